@@ -4,14 +4,22 @@ echo   Iniciando Servidores SICFAAE
 echo ========================================
 echo.
 
-echo [1/2] Iniciando DRH na porta 8000...
+echo [1/3] Iniciando DRH na porta 8000...
 start "SICFAAE-DRH" cmd /k "cd sicfaae-drh && python manage.py runserver 8000"
 
 timeout /t 3 /nobreak >nul
 
-echo [2/2] Iniciando DEFC na porta 8001...
+echo [2/3] Iniciando DEFC na porta 8001...
 start "SICFAAE-DEFC" cmd /k "cd sicfaae-defc && python manage.py runserver 8001"
 
+rem Workers das filas (exportacoes, envios para o DEFC, certificados e sincronizacao)
+echo [3/3] Iniciando workers...
+start "SICFAAE-DRH-TAREFAS" /min cmd /k "cd sicfaae-drh && python manage.py processar_tarefas"
+start "SICFAAE-DRH-ENVIAR-DEFC" /min cmd /k "cd sicfaae-drh && python manage.py enviar_defc"
+start "SICFAAE-DEFC-TAREFAS" /min cmd /k "cd sicfaae-defc && python manage.py processar_tarefas"
+start "SICFAAE-DEFC-CERTIFICADOS" /min cmd /k "cd sicfaae-defc && python manage.py processar_certificados"
+start "SICFAAE-DEFC-SYNC-DRH" /min cmd /k "cd sicfaae-defc && python manage.py sync_from_drh --continuo"
+
 echo.
 echo ========================================
 echo   Servidores Iniciados!
@@ -27,5 +35,5 @@ start http://localhost:8000
 start http://localhost:8001
 
 echo.
-echo Para parar os servidores, feche as janelas do terminal.
+echo Para parar os servidores e os workers, feche as janelas do terminal.
 echo.
@@ -5,14 +5,22 @@ Write-Host "  Iniciando Servidores SICFAAE" -ForegroundColor Cyan
 Write-Host "========================================" -ForegroundColor Cyan
 Write-Host ""
 
-Write-Host "[1/2] Iniciando DRH na porta 8000..." -ForegroundColor Yellow
+Write-Host "[1/3] Iniciando DRH na porta 8000..." -ForegroundColor Yellow
 Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$PSScriptRoot\sicfaae-drh'; python manage.py runserver 8000" -WindowStyle Normal
 
 Start-Sleep -Seconds 3
 
-Write-Host "[2/2] Iniciando DEFC na porta 8001..." -ForegroundColor Yellow
+Write-Host "[2/3] Iniciando DEFC na porta 8001..." -ForegroundColor Yellow
 Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$PSScriptRoot\sicfaae-defc'; python manage.py runserver 8001" -WindowStyle Normal
 
+# Workers das filas (exportações, envios para o DEFC, certificados e sincronização)
+Write-Host "[3/3] Iniciando workers..." -ForegroundColor Yellow
+Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$PSScriptRoot\sicfaae-drh'; python manage.py processar_tarefas" -WindowStyle Minimized
+Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$PSScriptRoot\sicfaae-drh'; python manage.py enviar_defc" -WindowStyle Minimized
+Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$PSScriptRoot\sicfaae-defc'; python manage.py processar_tarefas" -WindowStyle Minimized
+Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$PSScriptRoot\sicfaae-defc'; python manage.py processar_certificados" -WindowStyle Minimized
+Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$PSScriptRoot\sicfaae-defc'; python manage.py sync_from_drh --continuo" -WindowStyle Minimized
+
 Write-Host ""
 Write-Host "========================================" -ForegroundColor Green
 Write-Host "  Servidores Iniciados!" -ForegroundColor Green
@@ -30,5 +38,5 @@ Start-Process "http://localhost:8000"
 Start-Process "http://localhost:8001"
 
 Write-Host ""
-Write-Host "Para parar os servidores, feche as janelas do PowerShell." -ForegroundColor Gray
+Write-Host "Para parar os servidores e os workers, feche as janelas do PowerShell." -ForegroundColor Gray
 Write-Host ""
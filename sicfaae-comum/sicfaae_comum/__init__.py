@@ -0,0 +1,7 @@
+"""
+Código partilhado pelo DRH (sicfaae-drh) e pelo DEFC (sicfaae-defc).
+
+Os dois projectos são instalados separadamente; cada requirements.txt instala
+este pacote com `-e ../sicfaae-comum`. Os módulos não conhecem as apps de
+nenhum dos projectos: o que difere (modelos, nomes) vem das settings.
+"""
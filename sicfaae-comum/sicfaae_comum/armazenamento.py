@@ -0,0 +1,153 @@
+"""
+Armazenamento por conteúdo dos ficheiros dos candidatos (no DRH,
+Candidato.arquivo_* e foto; no DEFC, CandidatoFormacao.foto).
+
+Cada ficheiro é guardado uma única vez, com o nome derivado do SHA-256 do
+conteúdo: conteudo/<2 primeiros caracteres>/<sha256><extensão>. Dois envios
+iguais (o mesmo requerimento, o ficheiro de exemplo do popula_vagas_candidatos)
+ficam com o mesmo nome e ocupam o disco uma vez. O modelo
+ARMAZENAMENTO_CONTEUDO_MODELO (ConteudoFicheiro de cada projecto) conta as
+referências: delete() só remove o ficheiro quando deixa de ser usado.
+
+Os signals dos modelos (models.py de cada projecto) mantêm a contagem quando
+um ficheiro é substituído, quando um nome já guardado é atribuído
+directamente ao campo e quando o candidato é apagado. bulk_create() e
+update() não passam pelos signals; quem os usar chama referenciar()/delete()
+(ver popula_vagas_candidatos no DRH e formacao/recepcao.py no DEFC).
+
+Partilha entre o DRH e o DEFC: com ARMAZENAMENTO_CONTEUDO_ROOT (e
+ARMAZENAMENTO_CONTEUDO_URL) a apontar para a mesma pasta nos dois projectos,
+o DRH envia o nome da foto (foto_conteudo) e o DEFC referencia o mesmo
+ficheiro em vez de o copiar. Cada projecto conta as suas referências na sua
+base de dados e marca o uso com um ficheiro <nome>.ref-<projecto>
+(ARMAZENAMENTO_CONTEUDO_PROJECTO); o ficheiro só é removido quando nenhum
+projecto o usa.
+"""
+import glob
+import hashlib
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+PASTA = 'conteudo'
+
+
+def e_conteudo(nome):
+    """True se `nome` foi guardado pelo ArmazenamentoConteudo."""
+    return bool(nome) and nome.startswith(f'{PASTA}/')
+
+
+def nome_conteudo(sha256, extensao):
+    return f'{PASTA}/{sha256[:2]}/{sha256}{extensao.lower()}'
+
+
+@deconstructible
+class ArmazenamentoConteudo(FileSystemStorage):
+    """FileSystemStorage com chave no SHA-256 do conteúdo e contagem de referências."""
+
+    def __init__(self):
+        super().__init__(allow_overwrite=True)
+
+    @cached_property
+    def base_location(self):
+        return getattr(settings, 'ARMAZENAMENTO_CONTEUDO_ROOT', None) or settings.MEDIA_ROOT
+
+    @cached_property
+    def base_url(self):
+        return getattr(settings, 'ARMAZENAMENTO_CONTEUDO_URL', None) or settings.MEDIA_URL
+
+    @property
+    def projecto(self):
+        return settings.ARMAZENAMENTO_CONTEUDO_PROJECTO
+
+    def get_available_name(self, name, max_length=None):
+        # O nome final só é conhecido depois de ler o conteúdo (em _save)
+        return name
+
+    def _save(self, name, content):
+        sha256 = hashlib.sha256()
+        for bloco in content.chunks():
+            sha256.update(bloco)
+        nome = nome_conteudo(sha256.hexdigest(), os.path.splitext(name)[1])
+        self.referenciar(nome, content)
+        return nome
+
+    def _marca(self, nome):
+        return f'{self.path(nome)}.ref-{self.projecto}'
+
+    def referenciar(self, nome, conteudo=None, quantidade=1):
+        """
+        Acrescenta `quantidade` referências ao ficheiro `nome`. Se o ficheiro não
+        existir é gravado a partir de `conteudo`; sem conteúdo, lança FileNotFoundError.
+        """
+        ConteudoFicheiro = apps.get_model(settings.ARMAZENAMENTO_CONTEUDO_MODELO)
+        with transaction.atomic():
+            registo, _ = ConteudoFicheiro.objects.select_for_update().get_or_create(
+                nome=nome, defaults={'sha256': os.path.splitext(os.path.basename(nome))[0]}
+            )
+            if not self.exists(nome):
+                if conteudo is None:
+                    raise FileNotFoundError(nome)
+                super()._save(nome, conteudo)
+            if registo.referencias == 0:
+                registo.tamanho = self.size(nome)
+                registo.save(update_fields=['tamanho'])
+                open(self._marca(nome), 'a').close()
+            ConteudoFicheiro.objects.filter(pk=registo.pk).update(referencias=F('referencias') + quantidade)
+
+    def delete(self, name):
+        """Retira uma referência; o ficheiro é removido (após o commit) quando deixa de ser usado."""
+        if not e_conteudo(name):
+            return super().delete(name)
+        ConteudoFicheiro = apps.get_model(settings.ARMAZENAMENTO_CONTEUDO_MODELO)
+        with transaction.atomic():
+            registo = ConteudoFicheiro.objects.select_for_update().filter(nome=name).first()
+            if registo is None:
+                return
+            if registo.referencias > 1:
+                ConteudoFicheiro.objects.filter(pk=registo.pk).update(referencias=F('referencias') - 1)
+                return
+            registo.delete()
+            transaction.on_commit(lambda: self._remover(name))
+
+    def _remover(self, nome):
+        caminho = self.path(nome)
+        try:
+            os.remove(self._marca(nome))
+        except FileNotFoundError:
+            pass
+        if not glob.glob(glob.escape(caminho) + '.ref-*'):
+            super().delete(nome)
+
+
+armazenamento_conteudo = ArmazenamentoConteudo()
+
+
+def ficheiros(instancia, campos):
+    """Nomes actuais dos campos de ficheiro `campos` de `instancia`."""
+    return {campo: getattr(instancia, campo).name or '' for campo in campos}
+
+
+def actualizar_referencias(instancia, campos, anteriores, atribuidos):
+    """
+    Depois de gravar: referencia os nomes de `atribuidos` (guardados antes e
+    atribuídos directamente ao campo) e liberta os nomes `anteriores` substituídos.
+    """
+    actuais = ficheiros(instancia, campos)
+    for campo in campos:
+        actual, anterior = actuais[campo], anteriores.get(campo, '')
+        if actual == anterior:
+            continue
+        if campo in atribuidos and e_conteudo(actual):
+            try:
+                armazenamento_conteudo.referenciar(actual)
+            except FileNotFoundError:
+                pass
+        if e_conteudo(anterior):
+            armazenamento_conteudo.delete(anterior)
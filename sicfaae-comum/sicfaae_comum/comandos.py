@@ -0,0 +1,394 @@
+"""
+Bases dos management commands que o DRH e o DEFC têm em comum.
+
+Cada projecto mantém o seu comando (em <app>/management/commands/) como uma
+subclasse que só define o que é dele: o modelo, os índices, as consultas ou
+os pedidos a medir, e como gerar os dados.
+
+- ComandoBenchmarkIndices: benchmark_indices (EXPLAIN e tempos com e sem os
+  índices compostos, numa transacção revertida);
+- ComandoBenchmarkVistas: benchmark_vistas (p50/p95 e queries das vistas com
+  o cliente de testes, numa transacção revertida);
+- ComandoGerarDadosCarga: gerar_dados_carga (dados sintéticos e
+  determinísticos, em lotes);
+- ComandoProcessarTarefas: processar_tarefas (worker da fila TarefaRelatorio,
+  que também gera as miniaturas das fotos em falta).
+"""
+import math
+import random
+import statistics
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+VALIDADE_TAREFAS = getattr(settings, 'TAREFAS_VALIDADE_DIAS', 7)
+
+
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank."""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class ComandoBenchmarkIndices(BaseCommand):
+    """
+    Subclasses definem `modelo`, `indices` (nomes dos índices a remover para a
+    medição "antes"), `descricao` (para o relatório), semear(quantidade) e
+    consultas() -> [(nome, função)].
+    """
+    modelo = None
+    indices = ()
+    descricao = 'candidatos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--semear',
+            type=int,
+            default=0,
+            help='Número de candidatos sintéticos a criar antes de medir (revertidos no fim)'
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=5,
+            help='Execuções de cada consulta para calcular a mediana (padrão: 5)'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['semear']:
+                self.semear(options['semear'])
+            consultas = self.consultas()
+            if not consultas:
+                self.stdout.write(self.style.ERROR('❌ Sem candidatos. Use --semear N.'))
+                return
+
+            self.analisar()
+            depois = self.medir(consultas, options['repeticoes'])
+            self.remover_indices()
+            self.analisar()
+            antes = self.medir(consultas, options['repeticoes'])
+            total = self.modelo.objects.count()
+            transaction.set_rollback(True)
+
+        self.relatorio(consultas, antes, depois, total)
+
+    # --- Dados ---
+
+    def semear(self, quantidade):
+        raise NotImplementedError
+
+    def consultas(self):
+        raise NotImplementedError
+
+    # --- Medição ---
+
+    def analisar(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE' if connection.vendor == 'sqlite' else f'ANALYZE {self.modelo._meta.db_table}')
+
+    def remover_indices(self):
+        with connection.cursor() as cursor:
+            for nome in self.indices:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(nome)}')
+
+    def medir(self, consultas, repeticoes):
+        resultados = {}
+        for nome, consulta in consultas:
+            with CaptureQueriesContext(connection) as ctx:
+                consulta()
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                consulta()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nome] = (statistics.median(tempos), self.explicar(ctx.captured_queries[-1]['sql']))
+        return resultados
+
+    def explicar(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            return [str(linha[-1]) for linha in cursor.fetchall()]
+
+    def relatorio(self, consultas, antes, depois, total):
+        self.stdout.write(self.style.SUCCESS(f'\n📊 {total} {self.descricao} ({connection.vendor})\n'))
+        for nome, _ in consultas:
+            tempo_antes, plano_antes = antes[nome]
+            tempo_depois, plano_depois = depois[nome]
+            self.stdout.write(self.style.SUCCESS(
+                f'▶ {nome}: {tempo_antes:.2f} ms → {tempo_depois:.2f} ms'
+            ))
+            self.stdout.write('  Antes:')
+            for linha in plano_antes:
+                self.stdout.write(f'    {linha}')
+            self.stdout.write('  Depois:')
+            for linha in plano_depois:
+                self.stdout.write(f'    {linha}')
+
+
+class ComandoBenchmarkVistas(BaseCommand):
+    """
+    Subclasses definem `modelo` e `descricao` (contados no relatório) e
+    pedidos(token) -> [(nome, função que recebe o Client e devolve a resposta)].
+    """
+    help = 'Mede latência (p50/p95) e número de queries das vistas principais com o cliente de testes'
+    modelo = None
+    descricao = 'candidatos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20, help='Pedidos medidos por vista (padrão: 20)')
+        parser.add_argument('--aquecimento', type=int, default=2, help='Pedidos não medidos por vista (padrão: 2)')
+
+    def handle(self, *args, **options):
+        from rest_framework.authtoken.models import Token
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+            utilizador = User.objects.create_superuser('benchmark_vistas', 'benchmark@stae.gov.mz', None)
+            cliente = Client()
+            cliente.force_login(utilizador)
+            token = Token.objects.create(user=utilizador)
+
+            resultados = [
+                (nome, self.medir(cliente, pedido, options['repeticoes'], options['aquecimento']))
+                for nome, pedido in self.pedidos(token)
+            ]
+            total = self.modelo.objects.count()
+            transaction.set_rollback(True)
+
+        self.relatorio(resultados, total)
+
+    def pedidos(self, token):
+        raise NotImplementedError
+
+    def medir(self, cliente, pedido, repeticoes, aquecimento):
+        for _ in range(aquecimento):
+            self.executar(cliente, pedido)
+        tempos, queries = [], []
+        for _ in range(repeticoes):
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                resposta, tamanho = self.executar(cliente, pedido)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            queries.append(len(ctx.captured_queries))
+        return {
+            'estado': resposta.status_code, 'tamanho': tamanho,
+            'p50': statistics.median(tempos), 'p95': percentil(tempos, 95),
+            'queries': max(queries),
+        }
+
+    def executar(self, cliente, pedido):
+        resposta = pedido(cliente)
+        conteudo = b''.join(resposta.streaming_content) if resposta.streaming else resposta.content
+        return resposta, len(conteudo)
+
+    def relatorio(self, resultados, total):
+        self.stdout.write(self.style.SUCCESS(f'\n📊 {total} {self.descricao} ({connection.vendor})\n'))
+        self.stdout.write(f'{"Vista":<32} {"HTTP":>4} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"KB":>8}')
+        for nome, r in resultados:
+            linha = (
+                f'{nome:<32} {r["estado"]:>4} {r["p50"]:>9.1f} {r["p95"]:>9.1f} '
+                f'{r["queries"]:>8} {r["tamanho"] / 1024:>8.1f}'
+            )
+            self.stdout.write(self.style.ERROR(linha) if r['estado'] >= 400 else linha)
+        if any(r['estado'] == 302 for _, r in resultados):
+            self.stdout.write('\n302: volume acima do limite síncrono, pedido enviado para a fila de tarefas.')
+
+
+class ComandoGerarDadosCarga(BaseCommand):
+    """
+    Gera --candidatos candidatos em lotes de --lote, cada lote numa transacção.
+    Subclasses definem `modelo_distrito`, existentes() (quantos candidatos
+    sintéticos já existem, para continuar a numeração), gerar_lote(rng, numeros)
+    e, se precisarem, preparar(inicio) e concluir().
+    """
+    PREFIXO = 'SINT'
+    DATA_BASE = date(2026, 1, 1)
+    NOMES = [
+        'Ana', 'João', 'Maria', 'José', 'Fátima', 'António', 'Luísa', 'Armando', 'Celeste', 'Domingos',
+        'Esperança', 'Fernando', 'Graça', 'Hélder', 'Isabel', 'Jacinto', 'Lurdes', 'Manuel', 'Nélia', 'Orlando',
+    ]
+    APELIDOS = [
+        'Cossa', 'Machava', 'Sitoe', 'Langa', 'Mondlane', 'Nhantumbo', 'Tembe', 'Chissano', 'Macuácua', 'Mabunda',
+        'Muianga', 'Zunguze', 'Matsinhe', 'Bila', 'Guambe', 'Novela', 'Chauque', 'Mucavele', 'Massingue', 'Uamusse',
+    ]
+    modelo_distrito = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidatos', type=int, default=10000, help='Número de candidatos a gerar (padrão: 10000)')
+        parser.add_argument('--semente', type=int, default=42, help='Semente aleatória (padrão: 42)')
+        parser.add_argument('--lote', type=int, default=5000, help='Candidatos por bulk_create (padrão: 5000)')
+
+    def handle(self, *args, **options):
+        quantidade, lote = options['candidatos'], options['lote']
+
+        if not self.modelo_distrito.objects.exists():
+            call_command('popular_provincias', stdout=self.stdout)
+        self.distritos = list(self.modelo_distrito.objects.order_by('pk'))
+
+        inicio = self.existentes()
+        rng = random.Random(f"{options['semente']}:{inicio}")
+        self.preparar(inicio)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n🚀 A gerar {quantidade} candidatos em {len(self.distritos)} distritos (a partir do nº {inicio})...'
+        ))
+        for inicio_lote in range(inicio, inicio + quantidade, lote):
+            fim_lote = min(inicio_lote + lote, inicio + quantidade)
+            with transaction.atomic():
+                self.gerar_lote(rng, range(inicio_lote, fim_lote))
+            self.stdout.write(f'  ⏳ {fim_lote - inicio}/{quantidade}')
+
+        self.concluir()
+
+    def existentes(self):
+        raise NotImplementedError
+
+    def preparar(self, inicio):
+        pass
+
+    def gerar_lote(self, rng, numeros):
+        raise NotImplementedError
+
+    def concluir(self):
+        pass
+
+    def dados_pessoais(self, rng, n):
+        """Campos comuns ao Candidato e ao CandidatoFormacao do n-ésimo candidato sintético."""
+        distrito = self.distritos[n % len(self.distritos)]
+        return {
+            'nome_completo': f'{rng.choice(self.NOMES)} {rng.choice(self.APELIDOS)} {rng.choice(self.APELIDOS)}',
+            'genero': rng.choice('MF'),
+            'data_nascimento': self.DATA_BASE - timedelta(days=rng.randint(18 * 365, 60 * 365)),
+            'numero_bi': f'{self.PREFIXO}{n:08d}{rng.choice("ABCDEFGHIJ")}',
+            'numero_telefone': f'8{rng.choice("2345679")}{rng.randint(0, 9999999):07d}',
+            'provincia_id': distrito.provincia_id, 'distrito': distrito,
+            'endereco': f'Bairro {rng.randint(1, 50)}',
+        }
+
+    def espalhar_datas(self, rng, objectos, campo):
+        """`campo` é auto_now_add: distribui os objectos pelo ano anterior a DATA_BASE."""
+        origem = timezone.make_aware(datetime.combine(self.DATA_BASE - timedelta(days=365), datetime.min.time()))
+        for objecto in objectos:
+            setattr(objecto, campo, origem + timedelta(seconds=rng.randint(0, 365 * 86400)))
+        type(objectos[0]).objects.bulk_update(objectos, [campo], batch_size=1000)
+
+
+class ComandoProcessarTarefas(BaseCommand):
+    """
+    Worker da fila TarefaRelatorio. Subclasses definem `modelo` e executar(tarefa);
+    se houver outros ficheiros a apagar periodicamente, estendem limpar().
+
+    Enquanto executa uma tarefa, uma thread actualiza data_actividade a cada
+    --batimento segundos; as tarefas EM_CURSO sem actividade há mais de
+    --tempo-maximo minutos (worker morto) voltam à fila. As tarefas terminadas
+    há mais de --validade dias são apagadas com os seus ficheiros. Com a fila
+    vazia, gera as miniaturas das fotos novas (miniaturas.gerar_pendentes), no
+    máximo a cada --miniaturas segundos.
+    """
+    help = 'Executa as tarefas de relatórios e exportações em fila'
+    modelo = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help='Processa a fila actual e termina')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera quando a fila está vazia')
+        parser.add_argument(
+            '--batimento', type=float, default=30,
+            help='Segundos entre actualizações de data_actividade da tarefa em execução'
+        )
+        parser.add_argument(
+            '--tempo-maximo', type=float, default=5,
+            help='Minutos sem actividade após os quais uma tarefa EM_CURSO é considerada abandonada'
+        )
+        parser.add_argument(
+            '--validade', type=float, default=VALIDADE_TAREFAS,
+            help='Dias após a conclusão em que as tarefas e os seus ficheiros são apagados'
+        )
+        parser.add_argument(
+            '--limpeza', type=float, default=60,
+            help='Minutos entre limpezas dos ficheiros que deixaram de ser usados'
+        )
+        parser.add_argument(
+            '--miniaturas', type=float, default=30,
+            help='Segundos entre procuras de fotos sem miniaturas, com a fila vazia'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🚀 Worker de tarefas iniciado.'))
+        self.validade = options['validade']
+        ultima_limpeza = ultimas_miniaturas = None
+        while True:
+            # Tarefas de workers que morreram (os vivos actualizam data_actividade)
+            limite = timezone.now() - timedelta(minutes=options['tempo_maximo'])
+            recuperadas = self.modelo.recuperar_abandonadas(limite)
+            if recuperadas:
+                self.stdout.write(self.style.WARNING(f'⚠️  {recuperadas} tarefas abandonadas voltaram à fila.'))
+
+            if ultima_limpeza is None or time.monotonic() - ultima_limpeza >= options['limpeza'] * 60:
+                self.limpar()
+                ultima_limpeza = time.monotonic()
+
+            tarefa = self.modelo.reservar_proxima()
+            if tarefa is None:
+                if ultimas_miniaturas is None or time.monotonic() - ultimas_miniaturas >= options['miniaturas']:
+                    self.gerar_miniaturas()
+                    ultimas_miniaturas = time.monotonic()
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'▶️  {tarefa}')
+            self.executar_com_batimento(tarefa, options['batimento'])
+            if tarefa.estado == self.modelo.Estado.CONCLUIDA:
+                self.stdout.write(self.style.SUCCESS(f'✅ {tarefa}: {tarefa.ficheiro.name}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'❌ {tarefa}: {tarefa.erro}'))
+
+    def executar_com_batimento(self, tarefa, intervalo):
+        """Executa a tarefa com uma thread a chamar tarefa.registar_actividade() a cada `intervalo` segundos."""
+        parar = threading.Event()
+
+        def bater():
+            try:
+                while not parar.wait(intervalo):
+                    try:
+                        tarefa.registar_actividade()
+                    except DatabaseError:
+                        # Falha pontual (ex.: base de dados ocupada): o batimento seguinte volta a tentar
+                        pass
+            finally:
+                # A thread tem a sua própria ligação à base de dados
+                connections.close_all()
+
+        batimento = threading.Thread(target=bater, daemon=True)
+        batimento.start()
+        try:
+            self.executar(tarefa)
+        finally:
+            parar.set()
+            batimento.join()
+
+    def executar(self, tarefa):
+        raise NotImplementedError
+
+    def limpar(self):
+        """Apaga as tarefas expiradas; subclasses acrescentam os ficheiros delas."""
+        apagadas = self.modelo.limpar_expiradas(timezone.now() - timedelta(days=self.validade))
+        if apagadas:
+            self.stdout.write(f'🧹 {apagadas} tarefas expiradas apagadas com os seus ficheiros.')
+
+    def gerar_miniaturas(self):
+        from .miniaturas import gerar_pendentes
+
+        geradas = gerar_pendentes()
+        if geradas:
+            self.stdout.write(f'🖼️  Miniaturas de {geradas} fotos geradas.')
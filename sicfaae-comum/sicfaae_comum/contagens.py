@@ -0,0 +1,49 @@
+"""
+Contagens agregadas numa única query (aggregate + Count(filter=Q)).
+
+Em vez de um .count() por estado/género/tipo, cada painel pede todos os
+contadores de uma vez ao SGBD.
+"""
+from django.db.models import Count, Q
+
+
+def agregar_contagens(queryset, **filtros):
+    """
+    Conta o total e cada filtro numa única query aggregate(Count(filter=Q)).
+
+    Ex.: agregar_contagens(qs, pendentes=Q(estado='PENDENTE'))
+         -> {'total': 10, 'pendentes': 4}
+    """
+    contagens = {nome: Count('pk', filter=filtro) for nome, filtro in filtros.items()}
+    return queryset.order_by().aggregate(total=Count('pk'), **contagens)
+
+
+def contar_por_estado(queryset, estados=(), generos=(), tipos=(), campo_tipo='tipo_agente', **filtros):
+    """
+    Total, contagem por estado, por género e por tipo numa única query.
+
+    Os filtros extra (nome=Q(...)) são devolvidos como em agregar_contagens.
+
+    Ex.: contar_por_estado(qs, estados=['PENDENTE'], generos=['M', 'F'])
+         -> {'total': 10, 'por_estado': {'PENDENTE': 4},
+             'por_genero': {'M': 6, 'F': 4}, 'por_tipo': {}}
+    """
+    # Os valores podem não ser identificadores válidos: os aliases usam o índice
+    grupos = {
+        'por_estado': ('estado', estados),
+        'por_genero': ('genero', generos),
+        'por_tipo': (campo_tipo, tipos),
+    }
+    aliases = {}
+    for grupo, (campo, valores) in grupos.items():
+        for i, valor in enumerate(valores):
+            alias = f'_{grupo}_{i}'
+            filtros[alias] = Q(**{campo: valor})
+            aliases[alias] = (grupo, valor)
+
+    contagens = agregar_contagens(queryset, **filtros)
+    resultado = {grupo: {} for grupo in grupos}
+    for alias, (grupo, valor) in aliases.items():
+        resultado[grupo][valor] = contagens.pop(alias)
+    resultado.update(contagens)
+    return resultado
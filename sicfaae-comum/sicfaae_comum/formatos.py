@@ -0,0 +1,121 @@
+"""
+Formatos de troca em streaming: CSV e NDJSON (um objecto JSON por linha).
+
+Ao contrário do XLSX (openpyxl), ambos são escritos e lidos linha a linha, em
+memória constante e muito mais depressa, e aceitam ser acrescentados: várias
+exportações NDJSON (ou CSV sem cabeçalho) concatenadas continuam a ser um
+ficheiro válido.
+
+As colunas são pares (título, chave): o CSV usa o título no cabeçalho e o
+NDJSON usa a chave em cada objecto. O CSV começa com BOM para o Excel
+reconhecer o UTF-8; a leitura ignora-o.
+"""
+import csv
+import io
+import json
+
+from django.http import StreamingHttpResponse
+
+TIPOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+EXTENSOES = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+TAMANHO_BLOCO = 64 * 1024
+
+
+def formato_do_nome(nome):
+    """'csv', 'ndjson' ou None, pela extensão de `nome`."""
+    for extensao, formato in EXTENSOES.items():
+        if nome.lower().endswith(extensao):
+            return formato
+    return None
+
+
+class _Eco:
+    """Pseudo-ficheiro para o csv.writer devolver a linha em vez de a escrever."""
+
+    def write(self, valor):
+        return valor
+
+
+def _valor_json(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+
+
+def gerar_linhas(formato, colunas, linhas, cabecalho=True):
+    """Gera o texto de cada linha (terminada em \\n) no `formato` pedido."""
+    if formato == 'csv':
+        escritor = csv.writer(_Eco(), lineterminator='\n')
+        if cabecalho:
+            yield '\ufeff' + escritor.writerow([titulo for titulo, _ in colunas])
+        for linha in linhas:
+            yield escritor.writerow(linha)
+    elif formato == 'ndjson':
+        chaves = [chave for _, chave in colunas]
+        for linha in linhas:
+            yield json.dumps(dict(zip(chaves, linha)), ensure_ascii=False, default=_valor_json) + '\n'
+    else:
+        raise ValueError(f"Formato desconhecido: {formato}")
+
+
+def gerar_blocos(formato, colunas, linhas, cabecalho=True, tamanho_bloco=TAMANHO_BLOCO):
+    """Agrupa as linhas em blocos de bytes de ~tamanho_bloco (menos escritas na resposta/disco)."""
+    bloco, tamanho = [], 0
+    for texto in gerar_linhas(formato, colunas, linhas, cabecalho):
+        bloco.append(texto)
+        tamanho += len(texto)
+        if tamanho >= tamanho_bloco:
+            yield ''.join(bloco).encode('utf-8')
+            bloco, tamanho = [], 0
+    if bloco:
+        yield ''.join(bloco).encode('utf-8')
+
+
+def escrever(destino, formato, colunas, linhas, cabecalho=True):
+    """Escreve em `destino` (ficheiro binário) e devolve o número de bytes."""
+    total = 0
+    for bloco in gerar_blocos(formato, colunas, linhas, cabecalho):
+        destino.write(bloco)
+        total += len(bloco)
+    return total
+
+
+def resposta_streaming(nome_ficheiro, formato, colunas, linhas):
+    """StreamingHttpResponse que gera o ficheiro à medida que é enviado."""
+    response = StreamingHttpResponse(gerar_blocos(formato, colunas, linhas), content_type=TIPOS[formato])
+    response['Content-Disposition'] = f'attachment; filename={nome_ficheiro}'
+    return response
+
+
+def ler(ficheiro, formato):
+    """
+    Lê um ficheiro binário CSV ou NDJSON e gera (número da linha, registo, erro):
+    `registo` é um dict (cabeçalho do CSV ou chaves do objecto) e `erro` é
+    None, ou a mensagem de uma linha NDJSON inválida (com registo None).
+    """
+    texto = io.TextIOWrapper(ficheiro, encoding='utf-8-sig', newline='')
+    try:
+        if formato == 'csv':
+            leitor = csv.DictReader(texto)
+            for registo in leitor:
+                yield leitor.line_num, registo, None
+        elif formato == 'ndjson':
+            for numero, linha in enumerate(texto, 1):
+                if not linha.strip():
+                    continue
+                try:
+                    registo = json.loads(linha)
+                except ValueError as e:
+                    yield numero, None, f"JSON inválido: {e}"
+                    continue
+                if not isinstance(registo, dict):
+                    yield numero, None, "A linha não é um objecto JSON."
+                    continue
+                yield numero, registo, None
+        else:
+            raise ValueError(f"Formato desconhecido: {formato}")
+    finally:
+        # Não fechar o ficheiro de quem chamou
+        texto.detach()
@@ -0,0 +1,17 @@
+"""Conversões de imagem (Pillow) usadas pela compactação de documentos e pelas miniaturas."""
+
+QUALIDADE_JPEG = 80
+
+
+def imagem_rgb(imagem):
+    """Converte para RGB, sobre fundo branco se houver transparência."""
+    from PIL import Image
+
+    if imagem.mode in ('RGB', 'L'):
+        return imagem
+    if imagem.mode in ('RGBA', 'LA', 'P'):
+        imagem = imagem.convert('RGBA')
+        fundo = Image.new('RGB', imagem.size, 'white')
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        return fundo
+    return imagem.convert('RGB')
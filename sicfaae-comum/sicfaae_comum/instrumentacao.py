@@ -0,0 +1,246 @@
+"""
+Instrumentação dos pedidos: número de queries SQL, tempo de base de dados,
+queries repetidas e tempo de renderização.
+
+O InstrumentacaoMiddleware mede cada pedido com connection.execute_wrapper
+(funciona também com DEBUG=False) e expõe a medição:
+- nos cabeçalhos X-SQL-Queries, X-SQL-Duplicadas e Server-Timing
+  (visível nas ferramentas de programador do browser), se
+  INSTRUMENTACAO_CABECALHOS estiver activo;
+- numa linha de log JSON no logger 'sicfaae_comum.instrumentacao';
+- no modelo INSTRUMENTACAO_MODELO (MedicaoVista de cada projecto), agregada
+  por nome de URL e gravada a cada INSTRUMENTACAO_INTERVALO segundos (página
+  só para superutilizadores no admin; None desliga a gravação).
+
+Queries "duplicadas" são execuções repetidas da mesma impressão digital (SQL
+sem valores), a assinatura típica de um N+1.
+
+Orçamentos: ORCAMENTOS_SQL = {'candidaturas:lista_verificacao': 10, ...} limita
+o número de queries por nome de URL. Um pedido acima do orçamento gera um aviso
+no log ou, com INSTRUMENTACAO_ORCAMENTO_ESTRITO (usado nos testes), uma
+OrcamentoSQLExcedido. Para um bloco de código qualquer, usar orcamento_sql().
+
+As respostas em streaming só são medidas até a view devolver a resposta; a
+renderização só é separada para TemplateResponse (views baseadas em classes).
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SEM_ROTA = '(sem rota)'
+MAXIMO_DUPLICADAS_LOG = 5
+
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_LISTAS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_LINHAS = re.compile(r'(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+')
+_ESPACOS = re.compile(r'\s+')
+
+
+def impressao_digital(sql):
+    """SQL sem valores: literais, listas IN (%s, ...) e linhas de INSERT colapsados."""
+    sql = _LITERAIS.sub('?', sql)
+    sql = _LISTAS.sub('(...)', sql)
+    sql = _LINHAS.sub(r'\1', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+class OrcamentoSQLExcedido(AssertionError):
+    pass
+
+
+class Medicao:
+    """Contadores de um pedido (ou bloco); instalado como execute_wrapper em todas as ligações."""
+
+    def __init__(self):
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.tempo_render = 0.0
+        self.tempo_total = 0.0
+        self.impressoes = Counter()
+        self._inicio_render = None
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo_db += time.perf_counter() - inicio
+            self.queries += 1
+            self.impressoes[impressao_digital(sql)] += 1
+
+    @contextmanager
+    def instalar(self):
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for alias in connections:
+                pilha.enter_context(connections[alias].execute_wrapper(self))
+            try:
+                yield self
+            finally:
+                self.tempo_total = time.perf_counter() - inicio
+
+    def iniciar_render(self):
+        self._inicio_render = time.perf_counter()
+
+    def terminar_render(self, response=None):
+        if self._inicio_render is not None:
+            self.tempo_render += time.perf_counter() - self._inicio_render
+            self._inicio_render = None
+
+    @property
+    def duplicadas(self):
+        """{impressão digital: execuções} das queries executadas mais de uma vez."""
+        return {sql: n for sql, n in self.impressoes.most_common() if n > 1}
+
+    @property
+    def total_duplicadas(self):
+        """Execuções a mais (além da primeira) de queries repetidas."""
+        return sum(n - 1 for n in self.duplicadas.values())
+
+    def descrever_duplicadas(self, limite=MAXIMO_DUPLICADAS_LOG):
+        return [{'sql': sql[:300], 'execucoes': n} for sql, n in list(self.duplicadas.items())[:limite]]
+
+
+def nome_url(request):
+    correspondencia = getattr(request, 'resolver_match', None)
+    return correspondencia.view_name if correspondencia else SEM_ROTA
+
+
+def verificar_orcamento(medicao, maximo_queries=None, maximo_duplicadas=None, descricao='Bloco'):
+    """Lança OrcamentoSQLExcedido (com as queries repetidas) se a medição exceder os limites."""
+    problemas = []
+    if maximo_queries is not None and medicao.queries > maximo_queries:
+        problemas.append(f'{medicao.queries} queries (máximo {maximo_queries})')
+    if maximo_duplicadas is not None and medicao.total_duplicadas > maximo_duplicadas:
+        problemas.append(f'{medicao.total_duplicadas} queries repetidas (máximo {maximo_duplicadas})')
+    if problemas:
+        detalhe = ''.join(f'\n  {d["execucoes"]}x {d["sql"]}' for d in medicao.descrever_duplicadas())
+        raise OrcamentoSQLExcedido(f'{descricao}: {", ".join(problemas)}{detalhe}')
+
+
+@contextmanager
+def orcamento_sql(maximo_queries=None, maximo_duplicadas=None):
+    """
+    Falha (OrcamentoSQLExcedido) se o bloco exceder o número de queries ou de
+    queries repetidas:
+
+        with orcamento_sql(maximo_queries=8, maximo_duplicadas=0):
+            self.client.get(url)
+    """
+    medicao = Medicao()
+    with medicao.instalar():
+        yield medicao
+    verificar_orcamento(medicao, maximo_queries, maximo_duplicadas)
+
+
+class AgregadorMedicoes:
+    """Acumula as medições do processo por nome de URL e grava-as em MedicaoVista periodicamente."""
+
+    def __init__(self):
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self._ultima_gravacao = time.monotonic()
+
+    def adicionar(self, nome, medicao):
+        with self._lock:
+            agregado = self._pendentes.setdefault(nome, {
+                'pedidos': 0, 'queries': 0, 'max_queries': 0, 'pedidos_com_duplicadas': 0,
+                'tempo_db': 0.0, 'tempo_render': 0.0, 'tempo_total': 0.0, 'max_tempo_total': 0.0,
+                'exemplo_duplicada': '',
+            })
+            agregado['pedidos'] += 1
+            agregado['queries'] += medicao.queries
+            agregado['max_queries'] = max(agregado['max_queries'], medicao.queries)
+            agregado['tempo_db'] += medicao.tempo_db * 1000
+            agregado['tempo_render'] += medicao.tempo_render * 1000
+            agregado['tempo_total'] += medicao.tempo_total * 1000
+            agregado['max_tempo_total'] = max(agregado['max_tempo_total'], medicao.tempo_total * 1000)
+            if medicao.duplicadas:
+                agregado['pedidos_com_duplicadas'] += 1
+                agregado['exemplo_duplicada'] = next(iter(medicao.duplicadas))
+
+    def gravar_se_necessario(self):
+        intervalo = getattr(settings, 'INSTRUMENTACAO_INTERVALO', 60)
+        if intervalo is not None and time.monotonic() - self._ultima_gravacao >= intervalo:
+            self.gravar()
+
+    def gravar(self):
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+            self._ultima_gravacao = time.monotonic()
+        if not pendentes:
+            return
+        try:
+            apps.get_model(settings.INSTRUMENTACAO_MODELO).registar(pendentes)
+        except DatabaseError:
+            logger.exception('Não foi possível gravar as medições de %d vistas', len(pendentes))
+
+
+agregador = AgregadorMedicoes()
+
+
+class InstrumentacaoMiddleware:
+    """Deve ser o primeiro middleware, para incluir as queries dos restantes (sessão, autenticação)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicao = request.medicao_sql = Medicao()
+        with medicao.instalar():
+            response = self.get_response(request)
+
+        nome = nome_url(request)
+        if getattr(settings, 'INSTRUMENTACAO_CABECALHOS', settings.DEBUG):
+            self.adicionar_cabecalhos(response, medicao)
+        self.registar_log(request, response, nome, medicao)
+        agregador.adicionar(nome, medicao)
+        agregador.gravar_se_necessario()
+
+        maximo = getattr(settings, 'ORCAMENTOS_SQL', {}).get(nome)
+        if maximo is not None and medicao.queries > maximo:
+            if getattr(settings, 'INSTRUMENTACAO_ORCAMENTO_ESTRITO', False):
+                verificar_orcamento(medicao, maximo_queries=maximo, descricao=nome)
+            logger.warning('%s excedeu o orçamento de %d queries: %d', nome, maximo, medicao.queries)
+        return response
+
+    def process_template_response(self, request, response):
+        # O TemplateResponse é renderizado logo a seguir aos process_template_response
+        request.medicao_sql.iniciar_render()
+        response.add_post_render_callback(request.medicao_sql.terminar_render)
+        return response
+
+    def adicionar_cabecalhos(self, response, medicao):
+        response['X-SQL-Queries'] = str(medicao.queries)
+        response['X-SQL-Duplicadas'] = str(medicao.total_duplicadas)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={medicao.tempo_db * 1000:.1f};desc="{medicao.queries} queries"',
+            f'render;dur={medicao.tempo_render * 1000:.1f}',
+            f'total;dur={medicao.tempo_total * 1000:.1f}',
+        ])
+
+    def registar_log(self, request, response, nome, medicao):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(json.dumps({
+            'url': nome,
+            'metodo': request.method,
+            'caminho': request.path,
+            'estado': response.status_code,
+            'queries': medicao.queries,
+            'duplicadas': medicao.total_duplicadas,
+            'db_ms': round(medicao.tempo_db * 1000, 1),
+            'render_ms': round(medicao.tempo_render * 1000, 1),
+            'total_ms': round(medicao.tempo_total * 1000, 1),
+            'queries_repetidas': medicao.descrever_duplicadas(),
+        }, ensure_ascii=False))
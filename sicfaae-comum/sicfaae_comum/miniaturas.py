@@ -0,0 +1,125 @@
+"""
+Miniaturas das fotos dos candidatos (campo `foto` do modelo MINIATURAS_MODELO:
+Candidato no DRH, CandidatoFormacao no DEFC), em tamanhos fixos:
+
+- lista: avatar da lista de candidatos (e da lista do admin no DEFC);
+- cartao: foto das páginas de detalhe, avaliação e entrevista;
+- pdf: foto das fichas em PDF. link_callback (pdf.py do DRH) troca o URL da
+  foto por esta miniatura, em vez de o xhtml2pdf embeber a foto original.
+
+As miniaturas ficam em miniaturas/<tamanho>/<chave>.jpg no default_storage. A
+chave é o SHA-256 que dá nome à foto no armazenamento por conteúdo
+(armazenamento.py): fotos iguais partilham as miniaturas e uma foto nova tem
+sempre uma chave nova, por isso uma miniatura nunca fica desactualizada.
+
+Nunca são geradas durante um pedido: gerar_pendentes(), chamado pelo worker
+(processar_tarefas), gera as que faltam e copia o nome da foto para o campo
+`foto_miniaturas`. Enquanto os dois nomes forem diferentes, url() devolve o
+URL da foto original, sem consultar o storage. libertar() apaga as miniaturas
+de uma foto que deixou de ser usada.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Q, QuerySet
+
+from .armazenamento import armazenamento_conteudo, e_conteudo
+from .imagens import QUALIDADE_JPEG, imagem_rgb
+
+logger = logging.getLogger(__name__)
+
+PASTA = 'miniaturas'
+# Lado (em píxeis) de cada miniatura quadrada; a do PDF tem 3x o tamanho impresso (120px)
+TAMANHOS = {'lista': 64, 'cartao': 240, 'pdf': 360}
+# Fotos tratadas por consulta em gerar_pendentes()
+LOTE = 100
+
+
+def _chave(nome):
+    if e_conteudo(nome):
+        return os.path.splitext(os.path.basename(nome))[0]
+    return hashlib.sha256(nome.encode()).hexdigest()
+
+
+def nome_miniatura(nome, tamanho):
+    return f'{PASTA}/{tamanho}/{_chave(nome)}.jpg'
+
+
+def gerar(nome, tamanhos=tuple(TAMANHOS)):
+    """
+    Gera as miniaturas `tamanhos` da foto `nome` que ainda não existem. Devolve
+    {tamanho: nome da miniatura}, vazio se a foto não puder ser lida.
+    """
+    from PIL import Image, ImageOps
+
+    em_falta = [tamanho for tamanho in tamanhos if not default_storage.exists(nome_miniatura(nome, tamanho))]
+    if em_falta:
+        origem = armazenamento_conteudo if e_conteudo(nome) else default_storage
+        try:
+            with origem.open(nome) as ficheiro:
+                imagem = Image.open(ficheiro)
+                imagem.load()
+        except (OSError, Image.DecompressionBombError) as e:
+            logger.warning('Miniatura não gerada (%s): %s', nome, e)
+            return {}
+        imagem = imagem_rgb(ImageOps.exif_transpose(imagem))
+        for tamanho in em_falta:
+            saida = BytesIO()
+            lado = TAMANHOS[tamanho]
+            ImageOps.fit(imagem, (lado, lado)).save(saida, 'JPEG', quality=QUALIDADE_JPEG, optimize=True)
+            default_storage.save(nome_miniatura(nome, tamanho), ContentFile(saida.getvalue()))
+    return {tamanho: nome_miniatura(nome, tamanho) for tamanho in tamanhos}
+
+
+def gerar_pendentes():
+    """
+    Gera as miniaturas das fotos cujo `foto_miniaturas` não corresponde à foto
+    actual e marca-as. Devolve o número de fotos tratadas; as que não puderem
+    ser lidas ficam por marcar (e com o URL original) e voltam a ser tentadas
+    na chamada seguinte.
+    """
+    modelo = apps.get_model(settings.MINIATURAS_MODELO)
+    pendentes = modelo.objects.exclude(Q(foto='') | Q(foto__isnull=True) | Q(foto_miniaturas=F('foto')))
+    falhadas, tratadas = set(), 0
+    while True:
+        nomes = list(
+            pendentes.exclude(foto__in=falhadas).order_by('foto').values_list('foto', flat=True).distinct()[:LOTE]
+        )
+        if not nomes:
+            return tratadas
+        for nome in nomes:
+            if gerar(nome):
+                # QuerySet simples: marcar as miniaturas não é uma alteração do candidato (data_atualizacao)
+                QuerySet(modelo).filter(foto=nome).update(foto_miniaturas=nome)
+                tratadas += 1
+            else:
+                falhadas.add(nome)
+
+
+def url(foto, tamanho):
+    """URL da miniatura `tamanho` do FieldFile `foto`, ou o da foto original se ainda não tiver miniaturas."""
+    if not foto:
+        return ''
+    if getattr(foto.instance, 'foto_miniaturas', '') != foto.name:
+        return foto.url
+    return default_storage.url(nome_miniatura(foto.name, tamanho))
+
+
+def caminho(nome, tamanho):
+    """Caminho local da miniatura `tamanho` da foto `nome`, ou None se (ainda) não existir."""
+    miniatura = nome_miniatura(nome, tamanho)
+    return default_storage.path(miniatura) if default_storage.exists(miniatura) else None
+
+
+def libertar(nome):
+    """Apaga as miniaturas da foto `nome` se já nenhum candidato a usar."""
+    if not nome or apps.get_model(settings.MINIATURAS_MODELO).objects.filter(foto=nome).exists():
+        return
+    for tamanho in TAMANHOS:
+        default_storage.delete(nome_miniatura(nome, tamanho))
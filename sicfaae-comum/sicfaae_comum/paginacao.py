@@ -0,0 +1,209 @@
+"""
+Paginação por cursor (keyset), usada pelo DRH e pelo DEFC.
+
+Em vez de OFFSET, cada página começa depois da última linha da anterior:
+    WHERE (data, id) < (:data, :id) ORDER BY data DESC, id DESC LIMIT n
+pelo que a página 1000 custa o mesmo que a primeira, usando o índice com os
+campos da ordenação. O cursor guarda os valores de todos os campos.
+
+- paginar_por_cursor(): paginação das views HTML, com ?cursor= nos links
+  (url_com_cursor);
+- PaginacaoCursor: paginação da API (DRF). O CursorPagination do DRF só
+  compara o primeiro campo da ordenação e, com valores repetidos, recorre a um
+  OFFSET guardado no cursor.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valores, anterior=False):
+    # isoformat() completo: o DjangoJSONEncoder corta os microssegundos
+    valores = [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores]
+    dados = json.dumps({'v': valores, 'a': anterior})
+    return base64.urlsafe_b64encode(dados.encode()).decode()
+
+
+def ler_cursor(cursor):
+    """Devolve (valores, anterior)."""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return list(dados['v']), bool(dados['a'])
+    except (ValueError, TypeError, KeyError) as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+def _converter(queryset, ordenacao, valores):
+    """Valores do cursor convertidos com o to_python de cada campo (ou anotação) da ordenação."""
+    convertidos = []
+    for campo, valor in zip(ordenacao, valores):
+        nome = campo.lstrip('-')
+        try:
+            if nome in queryset.query.annotations:
+                campo_modelo = queryset.query.annotations[nome].output_field
+            else:
+                campo_modelo = queryset.model._meta.get_field(nome)
+            convertido = campo_modelo.to_python(valor)
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError) as e:
+            raise CursorInvalido(f"Valor inválido no cursor para {nome}: {valor!r}") from e
+        if convertido is None:
+            raise CursorInvalido(f"Valor vazio no cursor para {nome}")
+        convertidos.append(convertido)
+    return convertidos
+
+
+def _depois_de(ordenacao, valores):
+    """Q das linhas que vêm depois de `valores` na `ordenacao` (comparação de tuplos)."""
+    condicao = Q()
+    for i, campo in enumerate(ordenacao):
+        nome = campo.lstrip('-')
+        comparacao = 'lt' if campo.startswith('-') else 'gt'
+        iguais = {ordenacao[j].lstrip('-'): valores[j] for j in range(i)}
+        condicao |= Q(**iguais, **{f'{nome}__{comparacao}': valores[i]})
+    return condicao
+
+
+def _inverter(ordenacao):
+    return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordenacao)
+
+
+class PaginaCursor:
+    """Página de paginar_por_cursor, com a mesma interface usada nos templates (has_next/has_previous)."""
+
+    def __init__(self, objetos, cursor_seguinte=None, cursor_anterior=None):
+        self.object_list = objetos
+        self.cursor_seguinte = cursor_seguinte
+        self.cursor_anterior = cursor_anterior
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.cursor_seguinte is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginar_por_cursor(queryset, cursor, tamanho, ordenacao):
+    """
+    Devolve a PaginaCursor de `queryset` indicada por `cursor` (None = primeira página).
+    O último campo de `ordenacao` deve ser único; os campos podem ser anotações.
+    Um cursor inválido (mal formado ou com valores que não servem para os
+    campos da ordenação) devolve a primeira página.
+    """
+    try:
+        valores, anterior = ler_cursor(cursor) if cursor else (None, False)
+        if valores is not None:
+            if len(valores) != len(ordenacao):
+                raise CursorInvalido(f"Cursor inválido: {cursor}")
+            valores = _converter(queryset, ordenacao, valores)
+    except CursorInvalido:
+        valores, anterior = None, False
+
+    if valores is None:
+        linhas = list(queryset.order_by(*ordenacao)[:tamanho + 1])
+        ha_mais, ha_antes = len(linhas) > tamanho, False
+        linhas = linhas[:tamanho]
+    elif anterior:
+        linhas = list(queryset.filter(_depois_de(_inverter(ordenacao), valores)).order_by(*_inverter(ordenacao))[:tamanho + 1])
+        ha_antes, ha_mais = len(linhas) > tamanho, True
+        linhas = linhas[:tamanho][::-1]
+    else:
+        linhas = list(queryset.filter(_depois_de(ordenacao, valores)).order_by(*ordenacao)[:tamanho + 1])
+        ha_mais, ha_antes = len(linhas) > tamanho, True
+        linhas = linhas[:tamanho]
+
+    def posicao(objecto):
+        return [getattr(objecto, campo.lstrip('-')) for campo in ordenacao]
+
+    return PaginaCursor(
+        linhas,
+        cursor_seguinte=codificar_cursor(posicao(linhas[-1])) if linhas and ha_mais else None,
+        cursor_anterior=codificar_cursor(posicao(linhas[0]), anterior=True) if linhas and ha_antes else None,
+    )
+
+
+def url_com_cursor(request, cursor):
+    """Query string da página actual com outro cursor (mantém os filtros)."""
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    parametros.pop('page', None)
+    if cursor:
+        parametros['cursor'] = cursor
+    return f'?{parametros.urlencode()}'
+
+
+class PaginacaoCursor(BasePagination):
+    """
+    Paginação da API com paginar_por_cursor. Subclasses definem `ordering`
+    (o último campo deve ser único, ex.: ('-data_criacao', '-id')).
+    A resposta tem o formato do CursorPagination: next, previous e results.
+    """
+    ordering = None
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.url = request.build_absolute_uri()
+        self.pagina = paginar_por_cursor(
+            queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request), self.ordering
+        )
+        return list(self.pagina)
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(tamanho, self.max_page_size) if tamanho > 0 else self.page_size
+
+    def ligacao(self, cursor):
+        return replace_query_param(self.url, self.cursor_query_param, cursor) if cursor else None
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.ligacao(self.pagina.cursor_seguinte),
+            'previous': self.ligacao(self.pagina.cursor_anterior),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'Cursor da página', 'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': 'Número de resultados por página', 'schema': {'type': 'integer'},
+            },
+        ]
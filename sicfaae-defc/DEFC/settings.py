@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'sicfaae_comum.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -36,6 +37,7 @@ MIDDLEWARE = [
     'simple_history.middleware.HistoryRequestMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.escopo.EscopoUtilizadorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'formacao.middleware.ForcarAlteracaoSenhaMiddleware',
@@ -70,6 +72,14 @@ DATABASES = {
     }
 }
 
+# Cache partilhada entre processos, ex.: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# com CACHE_LOCATION=redis://127.0.0.1:6379, ou ...backends.db.DatabaseCache com o nome da tabela
+# (createcachetable). Sem ela fica a cache local de cada processo e o âmbito dos utilizadores
+# não é guardado entre pedidos (escopo.py)
+CACHE_BACKEND = config('CACHE_BACKEND', default='')
+if CACHE_BACKEND:
+    CACHES = {'default': {'BACKEND': CACHE_BACKEND, 'LOCATION': config('CACHE_LOCATION', default='')}}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -92,6 +102,14 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Ficheiros dos candidatos guardados por conteúdo (sicfaae_comum/armazenamento.py); a mesma pasta
+# nos dois projectos permite ao DEFC partilhar as fotos enviadas pelo DRH. Vazio = MEDIA_ROOT/MEDIA_URL
+ARMAZENAMENTO_CONTEUDO_ROOT = config('ARMAZENAMENTO_CONTEUDO_ROOT', default='')
+ARMAZENAMENTO_CONTEUDO_URL = config('ARMAZENAMENTO_CONTEUDO_URL', default='')
+ARMAZENAMENTO_CONTEUDO_MODELO = 'core.ConteudoFicheiro'
+ARMAZENAMENTO_CONTEUDO_PROJECTO = 'defc'
+# Modelo com as fotos (foto/foto_miniaturas) cujas miniaturas o worker gera (sicfaae_comum/miniaturas.py)
+MINIATURAS_MODELO = 'core.CandidatoFormacao'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -116,6 +134,37 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Instrumentação de pedidos (sicfaae_comum/instrumentacao.py)
+INSTRUMENTACAO_MODELO = 'core.MedicaoVista'
+INSTRUMENTACAO_CABECALHOS = config('INSTRUMENTACAO_CABECALHOS', default=DEBUG, cast=bool)
+INSTRUMENTACAO_INTERVALO = config('INSTRUMENTACAO_INTERVALO', default=60, cast=int)
+# Número máximo de queries por nome de URL (aviso no log; erro nos testes)
+ORCAMENTOS_SQL = {
+    'formacao:dashboard_geral': 10,
+    'formacao:lista_turmas': 10,
+    'formacao:lista_brigadas': 10,
+    'formacao:api_formadores_disponiveis': 8,
+    'formacao_api:candidato_formacao-list': 8,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simples': {'format': '{asctime} {levelname} {name} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simples'},
+    },
+    'loggers': {
+        'sicfaae_comum.instrumentacao': {
+            'handlers': ['console'],
+            'level': config('INSTRUMENTACAO_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 DRH_API_URL = config('DRH_API_URL', default='http://localhost:8000/api/')
 DRH_API_TOKEN = config('DRH_API_TOKEN', default='')
 
@@ -6,3 +6,6 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
+
+# Os workers das filas não fazem parte do build: cada um corre como serviço
+# próprio (ver "Workers" em README_SEPARACAO.md)
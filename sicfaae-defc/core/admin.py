@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Provincia, Distrito, CandidatoFormacao, ConfiguracaoSistema
+from django.utils.html import format_html
+from sicfaae_comum import miniaturas
+from .models import Provincia, Distrito, CandidatoFormacao, ConfiguracaoSistema, MedicaoVista
 
 @admin.register(ConfiguracaoSistema)
 class ConfiguracaoSistemaAdmin(admin.ModelAdmin):
@@ -31,11 +33,18 @@ class DistritoAdmin(admin.ModelAdmin):
 
 @admin.register(CandidatoFormacao)
 class CandidatoFormacaoAdmin(admin.ModelAdmin):
-    list_display = ('codigo_candidato', 'nome_completo', 'tipo_agente', 'provincia', 'distrito', 'ativo', 'data_recepcao')
+    list_display = ('miniatura_foto', 'codigo_candidato', 'nome_completo', 'tipo_agente', 'provincia', 'distrito', 'ativo', 'data_recepcao')
+    list_display_links = ('codigo_candidato',)
     list_filter = ('tipo_agente', 'genero', 'provincia', 'ativo')
     search_fields = ('nome_completo', 'codigo_candidato', 'numero_bi')
     readonly_fields = ('id_drh', 'codigo_candidato', 'data_recepcao')
     ordering = ('-data_recepcao',)
+
+    @admin.display(description='Foto')
+    def miniatura_foto(self, obj):
+        if not obj.foto:
+            return ''
+        return format_html('<img src="{}" width="32" height="32" alt="" loading="lazy">', miniaturas.url(obj.foto, 'lista'))
     
     fieldsets = (
         ('Identificação DRH', {
@@ -51,3 +60,45 @@ class CandidatoFormacaoAdmin(admin.ModelAdmin):
             'fields': ('tipo_agente', 'ativo', 'observacoes')
         }),
     )
+
+
+@admin.register(MedicaoVista)
+class MedicaoVistaAdmin(admin.ModelAdmin):
+    """Medições por URL do InstrumentacaoMiddleware (só leitura, só superutilizadores; apagar recomeça a contagem)."""
+    list_display = (
+        'nome_url', 'pedidos', 'queries_media', 'max_queries', 'pedidos_com_duplicadas',
+        'tempo_db_medio', 'tempo_render_medio', 'tempo_total_medio', 'max_tempo_total', 'data_atualizacao',
+    )
+    search_fields = ('nome_url',)
+    readonly_fields = [campo.name for campo in MedicaoVista._meta.fields]
+
+    @admin.display(description='Queries (média)')
+    def queries_media(self, obj):
+        return obj.media_queries
+
+    @admin.display(description='BD (ms, média)')
+    def tempo_db_medio(self, obj):
+        return obj.media_tempo_db
+
+    @admin.display(description='Render (ms, média)')
+    def tempo_render_medio(self, obj):
+        return obj.media_tempo_render
+
+    @admin.display(description='Total (ms, média)')
+    def tempo_total_medio(self, obj):
+        return obj.media_tempo_total
+
+    def has_module_permission(self, request):
+        return request.user.is_superuser
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
@@ -0,0 +1,99 @@
+"""
+Âmbito de dados do utilizador (nível, província e distrito), resolvido uma vez.
+
+O EscopoUtilizador fica guardado no próprio objecto User, pelo que todas as
+chamadas dentro do mesmo pedido (request.user, user.perfil nos templates)
+o reaproveitam. Entre pedidos, o PerfilUtilizador (com província e distrito)
+fica na cache do Django durante ESCOPO_CACHE_TIMEOUT segundos e é invalidado
+sempre que um perfil é gravado ou apagado (ver core/models.py).
+
+Isto só é feito com uma cache partilhada entre processos (CACHE_BACKEND nas
+settings). Na cache local de cada processo (LocMemCache, a omissão) a
+invalidação só chegaria ao worker que gravou o perfil, e os outros
+continuariam a aplicar o âmbito antigo: sem cache partilhada o perfil é lido
+da base de dados uma vez por pedido.
+
+O EscopoUtilizadorMiddleware expõe o âmbito em `request.escopo`.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.functional import SimpleLazyObject
+from .models import PerfilUtilizador
+
+CACHE_TIMEOUT = getattr(settings, 'ESCOPO_CACHE_TIMEOUT', 60)
+ATRIBUTO = '_escopo_utilizador'
+SEM_PERFIL = 'sem-perfil'
+
+
+def chave_cache(usuario_id):
+    return f'core:perfil_utilizador:{usuario_id}'
+
+
+class EscopoUtilizador:
+    """Nível e área geográfica do utilizador."""
+
+    def __init__(self, usuario, perfil=None):
+        self.is_superuser = usuario.is_superuser
+        self.perfil = perfil
+        self.nivel = perfil.nivel if perfil else None
+        self.provincia_id = perfil.provincia_id if perfil else None
+        self.distrito_id = perfil.distrito_id if perfil else None
+        self.deve_alterar_senha = bool(perfil and perfil.deve_alterar_senha)
+
+    @property
+    def is_central(self):
+        return self.nivel == PerfilUtilizador.Nivel.CENTRAL
+
+    @property
+    def is_provincial(self):
+        return self.nivel == PerfilUtilizador.Nivel.PROVINCIAL
+
+    @property
+    def is_distrital(self):
+        return self.nivel == PerfilUtilizador.Nivel.DISTRITAL
+
+
+def cache_partilhada():
+    """True se a cache do Django é vista por todos os processos (ver acima)."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _carregar_perfil(usuario):
+    partilhada = cache_partilhada()
+    perfil = cache.get(chave_cache(usuario.pk)) if partilhada else None
+    if perfil is None:
+        perfil = PerfilUtilizador.objects.select_related('provincia', 'distrito').filter(usuario=usuario).first()
+        if partilhada:
+            cache.set(chave_cache(usuario.pk), perfil or SEM_PERFIL, CACHE_TIMEOUT)
+    elif perfil == SEM_PERFIL:
+        perfil = None
+
+    if perfil is not None:
+        # Reaproveitar o mesmo objecto em usuario.perfil (templates, forms)
+        campo = PerfilUtilizador._meta.get_field('usuario')
+        campo.set_cached_value(perfil, usuario)
+        campo.remote_field.set_cached_value(usuario, perfil)
+    return perfil
+
+
+def obter_escopo(usuario):
+    """EscopoUtilizador de `usuario`, resolvido uma vez por objecto User."""
+    escopo = getattr(usuario, ATRIBUTO, None)
+    if escopo is None:
+        if not usuario.is_authenticated:
+            escopo = EscopoUtilizador(usuario)
+        else:
+            escopo = EscopoUtilizador(usuario, _carregar_perfil(usuario))
+        setattr(usuario, ATRIBUTO, escopo)
+    return escopo
+
+
+class EscopoUtilizadorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.escopo = SimpleLazyObject(lambda: obter_escopo(request.user))
+        return self.get_response(request)
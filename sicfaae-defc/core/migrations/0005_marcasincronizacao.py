@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-17 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_add_deve_alterar_senha_to_perfil'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaSincronizacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(max_length=50, unique=True, verbose_name='Feed')),
+                ('cursor', models.CharField(blank=True, max_length=100, verbose_name='Cursor')),
+                ('total_recebidos', models.PositiveIntegerField(default=0, verbose_name='Total Recebido')),
+                ('data_ultima_sincronizacao', models.DateTimeField(blank=True, null=True, verbose_name='Última Sincronização')),
+            ],
+            options={
+                'verbose_name': 'Marca de Sincronização',
+                'verbose_name_plural': 'Marcas de Sincronização',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_marcasincronizacao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidatoformacao',
+            index=models.Index(fields=['data_recepcao', 'id'], name='candidato_recepcao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatoformacao',
+            index=models.Index(fields=['tipo_agente', 'data_recepcao', 'id'], name='candidato_tipo_recepcao_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_candidato_recepcao_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidatoformacao',
+            index=models.Index(fields=['distrito', 'tipo_agente', 'ativo'], name='candidato_distrito_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatoformacao',
+            index=models.Index(fields=['provincia', 'tipo_agente', 'ativo'], name='candidato_provincia_tipo_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_candidato_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicaoVista',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_url', models.CharField(max_length=200, unique=True, verbose_name='Nome da URL')),
+                ('pedidos', models.PositiveIntegerField(default=0, verbose_name='Pedidos')),
+                ('queries', models.PositiveBigIntegerField(default=0, verbose_name='Total de Queries')),
+                ('max_queries', models.PositiveIntegerField(default=0, verbose_name='Máximo de Queries')),
+                ('pedidos_com_duplicadas', models.PositiveIntegerField(default=0, verbose_name='Pedidos com Queries Repetidas')),
+                ('exemplo_duplicada', models.TextField(blank=True, verbose_name='Última Query Repetida')),
+                ('tempo_db', models.FloatField(default=0, verbose_name='Tempo de BD (ms, total)')),
+                ('tempo_render', models.FloatField(default=0, verbose_name='Tempo de Renderização (ms, total)')),
+                ('tempo_total', models.FloatField(default=0, verbose_name='Tempo Total (ms, total)')),
+                ('max_tempo_total', models.FloatField(default=0, verbose_name='Tempo Máximo (ms)')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Medição de Vista',
+                'verbose_name_plural': 'Medições de Vistas',
+                'ordering': ['-tempo_total'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 15:20
+
+import sicfaae_comum.armazenamento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_medicao_vista'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteudoFicheiro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True, verbose_name='Nome no Storage')),
+                ('sha256', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('tamanho', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('referencias', models.PositiveIntegerField(default=0, verbose_name='Referências')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Conteúdo de Ficheiro',
+                'verbose_name_plural': 'Conteúdos de Ficheiros',
+            },
+        ),
+        migrations.AlterField(
+            model_name='candidatoformacao',
+            name='foto',
+            field=models.ImageField(blank=True, null=True, storage=sicfaae_comum.armazenamento.ArmazenamentoConteudo(), upload_to='candidatos_formacao/fotos/', verbose_name='Foto'),
+        ),
+    ]
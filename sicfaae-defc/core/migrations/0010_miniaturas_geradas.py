@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_conteudo_ficheiros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidatoformacao',
+            name='foto_miniaturas',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from sicfaae_comum import armazenamento, miniaturas
+from sicfaae_comum.armazenamento import armazenamento_conteudo
 
 
 class Provincia(models.Model):
@@ -101,12 +103,17 @@ class CandidatoFormacao(models.Model):
         help_text=_("Tipo de agente eleitoral para formação")
     )
     
+    # Guardada por conteúdo (sicfaae_comum/armazenamento.py); pode ser a mesma foto guardada pelo DRH
     foto = models.ImageField(
         _("Foto"),
         upload_to='candidatos_formacao/fotos/',
+        storage=armazenamento_conteudo,
         blank=True,
         null=True
     )
+    CAMPOS_FICHEIROS = ('foto',)
+    # Foto cujas miniaturas já existem (sicfaae_comum/miniaturas.py); diferente de `foto` = ainda não geradas
+    foto_miniaturas = models.CharField(max_length=100, blank=True, editable=False)
     
     data_recepcao = models.DateTimeField(
         _("Data de Recepção do DRH"),
@@ -135,6 +142,14 @@ class CandidatoFormacao(models.Model):
         verbose_name = _("Candidato em Formação")
         verbose_name_plural = _("Candidatos em Formação")
         ordering = ['-data_recepcao']
+        indexes = [
+            # Paginação por cursor da API (formacao/paginacao.py)
+            models.Index(fields=['data_recepcao', 'id'], name='candidato_recepcao_idx'),
+            models.Index(fields=['tipo_agente', 'data_recepcao', 'id'], name='candidato_tipo_recepcao_idx'),
+            # Candidatos disponíveis por turma e contagens do painel (ver benchmark_indices)
+            models.Index(fields=['distrito', 'tipo_agente', 'ativo'], name='candidato_distrito_tipo_idx'),
+            models.Index(fields=['provincia', 'tipo_agente', 'ativo'], name='candidato_provincia_tipo_idx'),
+        ]
 
 
 class ConfiguracaoSistema(models.Model):
@@ -173,6 +188,102 @@ class ConfiguracaoSistema(models.Model):
         verbose_name_plural = _("Configurações Gerais")
 
 
+
+class MarcaSincronizacao(models.Model):
+    """
+    Último cursor recebido de um feed de alterações do DRH (watermark).
+    O comando `sync_from_drh` continua a partir daqui em vez de reler tudo.
+    """
+    feed = models.CharField(_("Feed"), max_length=50, unique=True)
+    cursor = models.CharField(_("Cursor"), max_length=100, blank=True)
+    total_recebidos = models.PositiveIntegerField(_("Total Recebido"), default=0)
+    data_ultima_sincronizacao = models.DateTimeField(_("Última Sincronização"), null=True, blank=True)
+
+    @classmethod
+    def obter(cls, feed):
+        obj, created = cls.objects.get_or_create(feed=feed)
+        return obj
+
+    def __str__(self):
+        return f"Sincronização {self.feed} ({self.data_ultima_sincronizacao or 'nunca'})"
+
+    class Meta:
+        verbose_name = _("Marca de Sincronização")
+        verbose_name_plural = _("Marcas de Sincronização")
+
+
+class MedicaoVista(models.Model):
+    """
+    Medições agregadas por nome de URL (número de queries, tempos de base de
+    dados, renderização e total), acumuladas pelo InstrumentacaoMiddleware.
+    Ver sicfaae_comum/instrumentacao.py.
+    """
+    nome_url = models.CharField(_("Nome da URL"), max_length=200, unique=True)
+    pedidos = models.PositiveIntegerField(_("Pedidos"), default=0)
+    queries = models.PositiveBigIntegerField(_("Total de Queries"), default=0)
+    max_queries = models.PositiveIntegerField(_("Máximo de Queries"), default=0)
+    pedidos_com_duplicadas = models.PositiveIntegerField(_("Pedidos com Queries Repetidas"), default=0)
+    exemplo_duplicada = models.TextField(_("Última Query Repetida"), blank=True)
+    tempo_db = models.FloatField(_("Tempo de BD (ms, total)"), default=0)
+    tempo_render = models.FloatField(_("Tempo de Renderização (ms, total)"), default=0)
+    tempo_total = models.FloatField(_("Tempo Total (ms, total)"), default=0)
+    max_tempo_total = models.FloatField(_("Tempo Máximo (ms)"), default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Medição de Vista")
+        verbose_name_plural = _("Medições de Vistas")
+        ordering = ['-tempo_total']
+
+    def __str__(self):
+        return self.nome_url
+
+    def _media(self, total):
+        return round(total / self.pedidos, 1) if self.pedidos else 0
+
+    @property
+    def media_queries(self):
+        return self._media(self.queries)
+
+    @property
+    def media_tempo_db(self):
+        return self._media(self.tempo_db)
+
+    @property
+    def media_tempo_render(self):
+        return self._media(self.tempo_render)
+
+    @property
+    def media_tempo_total(self):
+        return self._media(self.tempo_total)
+
+    @classmethod
+    def registar(cls, agregados):
+        """Soma os agregados {nome_url: {...}} de um processo às linhas existentes."""
+        from django.db import transaction
+        from django.db.models import F
+        from django.db.models.functions import Greatest
+        from django.utils import timezone
+
+        with transaction.atomic():
+            for nome, a in agregados.items():
+                valores = {
+                    'pedidos': F('pedidos') + a['pedidos'],
+                    'queries': F('queries') + a['queries'],
+                    'max_queries': Greatest('max_queries', a['max_queries']),
+                    'pedidos_com_duplicadas': F('pedidos_com_duplicadas') + a['pedidos_com_duplicadas'],
+                    'tempo_db': F('tempo_db') + a['tempo_db'],
+                    'tempo_render': F('tempo_render') + a['tempo_render'],
+                    'tempo_total': F('tempo_total') + a['tempo_total'],
+                    'max_tempo_total': Greatest('max_tempo_total', a['max_tempo_total']),
+                    'data_atualizacao': timezone.now(),
+                }
+                if a['exemplo_duplicada']:
+                    valores['exemplo_duplicada'] = a['exemplo_duplicada']
+                if not cls.objects.filter(nome_url=nome).update(**valores):
+                    cls.objects.get_or_create(nome_url=nome)
+                    cls.objects.filter(nome_url=nome).update(**valores)
+
 class PerfilUtilizador(models.Model):
     """
     Perfil de utilizador para controlo hierárquico de acesso no DEFC.
@@ -240,8 +351,28 @@ class PerfilUtilizador(models.Model):
         verbose_name_plural = _("Perfis de Utilizadores")
 
 
+class ConteudoFicheiro(models.Model):
+    """
+    Ficheiro guardado pelo ArmazenamentoConteudo (sicfaae_comum/armazenamento.py),
+    com o número de campos que o usam no DEFC. Com zero referências o registo
+    é apagado e o ficheiro também, se o DRH não o estiver a usar.
+    """
+    nome = models.CharField(_("Nome no Storage"), max_length=100, unique=True)
+    sha256 = models.CharField(_("SHA-256"), max_length=64, db_index=True)
+    tamanho = models.PositiveBigIntegerField(_("Tamanho (bytes)"), default=0)
+    referencias = models.PositiveIntegerField(_("Referências"), default=0)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.nome} ({self.referencias})"
+
+    class Meta:
+        verbose_name = _("Conteúdo de Ficheiro")
+        verbose_name_plural = _("Conteúdos de Ficheiros")
+
+
 # Signal to auto-create UserProfile for new users
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 
@@ -257,3 +388,71 @@ def salvar_perfil_usuario(sender, instance, **kwargs):
     """Guarda o perfil quando o utilizador é guardado."""
     if not instance.is_superuser and hasattr(instance, 'perfil'):
         instance.perfil.save()
+
+
+@receiver(post_save, sender=PerfilUtilizador)
+@receiver(post_delete, sender=PerfilUtilizador)
+def invalidar_escopo_utilizador(sender, instance, **kwargs):
+    """Remove da cache o perfil usado por core.escopo."""
+    from django.core.cache import cache
+    from .escopo import chave_cache
+    cache.delete(chave_cache(instance.usuario_id))
+
+
+@receiver(pre_save, sender=CandidatoFormacao)
+def guardar_foto_anterior(sender, instance, **kwargs):
+    """Guarda a foto que o candidato tinha na base de dados (contagem de referências)."""
+    instance._ficheiros_anteriores = {}
+    if not instance._state.adding and instance.pk:
+        anterior = CandidatoFormacao.objects.filter(pk=instance.pk).values_list(
+            *CandidatoFormacao.CAMPOS_FICHEIROS
+        ).first()
+        if anterior:
+            instance._ficheiros_anteriores = {
+                campo: nome or '' for campo, nome in zip(CandidatoFormacao.CAMPOS_FICHEIROS, anterior)
+            }
+    instance._ficheiros_atribuidos = {
+        campo for campo, nome in armazenamento.ficheiros(instance, CandidatoFormacao.CAMPOS_FICHEIROS).items()
+        if nome != instance._ficheiros_anteriores.get(campo, '') and getattr(instance, campo)._committed
+    }
+
+
+@receiver(post_save, sender=CandidatoFormacao)
+def actualizar_referencias_foto(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    armazenamento.actualizar_referencias(
+        instance, CandidatoFormacao.CAMPOS_FICHEIROS,
+        getattr(instance, '_ficheiros_anteriores', {}), getattr(instance, '_ficheiros_atribuidos', set()),
+    )
+
+
+@receiver(post_delete, sender=CandidatoFormacao)
+def libertar_foto(sender, instance, **kwargs):
+    for nome in armazenamento.ficheiros(instance, CandidatoFormacao.CAMPOS_FICHEIROS).values():
+        if armazenamento.e_conteudo(nome):
+            armazenamento_conteudo.delete(nome)
+
+
+@receiver(post_save, sender=CandidatoFormacao)
+def actualizar_miniaturas(sender, instance, raw=False, **kwargs):
+    """
+    Apaga as miniaturas da foto substituída, depois do commit. As da foto nova
+    são geradas pelo worker (miniaturas.gerar_pendentes em processar_tarefas).
+    """
+    from django.db import transaction
+
+    if raw:
+        return
+    anterior = getattr(instance, '_ficheiros_anteriores', {}).get('foto', '')
+    if anterior and anterior != (instance.foto.name or ''):
+        transaction.on_commit(lambda: miniaturas.libertar(anterior))
+
+
+@receiver(post_delete, sender=CandidatoFormacao)
+def libertar_miniaturas(sender, instance, **kwargs):
+    from django.db import transaction
+
+    if instance.foto:
+        nome = instance.foto.name
+        transaction.on_commit(lambda: miniaturas.libertar(nome))
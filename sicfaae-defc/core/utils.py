@@ -1,13 +1,12 @@
 from .models import PerfilUtilizador
 
 def obter_perfil_usuario(user):
-    """Obtém o perfil do utilizador ou None se não existir."""
-    if not user.is_authenticated:
-        return None
-    try:
-        return user.perfil
-    except PerfilUtilizador.DoesNotExist:
-        return None
+    """
+    Obtém o perfil do utilizador ou None se não existir.
+    O perfil é resolvido uma vez por pedido (ver core/escopo.py).
+    """
+    from .escopo import obter_escopo
+    return obter_escopo(user).perfil
 
 def obter_exibicao_nivel_usuario(user):
     """Retorna string de exibição do nível do utilizador."""
@@ -26,3 +25,24 @@ def obter_exibicao_nivel_usuario(user):
         return f"Nível Distrital ({perfil.distrito.nome})"
     
     return str(perfil.nivel)
+
+
+CHAVE_MAPA_GEOGRAFIA = 'core:mapa_geografia'
+
+
+def obter_mapa_geografia(actualizar=False):
+    """
+    Províncias e distritos existentes, em cache:
+    {'provincias': {id, ...}, 'distritos': {distrito_id: provincia_id}}.
+    """
+    from django.core.cache import cache
+    from .models import Provincia, Distrito
+
+    mapa = None if actualizar else cache.get(CHAVE_MAPA_GEOGRAFIA)
+    if mapa is None:
+        mapa = {
+            'provincias': set(Provincia.objects.values_list('id', flat=True)),
+            'distritos': dict(Distrito.objects.values_list('id', 'provincia_id')),
+        }
+        cache.set(CHAVE_MAPA_GEOGRAFIA, mapa, 60 * 60)
+    return mapa
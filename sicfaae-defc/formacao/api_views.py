@@ -4,15 +4,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from core.models import CandidatoFormacao
 from .serializers import CandidatoRecepcaoSerializer, CandidatoFormacaoSerializer
+from . import recepcao
+from .paginacao import CandidatoFormacaoCursorPagination, ORDENACAO_CANDIDATOS
 
 
 class CandidatoFormacaoAPIViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API ViewSet para gestão de candidatos em formação.
     """
-    queryset = CandidatoFormacao.objects.all()
+    queryset = CandidatoFormacao.objects.select_related('provincia', 'distrito')
     serializer_class = CandidatoFormacaoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CandidatoFormacaoCursorPagination
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -25,7 +28,7 @@ class CandidatoFormacaoAPIViewSet(viewsets.ReadOnlyModelViewSet):
         if ativo is not None:
             queryset = queryset.filter(ativo=ativo.lower() == 'true')
         
-        return queryset.order_by('-data_recepcao')
+        return queryset.order_by(*ORDENACAO_CANDIDATOS)
     
     @action(detail=False, methods=['post'])
     def receber(self, request):
@@ -56,4 +59,26 @@ class CandidatoFormacaoAPIViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({
                 'error': 'Erro ao criar candidato',
                 'details': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR) 
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['post'])
+    def receber_lote(self, request):
+        """
+        Endpoint para receber um lote de candidatos do sistema DRH.
+        Espera {"candidatos": [...]} e devolve o resultado de cada candidato,
+        identificado pelo seu id no DRH (id_drh).
+        """
+        candidatos = request.data.get('candidatos') if isinstance(request.data, dict) else None
+        if not isinstance(candidatos, list):
+            return Response({
+                'error': 'Dados inválidos',
+                'details': 'Esperada uma lista em "candidatos"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        resultados = recepcao.receber_lote(candidatos)
+        
+        return Response({
+            'recebidos': len(candidatos),
+            'erros': sum(1 for r in resultados if r['estado'] == 'erro'),
+            'resultados': resultados,
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,376 @@
+"""
+Serviço de geração dos PDFs de certificação.
+
+O layout do certificado é compilado uma vez por turma (RenderizadorCertificados):
+fontes, fundo e moldura são preparados no construtor e cada página apenas
+carimba os campos variáveis (tipo, nome, nota e número).
+
+Os PDFs são renderizados num pool de processos de tamanho fixo
+(CERTIFICADOS_PROCESSOS), em blocos de certificados por processo. Os
+processos filhos só recebem dicionários simples e devolvem bytes; a base de
+dados é tocada apenas pelo processo principal. O pool (PoolCertificados) é
+criado uma vez por execução do comando processar_certificados e reutilizado
+por todos os processamentos da fila. Com o arranque por spawn
+(omissão no Windows e no macOS) os filhos começam sem o Django configurado:
+o pool corre django.setup() em cada filho, com o DJANGO_SETTINGS_MODULE
+herdado do processo principal. Cada certificado é tentado até
+CERTIFICADOS_MAX_TENTATIVAS vezes e os que já têm PDF nunca são renderizados
+de novo.
+
+Configuração opcional (settings):
+    CERTIFICADOS_FONTE / CERTIFICADOS_FONTE_NEGRITO: caminhos de ficheiros TTF
+    CERTIFICADOS_FUNDO: imagem de fundo (PNG/JPG) desenhada em cada página
+"""
+import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import django
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Certificacao, ProcessamentoCertificados
+
+PROCESSOS = getattr(settings, 'CERTIFICADOS_PROCESSOS', 2)
+MAX_TENTATIVAS = getattr(settings, 'CERTIFICADOS_MAX_TENTATIVAS', 3)
+# Máximo de certificados enviados de uma vez a cada processo do pool
+TAMANHO_BLOCO = getattr(settings, 'CERTIFICADOS_TAMANHO_BLOCO', 50)
+# Método de arranque dos processos ('spawn', 'fork', 'forkserver'); None = o da plataforma
+INICIO_PROCESSOS = getattr(settings, 'CERTIFICADOS_INICIO_PROCESSOS', None)
+
+SEM_PDF = Q(documento_pdf='') | Q(documento_pdf__isnull=True)
+
+
+def dados_turma(turma):
+    """Campos fixos da turma, comuns a todos os certificados (picklable)."""
+    if turma.distrito:
+        local = turma.distrito.nome
+    elif turma.provincia:
+        local = turma.provincia.nome
+    else:
+        local = ''
+    return {
+        'nome': turma.nome,
+        'formacao': str(turma.get_tipo_formacao_display()),
+        'local': local,
+    }
+
+
+def dados_certificado(cert):
+    """Campos variáveis de um certificado (picklable, sem objectos ORM)."""
+    return {
+        'pk': cert.pk,
+        'tipo': str(cert.get_tipo_display()),
+        'nome': cert.candidato.nome_completo,
+        'nota_final': cert.nota_final,
+        'numero_certificado': cert.numero_certificado,
+    }
+
+
+# Fontes registadas neste processo (o registo no reportlab é global)
+_FONTES = {}
+
+
+def _registar_fontes():
+    """Regista as fontes TTF configuradas uma única vez por processo."""
+    if not _FONTES:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        _FONTES['normal'] = 'Helvetica'
+        _FONTES['negrito'] = 'Helvetica-Bold'
+        for chave, setting, nome in (
+            ('normal', 'CERTIFICADOS_FONTE', 'CertificadoNormal'),
+            ('negrito', 'CERTIFICADOS_FONTE_NEGRITO', 'CertificadoNegrito'),
+        ):
+            caminho = getattr(settings, setting, None)
+            if caminho:
+                pdfmetrics.registerFont(TTFont(nome, str(caminho)))
+                _FONTES[chave] = nome
+    return _FONTES
+
+
+class RenderizadorCertificados:
+    """
+    Layout de certificado preparado uma vez por turma.
+
+    renderizar(dados) devolve o PDF de um certificado; renderizar_documento(lista, destino)
+    escreve todos os certificados num único PDF multi-página.
+    """
+
+    def __init__(self, turma):
+        from reportlab.lib.pagesizes import landscape, A4
+        from reportlab.lib.utils import ImageReader
+
+        self.turma = turma
+        self.tamanho = landscape(A4)
+        self.fontes = _registar_fontes()
+        caminho_fundo = getattr(settings, 'CERTIFICADOS_FUNDO', None)
+        self.fundo = ImageReader(str(caminho_fundo)) if caminho_fundo else None
+
+    def _desenhar_fundo(self, c):
+        """Parte estática da página: fundo, moldura e cabeçalho da turma."""
+        from reportlab.lib import colors
+
+        largura, altura = self.tamanho
+        if self.fundo:
+            c.drawImage(self.fundo, 0, 0, width=largura, height=altura)
+
+        c.setStrokeColor(colors.HexColor('#1f3a5f'))
+        c.setLineWidth(4)
+        c.rect(20, 20, largura - 40, altura - 40)
+        c.setLineWidth(1)
+        c.rect(30, 30, largura - 60, altura - 60)
+
+        c.setFillColor(colors.HexColor('#1f3a5f'))
+        c.setFont(self.fontes['negrito'], 14)
+        c.drawCentredString(largura / 2, altura - 70, "REPÚBLICA DE MOÇAMBIQUE")
+        c.setFont(self.fontes['normal'], 11)
+        c.drawCentredString(largura / 2, altura - 88, "Secretariado Técnico de Administração Eleitoral")
+
+        rodape = self.turma['formacao']
+        if self.turma['local']:
+            rodape = f"{rodape} • {self.turma['local']}"
+        c.setFont(self.fontes['normal'], 9)
+        c.setFillColor(colors.grey)
+        c.drawCentredString(largura / 2, 45, f"{self.turma['nome']} • {rodape}")
+
+    def _texto_centrado(self, c, texto, y, fonte, tamanho, minimo=10):
+        """Desenha o texto centrado, reduzindo a fonte para caber na largura útil."""
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        largura_util = self.tamanho[0] - 120
+        while tamanho > minimo and stringWidth(texto, fonte, tamanho) > largura_util:
+            tamanho -= 1
+        c.setFont(fonte, tamanho)
+        c.drawCentredString(self.tamanho[0] / 2, y, texto)
+
+    def _novo_canvas(self, destino):
+        from reportlab.pdfgen import canvas
+
+        c = canvas.Canvas(destino, pagesize=self.tamanho)
+        c.setTitle(f"Certificados - {self.turma['nome']}")
+        # O fundo é gravado uma vez no ficheiro e reutilizado em todas as páginas
+        c.beginForm('fundo')
+        self._desenhar_fundo(c)
+        c.endForm()
+        return c
+
+    def _carimbar(self, c, dados):
+        """Campos variáveis de um certificado, sobre o fundo."""
+        from reportlab.lib import colors
+
+        largura, altura = self.tamanho
+        c.doForm('fundo')
+        c.setFillColor(colors.black)
+        self._texto_centrado(c, f"Certificado de {dados['tipo']}", altura - 170, self.fontes['negrito'], 28)
+        self._texto_centrado(c, "Certifica-se que", altura - 230, self.fontes['normal'], 16)
+        self._texto_centrado(c, dados['nome'], altura - 275, self.fontes['negrito'], 30)
+        self._texto_centrado(
+            c, f"Concluiu com sucesso a formação. Nota: {dados['nota_final']} Valores",
+            altura - 320, self.fontes['normal'], 14
+        )
+        c.setFont(self.fontes['normal'], 10)
+        c.drawRightString(largura - 50, 60, f"Nº {dados['numero_certificado']}")
+        c.showPage()
+
+    def renderizar(self, dados):
+        """PDF (bytes) de um único certificado."""
+        buffer = BytesIO()
+        c = self._novo_canvas(buffer)
+        self._carimbar(c, dados)
+        c.save()
+        return buffer.getvalue()
+
+    def renderizar_documento(self, lista_dados, destino):
+        """Todos os certificados num único PDF multi-página."""
+        c = self._novo_canvas(destino)
+        for dados in lista_dados:
+            self._carimbar(c, dados)
+        c.save()
+
+
+def renderizar_bloco(turma, bloco):
+    """
+    Renderiza um bloco de certificados com um único renderizador.
+    Corre nos processos do pool; devolve [(dados, pdf, erro)].
+    """
+    renderizador = RenderizadorCertificados(turma)
+    resultados = []
+    for dados in bloco:
+        try:
+            resultados.append((dados, renderizador.renderizar(dados), None))
+        except Exception as e:
+            resultados.append((dados, None, str(e)))
+    return resultados
+
+
+class PoolCertificados:
+    """
+    Pool de processos partilhado pelos processamentos de uma execução.
+
+    O ProcessPoolExecutor só é criado quando um lote precisa dele e fica vivo
+    até fechar(); se um processo filho morrer, o pool partido é descartado e
+    o lote seguinte cria outro.
+    """
+
+    def __init__(self, processos=PROCESSOS):
+        self.processos = processos
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def obter(self, tamanho_lote):
+        """Executor para um lote de `tamanho_lote` certificados (None = renderizar aqui)."""
+        if self.executor is None and self.processos > 1 and tamanho_lote > 1:
+            # Os filhos não devem herdar ligações abertas à base de dados
+            connections.close_all()
+            os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processos, mp_context=multiprocessing.get_context(INICIO_PROCESSOS),
+                initializer=django.setup,
+            )
+        return self.executor
+
+    def descartar(self):
+        """Abandona um pool partido sem esperar pelos processos."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def fechar(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def _renderizar_lote(pool, turma, lote):
+    """Gera (dados, pdf, erro) para cada certificado do lote, bloco a bloco."""
+    executor = pool.obter(len(lote))
+    if executor is None:
+        yield from renderizar_bloco(turma, lote)
+        return
+
+    tamanho = min(TAMANHO_BLOCO, max(1, math.ceil(len(lote) / pool.processos)))
+    blocos = [lote[i:i + tamanho] for i in range(0, len(lote), tamanho)]
+    futuros = {executor.submit(renderizar_bloco, turma, bloco): bloco for bloco in blocos}
+    partido = False
+    for futuro in as_completed(futuros):
+        try:
+            yield from futuro.result()
+        except Exception as e:
+            # O processo morreu: todo o bloco conta como falhado nesta tentativa
+            partido = partido or isinstance(e, BrokenProcessPool)
+            for dados in futuros[futuro]:
+                yield dados, None, str(e)
+    if partido:
+        pool.descartar()
+
+
+def _gravar_pdf(pk, numero_certificado, pdf):
+    """Grava o ficheiro e actualiza só a coluna documento_pdf, se ainda estiver vazia."""
+    campo = Certificacao._meta.get_field('documento_pdf')
+    nome = campo.generate_filename(None, f"certificado_{numero_certificado}.pdf")
+    nome = campo.storage.save(nome, ContentFile(pdf))
+    if not Certificacao.objects.filter(SEM_PDF, pk=pk).update(documento_pdf=nome):
+        # Outro processo gravou primeiro: não deixar ficheiros órfãos
+        campo.storage.delete(nome)
+
+
+def gerar_documento_unico(processamento):
+    """Escreve todos os certificados da turma num único PDF e anexa-o ao processamento."""
+    turma = processamento.turma
+    certificacoes = Certificacao.objects.filter(turma=turma).select_related('candidato').order_by('candidato__nome_completo')
+    renderizador = RenderizadorCertificados(dados_turma(turma))
+
+    with tempfile.TemporaryFile(suffix='.pdf') as ficheiro:
+        renderizador.renderizar_documento((dados_certificado(cert) for cert in certificacoes.iterator()), ficheiro)
+        ficheiro.seek(0)
+        processamento.documento_unico.save(f"certificados_turma_{turma.pk}.pdf", File(ficheiro), save=False)
+    ProcessamentoCertificados.objects.filter(pk=processamento.pk).update(documento_unico=processamento.documento_unico.name)
+
+
+def processar(processamento, processos=PROCESSOS, max_tentativas=MAX_TENTATIVAS, documento_unico=None, pool=None):
+    """
+    Gera os PDFs em falta da turma do `processamento` e actualiza os contadores
+    (concluidos/falhados) à medida que avança. Com documento_unico (ou
+    processamento.gerar_documento_unico) grava também o PDF com todos os
+    certificados da turma.
+
+    Com `pool` (PoolCertificados) os processos são reutilizados e continuam
+    vivos no fim; sem ele é criado um pool só para este processamento.
+
+    Se chegar um pedido novo enquanto corre (novo_pedido), volta a procurar
+    certificados sem PDF antes de marcar o processamento como concluído.
+    """
+    if pool is None:
+        with PoolCertificados(processos) as pool:
+            return processar(processamento, max_tentativas=max_tentativas, documento_unico=documento_unico, pool=pool)
+
+    turma = dados_turma(processamento.turma)
+    processamentos = ProcessamentoCertificados.objects.filter(pk=processamento.pk)
+    processamentos.update(total=0, concluidos=0, falhados=0, erros='')
+
+    erros = []
+    tentados = set()
+    while True:
+        processamentos.update(novo_pedido=False)
+        certificacoes = Certificacao.objects.filter(SEM_PDF, turma=processamento.turma) \
+            .exclude(pk__in=tentados).select_related('candidato')
+        lote = [dados_certificado(cert) for cert in certificacoes]
+        tentados.update(dados['pk'] for dados in lote)
+        processamentos.update(total=F('total') + len(lote))
+
+        tentativa = 1
+        while lote and tentativa <= max_tentativas:
+            repetir = []
+            for dados, pdf, erro in _renderizar_lote(pool, turma, lote):
+                if erro is None:
+                    try:
+                        _gravar_pdf(dados['pk'], dados['numero_certificado'], pdf)
+                    except Exception as e:
+                        erro = e
+                if erro is None:
+                    processamentos.update(concluidos=F('concluidos') + 1, data_actividade=timezone.now())
+                elif tentativa < max_tentativas:
+                    repetir.append(dados)
+                else:
+                    erros.append(f"{dados['numero_certificado']}: {erro}")
+                    processamentos.update(falhados=F('falhados') + 1, data_actividade=timezone.now())
+            lote = repetir
+            tentativa += 1
+        if processamentos.filter(novo_pedido=True).exists():
+            continue
+
+        erros_documento = []
+        gerar = documento_unico
+        if gerar is None:
+            # Pode ter sido pedido (solicitar) depois de o processamento ser reservado
+            processamento.refresh_from_db(fields=['gerar_documento_unico'])
+            gerar = processamento.gerar_documento_unico
+        if gerar:
+            try:
+                gerar_documento_unico(processamento)
+            except Exception as e:
+                erros_documento.append(f"Documento único: {e}")
+
+        estado = ProcessamentoCertificados.Estado.CONCLUIDO_COM_ERROS if erros or erros_documento \
+            else ProcessamentoCertificados.Estado.CONCLUIDO
+        # Só termina se não chegou nenhum pedido desde a última procura
+        if processamentos.filter(novo_pedido=False).update(
+            estado=estado, erros='\n'.join(erros + erros_documento), data_conclusao=timezone.now()
+        ):
+            break
+
+    processamento.refresh_from_db()
+    return processamento
@@ -0,0 +1,90 @@
+"""
+Exportações CSV/NDJSON (sicfaae_comum/formatos.py) de candidatos em formação, turmas,
+alunos de uma turma e certificações.
+
+As linhas são lidas com values_list(...).iterator(), com as chaves
+estrangeiras resolvidas por JOIN, sem instanciar modelos: memória constante
+mesmo para centenas de milhares de registos. Os valores vão em código
+(género, tipo, estado, ids), prontos a ser importados noutra instalação;
+os candidatos seguem o formato da recepção do DRH (formacao/recepcao.py)
+e podem ser carregados com `python manage.py importar_candidatos`.
+"""
+from django.db.models import Count
+
+from core.models import CandidatoFormacao
+from .models import Turma, Certificacao
+
+TAMANHO_CHUNK = 2000
+
+# (Cabeçalho CSV, chave NDJSON, campo em values_list)
+CAMPOS_CANDIDATOS = [
+    ('ID DRH', 'id', 'id_drh'),
+    ('Código', 'codigo_candidato', 'codigo_candidato'),
+    ('Nome Completo', 'nome_completo', 'nome_completo'),
+    ('Género', 'genero', 'genero'),
+    ('Data de Nascimento', 'data_nascimento', 'data_nascimento'),
+    ('BI', 'numero_bi', 'numero_bi'),
+    ('Telefone', 'numero_telefone', 'numero_telefone'),
+    ('Província', 'provincia', 'provincia_id'),
+    ('Distrito', 'distrito', 'distrito_id'),
+    ('Endereço', 'endereco', 'endereco'),
+    ('Tipo de Agente', 'tipo_agente', 'tipo_agente'),
+    ('Activo', 'ativo', 'ativo'),
+]
+
+CAMPOS_TURMAS = [
+    ('ID', 'id', 'id'),
+    ('Nome', 'nome', 'nome'),
+    ('Número', 'numero', 'numero'),
+    ('Tipo de Formação', 'tipo_formacao', 'tipo_formacao'),
+    ('Província', 'provincia', 'provincia__nome'),
+    ('Distrito', 'distrito', 'distrito__nome'),
+    ('Início', 'data_inicio', 'data_inicio'),
+    ('Fim', 'data_fim', 'data_fim'),
+    ('Concluída', 'concluida', 'concluida'),
+    ('Alunos', 'total_alunos', 'total_alunos'),
+]
+
+CAMPOS_ALUNOS_TURMA = [
+    ('Código', 'codigo_candidato', 'codigo_candidato'),
+    ('Nome Completo', 'nome_completo', 'nome_completo'),
+    ('BI', 'numero_bi', 'numero_bi'),
+    ('Género', 'genero', 'genero'),
+    ('Telefone', 'numero_telefone', 'numero_telefone'),
+    ('Distrito', 'distrito', 'distrito__nome'),
+]
+
+CAMPOS_CERTIFICACOES = [
+    ('Número', 'numero_certificado', 'numero_certificado'),
+    ('Tipo', 'tipo', 'tipo'),
+    ('Estado', 'estado', 'estado'),
+    ('Código do Candidato', 'codigo_candidato', 'candidato__codigo_candidato'),
+    ('Nome Completo', 'nome_completo', 'candidato__nome_completo'),
+    ('BI', 'numero_bi', 'candidato__numero_bi'),
+    ('Turma', 'turma', 'turma__nome'),
+    ('Distrito', 'distrito', 'turma__distrito__nome'),
+    ('Nota Final', 'nota_final', 'nota_final'),
+    ('Presença (%)', 'percentual_presenca', 'percentual_presenca'),
+    ('Data de Emissão', 'data_emissao', 'data_emissao'),
+]
+
+
+def colunas(campos):
+    """Pares (cabeçalho, chave) para sicfaae_comum.formatos."""
+    return [(titulo, chave) for titulo, chave, _ in campos]
+
+
+def linhas(queryset, campos, chunk_size=TAMANHO_CHUNK):
+    return queryset.values_list(*[campo for _, _, campo in campos]).iterator(chunk_size=chunk_size)
+
+
+def turmas_com_alunos():
+    return Turma.objects.annotate(total_alunos=Count('alunos')).order_by('pk')
+
+
+# Exportações completas disponíveis no comando exportar_dados: nome -> (campos, queryset)
+EXPORTACOES = {
+    'candidatos': (CAMPOS_CANDIDATOS, lambda: CandidatoFormacao.objects.order_by('pk')),
+    'turmas': (CAMPOS_TURMAS, turmas_com_alunos),
+    'certificacoes': (CAMPOS_CERTIFICACOES, lambda: Certificacao.objects.order_by('pk')),
+}
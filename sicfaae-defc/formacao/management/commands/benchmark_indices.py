@@ -0,0 +1,91 @@
+"""
+Management command to compare query plans and timings with and without the composite indexes
+Usage: python manage.py benchmark_indices [--semear 100000] [--repeticoes 5]
+
+Tudo corre numa transacção que é revertida no fim: os candidatos semeados são
+apagados e os índices removidos para a medição "antes" voltam a existir.
+A medição e o relatório são os de sicfaae_comum.comandos.ComandoBenchmarkIndices.
+"""
+
+import random
+from datetime import timedelta
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from sicfaae_comum.comandos import ComandoBenchmarkIndices
+from sicfaae_comum.contagens import contar_por_estado
+from core.models import CandidatoFormacao, Provincia, Distrito
+
+
+class Command(ComandoBenchmarkIndices):
+    help = 'Mostra os planos EXPLAIN e tempos das consultas de candidatos em formação, com e sem os índices compostos'
+    modelo = CandidatoFormacao
+    descricao = 'candidatos em formação'
+    # Índices compostos de CandidatoFormacao (migrações core 0006 e 0007)
+    indices = (
+        'candidato_recepcao_idx',
+        'candidato_tipo_recepcao_idx',
+        'candidato_distrito_tipo_idx',
+        'candidato_provincia_tipo_idx',
+    )
+
+    def semear(self, quantidade):
+        self.stdout.write(f'🌱 A semear {quantidade} candidatos...')
+        random.seed(42)
+        distritos = list(Distrito.objects.all())
+        if not distritos:
+            provincia = Provincia.objects.create(nome='Benchmark')
+            distritos = [Distrito.objects.create(provincia=provincia, nome=f'Benchmark {i}') for i in range(10)]
+        tipos = CandidatoFormacao.TipoAgente.values
+        inicio = timezone.now() - timedelta(days=365)
+        primeiro_id = (CandidatoFormacao.objects.aggregate(models.Max('id_drh'))['id_drh__max'] or 0) + 1
+
+        candidatos = CandidatoFormacao.objects
+        for inicio_lote in range(0, quantidade, 5000):
+            lote = []
+            for i in range(inicio_lote, min(inicio_lote + 5000, quantidade)):
+                distrito = random.choice(distritos)
+                lote.append(CandidatoFormacao(
+                    id_drh=primeiro_id + i, codigo_candidato=f'BENCH-{i}', nome_completo=f'Benchmark {i}',
+                    genero=random.choice('MF'), numero_bi=f'BENCH{i:09d}', numero_telefone='841234567',
+                    provincia_id=distrito.provincia_id, distrito=distrito,
+                    tipo_agente=random.choice(tipos), ativo=random.random() < 0.9,
+                ))
+            candidatos.bulk_create(lote)
+            # data_recepcao é auto_now_add: espalhar ao longo do último ano
+            for candidato in lote:
+                candidato.data_recepcao = inicio + timedelta(seconds=random.randint(0, 365 * 86400))
+            candidatos.bulk_update(lote, ['data_recepcao'], batch_size=1000)
+
+    def consultas(self):
+        referencia = CandidatoFormacao.objects.order_by('pk').values('provincia_id', 'distrito_id').first()
+        if not referencia:
+            return []
+        Tipo = CandidatoFormacao.TipoAgente
+        distrito, provincia = referencia['distrito_id'], referencia['provincia_id']
+
+        def painel(qs):
+            return contar_por_estado(
+                qs, tipos=Tipo.values, generos=CandidatoFormacao.Genero.values, total_ativos=Q(ativo=True)
+            )
+
+        return [
+            ('Disponíveis para turma distrital (MMV)',
+             lambda: list(CandidatoFormacao.objects.filter(
+                 ativo=True, tipo_agente=Tipo.MMV, distrito_id=distrito
+             ).order_by('nome_completo'))),
+            ('Formadores da província',
+             lambda: list(CandidatoFormacao.objects.filter(
+                 ativo=True, tipo_agente=Tipo.FORMADOR, provincia_id=provincia
+             ).order_by('nome_completo'))),
+            ('Painel distrital',
+             lambda: painel(CandidatoFormacao.objects.filter(distrito_id=distrito))),
+            ('Painel provincial',
+             lambda: painel(CandidatoFormacao.objects.filter(provincia_id=provincia))),
+            ('API por tipo de agente',
+             lambda: list(CandidatoFormacao.objects.filter(tipo_agente=Tipo.BRIGADISTA).order_by(
+                 '-data_recepcao', '-id'
+             )[:100])),
+        ]
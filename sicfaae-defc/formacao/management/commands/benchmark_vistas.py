@@ -0,0 +1,57 @@
+"""
+Management command to time the main views with the Django test client
+Usage: python manage.py benchmark_vistas [--repeticoes 20] [--aquecimento 2]
+
+Usar sobre uma base de dados gerada por gerar_dados_carga. Cada vista (e a
+recepção de um lote do DRH pela API) é pedida --repeticoes vezes por um
+superutilizador temporário; o relatório mostra o estado HTTP, as latências
+p50/p95 (resposta lida até ao fim), o número de queries e o tamanho da
+resposta. Tudo corre numa transacção revertida no fim (ver
+sicfaae_comum.comandos.ComandoBenchmarkVistas).
+"""
+
+from django.db.models import Max
+from django.urls import reverse
+
+from sicfaae_comum.comandos import ComandoBenchmarkVistas
+from core.models import CandidatoFormacao, Distrito
+from formacao.models import Turma
+
+
+class Command(ComandoBenchmarkVistas):
+    modelo = CandidatoFormacao
+    descricao = 'candidatos em formação'
+
+    def pedidos(self, token):
+        api = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        pedidos = [
+            ('Dashboard geral', lambda c: c.get(reverse('formacao:dashboard_geral'))),
+            ('Lista de turmas', lambda c: c.get(reverse('formacao:lista_turmas'))),
+            ('Lista de certificações', lambda c: c.get(reverse('formacao:lista_certificacoes'))),
+            ('API candidatos', lambda c: c.get(reverse('formacao_api:candidato_formacao-list'), **api)),
+        ]
+        turma = Turma.objects.filter(alunos__isnull=False).order_by('pk').first()
+        if turma:
+            pedidos += [
+                ('Exportar turma (Excel)', lambda c: c.get(reverse('formacao:exportar_turma_excel', args=[turma.pk]))),
+                ('Exportar turma (PDF)', lambda c: c.get(reverse('formacao:exportar_turma_pdf', args=[turma.pk]))),
+            ]
+        distrito = Distrito.objects.order_by('pk').first()
+        if distrito:
+            lote = {'candidatos': self.lote_drh(distrito, 100)}
+            pedidos.append(('Receber lote do DRH (100)', lambda c: c.post(
+                reverse('formacao_api:candidato_formacao-receber-lote'), lote, content_type='application/json', **api
+            )))
+        return pedidos
+
+    def lote_drh(self, distrito, tamanho):
+        """Candidatos no formato enviado pelo DRH; o primeiro pedido cria-os, os seguintes actualizam-nos."""
+        primeiro = (CandidatoFormacao.objects.aggregate(Max('id_drh'))['id_drh__max'] or 0) + 1
+        return [
+            {
+                'id': id_drh, 'codigo_candidato': f'BENCH-{id_drh}', 'nome_completo': f'Benchmark {id_drh}',
+                'genero': 'F', 'numero_bi': f'BENCH{id_drh:09d}', 'numero_telefone': '841234567',
+                'provincia': distrito.provincia_id, 'distrito': distrito.pk, 'vaga_titulo': 'Brigadista',
+            }
+            for id_drh in range(primeiro, primeiro + tamanho)
+        ]
@@ -0,0 +1,45 @@
+"""
+Management command to export candidates, turmas or certificates as CSV or NDJSON in constant memory
+Usage: python manage.py exportar_dados candidatos saida.ndjson [--formato ndjson] [--acrescentar]
+
+O formato vem da extensão do ficheiro (ou de --formato); "-" escreve para o
+stdout. Com --acrescentar as linhas são acrescentadas ao ficheiro (no CSV sem
+repetir o cabeçalho). Os candidatos exportados podem ser carregados noutra
+instalação com importar_candidatos.
+"""
+
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sicfaae_comum import formatos
+from formacao.exportacao import EXPORTACOES, colunas, linhas
+
+
+class Command(BaseCommand):
+    help = 'Exporta candidatos em formação, turmas ou certificações para CSV ou NDJSON, em streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dados', choices=sorted(EXPORTACOES), help='O que exportar')
+        parser.add_argument('saida', help='Ficheiro de destino (.csv, .ndjson/.jsonl) ou "-" para o stdout')
+        parser.add_argument('--formato', choices=sorted(formatos.TIPOS), help='Formato (padrão: pela extensão)')
+        parser.add_argument('--acrescentar', action='store_true', help='Acrescentar ao ficheiro em vez de o substituir')
+
+    def handle(self, *args, **options):
+        saida = options['saida']
+        formato = options['formato'] or formatos.formato_do_nome(saida)
+        if formato is None:
+            raise CommandError('Indique --formato csv ou ndjson (a extensão do ficheiro não o identifica).')
+
+        campos, queryset = EXPORTACOES[options['dados']]
+        registos = linhas(queryset(), campos)
+
+        if saida == '-':
+            formatos.escrever(sys.stdout.buffer, formato, colunas(campos), registos)
+            return
+
+        acrescentar = options['acrescentar'] and os.path.exists(saida) and os.path.getsize(saida) > 0
+        with open(saida, 'ab' if acrescentar else 'wb') as destino:
+            tamanho = formatos.escrever(destino, formato, colunas(campos), registos, cabecalho=not acrescentar)
+        self.stdout.write(self.style.SUCCESS(f'✅ {tamanho / 1024:.1f} KB escritos em {saida}.'))
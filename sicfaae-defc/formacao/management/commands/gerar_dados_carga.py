@@ -0,0 +1,122 @@
+"""
+Management command to generate a synthetic, deterministic load dataset
+Usage: python manage.py gerar_dados_carga --candidatos 100000 [--semente 42] [--lote 5000]
+
+Ao contrário de popula_bd, não apaga dados, não acede à rede e grava tudo
+com bulk_create, em lotes: candidatos em formação, turmas de campo e de
+formadores (30 alunos cada, com a tabela de alunos) e certificações dos
+alunos das turmas concluídas. A mesma semente sobre a mesma base de dados
+gera sempre os mesmos dados. Os candidatos gerados têm o código começado
+por SINT e podem ser acrescentados em várias execuções. Os lotes e os dados
+pessoais são os de sicfaae_comum.comandos.ComandoGerarDadosCarga.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Max
+
+from sicfaae_comum.comandos import ComandoGerarDadosCarga
+from core.models import CandidatoFormacao, Distrito
+from formacao.models import Turma, Certificacao, TipoFormacao
+
+ALUNOS_POR_TURMA = 30
+
+Tipo = CandidatoFormacao.TipoAgente
+# Distribuição dos tipos de agente (pesos)
+TIPOS = [(Tipo.MMV, 45), (Tipo.BRIGADISTA, 30), (Tipo.AGENTE_CIVICO, 20), (Tipo.FORMADOR, 5)]
+TIPO_FORMACAO = {
+    Tipo.MMV: TipoFormacao.MMV,
+    Tipo.BRIGADISTA: TipoFormacao.BRIGADISTAS,
+    Tipo.AGENTE_CIVICO: TipoFormacao.AGENTES_EDUCACAO,
+    Tipo.FORMADOR: TipoFormacao.FORMADORES_PROVINCIAIS,
+}
+TIPO_CERTIFICACAO = {
+    Tipo.MMV: Certificacao.TipoCertificacao.MMV,
+    Tipo.BRIGADISTA: Certificacao.TipoCertificacao.BRIGADISTA,
+    Tipo.AGENTE_CIVICO: Certificacao.TipoCertificacao.AGENTE_EDUCACAO,
+    Tipo.FORMADOR: Certificacao.TipoCertificacao.FORMADOR,
+}
+
+
+class Command(ComandoGerarDadosCarga):
+    help = 'Gera candidatos em formação, turmas e certificações sintéticos (determinístico, offline, em bulk)'
+    modelo_distrito = Distrito
+
+    def existentes(self):
+        return CandidatoFormacao.objects.filter(codigo_candidato__startswith=self.PREFIXO).count()
+
+    def preparar(self, inicio):
+        self.primeiro_id = (CandidatoFormacao.objects.aggregate(Max('id_drh'))['id_drh__max'] or 0) + 1 - inicio
+        # Próximo número de turma por (distrito, tipo de formação) — unique_together
+        self.numeros_turma = defaultdict(int, {
+            (linha['distrito_id'], linha['tipo_formacao']): linha['ultimo']
+            for linha in Turma.objects.values('distrito_id', 'tipo_formacao').annotate(ultimo=Max('numero'))
+        })
+
+    def gerar_lote(self, rng, numeros):
+        tipos, pesos = zip(*TIPOS)
+        candidatos = [self.candidato(rng, n, rng.choices(tipos, pesos)[0]) for n in numeros]
+        CandidatoFormacao.objects.bulk_create(candidatos, batch_size=1000)
+        self.espalhar_datas(rng, candidatos, 'data_recepcao')
+        turmas = self.turmas(rng, candidatos)
+        self.certificacoes(rng, turmas)
+
+    def concluir(self):
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Concluído. {CandidatoFormacao.objects.count()} candidatos, {Turma.objects.count()} turmas, '
+            f'{Certificacao.objects.count()} certificações.'
+        ))
+
+    def candidato(self, rng, n, tipo):
+        return CandidatoFormacao(
+            id_drh=self.primeiro_id + n, codigo_candidato=f'{self.PREFIXO}-{n:08d}',
+            tipo_agente=tipo, ativo=rng.random() < 0.95, **self.dados_pessoais(rng, n),
+        )
+
+    def turmas(self, rng, candidatos):
+        """Agrupa os candidatos activos em turmas de ALUNOS_POR_TURMA por distrito e tipo. Devolve [(turma, alunos)]."""
+        grupos = defaultdict(list)
+        for candidato in candidatos:
+            if candidato.ativo:
+                grupos[(candidato.distrito_id, TIPO_FORMACAO[candidato.tipo_agente])].append(candidato)
+
+        turmas = []
+        for (distrito_id, tipo_formacao), grupo in grupos.items():
+            for i in range(0, len(grupo), ALUNOS_POR_TURMA):
+                self.numeros_turma[distrito_id, tipo_formacao] += 1
+                numero = self.numeros_turma[distrito_id, tipo_formacao]
+                inicio = self.DATA_BASE + timedelta(days=rng.randint(0, 180))
+                concluida = rng.random() < 0.6
+                turmas.append((Turma(
+                    nome=f'Turma {numero}', distrito_id=distrito_id, provincia_id=grupo[0].provincia_id,
+                    tipo_formacao=tipo_formacao, numero=numero,
+                    data_inicio=inicio, data_fim=inicio + timedelta(days=4),
+                    carga_horaria_realizada=40 if concluida else 0,
+                    concluida=concluida, data_conclusao=inicio + timedelta(days=4) if concluida else None,
+                ), grupo[i:i + ALUNOS_POR_TURMA]))
+
+        Turma.objects.bulk_create([turma for turma, _ in turmas], batch_size=1000)
+        Turma.alunos.through.objects.bulk_create([
+            Turma.alunos.through(turma_id=turma.pk, candidatoformacao_id=aluno.pk)
+            for turma, alunos in turmas for aluno in alunos
+        ], batch_size=1000)
+        return turmas
+
+    def certificacoes(self, rng, turmas):
+        certificacoes = []
+        for turma, alunos in turmas:
+            if not turma.concluida:
+                continue
+            for aluno in alunos:
+                if rng.random() >= 0.9:
+                    continue
+                tipo = TIPO_CERTIFICACAO[aluno.tipo_agente]
+                certificacoes.append(Certificacao(
+                    candidato=aluno, turma=turma, tipo=tipo,
+                    numero_certificado=f'{tipo[0]}-{turma.distrito_id}-{self.DATA_BASE.year}-{aluno.codigo_candidato}',
+                    nota_final=Decimal(rng.randint(1000, 2000)) / 100,
+                    percentual_presenca=Decimal(rng.randint(7500, 10000)) / 100,
+                ))
+        Certificacao.objects.bulk_create(certificacoes, batch_size=1000)
@@ -0,0 +1,76 @@
+"""
+Management command to load candidates from a CSV or NDJSON file
+Usage: python manage.py importar_candidatos candidatos.ndjson [--formato ndjson]
+
+Cada linha segue o formato da recepção do DRH (formacao/recepcao.py) ou o
+de `exportar_dados candidatos` (o CSV pode usar os cabeçalhos da exportação).
+O ficheiro é lido em streaming e gravado com receber_lote, por blocos:
+upsert por id_drh, em memória constante.
+"""
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sicfaae_comum import formatos
+from formacao.exportacao import CAMPOS_CANDIDATOS
+from formacao.recepcao import TAMANHO_BLOCO, receber_lote
+
+MAXIMO_ERROS_LISTADOS = 20
+
+
+class Command(BaseCommand):
+    help = 'Carrega candidatos em formação de um ficheiro CSV ou NDJSON (upsert por id_drh)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ficheiro', help='Ficheiro a importar (.csv, .ndjson/.jsonl)')
+        parser.add_argument('--formato', choices=sorted(formatos.TIPOS), help='Formato (padrão: pela extensão)')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or formatos.formato_do_nome(options['ficheiro'])
+        if formato is None:
+            raise CommandError('Indique --formato csv ou ndjson (a extensão do ficheiro não o identifica).')
+
+        # Cabeçalhos da exportação CSV -> chaves da recepção
+        chaves = {titulo: chave for titulo, chave, _ in CAMPOS_CANDIDATOS}
+        self.totais, self.erros = Counter(), []
+        bloco = []
+        try:
+            with open(options['ficheiro'], 'rb') as ficheiro:
+                for numero, registo, erro in formatos.ler(ficheiro, formato):
+                    if erro:
+                        self.registar_erro(numero, None, erro)
+                        continue
+                    if formato == 'csv':
+                        # CSV não tem nulos: campos vazios contam como ausentes
+                        registo = {chaves.get(chave, chave): valor for chave, valor in registo.items() if valor != ''}
+                    bloco.append((numero, registo))
+                    if len(bloco) >= TAMANHO_BLOCO:
+                        self.gravar(bloco)
+                        bloco = []
+                if bloco:
+                    self.gravar(bloco)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {self.totais['criado']} criados, {self.totais['actualizado']} actualizados, "
+            f"{self.totais['erro']} erros."
+        ))
+        for numero, id_drh, erro in self.erros[:MAXIMO_ERROS_LISTADOS]:
+            self.stdout.write(self.style.ERROR(f'  Linha {numero} (DRH {id_drh}): {erro}'))
+        if len(self.erros) > MAXIMO_ERROS_LISTADOS:
+            self.stdout.write(f'  ... e mais {len(self.erros) - MAXIMO_ERROS_LISTADOS}.')
+
+    def registar_erro(self, numero, id_drh, erro):
+        self.totais['erro'] += 1
+        self.erros.append((numero, id_drh, erro))
+
+    def gravar(self, bloco):
+        resultados = receber_lote([registo for _, registo in bloco])
+        for (numero, _), resultado in zip(bloco, resultados):
+            if resultado['estado'] == 'erro':
+                self.registar_erro(numero, resultado['id_drh'], resultado['erros'])
+            else:
+                self.totais[resultado['estado']] += 1
+        self.stdout.write(f'  ⏳ {sum(self.totais.values())} linhas')
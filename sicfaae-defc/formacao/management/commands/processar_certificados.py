@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from formacao.models import ProcessamentoCertificados
+from formacao.certificados import processar, PoolCertificados, PROCESSOS, MAX_TENTATIVAS
+
+class Command(BaseCommand):
+    help = 'Gera os PDFs de certificação das turmas em fila, num pool de processos de tamanho fixo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=PROCESSOS, help='Tamanho do pool de processos')
+        parser.add_argument('--tentativas', type=int, default=MAX_TENTATIVAS, help='Tentativas por certificado')
+        parser.add_argument(
+            '--documento-unico', action='store_true',
+            help='Gera também um PDF único por turma, mesmo que não tenha sido pedido'
+        )
+        parser.add_argument('--uma-vez', action='store_true', help='Processa a fila actual e termina')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera quando a fila está vazia')
+        parser.add_argument(
+            '--tempo-maximo', type=int, default=15,
+            help='Minutos sem actividade após os quais um processamento EM_CURSO é considerado abandonado'
+        )
+
+    def handle(self, *args, **options):
+        # Os processos do pool são criados uma vez e servem toda a fila
+        with PoolCertificados(options['processos']) as pool:
+            while True:
+                # Processamentos de workers que morreram (os vivos actualizam data_actividade)
+                limite = timezone.now() - timedelta(minutes=options['tempo_maximo'])
+                recuperados = ProcessamentoCertificados.recuperar_abandonados(limite)
+                if recuperados:
+                    self.stdout.write(self.style.WARNING(f'{recuperados} processamentos abandonados voltaram à fila.'))
+
+                processamento = ProcessamentoCertificados.reservar_proximo()
+                if processamento is None:
+                    if options['uma_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                processar(
+                    processamento, max_tentativas=options['tentativas'], pool=pool,
+                    documento_unico=options['documento_unico'] or None
+                )
+                mensagem = (
+                    f'{processamento.turma.nome}: {processamento.concluidos} gerados, '
+                    f'{processamento.falhados} falhados de {processamento.total}'
+                )
+                if processamento.falhados:
+                    self.stdout.write(self.style.WARNING(mensagem))
+                else:
+                    self.stdout.write(self.style.SUCCESS(mensagem))
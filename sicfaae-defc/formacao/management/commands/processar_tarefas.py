@@ -0,0 +1,18 @@
+"""
+Management command that runs queued class export jobs (TarefaRelatorio)
+Usage: python manage.py processar_tarefas [--uma-vez] [--intervalo 5] [--batimento 30] [--validade 7] [--miniaturas 30]
+
+O ciclo do worker é o de sicfaae_comum.comandos.ComandoProcessarTarefas.
+"""
+
+from sicfaae_comum.comandos import ComandoProcessarTarefas
+from formacao.models import TarefaRelatorio
+from formacao.tarefas import executar_tarefa
+
+
+class Command(ComandoProcessarTarefas):
+    help = 'Executa as tarefas de exportação de turmas em fila (Excel/PDF).'
+    modelo = TarefaRelatorio
+
+    def executar(self, tarefa):
+        executar_tarefa(tarefa)
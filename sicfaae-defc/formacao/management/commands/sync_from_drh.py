@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from core.models import MarcaSincronizacao
+from formacao.sincronizacao import ClienteDRH, ErroSincronizacao, sincronizar, FEED_CANDIDATOS, LIMITE_PAGINA
+
+class Command(BaseCommand):
+    help = 'Sincroniza os candidatos com o DRH a partir do último cursor guardado (apenas as alterações).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=LIMITE_PAGINA, help='Candidatos por página do feed')
+        parser.add_argument('--reiniciar', action='store_true', help='Esquece o cursor guardado e relê o feed desde o início')
+        parser.add_argument('--continuo', action='store_true', help='Continua a sincronizar a cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=60, help='Segundos entre sincronizações em modo contínuo')
+
+    def handle(self, *args, **options):
+        if options['reiniciar']:
+            MarcaSincronizacao.objects.filter(feed=FEED_CANDIDATOS).update(cursor='')
+            self.stdout.write(self.style.WARNING('Cursor reiniciado: o feed será relido desde o início.'))
+
+        try:
+            cliente = ClienteDRH()
+        except ErroSincronizacao as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+            return
+
+        try:
+            while True:
+                try:
+                    totais = sincronizar(cliente, options['limite'])
+                except ErroSincronizacao as e:
+                    self.stdout.write(self.style.ERROR(str(e)))
+                else:
+                    mensagem = (
+                        f"{totais['gravados']} candidatos gravados, {totais['desactivados']} desactivados "
+                        f"({totais['paginas']} páginas)"
+                    )
+                    for erro in totais['erros']:
+                        self.stdout.write(self.style.WARNING(f"Candidato DRH {erro['id_drh']}: {erro['erros']}"))
+                    self.stdout.write(self.style.SUCCESS(mensagem))
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        finally:
+            cliente.close()
@@ -18,16 +18,12 @@ class ForcarAlteracaoSenhaMiddleware:
 
     def __call__(self, request):
         if request.user.is_authenticated and not request.user.is_superuser:
-            # Verificar se o utilizador tem perfil e se deve alterar senha
-            try:
-                perfil = request.user.perfil
-                if perfil.deve_alterar_senha:
-                    # Permitir apenas URLs isentas
-                    path = request.path_info
-                    if not any(path.startswith(url) for url in EXEMPT_URLS):
-                        from django.shortcuts import redirect
-                        return redirect(CHANGE_PASSWORD_URL)
-            except Exception:
-                pass
+            # Nível e perfil resolvidos uma vez por pedido (core/escopo.py)
+            if request.escopo.deve_alterar_senha:
+                # Permitir apenas URLs isentas
+                path = request.path_info
+                if not any(path.startswith(url) for url in EXEMPT_URLS):
+                    from django.shortcuts import redirect
+                    return redirect(CHANGE_PASSWORD_URL)
 
         return self.get_response(request)
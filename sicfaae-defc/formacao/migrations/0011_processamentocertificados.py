@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-17 23:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formacao', '0010_tarefarelatorio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessamentoCertificados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EM_CURSO', 'Em Curso'), ('CONCLUIDO', 'Concluído'), ('CONCLUIDO_COM_ERROS', 'Concluído com Erros')], default='PENDENTE', max_length=20, verbose_name='Estado')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de Certificados')),
+                ('concluidos', models.PositiveIntegerField(default=0, verbose_name='Gerados')),
+                ('falhados', models.PositiveIntegerField(default=0, verbose_name='Falhados')),
+                ('erros', models.TextField(blank=True, verbose_name='Erros')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_inicio', models.DateTimeField(blank=True, null=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='processamentos_certificados', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+                ('turma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processamentos_certificados', to='formacao.turma', verbose_name='Turma')),
+            ],
+            options={
+                'verbose_name': 'Processamento de Certificados',
+                'verbose_name_plural': 'Processamentos de Certificados',
+                'ordering': ['-data_criacao'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado__in', ['PENDENTE', 'EM_CURSO'])), fields=('turma',), name='processamento_certificados_activo_unico')],
+            },
+        ),
+    ]
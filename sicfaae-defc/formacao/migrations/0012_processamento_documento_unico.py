@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formacao', '0011_processamentocertificados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processamentocertificados',
+            name='documento_unico',
+            field=models.FileField(blank=True, null=True, upload_to='certificados/turmas/', verbose_name='PDF da Turma'),
+        ),
+        migrations.AddField(
+            model_name='processamentocertificados',
+            name='gerar_documento_unico',
+            field=models.BooleanField(default=False, help_text='Gera também um PDF com todos os certificados da turma', verbose_name='Gerar PDF único'),
+        ),
+    ]
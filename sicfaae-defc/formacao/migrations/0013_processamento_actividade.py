@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formacao', '0012_processamento_documento_unico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processamentocertificados',
+            name='data_actividade',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='processamentocertificados',
+            name='novo_pedido',
+            field=models.BooleanField(default=False),
+        ),
+    ]
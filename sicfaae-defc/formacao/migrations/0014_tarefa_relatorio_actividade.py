@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def falhar_repetidas(apps, schema_editor):
+    """Antes da restrição: de cada chave fica activa só a tarefa mais antiga."""
+    TarefaRelatorio = apps.get_model('formacao', 'TarefaRelatorio')
+
+    chaves = set()
+    repetidas = []
+    activas = TarefaRelatorio.objects.filter(estado__in=['PENDENTE', 'EM_CURSO']).order_by('data_criacao')
+    for pk, chave in activas.values_list('pk', 'chave'):
+        if chave in chaves:
+            repetidas.append(pk)
+        chaves.add(chave)
+    TarefaRelatorio.objects.filter(pk__in=repetidas).update(
+        estado='FALHADA', erro='Pedido repetido.', data_conclusao=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formacao', '0013_processamento_actividade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefarelatorio',
+            name='data_actividade',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(falhar_repetidas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tarefarelatorio',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['PENDENTE', 'EM_CURSO'])), fields=('chave',), name='tarefa_relatorio_activa_unica'),
+        ),
+    ]
@@ -500,3 +500,287 @@ class Brigada(models.Model):
 
     def __str__(self):
         return f"{self.nome} ({self.distrito.nome})"
+
+
+
+class ProcessamentoCertificados(models.Model):
+    """
+    Geração dos PDFs de certificação de uma turma, executada pelo comando
+    `python manage.py processar_certificados` (ver formacao/certificados.py).
+    Só pode existir um processamento activo por turma, pelo que pedidos
+    repetidos reaproveitam o que já está em fila. Um pedido feito enquanto o
+    processamento está EM_CURSO marca-o com `novo_pedido`: o worker volta a
+    procurar certificados sem PDF na turma antes de o dar por concluído.
+    """
+    class Estado(models.TextChoices):
+        PENDENTE = 'PENDENTE', _('Pendente')
+        EM_CURSO = 'EM_CURSO', _('Em Curso')
+        CONCLUIDO = 'CONCLUIDO', _('Concluído')
+        CONCLUIDO_COM_ERROS = 'CONCLUIDO_COM_ERROS', _('Concluído com Erros')
+
+    ESTADOS_ACTIVOS = (Estado.PENDENTE, Estado.EM_CURSO)
+
+    turma = models.ForeignKey(
+        Turma, on_delete=models.CASCADE, related_name='processamentos_certificados',
+        verbose_name=_("Turma")
+    )
+    solicitado_por = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='processamentos_certificados', verbose_name=_("Solicitado por")
+    )
+    estado = models.CharField(_("Estado"), max_length=20, choices=Estado.choices, default=Estado.PENDENTE)
+    total = models.PositiveIntegerField(_("Total de Certificados"), default=0)
+    concluidos = models.PositiveIntegerField(_("Gerados"), default=0)
+    falhados = models.PositiveIntegerField(_("Falhados"), default=0)
+    erros = models.TextField(_("Erros"), blank=True)
+    gerar_documento_unico = models.BooleanField(
+        _("Gerar PDF único"), default=False,
+        help_text=_("Gera também um PDF com todos os certificados da turma")
+    )
+    documento_unico = models.FileField(_("PDF da Turma"), upload_to='certificados/turmas/', blank=True, null=True)
+    novo_pedido = models.BooleanField(default=False)
+
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(null=True, blank=True)
+    # Actualizada pelo worker a cada certificado gravado (ver recuperar_abandonados)
+    data_actividade = models.DateTimeField(null=True, blank=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Processamento de Certificados")
+        verbose_name_plural = _("Processamentos de Certificados")
+        ordering = ['-data_criacao']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['turma'],
+                condition=models.Q(estado__in=['PENDENTE', 'EM_CURSO']),
+                name='processamento_certificados_activo_unico',
+            )
+        ]
+
+    def __str__(self):
+        return f"Certificados {self.turma.nome} ({self.get_estado_display()})"
+
+    @property
+    def pendentes(self):
+        return max(self.total - self.concluidos - self.falhados, 0)
+
+    @classmethod
+    def solicitar(cls, turma, utilizador=None, documento_unico=False):
+        """Põe a turma em fila, ou devolve o processamento activo. Retorna (processamento, criado)."""
+        from django.db import IntegrityError, transaction
+
+        while True:
+            existente = cls.objects.filter(turma=turma, estado__in=cls.ESTADOS_ACTIVOS).first()
+            if existente is None:
+                try:
+                    with transaction.atomic():
+                        return cls.objects.create(
+                            turma=turma, solicitado_por=utilizador, gerar_documento_unico=documento_unico
+                        ), True
+                except IntegrityError:
+                    # Outro pedido criou o processamento entretanto
+                    continue
+            alteracoes = {'novo_pedido': True} if existente.estado == cls.Estado.EM_CURSO else {}
+            if documento_unico:
+                alteracoes['gerar_documento_unico'] = True
+            # Se entretanto terminou, o pedido fica num processamento novo
+            if not alteracoes or cls.objects.filter(pk=existente.pk, estado=existente.estado).update(**alteracoes):
+                for campo, valor in alteracoes.items():
+                    setattr(existente, campo, valor)
+                return existente, False
+
+    @classmethod
+    def reservar_proximo(cls):
+        """Marca o processamento pendente mais antigo como EM_CURSO e devolve-o."""
+        from django.utils import timezone
+        pendentes = cls.objects.filter(estado=cls.Estado.PENDENTE).order_by('data_criacao').values_list('pk', flat=True)[:10]
+        for pk in pendentes:
+            agora = timezone.now()
+            if cls.objects.filter(pk=pk, estado=cls.Estado.PENDENTE).update(
+                estado=cls.Estado.EM_CURSO, data_inicio=agora, data_actividade=agora, novo_pedido=False
+            ):
+                return cls.objects.select_related('turma__distrito', 'turma__provincia').get(pk=pk)
+        return None
+
+    @classmethod
+    def recuperar_abandonados(cls, limite):
+        """
+        Volta a pôr em fila os processamentos EM_CURSO sem actividade desde
+        `limite` (worker morto). Um worker vivo actualiza data_actividade a cada
+        certificado, pelo que não perde o processamento por este demorar.
+        """
+        return cls.objects.filter(estado=cls.Estado.EM_CURSO).filter(
+            models.Q(data_actividade__lt=limite) |
+            models.Q(data_actividade__isnull=True, data_inicio__lt=limite)
+        ).update(estado=cls.Estado.PENDENTE, data_inicio=None, data_actividade=None)
+
+class TarefaRelatorio(models.Model):
+    """
+    Exportação de turma (Excel/PDF) executada fora do pedido HTTP pelo
+    comando `python manage.py processar_tarefas`. O ficheiro final fica em
+    MEDIA_ROOT e é descarregado pela página de estado da tarefa.
+    """
+    class Tipo(models.TextChoices):
+        TURMA_EXCEL = 'TURMA_EXCEL', _('Lista da Turma (Excel)')
+        TURMA_PDF = 'TURMA_PDF', _('Pauta da Turma (PDF)')
+
+    class Estado(models.TextChoices):
+        PENDENTE = 'PENDENTE', _('Pendente')
+        EM_CURSO = 'EM_CURSO', _('Em Curso')
+        CONCLUIDA = 'CONCLUIDA', _('Concluída')
+        FALHADA = 'FALHADA', _('Falhada')
+
+    ESTADOS_ACTIVOS = (Estado.PENDENTE, Estado.EM_CURSO)
+
+    tipo = models.CharField(_("Tipo"), max_length=20, choices=Tipo.choices)
+    parametros = models.JSONField(_("Parâmetros"), default=dict, blank=True)
+    utilizador = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='tarefas_relatorio', verbose_name=_("Solicitado por")
+    )
+    escopo = models.CharField(
+        _("Âmbito"), max_length=50,
+        help_text=_("Âmbito de dados do utilizador (nível, província, distrito)")
+    )
+    chave = models.CharField(
+        _("Chave"), max_length=64, db_index=True,
+        help_text=_("Hash de tipo + parâmetros + âmbito, usado para reaproveitar pedidos iguais")
+    )
+    estado = models.CharField(_("Estado"), max_length=20, choices=Estado.choices, default=Estado.PENDENTE)
+    progresso = models.PositiveSmallIntegerField(_("Progresso (%)"), default=0)
+    ficheiro = models.FileField(_("Ficheiro"), upload_to='relatorios/%Y/%m/', blank=True)
+    erro = models.TextField(_("Erro"), blank=True)
+
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(null=True, blank=True)
+    # Actualizada pelo worker enquanto executa a tarefa (ver recuperar_abandonadas)
+    data_actividade = models.DateTimeField(null=True, blank=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Tarefa de Relatório")
+        verbose_name_plural = _("Tarefas de Relatório")
+        ordering = ['-data_criacao']
+        indexes = [models.Index(fields=['estado', 'data_criacao'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chave'],
+                condition=models.Q(estado__in=['PENDENTE', 'EM_CURSO']),
+                name='tarefa_relatorio_activa_unica',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_estado_display()})"
+
+    @staticmethod
+    def obter_escopo(utilizador):
+        """Âmbito de dados do utilizador, igual para quem vê os mesmos formandos."""
+        from core.models import PerfilUtilizador
+        if utilizador.is_superuser:
+            return 'superuser'
+        perfil = PerfilUtilizador.objects.filter(usuario=utilizador).values_list(
+            'nivel', 'provincia_id', 'distrito_id'
+        ).first()
+        if not perfil:
+            return 'nenhum'
+        nivel, provincia_id, distrito_id = perfil
+        if nivel == PerfilUtilizador.Nivel.CENTRAL:
+            return 'central'
+        if nivel == PerfilUtilizador.Nivel.PROVINCIAL:
+            return f'provincia:{provincia_id}'
+        return f'distrito:{distrito_id}'
+
+    @classmethod
+    def solicitar(cls, utilizador, tipo, parametros):
+        """
+        Cria a tarefa, ou devolve a que já está pendente/em curso para o mesmo
+        tipo, parâmetros e âmbito. Retorna (tarefa, criada).
+        """
+        import hashlib
+        import json
+        from django.db import IntegrityError, transaction
+
+        escopo = cls.obter_escopo(utilizador)
+        chave = hashlib.sha256(
+            json.dumps([tipo, parametros, escopo], sort_keys=True).encode()
+        ).hexdigest()
+
+        while True:
+            existente = cls.objects.filter(chave=chave, estado__in=cls.ESTADOS_ACTIVOS).first()
+            if existente:
+                return existente, False
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(
+                        tipo=tipo, parametros=parametros, utilizador=utilizador, escopo=escopo, chave=chave
+                    ), True
+            except IntegrityError:
+                # Outro pedido igual criou a tarefa entretanto
+                continue
+
+    @classmethod
+    def reservar_proxima(cls):
+        """
+        Marca a tarefa pendente mais antiga como EM_CURSO e devolve-a.
+        O UPDATE condicional garante que dois workers não ficam com a mesma tarefa.
+        """
+        from django.utils import timezone
+        pendentes = cls.objects.filter(estado=cls.Estado.PENDENTE).order_by('data_criacao').values_list('pk', flat=True)[:10]
+        for pk in pendentes:
+            agora = timezone.now()
+            if cls.objects.filter(pk=pk, estado=cls.Estado.PENDENTE).update(
+                estado=cls.Estado.EM_CURSO, data_inicio=agora, data_actividade=agora
+            ):
+                return cls.objects.get(pk=pk)
+        return None
+
+    @classmethod
+    def recuperar_abandonadas(cls, limite):
+        """
+        Volta a pôr em fila as tarefas EM_CURSO sem actividade desde `limite`
+        (worker morto). Um worker vivo actualiza data_actividade periodicamente
+        (registar_actividade), pelo que não perde a tarefa por esta demorar.
+        """
+        return cls.objects.filter(estado=cls.Estado.EM_CURSO).filter(
+            models.Q(data_actividade__lt=limite) |
+            models.Q(data_actividade__isnull=True, data_inicio__lt=limite)
+        ).update(estado=cls.Estado.PENDENTE, progresso=0, data_inicio=None, data_actividade=None)
+
+    @classmethod
+    def limpar_expiradas(cls, limite):
+        """Apaga as tarefas terminadas antes de `limite` e os seus ficheiros. Retorna quantas apagou."""
+        expiradas = cls.objects.exclude(estado__in=cls.ESTADOS_ACTIVOS).filter(data_conclusao__lt=limite)
+        apagadas = 0
+        for tarefa in expiradas.iterator():
+            if tarefa.ficheiro:
+                tarefa.ficheiro.delete(save=False)
+            tarefa.delete()
+            apagadas += 1
+        return apagadas
+
+    def registar_actividade(self):
+        """Batimento do worker: a tarefa continua a ser executada."""
+        from django.utils import timezone
+        TarefaRelatorio.objects.filter(pk=self.pk, estado=self.Estado.EM_CURSO).update(data_actividade=timezone.now())
+
+    def definir_progresso(self, progresso):
+        from django.utils import timezone
+        self.progresso = max(0, min(100, int(progresso)))
+        TarefaRelatorio.objects.filter(pk=self.pk).update(progresso=self.progresso, data_actividade=timezone.now())
+
+    def concluir(self, nome_ficheiro, conteudo):
+        from django.utils import timezone
+        self.ficheiro.save(nome_ficheiro, conteudo, save=False)
+        self.estado = self.Estado.CONCLUIDA
+        self.progresso = 100
+        self.data_conclusao = timezone.now()
+        self.save(update_fields=['ficheiro', 'estado', 'progresso', 'data_conclusao'])
+
+    def falhar(self, erro):
+        from django.utils import timezone
+        self.estado = self.Estado.FALHADA
+        self.erro = str(erro)
+        self.data_conclusao = timezone.now()
+        self.save(update_fields=['estado', 'erro', 'data_conclusao'])
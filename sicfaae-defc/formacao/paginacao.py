@@ -0,0 +1,15 @@
+"""
+Paginação por cursor (keyset) da API de candidatos em formação.
+
+Cada página começa depois da última linha da anterior, ordenada por
+(data_recepcao, id) e servida pelo índice com os mesmos campos. O cursor
+(sicfaae_comum.paginacao) guarda os dois valores, pelo que percorrer a tabela
+inteira custa o mesmo por página que a primeira, mesmo com datas repetidas.
+"""
+from sicfaae_comum.paginacao import PaginacaoCursor
+
+ORDENACAO_CANDIDATOS = ('-data_recepcao', '-id')
+
+
+class CandidatoFormacaoCursorPagination(PaginacaoCursor):
+    ordering = ORDENACAO_CANDIDATOS
@@ -0,0 +1,137 @@
+"""
+Recepção em lote dos candidatos enviados pelo DRH.
+
+Cada lote é validado item a item (sem consultas), as províncias e distritos
+são verificados contra o mapa em cache (core.utils.obter_mapa_geografia) e os
+candidatos válidos são gravados com um único bulk_create(update_conflicts=True)
+por bloco, usando id_drh como chave. Um lote de 2000 candidatos custa assim
+poucas instruções SQL em vez de várias por candidato.
+
+A foto não é copiada: o DRH envia em foto_conteudo o nome no armazenamento
+por conteúdo e, se a pasta for partilhada (sicfaae_comum/armazenamento.py), o candidato
+passa a referenciar o mesmo ficheiro. Sem foto_conteudo, ou com um ficheiro que
+o DEFC não vê, fica a foto que o candidato já tinha.
+
+tipo_agente e ativo podem ser corrigidos no DEFC: num candidato que já existe
+só são alterados quando o item os traz explicitamente (as exportações do
+próprio DEFC); o DRH não os envia e um reenvio não desfaz as correcções.
+"""
+from django.db import transaction
+from django.db.models import Q
+from sicfaae_comum import miniaturas
+from sicfaae_comum.armazenamento import armazenamento_conteudo, e_conteudo
+from core.models import CandidatoFormacao
+from core.utils import obter_mapa_geografia
+from .serializers import CandidatoRecepcaoSerializer
+
+TAMANHO_BLOCO = 500
+
+# Campos actualizados quando o candidato já existe (id_drh repetido)
+CAMPOS_ACTUALIZAVEIS = [
+    'codigo_candidato', 'nome_completo', 'genero', 'data_nascimento', 'numero_bi',
+    'numero_telefone', 'provincia', 'distrito', 'endereco', 'foto',
+]
+# Actualizados apenas quando vêm no item (ver acima)
+CAMPOS_EXPLICITOS = ('tipo_agente', 'ativo')
+
+
+def _erro_geografia(valores, mapa):
+    if valores['provincia_id'] not in mapa['provincias']:
+        return {'provincia': [f"Província {valores['provincia_id']} não existe no DEFC"]}
+    if valores['distrito_id'] not in mapa['distritos']:
+        return {'distrito': [f"Distrito {valores['distrito_id']} não existe no DEFC"]}
+    if mapa['distritos'][valores['distrito_id']] != valores['provincia_id']:
+        return {'distrito': [
+            f"Distrito {valores['distrito_id']} não pertence à província {valores['provincia_id']}"
+        ]}
+    return None
+
+
+def receber_lote(lista_dados):
+    """
+    Valida e grava (upsert por id_drh) uma lista de candidatos do DRH.
+    Devolve um resultado por item, pela ordem recebida:
+    {'id_drh', 'estado': 'criado' | 'actualizado' | 'erro', 'id' | 'erros'}.
+    """
+    resultados = []
+    validos = {}  # id_drh -> (índice do resultado, valores)
+    explicitos = {}  # id_drh -> CAMPOS_EXPLICITOS presentes no item
+    for dados in lista_dados:
+        id_drh = dados.get('id') if isinstance(dados, dict) else None
+        serializer = CandidatoRecepcaoSerializer(data=dados)
+        if not serializer.is_valid():
+            resultados.append({'id_drh': id_drh, 'estado': 'erro', 'erros': serializer.errors})
+            continue
+        id_drh = serializer.validated_data['id']
+        if id_drh in validos:
+            # O mesmo candidato repetido no lote: vale a última versão
+            anterior = validos[id_drh][0]
+            resultados[anterior] = {'id_drh': id_drh, 'estado': 'erro', 'erros': 'Repetido no lote; usada a última ocorrência'}
+        resultados.append({'id_drh': id_drh})
+        validos[id_drh] = (len(resultados) - 1, serializer.valores_candidato(serializer.validated_data))
+        explicitos[id_drh] = tuple(campo for campo in CAMPOS_EXPLICITOS if campo in serializer.validated_data)
+
+    if not validos:
+        return resultados
+
+    mapa = obter_mapa_geografia()
+    if any(_erro_geografia(valores, mapa) for _, valores in validos.values()):
+        # Pode haver geografia nova desde que o mapa foi guardado
+        mapa = obter_mapa_geografia(actualizar=True)
+
+    codigos = {}
+    for id_drh, (indice, valores) in list(validos.items()):
+        codigo = valores['codigo_candidato']
+        if codigo in codigos:
+            resultados[indice].update(estado='erro', erros={'codigo_candidato': [f"Código {codigo} repetido no lote"]})
+            del validos[id_drh]
+        else:
+            codigos[codigo] = id_drh
+
+    fotos_anteriores = {}  # id_drh -> foto actual dos candidatos existentes
+    for id_drh, codigo, foto in CandidatoFormacao.objects.filter(
+        Q(id_drh__in=validos) | Q(codigo_candidato__in=codigos)
+    ).values_list('id_drh', 'codigo_candidato', 'foto'):
+        if id_drh in validos:
+            fotos_anteriores[id_drh] = foto or ''
+        if codigos.get(codigo, id_drh) != id_drh:
+            # Código já usado por outro candidato: o upsert falharia para todo o bloco
+            indice, _ = validos.pop(codigos.pop(codigo))
+            resultados[indice].update(estado='erro', erros={'codigo_candidato': [f"Código {codigo} já existe no DEFC"]})
+
+    objectos = []
+    grupos = {}  # CAMPOS_EXPLICITOS presentes -> objectos com esses campos
+    for id_drh, (indice, valores) in list(validos.items()):
+        erros = _erro_geografia(valores, mapa)
+        if erros:
+            resultados[indice].update(estado='erro', erros=erros)
+            del validos[id_drh]
+            continue
+        if not (e_conteudo(valores['foto']) and armazenamento_conteudo.exists(valores['foto'])):
+            valores['foto'] = fotos_anteriores.get(id_drh, '')
+        objecto = CandidatoFormacao(id_drh=id_drh, **valores)
+        objectos.append(objecto)
+        grupos.setdefault(explicitos[id_drh], []).append(objecto)
+
+    with transaction.atomic():
+        for campos, grupo in grupos.items():
+            CandidatoFormacao.objects.bulk_create(
+                grupo, batch_size=TAMANHO_BLOCO, update_conflicts=True, unique_fields=['id_drh'],
+                update_fields=CAMPOS_ACTUALIZAVEIS + list(campos),
+            )
+        # bulk_create não passa pelos signals: referências das fotos novas e substituídas
+        for objecto in objectos:
+            anterior = fotos_anteriores.get(objecto.id_drh, '')
+            if objecto.foto.name != anterior:
+                armazenamento_conteudo.referenciar(objecto.foto.name)
+                if e_conteudo(anterior):
+                    armazenamento_conteudo.delete(anterior)
+                if anterior:
+                    transaction.on_commit(lambda anterior=anterior: miniaturas.libertar(anterior))
+
+    ids = dict(CandidatoFormacao.objects.filter(id_drh__in=validos).values_list('id_drh', 'pk'))
+    for id_drh, (indice, _) in validos.items():
+        resultados[indice].update(
+            estado='actualizado' if id_drh in fotos_anteriores else 'criado', id=ids.get(id_drh)
+        )
+    return resultados
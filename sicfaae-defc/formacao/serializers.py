@@ -15,6 +15,42 @@ class CandidatoRecepcaoSerializer(serializers.Serializer):
     distrito = serializers.IntegerField()
     endereco = serializers.CharField(required=False, allow_blank=True)
     vaga_titulo = serializers.CharField(required=False, allow_blank=True)
+    # Presentes nas exportações do próprio DEFC (formacao/exportacao.py); o DRH não os envia
+    tipo_agente = serializers.ChoiceField(choices=CandidatoFormacao.TipoAgente.choices, required=False)
+    ativo = serializers.BooleanField(required=False)
+    # Foto no armazenamento por conteúdo partilhado com o DRH (sicfaae_comum/armazenamento.py)
+    foto_conteudo = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    
+    @staticmethod
+    def tipo_agente_da_vaga(vaga_titulo):
+        """Tipo de agente no DEFC a partir do título da vaga no DRH."""
+        vaga_titulo = (vaga_titulo or '').upper()
+        if 'FORMADOR' in vaga_titulo:
+            return CandidatoFormacao.TipoAgente.FORMADOR
+        elif 'AGENTE' in vaga_titulo or 'CIVICO' in vaga_titulo or 'CÍVICO' in vaga_titulo:
+            return CandidatoFormacao.TipoAgente.AGENTE_CIVICO
+        elif 'MMV' in vaga_titulo or 'MESA' in vaga_titulo:
+            return CandidatoFormacao.TipoAgente.MMV
+        return CandidatoFormacao.TipoAgente.BRIGADISTA
+    
+    def valores_candidato(self, validated_data):
+        """Campos de CandidatoFormacao (sem id_drh) a partir dos dados validados."""
+        return {
+            'codigo_candidato': validated_data['codigo_candidato'],
+            'nome_completo': validated_data['nome_completo'],
+            'genero': validated_data['genero'],
+            'data_nascimento': validated_data.get('data_nascimento'),
+            'numero_bi': validated_data['numero_bi'],
+            'numero_telefone': validated_data['numero_telefone'],
+            'provincia_id': validated_data['provincia'],
+            'distrito_id': validated_data['distrito'],
+            'endereco': validated_data.get('endereco', ''),
+            'tipo_agente': (
+                validated_data.get('tipo_agente') or self.tipo_agente_da_vaga(validated_data.get('vaga_titulo'))
+            ),
+            'ativo': validated_data.get('ativo', True),
+            'foto': validated_data.get('foto_conteudo', ''),
+        }
     
     def create(self, validated_data):
         """Cria CandidatoFormacao a partir dos dados do DRH"""
@@ -29,15 +65,7 @@ class CandidatoRecepcaoSerializer(serializers.Serializer):
         provincia = Provincia.objects.get(id=validated_data['provincia'])
         distrito = Distrito.objects.get(id=validated_data['distrito'])
         
-        vaga_titulo = validated_data.get('vaga_titulo', '').upper()
-        tipo_agente = CandidatoFormacao.TipoAgente.BRIGADISTA
-        
-        if 'FORMADOR' in vaga_titulo:
-            tipo_agente = CandidatoFormacao.TipoAgente.FORMADOR
-        elif 'AGENTE' in vaga_titulo or 'CIVICO' in vaga_titulo or 'CÍVICO' in vaga_titulo:
-            tipo_agente = CandidatoFormacao.TipoAgente.AGENTE_CIVICO
-        elif 'MMV' in vaga_titulo or 'MESA' in vaga_titulo:
-            tipo_agente = CandidatoFormacao.TipoAgente.MMV
+        tipo_agente = self.tipo_agente_da_vaga(validated_data.get('vaga_titulo'))
         
         candidato = CandidatoFormacao.objects.create(
             id_drh=id_drh,
@@ -0,0 +1,89 @@
+"""
+Sincronização incremental de candidatos a partir do feed de alterações do DRH
+(`candidatos/alteracoes/`), executada pelo comando `python manage.py sync_from_drh`.
+
+Cada página traz os candidatos alterados desde o último cursor guardado em
+MarcaSincronizacao; os activos são gravados com recepcao.receber_lote e os
+que saíram da formação (ou foram apagados no DRH) ficam inactivos. O cursor só
+avança depois de a página estar gravada, pelo que uma falha a meio repete a
+página seguinte sem perder alterações.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+import requests
+
+from core.models import CandidatoFormacao, MarcaSincronizacao
+from . import recepcao
+
+FEED_CANDIDATOS = 'drh:candidatos'
+LIMITE_PAGINA = getattr(settings, 'SINCRONIZACAO_LIMITE_PAGINA', 500)
+TIMEOUT = getattr(settings, 'SINCRONIZACAO_TIMEOUT', 60)
+
+
+class ErroSincronizacao(Exception):
+    pass
+
+
+class ClienteDRH:
+    """Cliente HTTP do DRH com uma sessão persistente (keep-alive)."""
+
+    def __init__(self, url=None, token=None, timeout=TIMEOUT):
+        self.url = url or settings.DRH_API_URL
+        token = token if token is not None else settings.DRH_API_TOKEN
+        if not self.url or not token:
+            raise ErroSincronizacao('Configuração de API DRH não encontrada')
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        self.sessao.headers['Authorization'] = f'Token {token}'
+
+    def close(self):
+        self.sessao.close()
+
+    def obter_alteracoes(self, cursor, limite=LIMITE_PAGINA):
+        try:
+            resposta = self.sessao.get(
+                f'{self.url}candidatos/alteracoes/',
+                params={'cursor': cursor or '', 'limite': limite},
+                timeout=self.timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            raise ErroSincronizacao(f'Erro de comunicação com DRH: {e}') from e
+        if resposta.status_code != 200:
+            raise ErroSincronizacao(f'DRH respondeu {resposta.status_code}: {resposta.text[:500]}')
+        return resposta.json()
+
+
+def aplicar_pagina(marca, pagina):
+    """Grava uma página do feed e avança o cursor. Retorna (gravados, desactivados, erros)."""
+    activos = [c for c in pagina['candidatos'] if c.get('activo')]
+    inactivos = [c['id'] for c in pagina['candidatos'] if not c.get('activo')] + list(pagina['removidos'])
+
+    with transaction.atomic():
+        resultados = recepcao.receber_lote(activos) if activos else []
+        desactivados = CandidatoFormacao.objects.filter(id_drh__in=inactivos, ativo=True).update(ativo=False)
+        MarcaSincronizacao.objects.filter(pk=marca.pk).update(
+            cursor=pagina['cursor'],
+            total_recebidos=F('total_recebidos') + len(pagina['candidatos']) + len(pagina['removidos']),
+            data_ultima_sincronizacao=timezone.now(),
+        )
+    marca.cursor = pagina['cursor']
+
+    erros = [r for r in resultados if r['estado'] == 'erro']
+    return len(resultados) - len(erros), desactivados, erros
+
+
+def sincronizar(cliente, limite=LIMITE_PAGINA, feed=FEED_CANDIDATOS):
+    """Lê o feed até ao fim a partir da marca guardada. Devolve os totais e os erros por candidato."""
+    marca = MarcaSincronizacao.obter(feed)
+    totais = {'paginas': 0, 'gravados': 0, 'desactivados': 0, 'erros': []}
+    while True:
+        pagina = cliente.obter_alteracoes(marca.cursor, limite)
+        gravados, desactivados, erros = aplicar_pagina(marca, pagina)
+        totais['paginas'] += 1
+        totais['gravados'] += gravados
+        totais['desactivados'] += desactivados
+        totais['erros'].extend(erros)
+        if not pagina.get('mais'):
+            return totais
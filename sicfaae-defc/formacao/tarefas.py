@@ -0,0 +1,118 @@
+"""
+Exportações de turma (Excel e PDF) partilhadas entre as views e o worker.
+
+As views geram o ficheiro na hora quando a turma é pequena; acima de
+LIMITE_SINCRONO_TURMA alunos criam uma TarefaRelatorio, que o comando
+`python manage.py processar_tarefas` executa e guarda em MEDIA_ROOT.
+"""
+import tempfile
+from django.conf import settings
+from django.core.files import File
+from core.models import CandidatoFormacao
+from .models import Turma, TarefaRelatorio
+
+# Número de alunos a partir do qual a exportação passa para segundo plano
+LIMITE_SINCRONO_TURMA = getattr(settings, 'RELATORIOS_LIMITE_SINCRONO_TURMA', 200)
+
+
+def nome_turma_excel(turma, extensao='xlsx'):
+    distrito_nome = turma.distrito.nome if turma.distrito else 'central'
+    return f'turma_{turma.numero}_{distrito_nome}.{extensao}'
+
+
+def nome_turma_pdf(turma):
+    return f'pauta_turma_{turma.numero}.pdf'
+
+
+def escrever_turma_excel(turma, destino):
+    """Lista de alunos da turma num Workbook write-only."""
+    import openpyxl
+
+    generos = dict(CandidatoFormacao.Genero.choices)
+    alunos = turma.alunos.values_list(
+        'nome_completo', 'numero_bi', 'genero', 'numero_telefone', 'distrito__nome'
+    )
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=f"Turma {turma.numero}")
+
+    ws.append(['Nome Completo', 'BI', 'Género', 'Telefone', 'Distrito'])
+    for nome, bi, genero, telefone, distrito in alunos.iterator(chunk_size=500):
+        ws.append([nome, bi, str(generos.get(genero, genero)), telefone, distrito])
+
+    wb.save(destino)
+
+
+def escrever_turma_pdf(turma, destino):
+    """Pauta da turma (reportlab), com coluna para assinatura."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    generos = dict(CandidatoFormacao.Genero.choices)
+    alunos = turma.alunos.values_list(
+        'nome_completo', 'numero_bi', 'genero', 'numero_telefone'
+    )
+
+    doc = SimpleDocTemplate(destino, pagesize=landscape(A4))
+    elements = []
+    styles = getSampleStyleSheet()
+
+    elements.append(Paragraph(f"Pauta da Turma: {turma.nome}", styles['Title']))
+    local_nome = turma.local.nome if turma.local else 'N/A'
+    distrito_nome = turma.distrito.nome if turma.distrito else 'N/A'
+    elements.append(Paragraph(f"Distrito: {distrito_nome} | Local: {local_nome}", styles['Normal']))
+    elements.append(Spacer(1, 20))
+
+    data = [['Nome Completo', 'BI', 'Género', 'Telefone', 'Assinatura']]
+    for nome, bi, genero, telefone in alunos:
+        data.append([nome, bi, str(generos.get(genero, genero)), telefone, ''])
+
+    t = Table(data, colWidths=[200, 100, 60, 100, 200], repeatRows=1)
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.grey),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0,0), (-1,0), 12),
+        ('BACKGROUND', (0,1), (-1,-1), colors.white),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+    ]))
+
+    elements.append(t)
+    doc.build(elements)
+
+
+# --- Execução das tarefas (worker) ---
+
+def _executar_exportacao_turma(tarefa, escrever, nome, sufixo):
+    turma = Turma.objects.select_related('distrito', 'local').get(pk=tarefa.parametros['turma_id'])
+    tarefa.definir_progresso(10)
+    with tempfile.TemporaryFile(suffix=sufixo) as ficheiro:
+        escrever(turma, ficheiro)
+        ficheiro.seek(0)
+        tarefa.concluir(nome(turma), File(ficheiro))
+
+
+def executar_turma_excel(tarefa):
+    _executar_exportacao_turma(tarefa, escrever_turma_excel, nome_turma_excel, '.xlsx')
+
+
+def executar_turma_pdf(tarefa):
+    _executar_exportacao_turma(tarefa, escrever_turma_pdf, nome_turma_pdf, '.pdf')
+
+
+EXECUTORES = {
+    TarefaRelatorio.Tipo.TURMA_EXCEL: executar_turma_excel,
+    TarefaRelatorio.Tipo.TURMA_PDF: executar_turma_pdf,
+}
+
+
+def executar_tarefa(tarefa):
+    """Executa uma tarefa já reservada. Erros ficam registados na própria tarefa."""
+    try:
+        EXECUTORES[tarefa.tipo](tarefa)
+    except Exception as e:
+        tarefa.falhar(e)
+    return tarefa
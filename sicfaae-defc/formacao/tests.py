@@ -1,3 +1,608 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth.models import User
+from unittest.mock import patch
+from core.models import Provincia, Distrito, CandidatoFormacao
+from .models import Turma, TarefaRelatorio, Certificacao, ProcessamentoCertificados
 
-# Create your tests here.
+
+@override_settings(INSTRUMENTACAO_INTERVALO=None)  # gravar as medições alteraria as contagens de queries
+class TesteDashboardGeral(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(nome="Sofala")
+        self.distrito = Distrito.objects.create(provincia=self.provincia, nome="Beira")
+        self.user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(self.user)
+
+    def criar_formandos(self, quantidade, inicio=0):
+        tipos = CandidatoFormacao.TipoAgente.values
+        CandidatoFormacao.objects.bulk_create([
+            CandidatoFormacao(
+                id_drh=i, codigo_candidato=f"S-{i}", nome_completo=f"Formando {i}",
+                genero='F' if i % 4 == 0 else 'M', numero_bi=str(i), numero_telefone="841234567",
+                provincia=self.provincia, distrito=self.distrito,
+                tipo_agente=tipos[i % len(tipos)], ativo=bool(i % 2)
+            )
+            for i in range(inicio, inicio + quantidade)
+        ])
+
+    def contar_queries(self):
+        cache.clear()  # perfil do utilizador guardado entre pedidos (core/escopo.py)
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('formacao:dashboard_geral'))
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, len(ctx.captured_queries)
+
+    def test_numero_de_queries_fixo(self):
+        self.criar_formandos(2)
+        _, poucos = self.contar_queries()
+        self.criar_formandos(40, inicio=2)
+        resposta, muitos = self.contar_queries()
+
+        self.assertEqual(poucos, muitos)
+        self.assertEqual(resposta.context['total_formandos'], 42)
+        self.assertEqual(resposta.context['total_ativos'], 21)
+        self.assertEqual(resposta.context['total_mmv'], 11)
+        self.assertEqual(resposta.context['total_homens'], 31)
+        self.assertEqual(resposta.context['total_mulheres'], 11)
+
+
+@override_settings(INSTRUMENTACAO_INTERVALO=None)  # gravar as medições alteraria as contagens de queries
+class TesteInstrumentacao(TestCase):
+    setUp = TesteDashboardGeral.setUp
+    criar_formandos = TesteDashboardGeral.criar_formandos
+
+    def test_orcamentos_e_cabecalhos(self):
+        from sicfaae_comum.instrumentacao import orcamento_sql
+        from .models import Brigada
+
+        self.criar_formandos(40)
+        for i in range(4):
+            brigada = Brigada.objects.create(nome=f"Brigada {i}", distrito=self.distrito)
+            brigada.membros.set(CandidatoFormacao.objects.all()[i * 5:i * 5 + 5])
+
+        with self.settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=True, INSTRUMENTACAO_CABECALHOS=True):
+            for url in (reverse('formacao:lista_brigadas'), reverse('formacao_api:candidato_formacao-list')):
+                with orcamento_sql(maximo_duplicadas=0) as medicao:
+                    resposta = self.client.get(url)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual(int(resposta['X-SQL-Queries']), medicao.queries)
+
+    def test_medicoes_agregadas_no_admin(self):
+        from sicfaae_comum.instrumentacao import agregador
+        from core.models import MedicaoVista
+
+        agregador.gravar()
+        MedicaoVista.objects.all().delete()
+        with self.settings(INSTRUMENTACAO_INTERVALO=0):
+            self.client.get(reverse('formacao:dashboard_geral'))
+
+        self.assertEqual(MedicaoVista.objects.get(nome_url='formacao:dashboard_geral').pedidos, 1)
+        resposta = self.client.get(reverse('admin:core_medicaovista_changelist'))
+        self.assertContains(resposta, 'formacao:dashboard_geral')
+
+
+class TesteEscopoUtilizador(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('tecnico', password='password')
+        self.perfil = self.user.perfil
+        self.perfil.deve_alterar_senha = True
+        self.perfil.save()
+        self.client.force_login(self.user)
+
+    def test_perfil_em_cache_e_invalidado_ao_gravar(self):
+        import shutil
+        import tempfile
+        from core.escopo import cache_partilhada
+
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        definicao = self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': pasta,
+        }})
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+        self.assertTrue(cache_partilhada())
+
+        resposta = self.client.get(reverse('formacao:dashboard_geral'))
+        self.assertRedirects(resposta, '/formacao/alterar-senha/', fetch_redirect_response=False)
+
+        self.perfil.deve_alterar_senha = False
+        self.perfil.save(update_fields=['deve_alterar_senha'])
+        resposta = self.client.get(reverse('formacao:dashboard_geral'))
+        self.assertNotEqual(resposta.status_code, 302)
+
+
+class TesteExportacaoTurmaEmSegundoPlano(TestCase):
+    def setUp(self):
+        provincia = Provincia.objects.create(nome="Manica")
+        distrito = Distrito.objects.create(provincia=provincia, nome="Chimoio")
+        self.turma = Turma.objects.create(nome="Turma 1", distrito=distrito, numero=1)
+        self.turma.alunos.set(CandidatoFormacao.objects.bulk_create([
+            CandidatoFormacao(
+                id_drh=i, codigo_candidato=f"M-{i}", nome_completo=f"Formando {i}",
+                genero='F', numero_bi=str(i), numero_telefone="841234567",
+                provincia=provincia, distrito=distrito
+            )
+            for i in range(5)
+        ]))
+        self.user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(self.user)
+
+    def test_pauta_grande_vai_para_fila(self):
+        import io
+        import shutil
+        import tempfile
+        from django.core.management import call_command
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        url = reverse('formacao:exportar_turma_pdf', args=[self.turma.pk])
+
+        with override_settings(MEDIA_ROOT=media), patch('formacao.tarefas.LIMITE_SINCRONO_TURMA', 2):
+            primeira = self.client.get(url)
+            segunda = self.client.get(url)
+            self.assertEqual(TarefaRelatorio.objects.count(), 1)
+            self.assertEqual(primeira.url, segunda.url)
+
+            call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+
+            estado = self.client.get(primeira.url, {'formato': 'json'}).json()
+            self.assertEqual(estado['estado'], TarefaRelatorio.Estado.CONCLUIDA)
+            resposta = self.client.get(estado['url_download'])
+            self.assertTrue(b''.join(resposta.streaming_content).startswith(b'%PDF'))
+
+    def test_pauta_pequena_e_gerada_na_hora(self):
+        resposta = self.client.get(reverse('formacao:exportar_turma_excel', args=[self.turma.pk]))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(TarefaRelatorio.objects.exists())
+
+    def test_pedido_concorrente_reaproveita_a_tarefa(self):
+        from django.db.models.query import QuerySet
+
+        parametros = {'turma_id': self.turma.pk}
+        outra, _ = TarefaRelatorio.solicitar(self.user, TarefaRelatorio.Tipo.TURMA_PDF, parametros)
+
+        # O outro pedido ainda não estava gravado quando este procurou uma tarefa activa
+        first = QuerySet.first
+        procuras = []
+
+        def primeira_procura_vazia(qs):
+            procuras.append(qs)
+            return None if len(procuras) == 1 else first(qs)
+
+        with patch.object(QuerySet, 'first', primeira_procura_vazia):
+            tarefa, criada = TarefaRelatorio.solicitar(self.user, TarefaRelatorio.Tipo.TURMA_PDF, parametros)
+        self.assertEqual((tarefa, criada), (outra, False))
+        self.assertEqual(TarefaRelatorio.objects.count(), 1)
+
+    def test_tarefas_expiradas_apagadas_com_os_ficheiros(self):
+        import io
+        import shutil
+        import tempfile
+        from datetime import timedelta
+        from django.core.files.base import ContentFile
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            tarefas = []
+            for tipo in (TarefaRelatorio.Tipo.TURMA_EXCEL, TarefaRelatorio.Tipo.TURMA_PDF):
+                tarefa, _ = TarefaRelatorio.solicitar(self.user, tipo, {'turma_id': self.turma.pk})
+                tarefa.concluir(f'{tipo}.bin', ContentFile(b'conteudo'))
+                tarefas.append(tarefa)
+            expirada, recente = tarefas
+            TarefaRelatorio.objects.filter(pk=expirada.pk).update(data_conclusao=timezone.now() - timedelta(days=8))
+
+            call_command('processar_tarefas', '--uma-vez', '--validade', '7', stdout=io.StringIO())
+
+            self.assertEqual(list(TarefaRelatorio.objects.values_list('pk', flat=True)), [recente.pk])
+            self.assertFalse(expirada.ficheiro.storage.exists(expirada.ficheiro.name))
+            self.assertTrue(recente.ficheiro.storage.exists(recente.ficheiro.name))
+
+
+class TesteProcessamentoCertificados(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        provincia = Provincia.objects.create(nome="Zambézia")
+        distrito = Distrito.objects.create(provincia=provincia, nome="Quelimane")
+        self.turma = Turma.objects.create(nome="Turma 1", distrito=distrito, numero=1)
+        for i in range(3):
+            aluno = CandidatoFormacao.objects.create(
+                id_drh=i, codigo_candidato=f"Z-{i}", nome_completo=f"Formando {i}",
+                genero='M', numero_bi=str(i), numero_telefone="841234567",
+                provincia=provincia, distrito=distrito
+            )
+            Certificacao.objects.create(
+                candidato=aluno, turma=self.turma, tipo=Certificacao.TipoCertificacao.BRIGADISTA,
+                percentual_presenca=100, nota_final=15
+            )
+
+    def test_pedido_repetido_nao_regera_certificados(self):
+        from .certificados import processar
+
+        primeiro, criado = ProcessamentoCertificados.solicitar(self.turma)
+        segundo, criado_de_novo = ProcessamentoCertificados.solicitar(self.turma)
+        self.assertTrue(criado)
+        self.assertFalse(criado_de_novo)
+        self.assertEqual(primeiro.pk, segundo.pk)
+
+        processar(ProcessamentoCertificados.reservar_proximo(), processos=1)
+        primeiro.refresh_from_db()
+        self.assertEqual((primeiro.total, primeiro.concluidos, primeiro.falhados), (3, 3, 0))
+        self.assertFalse(Certificacao.objects.filter(documento_pdf='').exists())
+
+        novo, _ = ProcessamentoCertificados.solicitar(self.turma)
+        processar(ProcessamentoCertificados.reservar_proximo(), processos=1)
+        novo.refresh_from_db()
+        self.assertEqual(novo.total, 0)
+
+    def test_falhas_sao_repetidas(self):
+        from .certificados import processar, RenderizadorCertificados
+
+        falhas = {'restantes': 1}
+        renderizar = RenderizadorCertificados.renderizar
+        def renderizar_com_falha(renderizador, dados):
+            if falhas['restantes']:
+                falhas['restantes'] -= 1
+                raise RuntimeError("falha temporária")
+            return renderizar(renderizador, dados)
+
+        ProcessamentoCertificados.solicitar(self.turma)
+        with patch.object(RenderizadorCertificados, 'renderizar', autospec=True, side_effect=renderizar_com_falha):
+            processamento = processar(ProcessamentoCertificados.reservar_proximo(), processos=1, max_tentativas=2)
+
+        self.assertEqual(processamento.estado, ProcessamentoCertificados.Estado.CONCLUIDO)
+        self.assertEqual((processamento.concluidos, processamento.falhados), (3, 0))
+
+    def test_pedido_durante_o_processamento_e_incluido(self):
+        from .certificados import processar, RenderizadorCertificados
+
+        renderizar = RenderizadorCertificados.renderizar
+        def renderizar_e_lancar_nota(renderizador, dados):
+            if not CandidatoFormacao.objects.filter(codigo_candidato="Z-9").exists():
+                # Notas lançadas enquanto o worker gera o primeiro lote
+                aluno = CandidatoFormacao.objects.create(
+                    id_drh=9, codigo_candidato="Z-9", nome_completo="Formando 9", genero='F',
+                    numero_bi="9", numero_telefone="841234567",
+                    provincia=self.turma.distrito.provincia, distrito=self.turma.distrito
+                )
+                Certificacao.objects.create(
+                    candidato=aluno, turma=self.turma, tipo=Certificacao.TipoCertificacao.BRIGADISTA,
+                    percentual_presenca=100, nota_final=12
+                )
+                _, criado = ProcessamentoCertificados.solicitar(self.turma)
+                self.assertFalse(criado)
+            return renderizar(renderizador, dados)
+
+        ProcessamentoCertificados.solicitar(self.turma)
+        with patch.object(RenderizadorCertificados, 'renderizar', autospec=True, side_effect=renderizar_e_lancar_nota):
+            processamento = processar(ProcessamentoCertificados.reservar_proximo(), processos=1)
+
+        self.assertEqual((processamento.total, processamento.concluidos), (4, 4))
+        self.assertFalse(Certificacao.objects.filter(documento_pdf='').exists())
+
+    def test_processamento_activo_nao_e_recuperado(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        ProcessamentoCertificados.solicitar(self.turma)
+        processamento = ProcessamentoCertificados.reservar_proximo()
+        # Começou há duas horas mas gravou um certificado agora mesmo
+        ProcessamentoCertificados.objects.filter(pk=processamento.pk).update(
+            data_inicio=timezone.now() - timedelta(hours=2), data_actividade=timezone.now()
+        )
+        limite = timezone.now() - timedelta(minutes=15)
+        self.assertEqual(ProcessamentoCertificados.recuperar_abandonados(limite), 0)
+
+        ProcessamentoCertificados.objects.filter(pk=processamento.pk).update(
+            data_actividade=timezone.now() - timedelta(minutes=30)
+        )
+        self.assertEqual(ProcessamentoCertificados.recuperar_abandonados(limite), 1)
+
+    def test_pool_de_processos_com_spawn(self):
+        from .certificados import processar
+
+        ProcessamentoCertificados.solicitar(self.turma)
+        with patch('formacao.certificados.INICIO_PROCESSOS', 'spawn'):
+            processamento = processar(ProcessamentoCertificados.reservar_proximo(), processos=2, max_tentativas=1)
+
+        self.assertEqual(processamento.estado, ProcessamentoCertificados.Estado.CONCLUIDO)
+        self.assertEqual((processamento.concluidos, processamento.falhados), (3, 0))
+
+    def test_pool_reutilizado_entre_processamentos(self):
+        from .certificados import processar, PoolCertificados
+
+        with PoolCertificados(2) as pool:
+            ProcessamentoCertificados.solicitar(self.turma)
+            processar(ProcessamentoCertificados.reservar_proximo(), max_tentativas=1, pool=pool)
+            executor = pool.executor
+
+            Certificacao.objects.update(documento_pdf='')
+            ProcessamentoCertificados.solicitar(self.turma)
+            processamento = processar(ProcessamentoCertificados.reservar_proximo(), max_tentativas=1, pool=pool)
+
+            self.assertIsNotNone(executor)
+            self.assertIs(pool.executor, executor)
+        self.assertIsNone(pool.executor)
+        self.assertEqual((processamento.concluidos, processamento.falhados), (3, 0))
+
+    def test_documento_unico_da_turma(self):
+        import re
+        from .certificados import processar, RenderizadorCertificados
+
+        ProcessamentoCertificados.solicitar(self.turma)
+        # Um segundo pedido pode acrescentar o PDF único ao processamento em fila
+        ProcessamentoCertificados.solicitar(self.turma, documento_unico=True)
+        with patch('formacao.certificados.RenderizadorCertificados.__init__', autospec=True,
+                   side_effect=RenderizadorCertificados.__init__) as construtor:
+            processamento = processar(ProcessamentoCertificados.reservar_proximo(), processos=1)
+
+        # Layout preparado uma vez para o lote e uma vez para o documento único
+        self.assertEqual(construtor.call_count, 2)
+        self.assertEqual(processamento.concluidos, 3)
+        self.assertTrue(processamento.documento_unico)
+        with processamento.documento_unico.open('rb') as ficheiro:
+            conteudo = ficheiro.read()
+        self.assertTrue(conteudo.startswith(b'%PDF'))
+        self.assertEqual(len(re.findall(rb'/Type /Page\b(?!s)', conteudo)), 3)
+
+    def test_documento_unico_pedido_depois_de_reservado(self):
+        from .certificados import processar
+
+        ProcessamentoCertificados.solicitar(self.turma)
+        processamento = ProcessamentoCertificados.reservar_proximo()
+        ProcessamentoCertificados.solicitar(self.turma, documento_unico=True)
+
+        processamento = processar(processamento, processos=1)
+        self.assertTrue(processamento.documento_unico)
+
+
+class TesteReceberLote(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(nome="Gaza")
+        self.distrito = Distrito.objects.create(provincia=self.provincia, nome="Xai-Xai")
+        from rest_framework.authtoken.models import Token
+        token = Token.objects.create(user=User.objects.create_user('drh', password='password'))
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def candidato(self, id_drh, **extra):
+        dados = {
+            'id': id_drh, 'codigo_candidato': f"G-{id_drh}", 'nome_completo': f"Candidato {id_drh}",
+            'genero': 'F', 'numero_bi': f"BI{id_drh}", 'numero_telefone': "841234567",
+            'provincia': self.provincia.pk, 'distrito': self.distrito.pk, 'vaga_titulo': "Formador Provincial",
+        }
+        dados.update(extra)
+        return dados
+
+    def test_reenvio_nao_duplica(self):
+        url = reverse('formacao_api:candidato_formacao-receber-lote')
+        lote = {'candidatos': [self.candidato(1), self.candidato(2), self.candidato(3, genero='X')]}
+
+        resposta = self.client.post(url, lote, content_type='application/json', **self.auth)
+        self.assertEqual(resposta.status_code, 200)
+        estados = [r['estado'] for r in resposta.json()['resultados']]
+        self.assertEqual(estados, ['criado', 'criado', 'erro'])
+
+        lote['candidatos'][0]['nome_completo'] = "Nome Corrigido"
+        resposta = self.client.post(url, lote, content_type='application/json', **self.auth)
+        self.assertEqual([r['estado'] for r in resposta.json()['resultados']][:2], ['actualizado', 'actualizado'])
+        self.assertEqual(CandidatoFormacao.objects.count(), 2)
+        candidato = CandidatoFormacao.objects.get(id_drh=1)
+        self.assertEqual(candidato.nome_completo, "Nome Corrigido")
+        self.assertEqual(candidato.tipo_agente, CandidatoFormacao.TipoAgente.FORMADOR)
+
+    def test_reenvio_mantem_correcoes_do_defc(self):
+        from .recepcao import receber_lote
+
+        receber_lote([self.candidato(1)])
+        CandidatoFormacao.objects.filter(id_drh=1).update(
+            ativo=False, tipo_agente=CandidatoFormacao.TipoAgente.MMV
+        )
+
+        receber_lote([self.candidato(1, nome_completo="Nome Corrigido")])
+        candidato = CandidatoFormacao.objects.get(id_drh=1)
+        self.assertEqual(candidato.nome_completo, "Nome Corrigido")
+        self.assertFalse(candidato.ativo)
+        self.assertEqual(candidato.tipo_agente, CandidatoFormacao.TipoAgente.MMV)
+
+        # Uma exportação do DEFC traz os campos e repõe-nos
+        receber_lote([self.candidato(1, ativo=True, tipo_agente=CandidatoFormacao.TipoAgente.BRIGADISTA)])
+        candidato.refresh_from_db()
+        self.assertTrue(candidato.ativo)
+        self.assertEqual(candidato.tipo_agente, CandidatoFormacao.TipoAgente.BRIGADISTA)
+
+    def test_distrito_de_outra_provincia(self):
+        from .recepcao import receber_lote
+
+        outra = Provincia.objects.create(nome="Inhambane")
+        resultado, = receber_lote([self.candidato(1, provincia=outra.pk)])
+        self.assertEqual(resultado['estado'], 'erro')
+        self.assertIn('distrito', resultado['erros'])
+        self.assertFalse(CandidatoFormacao.objects.exists())
+
+    def test_lote_grande_em_poucas_queries(self):
+        from .recepcao import receber_lote
+
+        lote = [self.candidato(i) for i in range(600)]
+        lote.append(self.candidato(9999, distrito=999999))
+        with CaptureQueriesContext(connection) as ctx:
+            resultados = receber_lote(lote)
+
+        # Os INSERT dependem do limite de parâmetros do backend; o resto é fixo
+        outras = [q for q in ctx.captured_queries if not q['sql'].startswith('INSERT')]
+        self.assertLessEqual(len(outras), 8)
+        self.assertLess(len(ctx.captured_queries), len(lote) // 20)
+        self.assertEqual(CandidatoFormacao.objects.count(), 600)
+        self.assertEqual(resultados[-1]['estado'], 'erro')
+        self.assertIn('distrito', resultados[-1]['erros'])
+
+    def test_foto_partilhada_com_o_drh(self):
+        import os
+        import shutil
+        import tempfile
+        from django.core.files.base import ContentFile
+        from sicfaae_comum.armazenamento import armazenamento_conteudo
+        from core.models import ConteudoFicheiro
+        from .recepcao import receber_lote
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with self.settings(MEDIA_ROOT=media, ARMAZENAMENTO_CONTEUDO_PROJECTO='drh'):
+            # Foto guardada pelo DRH na pasta partilhada
+            nome = armazenamento_conteudo.save('foto.jpg', ContentFile(b'\xff\xd8 foto'))
+        ConteudoFicheiro.objects.all().delete()
+
+        with self.settings(MEDIA_ROOT=media):
+            receber_lote([self.candidato(1, foto_conteudo=nome), self.candidato(2, foto_conteudo='conteudo/xx/falta.jpg')])
+            receber_lote([self.candidato(1)])
+            candidato = CandidatoFormacao.objects.get(id_drh=1)
+            self.assertEqual(candidato.foto.name, nome)
+            self.assertFalse(CandidatoFormacao.objects.get(id_drh=2).foto)
+            self.assertEqual(ConteudoFicheiro.objects.get(nome=nome).referencias, 1)
+
+            # Sem referências no DEFC o ficheiro fica, porque o DRH ainda o usa
+            with self.captureOnCommitCallbacks(execute=True):
+                candidato.delete()
+            self.assertFalse(ConteudoFicheiro.objects.exists())
+            self.assertTrue(os.path.exists(armazenamento_conteudo.path(nome)))
+
+
+    def test_listagem_paginada_por_cursor(self):
+        from django.utils import timezone
+
+        url = reverse('formacao_api:candidato_formacao-receber-lote')
+        self.client.post(url, {'candidatos': [self.candidato(i) for i in range(1, 8)]},
+                         content_type='application/json', **self.auth)
+        # Datas iguais: a ordem é desempatada pelo id, guardado no cursor
+        CandidatoFormacao.objects.update(data_recepcao=timezone.now())
+
+        url = reverse('formacao_api:candidato_formacao-list') + '?page_size=3'
+        vistos = []
+        while url:
+            dados = self.client.get(url, **self.auth).json()
+            self.assertLessEqual(len(dados['results']), 3)
+            vistos += [c['id_drh'] for c in dados['results']]
+            url = dados['next']
+        esperados = CandidatoFormacao.objects.order_by('-data_recepcao', '-id').values_list('id_drh', flat=True)
+        self.assertEqual(vistos, list(esperados))
+
+
+class ClienteDRHFalso:
+    """Substitui o feed do DRH com páginas pré-definidas, indexadas pelo cursor."""
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.cursores = []
+
+    def obter_alteracoes(self, cursor, limite):
+        self.cursores.append(cursor)
+        return self.paginas[cursor]
+
+
+class TesteSincronizacaoDRH(TestCase):
+    setUp = TesteReceberLote.setUp
+    candidato = TesteReceberLote.candidato
+
+    def test_sincroniza_a_partir_do_cursor(self):
+        from core.models import MarcaSincronizacao
+        from .sincronizacao import sincronizar
+
+        activo = dict(self.candidato(1), activo=True)
+        cliente = ClienteDRHFalso({
+            '': {'candidatos': [activo, dict(self.candidato(2), activo=True)], 'removidos': [], 'cursor': 'a', 'mais': True},
+            'a': {'candidatos': [dict(self.candidato(2), activo=False)], 'removidos': [], 'cursor': 'b', 'mais': False},
+            'b': {'candidatos': [], 'removidos': [1], 'cursor': 'c', 'mais': False},
+        })
+
+        totais = sincronizar(cliente)
+        self.assertEqual((totais['paginas'], totais['gravados'], totais['desactivados']), (2, 2, 1))
+        self.assertEqual(MarcaSincronizacao.objects.get().cursor, 'b')
+        self.assertFalse(CandidatoFormacao.objects.get(id_drh=2).ativo)
+
+        # A execução seguinte só pede o que mudou depois da marca
+        sincronizar(cliente)
+        self.assertEqual(cliente.cursores, ['', 'a', 'b'])
+        self.assertFalse(CandidatoFormacao.objects.get(id_drh=1).ativo)
+
+
+class TesteFormatosTroca(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        provincia = Provincia.objects.create(nome="Manica")
+        distrito = Distrito.objects.create(provincia=provincia, nome="Chimoio")
+        self.turma = Turma.objects.create(nome="Turma 1", distrito=distrito, numero=1)
+        self.turma.alunos.set(CandidatoFormacao.objects.bulk_create([
+            CandidatoFormacao(
+                id_drh=i, codigo_candidato=f"M-{i}", nome_completo=f"Formando {i}",
+                genero='F', numero_bi=str(i), numero_telefone="841234567",
+                provincia=provincia, distrito=distrito, tipo_agente=CandidatoFormacao.TipoAgente.MMV,
+            )
+            for i in range(5)
+        ]))
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+
+    def test_turma_em_csv(self):
+        resposta = self.client.get(reverse('formacao:exportar_turma_excel', args=[self.turma.pk]), {'formato': 'csv'})
+        self.assertTrue(resposta.streaming)
+        linhas = b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[0], 'Código,Nome Completo,BI,Género,Telefone,Distrito')
+        self.assertEqual(linhas[1], 'M-0,Formando 0,0,F,841234567,Chimoio')
+        self.assertEqual(len(linhas), 6)
+
+    def test_candidatos_exportados_voltam_a_ser_carregados(self):
+        import io
+        import os
+        from django.core.management import call_command
+
+        for formato in ('csv', 'ndjson'):
+            destino = os.path.join(self.pasta, f'candidatos.{formato}')
+            call_command('exportar_dados', 'candidatos', destino, stdout=io.StringIO())
+            CandidatoFormacao.objects.filter(id_drh__in=[3, 4]).delete()
+            CandidatoFormacao.objects.filter(id_drh=0).update(nome_completo="Alterado")
+
+            saida = io.StringIO()
+            call_command('importar_candidatos', destino, stdout=saida)
+            self.assertIn('2 criados, 3 actualizados, 0 erros', saida.getvalue())
+            self.assertEqual(CandidatoFormacao.objects.get(id_drh=0).nome_completo, "Formando 0")
+            recriado = CandidatoFormacao.objects.get(id_drh=4)
+            self.assertEqual((recriado.tipo_agente, recriado.data_nascimento), (CandidatoFormacao.TipoAgente.MMV, None))
+
+
+class TesteGerarDadosCarga(TestCase):
+    def test_gera_candidatos_turmas_e_certificacoes(self):
+        import io
+        from django.core.management import call_command
+
+        provincia = Provincia.objects.create(nome="Tete")
+        Distrito.objects.create(provincia=provincia, nome="Moatize")
+        for _ in range(2):
+            call_command('gerar_dados_carga', '--candidatos', 150, '--lote', 60, stdout=io.StringIO())
+
+        self.assertEqual(CandidatoFormacao.objects.count(), 300)
+        self.assertEqual(CandidatoFormacao.objects.values('id_drh').distinct().count(), 300)
+        activos = CandidatoFormacao.objects.filter(ativo=True)
+        self.assertEqual(Turma.alunos.through.objects.count(), activos.count())
+        # Números de turma continuam entre execuções (unique_together distrito/número/tipo)
+        numeros = list(Turma.objects.filter(tipo_formacao='MMV').order_by('numero').values_list('numero', flat=True))
+        self.assertEqual(numeros, list(range(1, len(numeros) + 1)))
+        certificados = Certificacao.objects.select_related('turma')
+        self.assertTrue(certificados.exists())
+        self.assertTrue(all(c.turma.concluida for c in certificados))
@@ -23,6 +23,8 @@ urlpatterns = [
     path('turmas/<int:pk>/notas/', views.LancarNotasTurmaView.as_view(), name='lancar_notas_turma'),
     path('turmas/<int:pk>/exportar/excel/', views.ExportarTurmaExcelView.as_view(), name='exportar_turma_excel'),
     path('turmas/<int:pk>/exportar/pdf/', views.ExportarTurmaPDFView.as_view(), name='exportar_turma_pdf'),
+    path('tarefas/<int:pk>/', views.EstadoTarefaView.as_view(), name='estado_tarefa'),
+    path('tarefas/<int:pk>/descarregar/', views.DescarregarTarefaView.as_view(), name='descarregar_tarefa'),
     path('turmas/gerar-auto/', views.GerarTurmasView.as_view(), name='gerar_turmas_auto'),
     path('api/formadores-disponiveis/', views.ObterFormadoresDisponiveisView.as_view(), name='api_formadores_disponiveis'),
 
@@ -2,10 +2,12 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from .models import Turma, TipoFormacao, PlanoFormacaoDistrito, Certificacao, Brigada
+from .models import Turma, TipoFormacao, PlanoFormacaoDistrito, Certificacao, Brigada, TarefaRelatorio, ProcessamentoCertificados
 from .forms import TurmaForm, ConfiguracaoSistemaForm, BrigadaForm
 from core.models import ConfiguracaoSistema, CandidatoFormacao
 from django.db.models import Count, Q
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
 from django.urls import reverse_lazy, reverse
 
 class IsSTAEAdminMixin(UserPassesTestMixin):
@@ -36,13 +38,6 @@ class ConfiguracaoSistemaUpdateView(LoginRequiredMixin, IsSTAEAdminMixin, generi
         return context
 
 
-from django.views import generic
-from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Turma, TipoFormacao, PlanoFormacaoDistrito
-from django.db.models import Count, Q
-from django.urls import reverse_lazy
-from .forms import TurmaForm
-
 # --- Views de Listagem ---
 
 class ListaTurmasView(LoginRequiredMixin, generic.ListView):
@@ -104,7 +99,6 @@ class ListaTurmasFormadoresView(ListaTurmasView):
         perfil = obter_perfil_usuario(request.user)
         if not request.user.is_superuser and perfil:
             if perfil.nivel == PerfilUtilizador.Nivel.DISTRITAL:
-                from django.core.exceptions import PermissionDenied
                 raise PermissionDenied("Acesso restrito ao STAE Central ou Provincial.")
         return super().dispatch(request, *args, **kwargs)
 
@@ -128,7 +122,6 @@ class ListaTurmasFormadoresNacionaisView(ListaTurmasView):
     A Província não pode gerir formadores nacionais.
     """
     def dispatch(self, request, *args, **kwargs):
-        from django.core.exceptions import PermissionDenied
         from core.utils import obter_perfil_usuario
         from core.models import PerfilUtilizador
         if not request.user.is_superuser:
@@ -157,7 +150,6 @@ class ListaTurmasFormadoresProvinciaisView(ListaTurmasView):
     Acesso ao STAE Central e STAE Provincial (não ao Distrital).
     """
     def dispatch(self, request, *args, **kwargs):
-        from django.core.exceptions import PermissionDenied
         from core.utils import obter_perfil_usuario
         from core.models import PerfilUtilizador
         if not request.user.is_superuser:
@@ -198,7 +190,6 @@ class ListaTurmasBrigadistasView(ListaTurmasView):
 class GerarTurmasFormadoresView(LoginRequiredMixin, generic.TemplateView):
     template_name = 'formacao/gerar_turmas.html'
 
-from .forms import TurmaForm
 
 class CriarTurmaView(LoginRequiredMixin, generic.CreateView):
     template_name = 'formacao/form_turma.html'
@@ -239,6 +230,7 @@ class DetalheTurmaView(LoginRequiredMixin, generic.DetailView):
         context = super().get_context_data(**kwargs)
         turma = self.object
         context['alunos'] = turma.alunos.all()
+        context['processamento_certificados'] = turma.processamentos_certificados.first()
         
         # Obter candidatos já matriculados para os excluir da lista de disponíveis
         alunos_ids = turma.alunos.values_list('id', flat=True)
@@ -313,7 +305,6 @@ class ApagarTurmaView(LoginRequiredMixin, generic.DeleteView):
     template_name = 'formacao/confirmar_apagar_turma.html'
     success_url = reverse_lazy('formacao:lista_turmas')
 
-from formacao.models import Certificacao
 
 class LancarNotasTurmaView(LoginRequiredMixin, generic.View):
     template_name = 'formacao/lancar_notas.html'
@@ -379,141 +370,132 @@ class LancarNotasTurmaView(LoginRequiredMixin, generic.View):
                 except ValueError:
                     pass # Ignorar valores não numéricos
         
-        # Iniciar thread em background para gerar as certificações automaticamente
-        t = threading.Thread(target=gerar_pdfs_background, args=(turma.pk,))
-        t.daemon = True
-        t.start()
+        # Pôr a geração das certificações na fila do worker de certificados
+        ProcessamentoCertificados.solicitar(turma, request.user)
         
         from django.contrib import messages
         messages.success(request, "Notas gravadas com sucesso.")
         messages.info(request, "A geração das certificações (PDF) foi iniciada em segundo plano.")
         return redirect('formacao:detalhe_turma', pk=turma.pk)
 
-import openpyxl
-from django.http import HttpResponse
 
 class ExportarTurmaExcelView(LoginRequiredMixin, generic.View):
     def get(self, request, pk, *args, **kwargs):
-        turma = get_object_or_404(Turma, pk=pk)
-        alunos = turma.alunos.all()
+        from sicfaae_comum import formatos
+        from .exportacao import CAMPOS_ALUNOS_TURMA, colunas, linhas
+        from .tarefas import escrever_turma_excel, nome_turma_excel, LIMITE_SINCRONO_TURMA
+        turma = get_object_or_404(Turma.objects.select_related('distrito'), pk=pk)
+
+        # CSV/NDJSON (?formato=) são gerados enquanto são enviados, em memória constante
+        formato = request.GET.get('formato')
+        if formato in formatos.TIPOS:
+            return formatos.resposta_streaming(
+                nome_turma_excel(turma, formato), formato,
+                colunas(CAMPOS_ALUNOS_TURMA), linhas(turma.alunos.order_by('nome_completo'), CAMPOS_ALUNOS_TURMA)
+            )
+
+        if turma.alunos.count() > LIMITE_SINCRONO_TURMA:
+            return solicitar_tarefa(request, TarefaRelatorio.Tipo.TURMA_EXCEL, {'turma_id': turma.pk})
         
         response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename=turma_{turma.numero}_{turma.distrito.nome}.xlsx'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"Turma {turma.numero}"
-        
-        ws.append(['Nome Completo', 'BI', 'Género', 'Telefone', 'Distrito'])
-        for aluno in alunos:
-            ws.append([
-                aluno.nome_completo,
-                aluno.numero_bi,
-                aluno.get_genero_display(),
-                aluno.numero_telefone,
-                aluno.distrito.nome
-            ])
-            
-        wb.save(response)
+        response['Content-Disposition'] = f'attachment; filename={nome_turma_excel(turma)}'
+        escrever_turma_excel(turma, response)
         return response
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-
 class ExportarTurmaPDFView(LoginRequiredMixin, generic.View):
     def get(self, request, pk, *args, **kwargs):
-        turma = get_object_or_404(Turma, pk=pk)
-        alunos = turma.alunos.all()
+        from .tarefas import escrever_turma_pdf, nome_turma_pdf, LIMITE_SINCRONO_TURMA
+        turma = get_object_or_404(Turma.objects.select_related('distrito', 'local'), pk=pk)
+
+        if turma.alunos.count() > LIMITE_SINCRONO_TURMA:
+            return solicitar_tarefa(request, TarefaRelatorio.Tipo.TURMA_PDF, {'turma_id': turma.pk})
         
         response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=pauta_turma_{turma.numero}.pdf'
-        
-        doc = SimpleDocTemplate(response, pagesize=landscape(A4))
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        elements.append(Paragraph(f"Pauta da Turma: {turma.nome}", styles['Title']))
-        local_nome = turma.local.nome if turma.local else 'N/A'
-        elements.append(Paragraph(f"Distrito: {turma.distrito.nome} | Local: {local_nome}", styles['Normal']))
-        elements.append(Spacer(1, 20))
-        
-        data = [['Nome Completo', 'BI', 'Género', 'Telefone', 'Assinatura']]
-        for aluno in alunos:
-            data.append([aluno.nome_completo, aluno.numero_bi, aluno.get_genero_display(), aluno.numero_telefone, ''])
-            
-        t = Table(data, colWidths=[200, 100, 60, 100, 200])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0,0), (-1,0), 12),
-            ('BACKGROUND', (0,1), (-1,-1), colors.white),
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ]))
-        
-        elements.append(t)
-        doc.build(elements)
-        
+        response['Content-Disposition'] = f'attachment; filename={nome_turma_pdf(turma)}'
+        escrever_turma_pdf(turma, response)
         return response
 
-class GerarTurmasView(LoginRequiredMixin, generic.TemplateView):
-    template_name = 'formacao/gerar_turmas.html'
 
+def solicitar_tarefa(request, tipo, parametros):
+    """Cria (ou reaproveita) a tarefa em segundo plano e redirecciona para o seu estado."""
+    tarefa, criada = TarefaRelatorio.solicitar(request.user, tipo, parametros)
+    if criada:
+        messages.info(request, "O ficheiro é grande e está a ser gerado em segundo plano.")
+    else:
+        messages.info(request, "Já existe um pedido igual em curso. A acompanhar o seu progresso.")
+    return redirect('formacao:estado_tarefa', pk=tarefa.pk)
 
-import threading
-import time
-from reportlab.lib.pagesizes import landscape, A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from django.core.files.base import ContentFile
 
-def gerar_pdfs_background(turma_id):
-    # Aguarda um pequeno momento para a transacção do request terminar
-    time.sleep(2)
-    turma = Turma.objects.get(pk=turma_id)
-    certificacoes = Certificacao.objects.filter(turma=turma, documento_pdf='')
-    
-    for cert in certificacoes:
-        try:
-            # Geração muito básica de PDF apenas como placeholder simulando I/O pesado
-            from io import BytesIO
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-            styles = getSampleStyleSheet()
-            elements = []
-            elements.append(Paragraph(f"Certificado de {cert.get_tipo_display()}", styles['Title']))
-            elements.append(Spacer(1, 40))
-            elements.append(Paragraph(f"Certifica-se que {cert.candidato.nome_completo}", styles['Title']))
-            elements.append(Spacer(1, 20))
-            elements.append(Paragraph(f"Concluiu com sucesso a formação. Nota: {cert.nota_final} Valores", styles['Normal']))
-            doc.build(elements)
-            
-            pdf_data = buffer.getvalue()
-            buffer.close()
-            
-            # Anexar ao model (.save() dentro da thread)
-            nome_arquivo = f"certificado_{cert.numero_certificado}.pdf"
-            cert.documento_pdf.save(nome_arquivo, ContentFile(pdf_data), save=True)
-            
-            # TODO: Simular envio de e-mail/SMS aqui
-            
-        except Exception as e:
-            print(f"Erro ao gerar PDF para a certificacao {cert.id}: {e}")
+def pode_ver_tarefa(user, tarefa):
+    """Quem pediu a tarefa, ou quem tem o mesmo âmbito de dados (pedidos reaproveitados)."""
+    if user.is_superuser or tarefa.utilizador_id == user.id:
+        return True
+    return TarefaRelatorio.obter_escopo(user) == tarefa.escopo
+
+
+class EstadoTarefaView(LoginRequiredMixin, generic.DetailView):
+    """Página (ou JSON, com ?formato=json) de acompanhamento de uma TarefaRelatorio."""
+    model = TarefaRelatorio
+    template_name = 'formacao/estado_tarefa.html'
+    context_object_name = 'tarefa'
+
+    def get_object(self, queryset=None):
+        tarefa = super().get_object(queryset)
+        if not pode_ver_tarefa(self.request.user, tarefa):
+            raise PermissionDenied("Não tem permissão para ver esta tarefa.")
+        return tarefa
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if request.GET.get('formato') == 'json':
+            tarefa = self.object
+            return JsonResponse({
+                'id': tarefa.pk,
+                'estado': tarefa.estado,
+                'estado_display': tarefa.get_estado_display(),
+                'progresso': tarefa.progresso,
+                'erro': tarefa.erro,
+                'url_download': (
+                    reverse('formacao:descarregar_tarefa', args=[tarefa.pk])
+                    if tarefa.estado == TarefaRelatorio.Estado.CONCLUIDA else None
+                ),
+            })
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+class DescarregarTarefaView(LoginRequiredMixin, generic.View):
+    """Descarrega o ficheiro de uma tarefa concluída."""
+    def get(self, request, pk, *args, **kwargs):
+        from django.http import FileResponse, Http404
+        import os
+
+        tarefa = get_object_or_404(TarefaRelatorio, pk=pk)
+        if not pode_ver_tarefa(request.user, tarefa):
+            raise PermissionDenied("Não tem permissão para ver esta tarefa.")
+        if tarefa.estado != TarefaRelatorio.Estado.CONCLUIDA or not tarefa.ficheiro:
+            raise Http404("O ficheiro ainda não está disponível.")
+
+        return FileResponse(
+            tarefa.ficheiro.open('rb'), as_attachment=True, filename=os.path.basename(tarefa.ficheiro.name)
+        )
+
+class GerarTurmasView(LoginRequiredMixin, generic.TemplateView):
+    template_name = 'formacao/gerar_turmas.html'
+
 
 class ProcessarCertificacoesView(LoginRequiredMixin, generic.View):
     def post(self, request, pk, *args, **kwargs):
         turma = get_object_or_404(Turma, pk=pk)
         
-        # Iniciar thread em background para não bloquear o utilizador
-        t = threading.Thread(target=gerar_pdfs_background, args=(turma.pk,))
-        t.daemon = True
-        t.start()
+        # Pôr a turma na fila do worker de certificados (pedidos repetidos reaproveitam o activo)
+        processamento, criado = ProcessamentoCertificados.solicitar(
+            turma, request.user, documento_unico=bool(request.POST.get('documento_unico'))
+        )
         
-        messages.info(request, "A geração dos PDFs começou em segundo plano. Poderá consultar os ficheiros na página de Certificações dentro de alguns minutos.")
+        if criado:
+            messages.info(request, "A geração dos PDFs começou em segundo plano. Poderá consultar os ficheiros na página de Certificações dentro de alguns minutos.")
+        else:
+            messages.info(request, f"A geração dos PDFs desta turma já está em curso ({processamento.concluidos} de {processamento.total} gerados).")
         return redirect('formacao:detalhe_turma', pk=turma.pk)
 
 class ListaCertificacoesView(LoginRequiredMixin, generic.ListView):
@@ -557,6 +539,20 @@ class ListaCertificacoesView(LoginRequiredMixin, generic.ListView):
             
         return qs.order_by('-criada_em')
 
+    def get(self, request, *args, **kwargs):
+        from django.utils import timezone
+        from sicfaae_comum import formatos
+        from .exportacao import CAMPOS_CERTIFICACOES, colunas, linhas
+
+        # ?formato=csv|ndjson exporta a lista filtrada inteira, em streaming
+        formato = request.GET.get('formato')
+        if formato in formatos.TIPOS:
+            return formatos.resposta_streaming(
+                f'certificacoes_{timezone.now():%Y%m%d_%H%M}.{formato}', formato,
+                colunas(CAMPOS_CERTIFICACOES), linhas(self.get_queryset(), CAMPOS_CERTIFICACOES)
+            )
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['tipos'] = Certificacao.TipoCertificacao.choices
@@ -624,7 +620,6 @@ class BrigadaDeleteView(LoginRequiredMixin, generic.DeleteView):
         messages.success(self.request, "Brigada removida com sucesso.")
         return super().delete(request, *args, **kwargs)
 
-from django.http import JsonResponse
 class ObterBrigadistasDisponiveisView(LoginRequiredMixin, generic.View):
     """
     Retorna JSON com os brigadistas certificados disponíveis num distrito.
@@ -659,6 +654,7 @@ class DashboardGeralView(LoginRequiredMixin, generic.TemplateView):
         context = super().get_context_data(**kwargs)
         from core.models import CandidatoFormacao, PerfilUtilizador
         from core.utils import obter_perfil_usuario
+        from sicfaae_comum.contagens import contar_por_estado
         
         # Filtragem Hierárquica
         qs = CandidatoFormacao.objects.all()
@@ -676,18 +672,23 @@ class DashboardGeralView(LoginRequiredMixin, generic.TemplateView):
             # Sem perfil e não é superuser -> não vê nada
             qs = qs.none()
 
-        # Totais Gerais (Baseados no QuerySet Filtrado)
-        context['total_formandos'] = qs.count()
-        context['total_ativos'] = qs.filter(ativo=True).count()
-        
-        # Totais por Tipo
-        context['total_mmv'] = qs.filter(tipo_agente=CandidatoFormacao.TipoAgente.MMV).count()
-        context['total_civicos'] = qs.filter(tipo_agente=CandidatoFormacao.TipoAgente.AGENTE_CIVICO).count()
-        context['total_brigadistas'] = qs.filter(tipo_agente=CandidatoFormacao.TipoAgente.BRIGADISTA).count()
-        context['total_formadores'] = qs.filter(tipo_agente=CandidatoFormacao.TipoAgente.FORMADOR).count()
+        # Totais Gerais, por Tipo e por Género (Baseados no QuerySet Filtrado, numa única query)
+        Tipo, Genero = CandidatoFormacao.TipoAgente, CandidatoFormacao.Genero
+        contagens = contar_por_estado(
+            qs, tipos=Tipo.values, generos=Genero.values, total_ativos=Q(ativo=True)
+        )
+        por_tipo = contagens['por_tipo']
+        context['total_formandos'] = contagens['total']
+        context['total_ativos'] = contagens['total_ativos']
+        context['total_mmv'] = por_tipo[Tipo.MMV]
+        context['total_civicos'] = por_tipo[Tipo.AGENTE_CIVICO]
+        context['total_brigadistas'] = por_tipo[Tipo.BRIGADISTA]
+        context['total_formadores'] = por_tipo[Tipo.FORMADOR]
+        context['total_homens'] = contagens['por_genero'][Genero.MASCULINO]
+        context['total_mulheres'] = contagens['por_genero'][Genero.FEMININO]
         
         # Lista Recente
-        context['formandos_recentes'] = qs.order_by('-data_recepcao')[:10]
+        context['formandos_recentes'] = qs.select_related('provincia', 'distrito').order_by('-data_recepcao')[:10]
         
         return context
 
@@ -858,8 +859,6 @@ class PlanoFormacaoDistritoCreateView(LoginRequiredMixin, generic.CreateView):
         return super().form_valid(form)
 
 
-from django.core.exceptions import PermissionDenied
-from django.contrib import messages
 from .forms import FormularioCriacaoUsuario
 from core.models import PerfilUtilizador
 from core.utils import obter_perfil_usuario, obter_exibicao_nivel_usuario
@@ -994,7 +993,6 @@ class EditarLocalView(LoginRequiredMixin, generic.TemplateView):
     template_name = 'formacao/form_local.html'
 
 from django.contrib.auth import logout
-from django.shortcuts import redirect
 
 def custom_logout(request):
     """
@@ -1004,7 +1002,6 @@ def custom_logout(request):
     return redirect('login')
 
 from .forms import CadastrarFormadorNacionalForm
-from core.models import CandidatoFormacao
 
 class CadastrarFormadorNacionalView(LoginRequiredMixin, IsSTAEAdminMixin, generic.CreateView):
     """
@@ -1110,7 +1107,6 @@ class ApagarFormadorNacionalView(LoginRequiredMixin, IsSTAEAdminMixin, generic.D
         messages.success(request, f"O formador {formador.nome_completo} foi removido.")
         return super().delete(request, *args, **kwargs)
 
-from django.http import JsonResponse
 from django.db.models import F
 
 class ObterFormadoresDisponiveisView(LoginRequiredMixin, generic.View):
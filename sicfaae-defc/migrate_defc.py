@@ -1,6 +1,9 @@
 """
 Script de Migração de Dados - ORIGINAL → DEFC
 Migra dados de formação completos
+
+Apenas para a carga inicial a partir de uma cópia do ficheiro do DRH. A
+sincronização corrente é incremental, pela API: `python manage.py sync_from_drh`.
 """
 import os
 import sys
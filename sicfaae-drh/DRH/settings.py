@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'sicfaae_comum.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -36,6 +37,7 @@ MIDDLEWARE = [
     'simple_history.middleware.HistoryRequestMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'candidaturas.escopo.EscopoUtilizadorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,6 +71,14 @@ DATABASES = {
     }
 }
 
+# Cache partilhada entre processos, ex.: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# com CACHE_LOCATION=redis://127.0.0.1:6379, ou ...backends.db.DatabaseCache com o nome da tabela
+# (createcachetable). Sem ela fica a cache local de cada processo e o âmbito dos utilizadores
+# não é guardado entre pedidos (escopo.py)
+CACHE_BACKEND = config('CACHE_BACKEND', default='')
+if CACHE_BACKEND:
+    CACHES = {'default': {'BACKEND': CACHE_BACKEND, 'LOCATION': config('CACHE_LOCATION', default='')}}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -91,6 +101,17 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Envio de ficheiros pelo servidor web: '', 'x-accel-redirect' (nginx) ou 'x-sendfile' (candidaturas/ficheiros.py)
+FICHEIROS_ENVIO = config('FICHEIROS_ENVIO', default='')
+FICHEIROS_PREFIXO_INTERNO = config('FICHEIROS_PREFIXO_INTERNO', default='/media-interno/')
+# Ficheiros dos candidatos guardados por conteúdo (sicfaae_comum/armazenamento.py); a mesma pasta
+# nos dois projectos permite ao DEFC partilhar as fotos enviadas pelo DRH. Vazio = MEDIA_ROOT/MEDIA_URL
+ARMAZENAMENTO_CONTEUDO_ROOT = config('ARMAZENAMENTO_CONTEUDO_ROOT', default='')
+ARMAZENAMENTO_CONTEUDO_URL = config('ARMAZENAMENTO_CONTEUDO_URL', default='')
+ARMAZENAMENTO_CONTEUDO_MODELO = 'candidaturas.ConteudoFicheiro'
+ARMAZENAMENTO_CONTEUDO_PROJECTO = 'drh'
+# Modelo com as fotos (foto/foto_miniaturas) cujas miniaturas o worker gera (sicfaae_comum/miniaturas.py)
+MINIATURAS_MODELO = 'candidaturas.Candidato'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -115,6 +136,37 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Instrumentação de pedidos (sicfaae_comum/instrumentacao.py)
+INSTRUMENTACAO_MODELO = 'candidaturas.MedicaoVista'
+INSTRUMENTACAO_CABECALHOS = config('INSTRUMENTACAO_CABECALHOS', default=DEBUG, cast=bool)
+INSTRUMENTACAO_INTERVALO = config('INSTRUMENTACAO_INTERVALO', default=60, cast=int)
+# Número máximo de queries por nome de URL (aviso no log; erro nos testes)
+ORCAMENTOS_SQL = {
+    'candidaturas:painel_controlo': 12,
+    'candidaturas:lista_verificacao': 12,
+    'candidaturas:exportar_excel': 10,
+    'candidaturas:relatorio_pdf': 10,
+    'candidaturas_api:candidato-list': 8,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simples': {'format': '{asctime} {levelname} {name} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simples'},
+    },
+    'loggers': {
+        'sicfaae_comum.instrumentacao': {
+            'handlers': ['console'],
+            'level': config('INSTRUMENTACAO_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 DEFC_API_URL = config('DEFC_API_URL', default='http://localhost:8001/api/')
 DEFC_API_TOKEN = config('DEFC_API_TOKEN', default='')
 
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Candidato, PerfilUtilizador, Provincia, Distrito, Vaga, Entrevista
+from .models import Candidato, PerfilUtilizador, Provincia, Distrito, Vaga, Entrevista, MedicaoVista
 from .permissions import obter_candidatos_acessiveis, pode_gerir_candidato
 from django.utils.translation import gettext_lazy as _
 from simple_history.admin import SimpleHistoryAdmin
@@ -89,6 +89,46 @@ class EntrevistaAdmin(SimpleHistoryAdmin):
     )
 
 
+@admin.register(MedicaoVista)
+class MedicaoVistaAdmin(admin.ModelAdmin):
+    """Medições por URL do InstrumentacaoMiddleware (só leitura, só superutilizadores; apagar recomeça a contagem)."""
+    list_display = (
+        'nome_url', 'pedidos', 'queries_media', 'max_queries', 'pedidos_com_duplicadas',
+        'tempo_db_medio', 'tempo_render_medio', 'tempo_total_medio', 'max_tempo_total', 'data_atualizacao',
+    )
+    search_fields = ('nome_url',)
+    readonly_fields = [campo.name for campo in MedicaoVista._meta.fields]
+
+    @admin.display(description='Queries (média)')
+    def queries_media(self, obj):
+        return obj.media_queries
+
+    @admin.display(description='BD (ms, média)')
+    def tempo_db_medio(self, obj):
+        return obj.media_tempo_db
+
+    @admin.display(description='Render (ms, média)')
+    def tempo_render_medio(self, obj):
+        return obj.media_tempo_render
+
+    @admin.display(description='Total (ms, média)')
+    def tempo_total_medio(self, obj):
+        return obj.media_tempo_total
+
+    def has_module_permission(self, request):
+        return request.user.is_superuser
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
 
 
 # PerfilUtilizador Admin
@@ -0,0 +1,88 @@
+"""
+Feed de alterações de candidatos para o DEFC.
+
+O DEFC guarda o último cursor recebido e pede apenas o que mudou desde então
+(`python manage.py sync_from_drh` no DEFC), em vez de reler a tabela inteira.
+
+O cursor é opaco para o cliente e combina:
+    - (data_atualizacao, id) do último candidato devolvido;
+    - history_id do último registo de remoção (simple_history, tipo '-').
+
+Cada candidato alterado traz 'activo' (estado ENVIADO_DEFC); o DEFC grava os
+activos e desactiva os restantes que já conheça. As linhas alteradas há menos
+de MARGEM_SEGUNDOS ficam para o pedido seguinte, para não saltar transacções
+que ainda não fizeram commit com uma data_atualizacao anterior.
+
+A margem tem de ser maior do que a transacção de escrita de candidatos mais
+longa (a importação grava blocos de TAMANHO_BLOCO linhas, cada um na sua
+transacção). As escritas não esperam umas pelas outras; o custo é o DEFC ver
+cada alteração com MARGEM_SEGUNDOS de atraso.
+"""
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import Candidato
+
+ESTADOS_DEFC = (Candidato.Estado.ENVIADO_DEFC,)
+LIMITE_PADRAO = 500
+LIMITE_MAXIMO = 2000
+MARGEM_SEGUNDOS = getattr(settings, 'ALTERACOES_MARGEM_SEGUNDOS', 60)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(data, pk, history_id):
+    return f"{data.isoformat() if data else ''}|{pk}|{history_id}"
+
+
+def ler_cursor(cursor):
+    """Devolve (data_atualizacao, pk, history_id); cursor vazio começa do início."""
+    if not cursor:
+        return None, 0, 0
+    try:
+        data, pk, history_id = cursor.split('|')
+        return (datetime.fromisoformat(data) if data else None), int(pk), int(history_id)
+    except ValueError as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+def obter_alteracoes(cursor=None, limite=LIMITE_PADRAO):
+    """
+    Devolve {'candidatos': [...], 'removidos': [id, ...], 'cursor': str, 'mais': bool}.
+    Cada candidato traz 'activo', falso quando não está num estado do DEFC.
+    """
+    from .serializers import CandidatoAlteracaoSerializer
+
+    data, pk, history_id = ler_cursor(cursor)
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    corte = timezone.now() - timedelta(seconds=MARGEM_SEGUNDOS)
+
+    alterados = Candidato.objects.filter(data_atualizacao__lt=corte)
+    if data is not None:
+        alterados = alterados.filter(Q(data_atualizacao__gt=data) | Q(data_atualizacao=data, pk__gt=pk))
+    candidatos = list(
+        alterados.select_related('provincia', 'distrito', 'vaga').order_by('data_atualizacao', 'pk')[:limite + 1]
+    )
+    mais = len(candidatos) > limite
+    candidatos = candidatos[:limite]
+    if candidatos:
+        data, pk = candidatos[-1].data_atualizacao, candidatos[-1].pk
+
+    remocoes = list(
+        Candidato.history.filter(history_type='-', history_id__gt=history_id, history_date__lt=corte)
+        .order_by('history_id').values_list('history_id', 'id')[:limite + 1]
+    )
+    mais = mais or len(remocoes) > limite
+    remocoes = remocoes[:limite]
+    if remocoes:
+        history_id = remocoes[-1][0]
+
+    return {
+        'candidatos': CandidatoAlteracaoSerializer(candidatos, many=True).data,
+        'removidos': [id_candidato for _, id_candidato in remocoes],
+        'cursor': codificar_cursor(data, pk, history_id),
+        'mais': mais,
+    }
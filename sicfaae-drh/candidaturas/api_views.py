@@ -2,12 +2,12 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import F
 from django.utils import timezone
-from django.conf import settings
-import requests
 
-from .models import Candidato
-from .serializers import CandidatoParaDEFCSerializer, CandidatoListSerializer
+from .models import Candidato, EnvioDEFC, ItemEnvioDEFC
+from .serializers import CandidatoListSerializer
+from .paginacao import CandidatoCursorPagination, ORDENACAO_CANDIDATOS
 
 
 class CandidatoAPIViewSet(viewsets.ReadOnlyModelViewSet):
@@ -15,9 +15,10 @@ class CandidatoAPIViewSet(viewsets.ReadOnlyModelViewSet):
     API ViewSet para gestão de candidatos.
     Permite consulta e envio de candidatos para DEFC.
     """
-    queryset = Candidato.objects.all()
+    queryset = Candidato.objects.select_related('provincia', 'distrito')
     serializer_class = CandidatoListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CandidatoCursorPagination
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -30,7 +31,7 @@ class CandidatoAPIViewSet(viewsets.ReadOnlyModelViewSet):
         if estado:
             queryset = queryset.filter(estado=estado)
         
-        return queryset.order_by('-data_criacao')
+        return queryset.order_by(*ORDENACAO_CANDIDATOS)
     
     @action(detail=True, methods=['post'])
     def enviar_para_defc(self, request, pk=None):
@@ -52,60 +53,59 @@ class CandidatoAPIViewSet(viewsets.ReadOnlyModelViewSet):
                 'data_envio': candidato.data_envio_defc
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = CandidatoParaDEFCSerializer(candidato)
-        
+        from .transferencia import ClienteDEFC, ErroTransferencia, enviar_itens, concluir_envio
+
+        # Mesmo caminho dos envios em massa: um EnvioDEFC com um único item
+        envio = EnvioDEFC.solicitar(Candidato.objects.filter(pk=candidato.pk), request.user)
+        if envio is None:
+            return Response({
+                'error': 'Candidato já está em fila para envio ao DEFC'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        EnvioDEFC.objects.filter(pk=envio.pk).update(estado=EnvioDEFC.Estado.EM_CURSO, data_inicio=timezone.now())
+
         try:
-            defc_api_url = settings.DEFC_API_URL
-            defc_token = settings.DEFC_API_TOKEN
-            
-            if not defc_api_url or not defc_token:
-                return Response({
-                    'error': 'Configuração de API DEFC não encontrada'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            headers = {
-                'Authorization': f'Token {defc_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(
-                f'{defc_api_url}candidatos/receber/',
-                json=serializer.data,
-                headers=headers,
-                timeout=30
-            )
-            
-            if response.status_code == 201:
-                response_data = response.json()
-                
-                candidato.enviado_defc = True
-                candidato.data_envio_defc = timezone.now()
-                candidato.id_defc = response_data.get('id', '')
-                candidato.estado = Candidato.Estado.ENVIADO_DEFC
-                candidato.save()
-                
-                return Response({
-                    'success': True,
-                    'message': f'Candidato {candidato.nome_completo} enviado para DEFC com sucesso',
-                    'id_defc': candidato.id_defc,
-                    'data_envio': candidato.data_envio_defc
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response({
-                    'error': 'Erro ao enviar candidato para DEFC',
-                    'defc_response': response.text
-                }, status=status.HTTP_502_BAD_GATEWAY)
-                
-        except requests.exceptions.RequestException as e:
+            with ClienteDEFC() as cliente:
+                enviar_itens(cliente, list(envio.itens.select_related('candidato__provincia', 'candidato__distrito', 'candidato__vaga')))
+        except ErroTransferencia as e:
+            envio.itens.update(estado=ItemEnvioDEFC.Estado.FALHADO, tentativas=F('tentativas') + 1, erro=str(e))
+            concluir_envio(envio)
             return Response({
                 'error': 'Erro de comunicação com DEFC',
                 'details': str(e)
             }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-        except Exception as e:
+
+        item = envio.itens.get()
+        concluir_envio(envio)
+        if item.estado != ItemEnvioDEFC.Estado.ENVIADO:
             return Response({
-                'error': 'Erro interno ao processar envio',
-                'details': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': 'Erro ao enviar candidato para DEFC',
+                'defc_response': item.erro
+            }, status=status.HTTP_502_BAD_GATEWAY)
+
+        candidato.refresh_from_db()
+        return Response({
+            'success': True,
+            'message': f'Candidato {candidato.nome_completo} enviado para DEFC com sucesso',
+            'id_defc': candidato.id_defc,
+            'data_envio': candidato.data_envio_defc
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'])
+    def alteracoes(self, request):
+        """
+        Feed de alterações para o DEFC: candidatos alterados desde `cursor`.
+        Parâmetros: cursor (devolvido pelo pedido anterior) e limite.
+        """
+        from .alteracoes import obter_alteracoes, CursorInvalido, LIMITE_PADRAO
+        
+        try:
+            dados = obter_alteracoes(
+                request.query_params.get('cursor'),
+                request.query_params.get('limite', LIMITE_PADRAO)
+            )
+        except (CursorInvalido, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(dados)
     
     def _verificar_requisitos_envio(self, candidato):
         """Verifica e retorna motivos pelos quais candidato não pode ser enviado"""
@@ -0,0 +1,93 @@
+"""
+Compactação dos documentos da candidatura antes de serem guardados.
+
+- Imagens (foto, BI e certificado digitalizados): orientação EXIF aplicada,
+  redimensionadas para caber em LADO_MAXIMO[campo] e gravadas em JPEG
+  progressivo (o xhtml2pdf das fichas lê JPEG sem conversões).
+- PDF: as imagens das páginas (digitalizações) maiores do que o lado máximo
+  são reduzidas e recomprimidas em JPEG, os fluxos de conteúdo comprimidos e
+  os objectos repetidos juntos.
+- Outros formatos (Word) ficam como foram enviados.
+
+O resultado só substitui o original se for mais pequeno. compactar() devolve
+também os tamanhos original e guardado, registados em Candidato.tamanhos_documentos.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+
+from sicfaae_comum.imagens import QUALIDADE_JPEG, imagem_rgb
+
+logger = logging.getLogger(__name__)
+
+# Maior lado (em píxeis) das imagens guardadas, por campo
+LADO_MAXIMO = {'foto': 800, 'arquivo_bi': 2000, 'arquivo_certificado': 2000, 'arquivo_cv': 2000}
+
+
+def compactar_imagem(ficheiro, lado):
+    """Bytes JPEG da imagem reduzida a `lado` píxeis, ou None se não for uma imagem."""
+    from PIL import Image, ImageOps
+
+    ficheiro.seek(0)
+    try:
+        imagem = Image.open(ficheiro)
+        imagem.load()
+    except (OSError, Image.DecompressionBombError):
+        return None
+    imagem = imagem_rgb(ImageOps.exif_transpose(imagem))
+    imagem.thumbnail((lado, lado))
+    saida = BytesIO()
+    imagem.save(saida, 'JPEG', quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+    return saida.getvalue()
+
+
+def compactar_pdf(ficheiro, lado):
+    """Bytes do PDF com as imagens reduzidas e os fluxos comprimidos, ou None se não for possível."""
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.errors import PyPdfError
+
+    ficheiro.seek(0)
+    try:
+        leitor = PdfReader(ficheiro)
+        if leitor.is_encrypted:
+            return None
+        escritor = PdfWriter(clone_from=leitor)
+        for pagina in escritor.pages:
+            for imagem in pagina.images:
+                if max(imagem.image.size) > lado:
+                    reduzida = imagem_rgb(imagem.image)
+                    reduzida.thumbnail((lado, lado))
+                    imagem.replace(reduzida, quality=QUALIDADE_JPEG)
+            pagina.compress_content_streams()
+        escritor.compress_identical_objects()
+        saida = BytesIO()
+        escritor.write(saida)
+    except (PyPdfError, OSError, ValueError, TypeError, KeyError) as e:
+        logger.warning('PDF não compactado (%s): %s', getattr(ficheiro, 'name', ''), e)
+        return None
+    return saida.getvalue()
+
+
+def compactar(campo, ficheiro):
+    """
+    Devolve (ficheiro a guardar, tamanho original, tamanho guardado) para o
+    ficheiro enviado no `campo` do candidato.
+    """
+    original = ficheiro.size
+    nome, extensao = os.path.splitext(os.path.basename(ficheiro.name))
+    extensao = extensao.lower()
+    lado = LADO_MAXIMO.get(campo, 2000)
+
+    if extensao == '.pdf':
+        conteudo, extensao_final = compactar_pdf(ficheiro, lado), '.pdf'
+    elif extensao in ('.doc', '.docx'):
+        conteudo = None
+    else:
+        conteudo, extensao_final = compactar_imagem(ficheiro, lado), '.jpg'
+
+    ficheiro.seek(0)
+    if conteudo is None or len(conteudo) >= original:
+        return ficheiro, original, original
+    return ContentFile(conteudo, name=nome + extensao_final), original, len(conteudo)
@@ -0,0 +1,127 @@
+"""
+Âmbito de dados do utilizador (nível, província e distrito), resolvido uma vez.
+
+O EscopoUtilizador fica guardado no próprio objecto User, pelo que todas as
+chamadas de permissões dentro do mesmo pedido (request.user) o reaproveitam.
+Entre pedidos, o PerfilUtilizador (com província e distrito) fica na cache
+do Django durante ESCOPO_CACHE_TIMEOUT segundos e é invalidado sempre que um
+perfil é gravado ou apagado.
+
+Isto só é feito com uma cache partilhada entre processos (CACHE_BACKEND nas
+settings). Na cache local de cada processo (LocMemCache, a omissão) a
+invalidação só chegaria ao worker que gravou o perfil, e os outros
+continuariam a aplicar o âmbito antigo: sem cache partilhada o perfil é lido
+da base de dados uma vez por pedido.
+
+O EscopoUtilizadorMiddleware expõe o âmbito em `request.escopo`.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.functional import SimpleLazyObject
+from .models import PerfilUtilizador
+
+CACHE_TIMEOUT = getattr(settings, 'ESCOPO_CACHE_TIMEOUT', 60)
+ATRIBUTO = '_escopo_utilizador'
+
+
+def chave_cache(usuario_id):
+    return f'candidaturas:perfil_utilizador:{usuario_id}'
+
+
+class EscopoUtilizador:
+    """Nível e área geográfica do utilizador; compara apenas ids, sem queries."""
+
+    def __init__(self, usuario, perfil=None):
+        self.is_superuser = usuario.is_superuser
+        self.perfil = perfil
+        self.nivel = perfil.nivel if perfil else None
+        self.provincia_id = perfil.provincia_id if perfil else None
+        self.distrito_id = perfil.distrito_id if perfil else None
+
+    @property
+    def is_central(self):
+        return self.nivel == PerfilUtilizador.Nivel.CENTRAL
+
+    @property
+    def is_provincial(self):
+        return self.nivel == PerfilUtilizador.Nivel.PROVINCIAL
+
+    @property
+    def is_distrital(self):
+        return self.nivel == PerfilUtilizador.Nivel.DISTRITAL
+
+    @property
+    def chave(self):
+        """Identificador do âmbito, igual para quem vê os mesmos candidatos."""
+        if self.is_superuser:
+            return 'superuser'
+        if not self.perfil:
+            return 'nenhum'
+        if self.is_central:
+            return 'central'
+        if self.is_provincial:
+            return f'provincia:{self.provincia_id}'
+        return f'distrito:{self.distrito_id}'
+
+    def filtrar(self, queryset):
+        """Restringe um queryset com campos provincia/distrito ao âmbito do utilizador."""
+        if self.is_superuser or self.is_central:
+            return queryset
+        if self.is_provincial and self.provincia_id:
+            return queryset.filter(provincia_id=self.provincia_id)
+        if self.is_distrital and self.distrito_id:
+            return queryset.filter(distrito_id=self.distrito_id)
+        return queryset.none()
+
+    def abrange(self, provincia_id, distrito_id):
+        """Verifica se uma província/distrito está dentro do âmbito."""
+        if self.is_superuser or self.is_central:
+            return True
+        if self.is_provincial:
+            return provincia_id == self.provincia_id
+        if self.is_distrital:
+            return distrito_id == self.distrito_id
+        return False
+
+
+def cache_partilhada():
+    """True se a cache do Django é vista por todos os processos (ver acima)."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _carregar_perfil(usuario):
+    partilhada = cache_partilhada()
+    perfil = cache.get(chave_cache(usuario.pk)) if partilhada else None
+    if perfil is None:
+        # get_or_create: dois pedidos do mesmo utilizador podem chegar aqui ao mesmo tempo
+        perfil, _ = PerfilUtilizador.objects.select_related('provincia', 'distrito').get_or_create(usuario=usuario)
+        if partilhada:
+            cache.set(chave_cache(usuario.pk), perfil, CACHE_TIMEOUT)
+    # Reaproveitar o mesmo objecto em usuario.perfil (templates, forms)
+    campo = PerfilUtilizador._meta.get_field('usuario')
+    campo.set_cached_value(perfil, usuario)
+    campo.remote_field.set_cached_value(usuario, perfil)
+    return perfil
+
+
+def obter_escopo(usuario):
+    """EscopoUtilizador de `usuario`, resolvido uma vez por objecto User."""
+    escopo = getattr(usuario, ATRIBUTO, None)
+    if escopo is None:
+        if not usuario.is_authenticated or usuario.is_superuser:
+            escopo = EscopoUtilizador(usuario)
+        else:
+            escopo = EscopoUtilizador(usuario, _carregar_perfil(usuario))
+        setattr(usuario, ATRIBUTO, escopo)
+    return escopo
+
+
+class EscopoUtilizadorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.escopo = SimpleLazyObject(lambda: obter_escopo(request.user))
+        return self.get_response(request)
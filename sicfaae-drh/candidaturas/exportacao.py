@@ -0,0 +1,131 @@
+"""
+Motor de exportação Excel (XLSX) em memória constante.
+
+As linhas são lidas com values_list(...).iterator(), com as chaves
+estrangeiras resolvidas por JOIN, e escritas num Workbook openpyxl em modo
+write-only (as linhas vão para disco à medida que são escritas). O ficheiro
+final é enviado por blocos num StreamingHttpResponse.
+"""
+import tempfile
+from django.http import StreamingHttpResponse
+from .models import Candidato
+
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+TAMANHO_CHUNK = 2000
+TAMANHO_BLOCO = 64 * 1024
+
+# (Cabeçalho, campo em values_list)
+COLUNAS_CANDIDATOS = [
+    ('Código', 'codigo_candidato'),
+    ('Nome Completo', 'nome_completo'),
+    ('BI', 'numero_bi'),
+    ('Gênero', 'genero'),
+    ('Vaga', 'vaga__titulo'),
+    ('Província', 'provincia__nome'),
+    ('Distrito', 'distrito__nome'),
+    ('Telefone', 'numero_telefone'),
+    ('Estado', 'estado'),
+    ('Data Inscrição', 'data_criacao'),
+]
+
+# Colunas para CSV/NDJSON (sicfaae_comum/formatos.py): (cabeçalho, chave NDJSON).
+# Os nomes são reconhecidos pela importação (candidaturas/importacao.py).
+COLUNAS_TROCA = [(titulo, campo.split('__')[0]) for titulo, campo in COLUNAS_CANDIDATOS]
+
+
+def linhas_candidatos(queryset, chunk_size=TAMANHO_CHUNK):
+    """Gera as linhas de exportação de um queryset de Candidato, sem instanciar modelos."""
+    generos = dict(Candidato.Genero.choices)
+    estados = dict(Candidato.Estado.choices)
+    campos = [campo for _, campo in COLUNAS_CANDIDATOS]
+
+    for (codigo, nome, bi, genero, vaga, provincia, distrito,
+         telefone, estado, data_criacao) in queryset.values_list(*campos).iterator(chunk_size=chunk_size):
+        yield [
+            codigo,
+            nome,
+            bi,
+            str(generos.get(genero, genero or '')),
+            vaga or '',
+            provincia or '',
+            distrito or '',
+            telefone,
+            str(estados.get(estado, estado or '')),
+            data_criacao.strftime("%d/%m/%Y") if data_criacao else "",
+        ]
+
+
+CABECALHO_AUDITORIA = ['Data', 'Usuario', 'Tipo', 'Alteração']
+
+
+def linhas_auditoria(limite=500):
+    """Últimos eventos do histórico de candidatos (django-simple-history)."""
+    historico = Candidato.history.order_by('-history_date').values_list(
+        'history_date', 'history_user__username', 'history_type', 'estado'
+    )[:limite]
+
+    for data, username, history_type, estado in historico:
+        tipo = "Criação" if history_type == '+' else "Edição" if history_type == '~' else "Remoção"
+        yield [
+            data.strftime("%d/%m/%Y %H:%M"),
+            username or "Sistema",
+            tipo,
+            f"Estado alterado para {estado}" # Simplificação
+        ]
+
+
+def escrever_xlsx(destino, titulo, cabecalho, linhas):
+    """Escreve uma folha write-only em `destino` (caminho ou ficheiro binário)."""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo)
+
+    negrito = Font(bold=True)
+    celulas = []
+    for texto in cabecalho:
+        celula = WriteOnlyCell(ws, value=texto)
+        celula.font = negrito
+        celulas.append(celula)
+    ws.append(celulas)
+
+    total = 0
+    for linha in linhas:
+        ws.append(linha)
+        total += 1
+
+    wb.save(destino)
+    return total
+
+
+def _ler_em_blocos(ficheiro, tamanho_bloco):
+    try:
+        while True:
+            bloco = ficheiro.read(tamanho_bloco)
+            if not bloco:
+                break
+            yield bloco
+    finally:
+        ficheiro.close()
+
+
+def resposta_xlsx(nome_ficheiro, titulo, cabecalho, linhas, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera o XLSX num ficheiro temporário e devolve-o num StreamingHttpResponse.
+    """
+    ficheiro = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        escrever_xlsx(ficheiro, titulo, cabecalho, linhas)
+        tamanho = ficheiro.tell()
+        ficheiro.seek(0)
+    except Exception:
+        ficheiro.close()
+        raise
+
+    response = StreamingHttpResponse(_ler_em_blocos(ficheiro, tamanho_bloco), content_type=TIPO_XLSX)
+    response['Content-Length'] = str(tamanho)
+    response['Content-Disposition'] = f'attachment; filename={nome_ficheiro}'
+    return response
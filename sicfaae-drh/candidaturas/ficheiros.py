@@ -0,0 +1,52 @@
+"""
+Entrega de ficheiros do storage (MEDIA_ROOT) sem ocupar os workers da aplicação.
+
+Com FICHEIROS_ENVIO = 'x-accel-redirect' (nginx) ou 'x-sendfile' (Apache com
+mod_xsendfile, lighttpd) a view só verifica o pedido e devolve os cabeçalhos;
+o ficheiro é enviado pelo servidor web. Para o nginx, FICHEIROS_PREFIXO_INTERNO
+é uma location interna que aponta para MEDIA_ROOT:
+
+    location /media-interno/ {
+        internal;
+        alias /caminho/para/media/;
+    }
+
+Sem servidor à frente (FICHEIROS_ENVIO vazio) o ficheiro é enviado com FileResponse.
+
+Ficheiros com nome versionado (o URL muda quando o conteúdo muda) podem ser
+servidos com imutavel=True: Cache-Control immutable de um ano, para browsers e
+proxies não voltarem a pedir. Com `etag`, um If-None-Match igual recebe 304.
+"""
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+
+
+def resposta_ficheiro(request, ficheiro, nome, content_type='application/pdf', etag=None, imutavel=False,
+                      anexo=False):
+    """Resposta para o FieldFile `ficheiro`, descarregado (ou aberto, sem `anexo`) como `nome`."""
+    etag = f'"{etag}"' if etag else None
+    if etag and etag in request.headers.get('If-None-Match', ''):
+        resposta = HttpResponseNotModified()
+    else:
+        envio = getattr(settings, 'FICHEIROS_ENVIO', '').lower()
+        if envio == 'x-accel-redirect':
+            prefixo = getattr(settings, 'FICHEIROS_PREFIXO_INTERNO', '/media-interno/')
+            resposta = HttpResponse(content_type=content_type)
+            resposta['X-Accel-Redirect'] = prefixo + quote(ficheiro.name)
+        elif envio == 'x-sendfile':
+            resposta = HttpResponse(content_type=content_type)
+            resposta['X-Sendfile'] = ficheiro.path
+        else:
+            resposta = FileResponse(ficheiro.open('rb'), content_type=content_type)
+        resposta['Content-Disposition'] = content_disposition_header(anexo, nome)
+
+    if etag:
+        resposta['ETag'] = etag
+    if imutavel:
+        resposta['Cache-Control'] = CACHE_IMUTAVEL
+    return resposta
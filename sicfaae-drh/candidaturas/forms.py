@@ -93,7 +93,18 @@ class FormularioCandidaturaEtapa1(forms.ModelForm):
             self.fields['distrito'].queryset = self.instance.provincia.distritos.order_by('nome')
 
 class FormularioCandidaturaEtapa2(forms.ModelForm):
-    """Formulário para Etapa 2: Upload de Documentos"""
+    """
+    Formulário para Etapa 2: Upload de Documentos.
+    Cada documento pode vir no próprio campo ou, se foi enviado em blocos
+    (views_carregamentos.py), pelo identificador em carregamento_<campo>.
+    """
+    CAMPOS_DOCUMENTOS = ['arquivo_cv', 'arquivo_bi', 'arquivo_certificado', 'foto']
+
+    carregamento_arquivo_cv = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    carregamento_arquivo_bi = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    carregamento_arquivo_certificado = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    carregamento_foto = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Candidato
         fields = ['arquivo_cv', 'arquivo_bi', 'arquivo_certificado', 'foto']
@@ -104,6 +115,34 @@ class FormularioCandidaturaEtapa2(forms.ModelForm):
             'foto': forms.FileInput(attrs={'class': 'form-control mt-2', 'accept': '.jpg,.jpeg,.png'}),
         }
 
+    def clean(self):
+        from .models import CarregamentoDocumento
+
+        cleaned_data = super().clean()
+        self.carregamentos = []
+        for campo in self.CAMPOS_DOCUMENTOS:
+            identificador = cleaned_data.get(f'carregamento_{campo}')
+            if cleaned_data.get(campo) or not identificador:
+                continue
+            carregamento = CarregamentoDocumento.objects.filter(identificador=identificador, campo=campo).first()
+            if carregamento is None or not carregamento.concluido:
+                self.add_error(campo, "O envio deste documento não terminou. Volte a seleccioná-lo.")
+                continue
+            ficheiro = carregamento.abrir()
+            if campo == 'foto':
+                # O ImageField só valida os ficheiros enviados no próprio campo
+                from PIL import Image
+                try:
+                    Image.open(ficheiro).verify()
+                except Exception:
+                    ficheiro.close()
+                    self.add_error(campo, "A foto enviada não é uma imagem válida.")
+                    continue
+                ficheiro.seek(0)
+            cleaned_data[campo] = ficheiro
+            self.carregamentos.append(carregamento)
+        return cleaned_data
+
 class EntrevistaForm(forms.ModelForm):
     """Formulário para agendamento de entrevista."""
     class Meta:
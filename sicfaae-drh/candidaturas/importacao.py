@@ -0,0 +1,277 @@
+"""
+Motor de importação de candidatos a partir de Excel (XLSX), CSV ou NDJSON.
+
+O XLSX é lido em modo read-only (linha a linha, só valores) e o CSV/NDJSON
+por sicfaae_comum/formatos.py; as colunas (ou chaves) são reconhecidas pelos
+nomes em COLUNAS. As linhas são tratadas em blocos de TAMANHO_BLOCO. Para cada bloco:
+- os candidatos já existentes são obtidos numa única query pelo BI;
+- os novos recebem os códigos de uma vez (Candidato.reservar_codigos) e são
+  gravados com bulk_create (CandidatoQuerySet mantém as estatísticas e os
+  termos de pesquisa);
+- as observações dos existentes são acrescentadas com bulk_update;
+- o histórico (django-simple-history) de ambos é gravado com bulk_history_create.
+
+Cada linha com problema (BI em falta ou repetido, valor demasiado longo,
+vaga ou distrito desconhecido, candidato novo sem província/distrito) fica
+no relatório de erros e não impede as restantes.
+Com simular=True nada é gravado: o resumo e o relatório mostram o que seria feito.
+"""
+import hashlib
+import os
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from sicfaae_comum import formatos
+from .models import Candidato, Distrito, Vaga
+
+TAMANHO_BLOCO = 1000
+LOTE_BD = 500
+
+# Campo do candidato -> cabeçalhos aceites (sem distinguir maiúsculas)
+COLUNAS = {
+    'numero_bi': ('BI', 'Número de BI', 'Numero de BI'),
+    'nome_completo': ('Nome', 'Nome Completo'),
+    'numero_telefone': ('Telefone', 'Telemovel', 'Celular'),
+    'observacoes': ('Observacoes', 'Observações', 'Notas', 'Obs'),
+    'vaga': ('Vaga', 'Cargo', 'Função'),
+    'provincia': ('Província', 'Provincia'),
+    'distrito': ('Distrito',),
+}
+# Cabeçalho ou chave NDJSON (sem maiúsculas) -> campo; o nome do campo também é aceite
+ALIASES = {aceite.lower(): campo for campo, aceites in COLUNAS.items() for aceite in (campo, *aceites)}
+
+FORMATOS = ('xlsx', 'csv', 'ndjson')
+
+CRIADO = 'criados'
+ACTUALIZADO = 'actualizados'
+SEM_ALTERACOES = 'sem_alteracoes'
+ERRO = 'erros'
+
+CABECALHO_RELATORIO = ['Linha', 'BI', 'Erro']
+
+MOTIVO_HISTORICO = 'Importação Excel'
+
+
+class ErroImportacao(Exception):
+    """O ficheiro não pode ser importado (não é um XLSX válido ou falta a coluna BI)."""
+
+
+def resumo_sha256(ficheiro):
+    """SHA-256 do conteúdo de um ficheiro enviado (lido por chunks)."""
+    digest = hashlib.sha256()
+    for chunk in ficheiro.chunks():
+        digest.update(chunk)
+    ficheiro.seek(0)
+    return digest.hexdigest()
+
+
+def formato_do_nome(nome):
+    """Formato de importação pela extensão do ficheiro, ou None."""
+    if nome.lower().endswith('.xlsx'):
+        return 'xlsx'
+    return formatos.formato_do_nome(nome)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        # Números de BI/telefone gravados como número pelo Excel
+        valor = int(valor)
+    return str(valor).strip()
+
+
+class ImportadorCandidatos:
+    def __init__(self, utilizador=None, simular=False, tamanho_bloco=TAMANHO_BLOCO):
+        self.utilizador = utilizador
+        self.simular = simular
+        self.tamanho_bloco = tamanho_bloco
+        self.resumo = Counter({CRIADO: 0, ACTUALIZADO: 0, SEM_ALTERACOES: 0, ERRO: 0})
+        self.erros = []
+        self.vistos = {}
+        self.vagas = {titulo.lower(): pk for pk, titulo in Vaga.objects.values_list('pk', 'titulo')}
+        self.distritos = {
+            (distrito.provincia.nome.lower(), distrito.nome.lower()): distrito
+            for distrito in Distrito.objects.select_related('provincia')
+        }
+        self.tamanhos = {
+            campo: Candidato._meta.get_field(campo).max_length
+            for campo in ('numero_bi', 'nome_completo', 'numero_telefone')
+        }
+
+    def importar(self, ficheiro, formato='xlsx', progresso=None):
+        """
+        Importa `ficheiro` (ficheiro binário em `formato`: xlsx, csv ou ndjson).
+        `progresso(fraccao)` é chamado após cada bloco.
+        Retorna o resumo {criados, actualizados, sem_alteracoes, erros}.
+        """
+        if formato == 'xlsx':
+            registos = self.ler_xlsx(ficheiro)
+        elif formato in formatos.TIPOS:
+            registos = self.ler_texto(ficheiro, formato)
+        else:
+            raise ErroImportacao(f"Formato desconhecido: {formato}")
+
+        bloco = []
+        for numero, valores, erro in registos:
+            if erro:
+                self.registar_erro(numero, '', erro)
+                continue
+            bloco.append((numero, valores))
+            if len(bloco) >= self.tamanho_bloco:
+                self.processar_bloco(bloco)
+                bloco = []
+                fraccao = self.fraccao(numero)
+                if progresso and fraccao:
+                    progresso(fraccao)
+        if bloco:
+            self.processar_bloco(bloco)
+        self.erros.sort(key=lambda erro: erro[0])
+        return dict(self.resumo)
+
+    def ler_xlsx(self, ficheiro):
+        """Gera (linha, {campo: valor}, erro) de uma folha XLSX lida em modo read-only."""
+        import openpyxl
+        from zipfile import BadZipFile
+
+        try:
+            wb = openpyxl.load_workbook(ficheiro, read_only=True, data_only=True)
+        except (BadZipFile, KeyError, OSError) as e:
+            raise ErroImportacao(f"O ficheiro não é um Excel (.xlsx) válido: {e}")
+
+        try:
+            ws = wb.active
+            linhas = ws.iter_rows(values_only=True)
+            indices = self.mapear_colunas(next(linhas, None) or ())
+            total = ws.max_row or 0
+            self.fraccao = lambda numero: numero / total if total else None
+            for numero, valores in enumerate(linhas, 2):
+                yield numero, {campo: valores[i] for campo, i in indices.items() if i < len(valores)}, None
+        finally:
+            wb.close()
+
+    def ler_texto(self, ficheiro, formato):
+        """Gera (linha, {campo: valor}, erro) de um ficheiro CSV ou NDJSON (ver sicfaae_comum/formatos.py)."""
+        tamanho = ficheiro.seek(0, os.SEEK_END)
+        ficheiro.seek(0)
+        self.fraccao = lambda numero: ficheiro.tell() / tamanho if tamanho else None
+
+        cabecalho_verificado = formato != 'csv'
+        for numero, registo, erro in formatos.ler(ficheiro, formato):
+            if erro:
+                yield numero, None, erro
+                continue
+            if not cabecalho_verificado:
+                self.mapear_colunas(list(registo))
+                cabecalho_verificado = True
+            yield numero, {
+                ALIASES[chave]: valor for chave, valor in
+                ((_texto(chave).lower(), valor) for chave, valor in registo.items())
+                if chave in ALIASES
+            }, None
+
+    def mapear_colunas(self, cabecalho):
+        """{campo: índice} das colunas reconhecidas no cabeçalho (a primeira, se houver repetidas)."""
+        indices = {}
+        for indice, titulo in enumerate(cabecalho):
+            campo = ALIASES.get(_texto(titulo).lower())
+            if campo and campo not in indices:
+                indices[campo] = indice
+        if 'numero_bi' not in indices:
+            raise ErroImportacao("Coluna 'BI' não encontrada no ficheiro.")
+        return indices
+
+    def ler_linha(self, valores):
+        """{campo: texto} da linha, ou None se a linha estiver vazia. Lança ValueError se for inválida."""
+        dados = {campo: _texto(valores.get(campo)) for campo in COLUNAS}
+        if not any(dados.values()):
+            return None
+        if not dados['numero_bi']:
+            raise ValueError("BI em falta.")
+        for campo, maximo in self.tamanhos.items():
+            if len(dados[campo]) > maximo:
+                raise ValueError(f"{Candidato._meta.get_field(campo).verbose_name} com mais de {maximo} caracteres.")
+
+        vaga = dados.pop('vaga')
+        dados['vaga_id'] = None
+        if vaga:
+            dados['vaga_id'] = self.vagas.get(vaga.lower())
+            if dados['vaga_id'] is None:
+                raise ValueError(f"Vaga desconhecida: {vaga}")
+
+        provincia, distrito = dados.pop('provincia'), dados.pop('distrito')
+        dados['distrito'] = None
+        if provincia or distrito:
+            dados['distrito'] = self.distritos.get((provincia.lower(), distrito.lower()))
+            if dados['distrito'] is None:
+                raise ValueError(f"Distrito desconhecido: {distrito} ({provincia})")
+        return dados
+
+    def registar_erro(self, numero, bi, mensagem):
+        self.resumo[ERRO] += 1
+        self.erros.append([numero, bi, mensagem])
+
+    def processar_bloco(self, bloco):
+        registos = {}
+        for numero, valores in bloco:
+            try:
+                dados = self.ler_linha(valores)
+            except ValueError as e:
+                self.registar_erro(numero, _texto(valores.get('numero_bi')), str(e))
+                continue
+            if dados is None:
+                continue
+            bi = dados['numero_bi']
+            if bi in self.vistos:
+                self.registar_erro(numero, bi, f"BI repetido no ficheiro (linha {self.vistos[bi]}).")
+                continue
+            self.vistos[bi] = numero
+            registos[bi] = dados
+
+        existentes = Candidato.objects.in_bulk(list(registos), field_name='numero_bi')
+        novos, actualizados = [], []
+        for bi, dados in registos.items():
+            candidato = existentes.get(bi)
+            if candidato is None and dados['distrito'] is None:
+                self.registar_erro(self.vistos[bi], bi, "Província e Distrito são obrigatórios para novos candidatos.")
+            elif candidato is None:
+                novos.append(Candidato(
+                    numero_bi=bi,
+                    nome_completo=dados.get('nome_completo') or f"Candidato {bi}",
+                    numero_telefone=dados.get('numero_telefone') or "000000000",
+                    observacoes=dados.get('observacoes', ''),
+                    vaga_id=dados['vaga_id'],
+                    provincia=dados['distrito'].provincia,
+                    distrito=dados['distrito'],
+                    estado=Candidato.Estado.PENDENTE,
+                ))
+            elif dados.get('observacoes'):
+                if candidato.observacoes:
+                    candidato.observacoes += f"\n[Import]: {dados['observacoes']}"
+                else:
+                    candidato.observacoes = dados['observacoes']
+                actualizados.append(candidato)
+            else:
+                self.resumo[SEM_ALTERACOES] += 1
+
+        if not self.simular:
+            self.gravar(novos, actualizados)
+        self.resumo[CRIADO] += len(novos)
+        self.resumo[ACTUALIZADO] += len(actualizados)
+
+    def gravar(self, novos, actualizados):
+        historico = {'default_user': self.utilizador, 'default_change_reason': MOTIVO_HISTORICO}
+        with transaction.atomic():
+            if novos:
+                Candidato.reservar_codigos(novos)
+                Candidato.objects.bulk_create(novos, batch_size=LOTE_BD)
+                Candidato.history.bulk_history_create(novos, batch_size=LOTE_BD, **historico)
+            if actualizados:
+                # bulk_update não passa pelo auto_now; o feed de alterações depende deste campo
+                agora = timezone.now()
+                for candidato in actualizados:
+                    candidato.data_atualizacao = agora
+                Candidato.objects.bulk_update(actualizados, ['observacoes', 'data_atualizacao'], batch_size=LOTE_BD)
+                Candidato.history.bulk_history_create(actualizados, batch_size=LOTE_BD, update=True, **historico)
@@ -0,0 +1,96 @@
+"""
+Management command to compare query plans and timings with and without the composite indexes
+Usage: python manage.py benchmark_indices [--semear 100000] [--repeticoes 5]
+
+Tudo corre numa transacção que é revertida no fim: os candidatos semeados são
+apagados e os índices removidos para a medição "antes" voltam a existir.
+A medição e o relatório são os de sicfaae_comum.comandos.ComandoBenchmarkIndices.
+"""
+
+import random
+from datetime import date, timedelta
+
+from django.db import models
+from django.db.models import Count
+from django.utils import timezone
+
+from sicfaae_comum.comandos import ComandoBenchmarkIndices
+from candidaturas.models import Candidato, Vaga, EnvioDEFC
+from core.models import Provincia, Distrito
+
+
+class Command(ComandoBenchmarkIndices):
+    help = 'Mostra os planos EXPLAIN e tempos das consultas de candidatos, com e sem os índices compostos'
+    modelo = Candidato
+    # Índices compostos de Candidato (migrações 0015 e 0016)
+    indices = (
+        'candidato_criacao_idx',
+        'candidato_estado_criacao_idx',
+        'candidato_distrito_estado_idx',
+        'candidato_provincia_estado_idx',
+        'candidato_vaga_estado_idx',
+        'candidato_por_enviar_idx',
+        'candidato_estatistica_idx',
+    )
+
+    def semear(self, quantidade):
+        self.stdout.write(f'🌱 A semear {quantidade} candidatos...')
+        random.seed(42)
+        distritos = list(Distrito.objects.all())
+        if not distritos:
+            provincia = Provincia.objects.create(nome='Benchmark')
+            distritos = [Distrito.objects.create(provincia=provincia, nome=f'Benchmark {i}') for i in range(10)]
+        vagas = list(Vaga.objects.all()[:5]) or [
+            Vaga.objects.create(titulo=f'Vaga Benchmark {i}', data_inicio=date.today(), data_fim=date.today())
+            for i in range(5)
+        ]
+        estados = Candidato.Estado.values
+        inicio = timezone.now() - timedelta(days=365)
+
+        # QuerySet simples: não mantém EstatisticaCandidatos nem o índice de pesquisa
+        candidatos = models.QuerySet(Candidato)
+        for inicio_lote in range(0, quantidade, 5000):
+            lote = []
+            for i in range(inicio_lote, min(inicio_lote + 5000, quantidade)):
+                distrito = random.choice(distritos)
+                lote.append(Candidato(
+                    nome_completo=f'Benchmark {i}', numero_bi=f'BENCH{i:09d}', codigo_candidato=f'BENCH-{i}',
+                    numero_telefone='841234567', genero=random.choice('MF'),
+                    provincia_id=distrito.provincia_id, distrito=distrito, vaga=random.choice(vagas),
+                    estado=random.choice(estados), enviado_defc=random.random() < 0.2,
+                ))
+            candidatos.bulk_create(lote)
+            # data_criacao é auto_now_add: espalhar ao longo do último ano
+            for candidato in lote:
+                candidato.data_criacao = inicio + timedelta(seconds=random.randint(0, 365 * 86400))
+            candidatos.bulk_update(lote, ['data_criacao'], batch_size=1000)
+
+    def consultas(self):
+        referencia = Candidato.objects.exclude(vaga=None).order_by('pk').values(
+            'provincia_id', 'distrito_id', 'vaga_id'
+        ).first()
+        if not referencia:
+            return []
+        pendente, aprovado = Candidato.Estado.PENDENTE, Candidato.Estado.ENTREVISTA_APROVADA
+        ordem = ('-data_criacao', '-id')
+        distrito, provincia, vaga = referencia['distrito_id'], referencia['provincia_id'], referencia['vaga_id']
+        return [
+            ('Lista distrital por estado',
+             lambda: list(Candidato.objects.filter(distrito_id=distrito, estado=pendente).order_by(*ordem)[:30])),
+            ('Lista provincial por estado',
+             lambda: list(Candidato.objects.filter(provincia_id=provincia, estado=pendente).order_by(*ordem)[:30])),
+            ('Lista central por estado',
+             lambda: list(Candidato.objects.filter(estado=pendente).order_by(*ordem)[:30])),
+            ('Aprovados da vaga',
+             lambda: Candidato.objects.filter(vaga_id=vaga, estado=aprovado).count()),
+            ('Aprovados por enviar ao DEFC',
+             lambda: list(Candidato.objects.filter(
+                 estado=aprovado, enviado_defc=False
+             ).exclude(
+                 itens_envio_defc__envio__estado__in=EnvioDEFC.ESTADOS_ACTIVOS
+             ).values_list('pk', flat=True))),
+            ('Contagem por chave de estatística',
+             lambda: list(Candidato.objects.order_by().values_list(
+                 'provincia_id', 'distrito_id', 'vaga_id', 'estado', 'genero'
+             ).annotate(n=Count('id')))),
+        ]
@@ -0,0 +1,36 @@
+"""
+Management command to time the main views with the Django test client
+Usage: python manage.py benchmark_vistas [--repeticoes 20] [--aquecimento 2]
+
+Usar sobre uma base de dados gerada por gerar_dados_carga. Cada vista é pedida
+--repeticoes vezes por um superutilizador temporário; o relatório mostra o
+estado HTTP, as latências p50/p95 (resposta lida até ao fim), o número de
+queries e o tamanho da resposta. Tudo corre numa transacção revertida no fim
+(ver sicfaae_comum.comandos.ComandoBenchmarkVistas).
+"""
+
+from django.urls import reverse
+
+from sicfaae_comum.comandos import ComandoBenchmarkVistas
+from candidaturas.models import Candidato
+
+
+class Command(ComandoBenchmarkVistas):
+    modelo = Candidato
+
+    def pedidos(self, token):
+        api = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        lista = reverse('candidaturas:lista_verificacao')
+        return [
+            ('Painel de controlo', lambda c: c.get(reverse('candidaturas:painel_controlo'))),
+            ('Lista de verificação', lambda c: c.get(lista)),
+            ('Lista filtrada (pendentes)', lambda c: c.get(lista, {'estado': Candidato.Estado.PENDENTE})),
+            ('Lista com pesquisa', lambda c: c.get(lista, {'q': 'ana cossa'})),
+            ('Exportar Excel (geral)',
+             lambda c: c.get(reverse('candidaturas:exportar_excel', args=['geral']))),
+            ('Relatório PDF (estatísticas)',
+             lambda c: c.get(reverse('candidaturas:relatorio_pdf', args=['estatisticas']))),
+            ('Relatório PDF (geral)',
+             lambda c: c.get(reverse('candidaturas:relatorio_pdf', args=['geral']))),
+            ('API candidatos', lambda c: c.get(reverse('candidaturas_api:candidato-list'), **api)),
+        ]
@@ -0,0 +1,41 @@
+"""
+Management command that moves candidate files saved before the content-addressed storage into it
+Usage: python manage.py deduplicar_ficheiros
+"""
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from sicfaae_comum.armazenamento import PASTA, armazenamento_conteudo
+from candidaturas.models import Candidato
+
+class Command(BaseCommand):
+    help = 'Guarda por conteúdo (SHA-256) os ficheiros dos candidatos gravados em candidatos/... e apaga as cópias antigas'
+
+    def handle(self, *args, **options):
+        convertidos = {}  # nome antigo -> nome por conteúdo
+        em_falta = 0
+        for campo in Candidato.CAMPOS_FICHEIROS:
+            antigos = Candidato.objects.filter(
+                Q(**{f'{campo}__gt': ''}) & ~Q(**{f'{campo}__startswith': f'{PASTA}/'})
+            ).values_list('pk', campo)
+            for pk, nome in antigos.iterator():
+                if nome in convertidos:
+                    armazenamento_conteudo.referenciar(convertidos[nome])
+                elif default_storage.exists(nome):
+                    with default_storage.open(nome) as ficheiro:
+                        convertidos[nome] = armazenamento_conteudo.save(nome, ficheiro)
+                else:
+                    em_falta += 1
+                    continue
+                Candidato.objects.filter(pk=pk).update(**{campo: convertidos[nome]})
+
+        for nome in convertidos:
+            default_storage.delete(nome)
+
+        unicos = len(set(convertidos.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'📦 {len(convertidos)} ficheiros convertidos em {unicos} conteúdos únicos.'
+        ))
+        if em_falta:
+            self.stdout.write(self.style.WARNING(f'⚠️ {em_falta} referências a ficheiros que não existem (mantidas).'))
@@ -0,0 +1,62 @@
+"""
+Management command that sends queued candidate transfers (EnvioDEFC) to DEFC
+Usage: python manage.py enviar_defc [--uma-vez] [--tamanho-lote 500]
+"""
+
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from candidaturas.models import EnvioDEFC
+from candidaturas.transferencia import (
+    ClienteDEFC, ErroTransferencia, processar, TAMANHO_LOTE, MAX_TENTATIVAS, ESPERA_TENTATIVA
+)
+
+class Command(BaseCommand):
+    help = 'Envia para o DEFC, em lotes, os candidatos aprovados em fila'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE, help='Candidatos por pedido HTTP')
+        parser.add_argument('--tentativas', type=int, default=MAX_TENTATIVAS, help='Tentativas por lote')
+        parser.add_argument(
+            '--espera', type=float, default=ESPERA_TENTATIVA,
+            help='Segundos antes de repetir um lote após um erro de rede (duplica a cada falha seguida)'
+        )
+        parser.add_argument('--uma-vez', action='store_true', help='Processa a fila actual e termina')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera quando a fila está vazia')
+        parser.add_argument(
+            '--tempo-maximo', type=int, default=60,
+            help='Minutos após os quais um envio EM_CURSO é considerado abandonado'
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(minutes=options['tempo_maximo'])
+        recuperados = EnvioDEFC.recuperar_abandonados(limite)
+        if recuperados:
+            self.stdout.write(self.style.WARNING(f'⚠️  {recuperados} envios abandonados voltaram à fila.'))
+
+        try:
+            cliente = ClienteDEFC()
+        except ErroTransferencia as e:
+            self.stdout.write(self.style.ERROR(f'❌ {e}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('🚀 Worker de envios para o DEFC iniciado.'))
+        with cliente:
+            while True:
+                envio = EnvioDEFC.reservar_proximo()
+                if envio is None:
+                    if options['uma_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                processar(
+                    envio, cliente, tamanho_lote=options['tamanho_lote'], max_tentativas=options['tentativas'],
+                    espera=options['espera']
+                )
+                mensagem = f'{envio}: {envio.enviados} enviados, {envio.falhados} falhados de {envio.total}'
+                if envio.falhados:
+                    self.stdout.write(self.style.WARNING(f'⚠️  {mensagem}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'✅ {mensagem}'))
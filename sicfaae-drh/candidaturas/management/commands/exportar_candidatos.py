@@ -0,0 +1,47 @@
+"""
+Management command to export candidates as CSV or NDJSON in constant memory
+Usage: python manage.py exportar_candidatos saida.ndjson [--formato ndjson] [--estado PENDENTE] [--acrescentar]
+
+O formato vem da extensão do ficheiro (ou de --formato); "-" escreve para o
+stdout. Com --acrescentar as linhas são acrescentadas ao ficheiro (no CSV sem
+repetir o cabeçalho). O ficheiro pode ser importado com importar_candidatos.
+"""
+
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sicfaae_comum import formatos
+from candidaturas.exportacao import COLUNAS_TROCA, linhas_candidatos
+from candidaturas.models import Candidato
+
+
+class Command(BaseCommand):
+    help = 'Exporta candidatos para CSV ou NDJSON, em streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('saida', help='Ficheiro de destino (.csv, .ndjson/.jsonl) ou "-" para o stdout')
+        parser.add_argument('--formato', choices=sorted(formatos.TIPOS), help='Formato (padrão: pela extensão)')
+        parser.add_argument('--estado', choices=Candidato.Estado.values, help='Exportar apenas este estado')
+        parser.add_argument('--acrescentar', action='store_true', help='Acrescentar ao ficheiro em vez de o substituir')
+
+    def handle(self, *args, **options):
+        saida = options['saida']
+        formato = options['formato'] or formatos.formato_do_nome(saida)
+        if formato is None:
+            raise CommandError('Indique --formato csv ou ndjson (a extensão do ficheiro não o identifica).')
+
+        candidatos = Candidato.objects.order_by('pk')
+        if options['estado']:
+            candidatos = candidatos.filter(estado=options['estado'])
+        linhas = linhas_candidatos(candidatos)
+
+        if saida == '-':
+            formatos.escrever(sys.stdout.buffer, formato, COLUNAS_TROCA, linhas)
+            return
+
+        acrescentar = options['acrescentar'] and os.path.exists(saida) and os.path.getsize(saida) > 0
+        with open(saida, 'ab' if acrescentar else 'wb') as destino:
+            tamanho = formatos.escrever(destino, formato, COLUNAS_TROCA, linhas, cabecalho=not acrescentar)
+        self.stdout.write(self.style.SUCCESS(f'✅ {tamanho / 1024:.1f} KB escritos em {saida}.'))
@@ -31,22 +31,24 @@ class Command(BaseCommand):
         gerados = 0
         erros = 0
         
-        for candidato in candidatos_sem_codigo:
+        # Processar em lotes: cada lote reserva os códigos de cada distrito
+        # numa única operação e grava-os com um bulk_update.
+        tamanho_lote = 1000
+        candidatos_sem_codigo = candidatos_sem_codigo.select_related('provincia', 'distrito')
+        ids = list(candidatos_sem_codigo.values_list('id', flat=True))
+        
+        for inicio in range(0, len(ids), tamanho_lote):
+            lote = list(candidatos_sem_codigo.filter(id__in=ids[inicio:inicio + tamanho_lote]))
             try:
-                # Gerar código
-                codigo = candidato.gerar_codigo_candidato()
-                
-                # Atualizar usando queryset.update() para evitar signals
-                Candidato.objects.filter(id=candidato.id).update(codigo_candidato=codigo)
-                
-                gerados += 1
-                if gerados % 100 == 0:
-                    self.stdout.write(f'  ⏳ Processados: {gerados}/{total}')
-                    
+                with transaction.atomic():
+                    atribuidos = Candidato.reservar_codigos(lote)
+                    Candidato.objects.bulk_update(atribuidos, ['codigo_candidato'])
+                gerados += len(atribuidos)
+                self.stdout.write(f'  ⏳ Processados: {gerados}/{total}')
             except Exception as e:
-                erros += 1
+                erros += len(lote)
                 self.stdout.write(
-                    self.style.ERROR(f'  ❌ Erro ao gerar código para {candidato.nome_completo}: {e}')
+                    self.style.ERROR(f'  ❌ Erro ao gerar códigos para o lote {inicio // tamanho_lote + 1}: {e}')
                 )
         
         self.stdout.write(self.style.SUCCESS(f'\n✅ Concluído!'))
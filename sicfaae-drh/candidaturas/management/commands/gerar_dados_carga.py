@@ -0,0 +1,111 @@
+"""
+Management command to generate a synthetic, deterministic load dataset
+Usage: python manage.py gerar_dados_carga --candidatos 100000 [--semente 42] [--lote 5000]
+
+Ao contrário de popula_vagas_candidatos, não apaga dados, não acede à rede
+e grava tudo com bulk_create (com os registos de histórico), em lotes.
+Os termos de pesquisa são indexados por lote e EstatisticaCandidatos é
+reconstruída uma única vez no fim.
+A mesma semente sobre a mesma base de dados gera sempre os mesmos dados.
+Os candidatos gerados têm o BI começado por SINT e podem ser acrescentados
+em várias execuções. Os lotes e os dados pessoais são os de
+sicfaae_comum.comandos.ComandoGerarDadosCarga.
+"""
+
+from datetime import timedelta
+
+from django.db import models
+
+from sicfaae_comum.comandos import ComandoGerarDadosCarga
+from candidaturas.models import Candidato, Entrevista, Vaga, EstatisticaCandidatos, TermoPesquisaCandidato
+from core.models import Distrito
+
+VAGAS = [
+    ('Formador Provincial (carga)', Vaga.NivelAprovacao.PROVINCIAL),
+    ('MMV (carga)', Vaga.NivelAprovacao.DISTRITAL),
+    ('Brigadista (carga)', Vaga.NivelAprovacao.DISTRITAL),
+    ('Agente de Educação Cívica (carga)', Vaga.NivelAprovacao.DISTRITAL),
+]
+# Distribuição dos estados (pesos)
+ESTADOS = [
+    (Candidato.Estado.PENDENTE, 50),
+    (Candidato.Estado.ENTREVISTA_AGENDADA, 15),
+    (Candidato.Estado.ENTREVISTA_APROVADA, 15),
+    (Candidato.Estado.ENTREVISTA_REPROVADA, 10),
+    (Candidato.Estado.ENVIADO_DEFC, 10),
+]
+RESULTADO_ENTREVISTA = {
+    Candidato.Estado.ENTREVISTA_AGENDADA: (Entrevista.Status.AGENDADA, Entrevista.Resultado.PENDENTE),
+    Candidato.Estado.ENTREVISTA_APROVADA: (Entrevista.Status.REALIZADA, Entrevista.Resultado.APROVADO),
+    Candidato.Estado.ENTREVISTA_REPROVADA: (Entrevista.Status.REALIZADA, Entrevista.Resultado.REPROVADO),
+    Candidato.Estado.ENVIADO_DEFC: (Entrevista.Status.REALIZADA, Entrevista.Resultado.APROVADO),
+}
+
+
+class Command(ComandoGerarDadosCarga):
+    help = 'Gera candidatos, vagas e entrevistas sintéticos (determinístico, offline, em bulk)'
+    modelo_distrito = Distrito
+
+    def existentes(self):
+        return Candidato.objects.filter(numero_bi__startswith=self.PREFIXO).count()
+
+    def preparar(self, inicio):
+        self.vagas = self.obter_vagas()
+
+    def gerar_lote(self, rng, numeros):
+        estados, pesos = zip(*ESTADOS)
+        candidatos = [self.candidato(rng, n, rng.choices(estados, pesos)[0]) for n in numeros]
+        Candidato.reservar_codigos(candidatos)
+        # QuerySet simples: as estatísticas por lote custariam um get_or_create por chave
+        models.QuerySet(Candidato).bulk_create(candidatos, batch_size=1000)
+        self.espalhar_datas(rng, candidatos, 'data_criacao')
+        for candidato in candidatos:
+            candidato._history_date = candidato.data_criacao
+        Candidato.history.bulk_history_create(candidatos, batch_size=1000)
+        TermoPesquisaCandidato.indexar(candidatos)
+
+        entrevistas = self.entrevistas(rng, candidatos)
+        Entrevista.objects.bulk_create(entrevistas, batch_size=1000)
+        Entrevista.history.bulk_history_create(entrevistas, batch_size=1000)
+
+    def concluir(self):
+        EstatisticaCandidatos.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'✅ Concluído. Total de candidatos: {Candidato.objects.count()}'))
+
+    def obter_vagas(self):
+        vagas = []
+        for titulo, nivel in VAGAS:
+            vaga, _ = Vaga.objects.get_or_create(
+                titulo=titulo,
+                defaults={
+                    'descricao': 'Vaga gerada por gerar_dados_carga', 'nivel_aprovacao': nivel,
+                    'data_inicio': self.DATA_BASE, 'data_fim': self.DATA_BASE + timedelta(days=365),
+                    'numero_vagas': 1000,
+                }
+            )
+            vagas.append(vaga)
+        return vagas
+
+    def candidato(self, rng, n, estado):
+        return Candidato(
+            vaga=rng.choice(self.vagas), estado=estado, enviado_defc=estado == Candidato.Estado.ENVIADO_DEFC,
+            **self.dados_pessoais(rng, n),
+        )
+
+    def entrevistas(self, rng, candidatos):
+        entrevistas = []
+        for candidato in candidatos:
+            if candidato.estado not in RESULTADO_ENTREVISTA:
+                continue
+            status, resultado = RESULTADO_ENTREVISTA[candidato.estado]
+            realizada = status == Entrevista.Status.REALIZADA
+            entrevistas.append(Entrevista(
+                candidato=candidato,
+                data_hora=candidato.data_criacao + timedelta(days=rng.randint(7, 30)),
+                local=f'STAE {candidato.distrito.nome}',
+                nota_tecnica=rng.randint(8, 20) if realizada else 0,
+                nota_comunicacao=rng.randint(8, 20) if realizada else 0,
+                nota_experiencia=rng.randint(8, 20) if realizada else 0,
+                status=status, resultado=resultado,
+            ))
+        return entrevistas
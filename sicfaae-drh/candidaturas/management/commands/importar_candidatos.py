@@ -0,0 +1,57 @@
+"""
+Management command to import candidates from XLSX, CSV or NDJSON
+Usage: python manage.py importar_candidatos ficheiro.ndjson [--formato ndjson] [--simular] [--relatorio erros.csv]
+
+Usa o mesmo motor da página de importação (candidaturas/importacao.py):
+leitura em streaming, criações e actualizações em bulk, por blocos.
+As linhas com erro são listadas no fim ou gravadas em --relatorio (CSV).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sicfaae_comum import formatos
+from candidaturas.importacao import (
+    CABECALHO_RELATORIO, FORMATOS, ErroImportacao, ImportadorCandidatos, formato_do_nome,
+)
+
+MAXIMO_ERROS_LISTADOS = 20
+
+
+class Command(BaseCommand):
+    help = 'Importa candidatos de um ficheiro XLSX, CSV ou NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ficheiro', help='Ficheiro a importar (.xlsx, .csv, .ndjson/.jsonl)')
+        parser.add_argument('--formato', choices=FORMATOS, help='Formato (padrão: pela extensão)')
+        parser.add_argument('--simular', action='store_true', help='Validar sem gravar alterações')
+        parser.add_argument('--relatorio', help='Gravar as linhas com erro neste ficheiro CSV')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or formato_do_nome(options['ficheiro'])
+        if formato is None:
+            raise CommandError('Indique --formato (a extensão do ficheiro não o identifica).')
+
+        importador = ImportadorCandidatos(simular=options['simular'])
+        try:
+            with open(options['ficheiro'], 'rb') as ficheiro:
+                resumo = importador.importar(
+                    ficheiro, formato, progresso=lambda fraccao: self.stdout.write(f'  ⏳ {fraccao:.0%}')
+                )
+        except (ErroImportacao, OSError) as e:
+            raise CommandError(str(e))
+
+        prefixo = '🔎 Simulação: ' if options['simular'] else '✅ '
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixo}{resumo['criados']} criados, {resumo['actualizados']} actualizados, "
+            f"{resumo['sem_alteracoes']} sem alterações, {resumo['erros']} erros."
+        ))
+
+        if options['relatorio']:
+            colunas = [(titulo, titulo) for titulo in CABECALHO_RELATORIO]
+            with open(options['relatorio'], 'wb') as destino:
+                formatos.escrever(destino, 'csv', colunas, importador.erros)
+        else:
+            for numero, bi, erro in importador.erros[:MAXIMO_ERROS_LISTADOS]:
+                self.stdout.write(self.style.ERROR(f'  Linha {numero} ({bi or "sem BI"}): {erro}'))
+            if len(importador.erros) > MAXIMO_ERROS_LISTADOS:
+                self.stdout.write(f'  ... e mais {len(importador.erros) - MAXIMO_ERROS_LISTADOS} (use --relatorio).')
@@ -0,0 +1,20 @@
+"""
+Management command that deletes abandoned chunked uploads (CarregamentoDocumento)
+Usage: python manage.py limpar_carregamentos [--horas 24]
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from candidaturas.models import CarregamentoDocumento
+
+class Command(BaseCommand):
+    help = 'Apaga os carregamentos de documentos por terminar ou não usados (e os ficheiros parciais)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, default=24, help='Horas sem actividade após as quais o carregamento expira')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(hours=options['horas'])
+        apagados = CarregamentoDocumento.limpar_expirados(limite)
+        self.stdout.write(self.style.SUCCESS(f'🧹 {apagados} carregamentos expirados apagados.'))
@@ -5,6 +5,7 @@ from datetime import timedelta
 from django.core.management.base import BaseCommand
 from django.core.files.base import ContentFile
 from django.utils import timezone
+from sicfaae_comum.armazenamento import armazenamento_conteudo
 from candidaturas.models import Vaga, Candidato, Provincia, Distrito
 
 class Command(BaseCommand):
@@ -21,15 +22,21 @@ class Command(BaseCommand):
         return f"{prefixo}{sufixo}"
 
     def get_dummy_file_path(self, folder, filename, content):
-        import os
-        from django.conf import settings
-        from django.core.files.storage import default_storage
-        
-        rel_path = f'candidatos/{folder}/{filename}'
-        if not default_storage.exists(rel_path):
-            default_storage.save(rel_path, ContentFile(content))
+        # Guardado por conteúdo: ficheiros de modelo iguais ficam com o mesmo nome
+        rel_path = armazenamento_conteudo.save(f'candidatos/{folder}/{filename}', ContentFile(content))
+        self.ficheiros_modelo.append(rel_path)
         return rel_path
 
+    def referenciar_ficheiros_modelo(self):
+        """bulk_create não passa pelos signals: conta os candidatos que usam cada ficheiro de modelo."""
+        for nome in set(self.ficheiros_modelo):
+            usos = sum(Candidato.objects.filter(**{campo: nome}).count() for campo in Candidato.CAMPOS_FICHEIROS)
+            if usos:
+                armazenamento_conteudo.referenciar(nome, quantidade=usos)
+        # Referências do próprio comando (uma por save)
+        for nome in self.ficheiros_modelo:
+            armazenamento_conteudo.delete(nome)
+
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.WARNING('Iniciando população de vagas e candidatos...'))
         
@@ -37,6 +44,8 @@ class Command(BaseCommand):
         Candidato.objects.all().delete()
         Vaga.objects.filter(titulo__in=['Formador Nacional', 'Formador Provincial - Maputo', 'Brigadistas Nacionais', 'Agentes de Educação Cívica']).delete()
 
+        self.ficheiros_modelo = []
+
         # Download Dummy PDF Content
         self.stdout.write('Preparando ficheiros de modelo (Isto ocorre apenas uma vez)...')
         try:
@@ -71,6 +80,7 @@ class Command(BaseCommand):
         
         if not provincias or not distritos:
             self.stdout.write(self.style.ERROR('Erro: Não existem Províncias ou Distritos na Base de Dados. Popula o DEFC/core primeiro.'))
+            self.referenciar_ficheiros_modelo()
             return
 
         maputo_prov = Provincia.objects.filter(nome__icontains='Maputo').first() or provincias[0]
@@ -213,4 +223,6 @@ class Command(BaseCommand):
                 Candidato.objects.bulk_create(candidatos_batch, ignore_conflicts=True)
                 num_candidatos_gerados += len(candidatos_batch)
 
+        self.referenciar_ficheiros_modelo()
+
         self.stdout.write(self.style.SUCCESS(f'Base de Dados do DRH populada com {len(vagas_criadas)} vagas e {num_candidatos_gerados} candidatos com sucesso!'))
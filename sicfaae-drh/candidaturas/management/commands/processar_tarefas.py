@@ -0,0 +1,29 @@
+"""
+Management command that runs queued report/export jobs (TarefaRelatorio)
+Usage: python manage.py processar_tarefas [--uma-vez] [--intervalo 5] [--batimento 30] [--validade 7] [--limpeza 60] [--miniaturas 30]
+
+O ciclo do worker é o de sicfaae_comum.comandos.ComandoProcessarTarefas.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from sicfaae_comum.comandos import ComandoProcessarTarefas
+from candidaturas.models import TarefaRelatorio
+from candidaturas.tarefas import executar_tarefa
+
+
+class Command(ComandoProcessarTarefas):
+    modelo = TarefaRelatorio
+
+    def executar(self, tarefa):
+        executar_tarefa(tarefa)
+
+    def limpar(self):
+        from candidaturas import pdf
+
+        super().limpar()
+        apagados = pdf.limpar_versoes_antigas(timezone.now() - timedelta(minutes=pdf.VALIDADE_VERSAO_ANTIGA))
+        if apagados:
+            self.stdout.write(f'🧹 {apagados} PDFs de candidatos substituídos apagados.')
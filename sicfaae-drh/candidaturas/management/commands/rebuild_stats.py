@@ -0,0 +1,17 @@
+"""
+Management command to rebuild the pre-aggregated candidate statistics
+Usage: python manage.py rebuild_stats
+"""
+
+from django.core.management.base import BaseCommand
+from candidaturas.models import EstatisticaCandidatos
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela de estatísticas pré-agregadas de candidatos'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n🚀 Recalculando estatísticas de candidatos...'))
+
+        linhas = EstatisticaCandidatos.reconstruir()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {linhas} linhas de estatística geradas.'))
@@ -49,35 +49,38 @@ class Command(BaseCommand):
             self.stdout.write(f'\n{provincia_nome} - {distrito_nome} (ID {distrito_id}):')
             self.stdout.write('-' * 80)
             
-            # Regenerar códigos sequencialmente para este distrito
-            for idx, candidato in enumerate(candidatos_distrito, start=1):
-                try:
-                    codigo_antigo = candidato.codigo_candidato
-                    
-                    # Gerar novo código
-                    candidato.codigo_candidato = ''  # Limpar para forçar regeneração
-                    codigo_novo = candidato.gerar_codigo_candidato()
+            # Reservar de uma só vez os códigos de todo o distrito
+            codigos_antigos = {c.id: c.codigo_candidato for c in candidatos_distrito}
+            for candidato in candidatos_distrito:
+                candidato.codigo_candidato = ''  # Limpar para forçar regeneração
+            
+            try:
+                with transaction.atomic():
+                    Candidato.reservar_codigos(candidatos_distrito, simular=dry_run)
                     
-                    if codigo_antigo != codigo_novo:
-                        self.stdout.write(
-                            f'  [{idx:3d}] {codigo_antigo:20s} -> {codigo_novo:20s}'
-                        )
+                    for idx, candidato in enumerate(candidatos_distrito, start=1):
+                        codigo_antigo = codigos_antigos[candidato.id]
+                        codigo_novo = candidato.codigo_candidato
                         
-                        if not dry_run:
-                            # Usar update para evitar signals
-                            Candidato.objects.filter(id=candidato.id).update(
-                                codigo_candidato=codigo_novo
+                        if codigo_antigo != codigo_novo:
+                            self.stdout.write(
+                                f'  [{idx:3d}] {codigo_antigo:20s} -> {codigo_novo:20s}'
                             )
-                        
-                        alterados += 1
-                    else:
-                        mantidos += 1
-                        
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'  Erro no candidato {candidato.id}: {str(e)}')
-                    )
-                    erros += 1
+                            alterados += 1
+                        else:
+                            mantidos += 1
+                    
+                    if not dry_run:
+                        # Usar bulk_update para evitar signals e um UPDATE por linha
+                        Candidato.objects.bulk_update(
+                            candidatos_distrito, ['codigo_candidato'], batch_size=500
+                        )
+                    
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'  Erro no distrito {distrito_id}: {str(e)}')
+                )
+                erros += len(candidatos_distrito)
         
         # Resumo
         self.stdout.write('\n' + '=' * 80)
@@ -0,0 +1,17 @@
+"""
+Management command to rebuild the candidate search index
+Usage: python manage.py reindexar_pesquisa
+"""
+
+from django.core.management.base import BaseCommand
+from candidaturas.models import TermoPesquisaCandidato
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de pesquisa de candidatos (nome, BI, código e telefone)'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n🔎 Reindexando candidatos para pesquisa...'))
+
+        termos = TermoPesquisaCandidato.reconstruir()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {termos} termos de pesquisa gerados.'))
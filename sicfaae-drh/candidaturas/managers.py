@@ -1,39 +1,89 @@
-from django.db.models import Count, Q, Prefetch
-from .models import Candidato, Provincia, Distrito, PerfilUtilizador
+from collections import defaultdict
+from .models import Candidato, EstatisticaCandidatos, Provincia, Distrito, PerfilUtilizador
+
+STATUS_ADMITIDOS = (Candidato.Estado.ENTREVISTA_APROVADA, Candidato.Estado.ENVIADO_DEFC)
+
+
+def _contadores():
+    return {'total': 0, 'admitted_total': 0, 'gen_male': 0, 'gen_female': 0, 'adm_male': 0, 'adm_female': 0}
+
+
+def _somar(contador, linha):
+    """Acumula uma linha de EstatisticaCandidatos nos contadores de uma região."""
+    admitido = linha['estado'] in STATUS_ADMITIDOS
+    contador['total'] += linha['total']
+    if admitido:
+        contador['admitted_total'] += linha['total']
+    if linha['genero'] == Candidato.Genero.MASCULINO:
+        contador['gen_male'] += linha['total']
+        if admitido:
+            contador['adm_male'] += linha['total']
+    elif linha['genero'] == Candidato.Genero.FEMININO:
+        contador['gen_female'] += linha['total']
+        if admitido:
+            contador['adm_female'] += linha['total']
+
 
 class GestorEstatisticas:
     """
     Gestor responsável por agregar e calcular estatísticas do sistema.
     Remove a complexidade das Views.
+
+    As contagens vêm da tabela pré-agregada EstatisticaCandidatos, pelo que
+    cada painel lê no máximo algumas centenas de linhas.
     """
 
+    CAMPOS = ('provincia_id', 'distrito_id', 'vaga_id', 'vaga__titulo', 'estado', 'genero', 'total')
+
     def __init__(self, user):
         self.user = user
+        self._linhas = None
 
     def obter_queryset_base(self):
         """Retorna o queryset filtrado com base nas permissões do utilizador."""
         from .permissions import obter_candidatos_acessiveis
         return obter_candidatos_acessiveis(self.user)
 
+    def obter_linhas_estatisticas(self):
+        """Linhas de EstatisticaCandidatos no âmbito do utilizador (lidas uma vez)."""
+        if self._linhas is None:
+            from .permissions import obter_estatisticas_acessiveis
+            self._linhas = list(
+                obter_estatisticas_acessiveis(self.user).filter(total__gt=0).values(*self.CAMPOS)
+            )
+        return self._linhas
+
     def obter_estatisticas_gerais(self):
         """Retorna estatísticas básicas (Totais, Pendentes, Gráficos)."""
-        base_qs = self.obter_queryset_base()
-        
-        # Totais
-        total = base_qs.count()
-        pendentes = base_qs.filter(estado=Candidato.Estado.PENDENTE).count()
+        linhas = self.obter_linhas_estatisticas()
+
+        total = 0
+        pendentes = 0
+        por_vaga = {}
+        por_estado = {}
+        for linha in linhas:
+            total += linha['total']
+            if linha['estado'] == Candidato.Estado.PENDENTE:
+                pendentes += linha['total']
+            # Candidatos sem vaga aparecem no gráfico com contagem 0, como no Count('vaga')
+            por_vaga[linha['vaga__titulo']] = por_vaga.get(linha['vaga__titulo'], 0) + (
+                linha['total'] if linha['vaga_id'] else 0
+            )
+            por_estado[linha['estado']] = por_estado.get(linha['estado'], 0) + linha['total']
 
         # Gráficos de Distribuição
-        stats_funcao = list(base_qs.values('vaga__titulo').annotate(count=Count('vaga')))
-        for item in stats_funcao:
-            item['label'] = item['vaga__titulo']
+        stats_funcao = [
+            {'vaga__titulo': titulo, 'count': count, 'label': titulo}
+            for titulo, count in por_vaga.items()
+        ]
 
-        stats_estado = list(base_qs.values('estado').annotate(count=Count('estado')))
-        for item in stats_estado:
+        stats_estado = []
+        for estado, count in por_estado.items():
             try:
-                item['label'] = Candidato.Estado(item['estado']).label
+                label = Candidato.Estado(estado).label
             except ValueError:
-                item['label'] = item['estado']
+                label = estado
+            stats_estado.append({'estado': estado, 'count': count, 'label': label})
 
         return {
             'total_candidatos': total,
@@ -44,96 +94,89 @@ class GestorEstatisticas:
 
     def obter_detalhes_admissao(self):
         """Retorna estatísticas detalhadas de admissão e género."""
-        base_qs = self.obter_queryset_base()
-        STATUS_ADMITIDOS = [Candidato.Estado.ENTREVISTA_APROVADA, Candidato.Estado.ENVIADO_DEFC]
-        
-        admitidos_qs = base_qs.filter(estado__in=STATUS_ADMITIDOS)
-        
+        contador = _contadores()
+        for linha in self.obter_linhas_estatisticas():
+            _somar(contador, linha)
+
         return {
-            'total_admitidos': admitidos_qs.count(),
-            'admitidos_homens': admitidos_qs.filter(genero=Candidato.Genero.MASCULINO).count(),
-            'admitidos_mulheres': admitidos_qs.filter(genero=Candidato.Genero.FEMININO).count()
+            'total_admitidos': contador['admitted_total'],
+            'admitidos_homens': contador['adm_male'],
+            'admitidos_mulheres': contador['adm_female']
         }
 
     def obter_distribuicao_geografica(self, is_central=False, is_provincial=False, perfil=None):
         """
         Retorna estatísticas complexas por Província ou Distrito.
         """
-        STATUS_ADMITIDOS = [Candidato.Estado.ENTREVISTA_APROVADA, Candidato.Estado.ENVIADO_DEFC]
-        
-        # Filtros Comuns
-        filtro_admitidos = Q(candidatos__estado__in=STATUS_ADMITIDOS)
-        filtro_homem = Q(candidatos__genero=Candidato.Genero.MASCULINO)
-        filtro_mulher = Q(candidatos__genero=Candidato.Genero.FEMININO)
-        filtro_admitido_homem = filtro_admitidos & filtro_homem
-        filtro_admitido_mulher = filtro_admitidos & filtro_mulher
-
         dados = {}
 
         # Lógica Central (Por Província)
         if is_central:
-            distritos_prefetch = Prefetch(
-                'distritos',
-                queryset=Distrito.objects.annotate(
-                    total=Count('candidatos'),
-                    admitted=Count('candidatos', filter=filtro_admitidos)
-                ).filter(total__gt=0).order_by('-admitted')
+            # O âmbito central abrange todas as linhas: reaproveita as já lidas pelas estatísticas gerais
+            linhas = self.obter_linhas_estatisticas()
+            por_provincia = defaultdict(_contadores)
+            por_distrito = defaultdict(_contadores)
+            for linha in linhas:
+                if linha['provincia_id']:
+                    _somar(por_provincia[linha['provincia_id']], linha)
+                if linha['distrito_id']:
+                    _somar(por_distrito[linha['distrito_id']], linha)
+
+            distritos_por_provincia = defaultdict(list)
+            for dist in Distrito.objects.filter(id__in=por_distrito).values('id', 'nome', 'provincia_id'):
+                contador = por_distrito[dist['id']]
+                distritos_por_provincia[dist['provincia_id']].append(
+                    {'name': dist['nome'], 'admitted': contador['admitted_total'], 'total': contador['total']}
+                )
+
+            provincias = sorted(
+                Provincia.objects.filter(id__in=por_provincia),
+                key=lambda prov: -por_provincia[prov.id]['total']
             )
-            
-            provincias = Provincia.objects.annotate(
-                total=Count('candidatos'),
-                admitted_total=Count('candidatos', filter=filtro_admitidos),
-                gen_male=Count('candidatos', filter=filtro_homem),
-                gen_female=Count('candidatos', filter=filtro_mulher),
-                adm_male=Count('candidatos', filter=filtro_admitido_homem),
-                adm_female=Count('candidatos', filter=filtro_admitido_mulher)
-            ).filter(total__gt=0).prefetch_related(distritos_prefetch).order_by('-total')
 
             lista_provincias = []
             for prov in provincias:
-                stats_distritos = [
-                    {'name': d.nome, 'admitted': d.admitted, 'total': d.total} 
-                    for d in prov.distritos.all()
-                ]
-                
+                contador = por_provincia[prov.id]
+                stats_distritos = sorted(distritos_por_provincia[prov.id], key=lambda d: -d['admitted'])
+
                 lista_provincias.append({
                     'id': prov.id,
                     'nome': prov.nome,
                     'lat': prov.latitude,
                     'lon': prov.longitude,
-                    'total': prov.total,
-                    'admitted_total': prov.admitted_total,
-                    'not_admitted_total': prov.total - prov.admitted_total,
-                    'gender_general': {'m': prov.gen_male, 'f': prov.gen_female},
-                    'gender_admitted': {'m': prov.adm_male, 'f': prov.adm_female},
+                    'total': contador['total'],
+                    'admitted_total': contador['admitted_total'],
+                    'not_admitted_total': contador['total'] - contador['admitted_total'],
+                    'gender_general': {'m': contador['gen_male'], 'f': contador['gen_female']},
+                    'gender_admitted': {'m': contador['adm_male'], 'f': contador['adm_female']},
                     'districts_stats': stats_distritos
                 })
             dados['detalhes_provincia'] = lista_provincias
 
         # Lógica Provincial (Por Distrito)
         if is_provincial and perfil and perfil.provincia:
-            distritos = Distrito.objects.filter(provincia=perfil.provincia).annotate(
-                total=Count('candidatos'),
-                admitted_total=Count('candidatos', filter=filtro_admitidos),
-                gen_male=Count('candidatos', filter=filtro_homem),
-                gen_female=Count('candidatos', filter=filtro_mulher),
-                adm_male=Count('candidatos', filter=filtro_admitido_homem),
-                adm_female=Count('candidatos', filter=filtro_admitido_mulher)
-            ).filter(total__gt=0).order_by('-total')
+            distritos = Distrito.objects.filter(provincia=perfil.provincia)
+            linhas = EstatisticaCandidatos.objects.filter(
+                total__gt=0, distrito__in=distritos
+            ).values(*self.CAMPOS)
+            por_distrito = defaultdict(_contadores)
+            for linha in linhas:
+                _somar(por_distrito[linha['distrito_id']], linha)
 
             lista_distritos = []
-            for dist in distritos:
+            for dist in sorted(distritos.filter(id__in=por_distrito), key=lambda d: -por_distrito[d.id]['total']):
+                contador = por_distrito[dist.id]
                 lista_distritos.append({
                     'id': dist.id,
                     'nome': dist.nome,
-                    'total': dist.total,
-                    'admitted_total': dist.admitted_total,
-                    'not_admitted_total': dist.total - dist.admitted_total,
-                    'gender_general': {'m': dist.gen_male, 'f': dist.gen_female},
-                    'gender_admitted': {'m': dist.adm_male, 'f': dist.adm_female},
+                    'total': contador['total'],
+                    'admitted_total': contador['admitted_total'],
+                    'not_admitted_total': contador['total'] - contador['admitted_total'],
+                    'gender_general': {'m': contador['gen_male'], 'f': contador['gen_female']},
+                    'gender_admitted': {'m': contador['adm_male'], 'f': contador['adm_female']},
                 })
             dados['detalhes_distrito'] = lista_distritos
-            
+
         return dados
 
     def obter_candidatos_recentes(self, limite=5):
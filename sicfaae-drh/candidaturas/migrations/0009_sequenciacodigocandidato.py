@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-17 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0008_historicalvaga_distrito_historicalvaga_provincia_and_more'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaCodigoCandidato',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bloco', models.CharField(max_length=10, verbose_name='Bloco')),
+                ('ultimo_numero', models.PositiveBigIntegerField(default=0, verbose_name='Último Número Atribuído')),
+                ('distrito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sequencias_codigo', to='core.distrito', verbose_name='Distrito')),
+            ],
+            options={
+                'verbose_name': 'Sequência de Código de Candidato',
+                'verbose_name_plural': 'Sequências de Códigos de Candidatos',
+                'unique_together': {('distrito', 'bloco')},
+            },
+        ),
+    ]
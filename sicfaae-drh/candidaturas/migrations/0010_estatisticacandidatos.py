@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-17 23:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def preencher_estatisticas(apps, schema_editor):
+    Candidato = apps.get_model('candidaturas', 'Candidato')
+    EstatisticaCandidatos = apps.get_model('candidaturas', 'EstatisticaCandidatos')
+
+    grupos = Candidato.objects.order_by().values_list(
+        'provincia_id', 'distrito_id', 'vaga_id', 'estado', 'genero'
+    ).annotate(n=Count('id'))
+    EstatisticaCandidatos.objects.bulk_create([
+        EstatisticaCandidatos(
+            chave=':'.join('-' if valor is None else str(valor) for valor in grupo[:5]),
+            provincia_id=grupo[0], distrito_id=grupo[1], vaga_id=grupo[2],
+            estado=grupo[3], genero=grupo[4], total=grupo[5],
+        )
+        for grupo in grupos
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0009_sequenciacodigocandidato'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaCandidatos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=100, unique=True, verbose_name='Chave')),
+                ('estado', models.CharField(max_length=30, verbose_name='Estado da Candidatura')),
+                ('genero', models.CharField(max_length=1, verbose_name='Género')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('distrito', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.distrito', verbose_name='Distrito')),
+                ('provincia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.provincia', verbose_name='Província')),
+                ('vaga', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='candidaturas.vaga', verbose_name='Vaga')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Candidatos',
+                'verbose_name_plural': 'Estatísticas de Candidatos',
+            },
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
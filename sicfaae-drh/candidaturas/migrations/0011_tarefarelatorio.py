@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-17 23:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0010_estatisticacandidatos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('RELATORIO_PDF', 'Relatório PDF'), ('EXPORTAR_EXCEL', 'Exportação Excel')], max_length=20, verbose_name='Tipo')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parâmetros')),
+                ('escopo', models.CharField(help_text='Âmbito de dados do utilizador (nível, província, distrito)', max_length=50, verbose_name='Âmbito')),
+                ('chave', models.CharField(db_index=True, help_text='Hash de tipo + parâmetros + âmbito, usado para reaproveitar pedidos iguais', max_length=64, verbose_name='Chave')),
+                ('estado', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EM_CURSO', 'Em Curso'), ('CONCLUIDA', 'Concluída'), ('FALHADA', 'Falhada')], default='PENDENTE', max_length=20, verbose_name='Estado')),
+                ('progresso', models.PositiveSmallIntegerField(default=0, verbose_name='Progresso (%)')),
+                ('ficheiro', models.FileField(blank=True, upload_to='relatorios/%Y/%m/', verbose_name='Ficheiro')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_inicio', models.DateTimeField(blank=True, null=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('utilizador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tarefas_relatorio', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Relatório',
+                'verbose_name_plural': 'Tarefas de Relatório',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(fields=['estado', 'data_criacao'], name='candidatura_estado_6c76a9_idx')],
+            },
+        ),
+    ]
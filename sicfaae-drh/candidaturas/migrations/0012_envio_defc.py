@@ -0,0 +1,64 @@
+# Generated by Django 6.0 on 2026-10-17 11:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0011_tarefarelatorio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioDEFC',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EM_CURSO', 'Em Curso'), ('CONCLUIDO', 'Concluído'), ('CONCLUIDO_COM_ERROS', 'Concluído com Erros')], default='PENDENTE', max_length=20, verbose_name='Estado')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de Candidatos')),
+                ('enviados', models.PositiveIntegerField(default=0, verbose_name='Enviados')),
+                ('falhados', models.PositiveIntegerField(default=0, verbose_name='Falhados')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_inicio', models.DateTimeField(blank=True, null=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('utilizador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='envios_defc', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Envio para DEFC',
+                'verbose_name_plural': 'Envios para DEFC',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemEnvioDEFC',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('PENDENTE', 'Pendente'), ('ENVIADO', 'Enviado'), ('FALHADO', 'Falhado')], default='PENDENTE', max_length=10, verbose_name='Estado')),
+                ('id_defc', models.CharField(blank=True, max_length=50, verbose_name='ID no Sistema DEFC')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('data_envio', models.DateTimeField(blank=True, null=True)),
+                ('candidato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens_envio_defc', to='candidaturas.candidato')),
+                ('envio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='candidaturas.enviodefc')),
+            ],
+            options={
+                'verbose_name': 'Candidato do Envio DEFC',
+                'verbose_name_plural': 'Candidatos do Envio DEFC',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='enviodefc',
+            index=models.Index(fields=['estado', 'data_criacao'], name='candidatura_estado_c02335_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemenviodefc',
+            index=models.Index(fields=['envio', 'estado'], name='candidatura_envio_i_762cbb_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemenviodefc',
+            constraint=models.UniqueConstraint(fields=('envio', 'candidato'), name='item_envio_defc_unico'),
+        ),
+    ]
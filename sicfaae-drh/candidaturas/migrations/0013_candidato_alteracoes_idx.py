@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0012_envio_defc'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='candidato_alteracoes_idx'),
+        ),
+    ]
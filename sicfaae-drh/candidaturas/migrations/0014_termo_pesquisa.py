@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-17 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from candidaturas.pesquisa import termos_candidato
+
+
+def indexar_candidatos(apps, schema_editor):
+    Candidato = apps.get_model('candidaturas', 'Candidato')
+    TermoPesquisaCandidato = apps.get_model('candidaturas', 'TermoPesquisaCandidato')
+
+    linhas = Candidato.objects.order_by('pk').values_list(
+        'pk', 'nome_completo', 'numero_bi', 'codigo_candidato', 'numero_telefone'
+    )
+    termos = []
+    for linha in linhas.iterator(chunk_size=2000):
+        termos.extend(
+            TermoPesquisaCandidato(candidato_id=linha[0], tipo=tipo, termo=termo, peso=peso)
+            for tipo, termo, peso in termos_candidato(*linha[1:])
+        )
+        if len(termos) >= 5000:
+            TermoPesquisaCandidato.objects.bulk_create(termos, batch_size=1000)
+            termos = []
+    TermoPesquisaCandidato.objects.bulk_create(termos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0013_candidato_alteracoes_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermoPesquisaCandidato',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('N', 'Nome'), ('B', 'BI'), ('C', 'Código'), ('T', 'Telefone')], max_length=1, verbose_name='Tipo')),
+                ('termo', models.CharField(max_length=40, verbose_name='Termo')),
+                ('peso', models.PositiveSmallIntegerField(default=0, verbose_name='Peso')),
+                ('candidato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termos_pesquisa', to='candidaturas.candidato')),
+            ],
+            options={
+                'verbose_name': 'Termo de Pesquisa',
+                'verbose_name_plural': 'Termos de Pesquisa',
+                'indexes': [models.Index(fields=['tipo', 'termo'], name='termo_pesquisa_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_candidatos, migrations.RunPython.noop),
+    ]
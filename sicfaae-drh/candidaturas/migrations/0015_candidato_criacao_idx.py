@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0014_termo_pesquisa'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(fields=['data_criacao', 'id'], name='candidato_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(fields=['estado', 'data_criacao', 'id'], name='candidato_estado_criacao_idx'),
+        ),
+    ]
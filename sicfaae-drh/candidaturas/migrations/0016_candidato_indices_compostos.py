@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0015_candidato_criacao_idx'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(fields=['distrito', 'estado', 'data_criacao', 'id'], name='candidato_distrito_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(fields=['provincia', 'estado', 'data_criacao', 'id'], name='candidato_provincia_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(fields=['vaga', 'estado'], name='candidato_vaga_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(condition=models.Q(('enviado_defc', False)), fields=['estado', 'provincia', 'distrito'], name='candidato_por_enviar_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidato',
+            index=models.Index(fields=['provincia', 'distrito', 'vaga', 'estado', 'genero'], name='candidato_estatistica_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0017_medicao_vista'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefarelatorio',
+            name='entrada',
+            field=models.FileField(blank=True, help_text='Ficheiro enviado pelo utilizador (importações)', upload_to='importacoes/%Y/%m/', verbose_name='Ficheiro de entrada'),
+        ),
+        migrations.AddField(
+            model_name='tarefarelatorio',
+            name='resumo',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Resumo'),
+        ),
+        migrations.AlterField(
+            model_name='tarefarelatorio',
+            name='tipo',
+            field=models.CharField(choices=[('RELATORIO_PDF', 'Relatório PDF'), ('EXPORTAR_EXCEL', 'Exportação Excel'), ('IMPORTAR_EXCEL', 'Importação Excel')], max_length=20, verbose_name='Tipo'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0018_importacao_excel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalvaga',
+            name='hash_concurso',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 do template e dos dados da vaga usados no documento do concurso.', max_length=64, verbose_name='Hash do Documento do Concurso'),
+        ),
+        migrations.AddField(
+            model_name='vaga',
+            name='hash_concurso',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 do template e dos dados da vaga usados no documento do concurso.', max_length=64, verbose_name='Hash do Documento do Concurso'),
+        ),
+        migrations.AlterField(
+            model_name='tarefarelatorio',
+            name='tipo',
+            field=models.CharField(choices=[('RELATORIO_PDF', 'Relatório PDF'), ('EXPORTAR_EXCEL', 'Exportação Excel'), ('IMPORTAR_EXCEL', 'Importação Excel'), ('DOCUMENTO_CONCURSO', 'Documento de Concurso')], max_length=20, verbose_name='Tipo'),
+        ),
+    ]
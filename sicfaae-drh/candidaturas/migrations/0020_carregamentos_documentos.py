@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0019_hash_documento_concurso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidato',
+            name='tamanhos_documentos',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Bytes enviados e guardados (após compactação) por documento', verbose_name='Tamanhos dos Documentos'),
+        ),
+        migrations.AddField(
+            model_name='historicalcandidato',
+            name='tamanhos_documentos',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Bytes enviados e guardados (após compactação) por documento', verbose_name='Tamanhos dos Documentos'),
+        ),
+        migrations.CreateModel(
+            name='CarregamentoDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identificador', models.UUIDField(editable=False, unique=True, verbose_name='Identificador')),
+                ('campo', models.CharField(choices=[('arquivo_cv', 'Curriculum Vitae'), ('arquivo_bi', 'Cópia do BI'), ('arquivo_certificado', 'Certificado'), ('foto', 'Foto')], max_length=30, verbose_name='Documento')),
+                ('nome_original', models.CharField(max_length=255, verbose_name='Nome do Ficheiro')),
+                ('tamanho', models.PositiveBigIntegerField(verbose_name='Tamanho (bytes)')),
+                ('recebido', models.PositiveBigIntegerField(default=0, verbose_name='Recebido (bytes)')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Carregamento de Documento',
+                'verbose_name_plural': 'Carregamentos de Documentos',
+                'indexes': [models.Index(fields=['data_atualizacao'], name='candidatura_data_at_2cf2ce_idx')],
+            },
+        ),
+    ]
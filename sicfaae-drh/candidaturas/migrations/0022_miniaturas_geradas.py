@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0021_conteudo_ficheiros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidato',
+            name='foto_miniaturas',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='historicalcandidato',
+            name='foto_miniaturas',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
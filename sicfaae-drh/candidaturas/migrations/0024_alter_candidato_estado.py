@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0023_tarefa_relatorio_actividade'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidato',
+            name='estado',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('ENTREVISTA_AGENDADA', 'Entrevista Agendada'), ('ENTREVISTA_APROVADA', 'Aprovado na Entrevista'), ('ENTREVISTA_REPROVADA', 'Reprovado na Entrevista'), ('ENVIADO_DEFC', 'Enviado para Formação (DEFC)')], default='PENDENTE', max_length=30, verbose_name='Estado da Candidatura'),
+        ),
+        migrations.AlterField(
+            model_name='historicalcandidato',
+            name='estado',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('ENTREVISTA_AGENDADA', 'Entrevista Agendada'), ('ENTREVISTA_APROVADA', 'Aprovado na Entrevista'), ('ENTREVISTA_REPROVADA', 'Reprovado na Entrevista'), ('ENVIADO_DEFC', 'Enviado para Formação (DEFC)')], default='PENDENTE', max_length=30, verbose_name='Estado da Candidatura'),
+        ),
+    ]
@@ -1,10 +1,15 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from simple_history.models import HistoricalRecords
 from core.models import Provincia, Distrito
+from sicfaae_comum import armazenamento, miniaturas
+from sicfaae_comum.armazenamento import armazenamento_conteudo
+from . import pesquisa
+from .referencias import referencias
 
 
 class Vaga(models.Model):
@@ -40,6 +45,10 @@ class Vaga(models.Model):
         blank=True,
         help_text=_("PDF oficial gerado aquando da abertura do concurso.")
     )
+    hash_concurso = models.CharField(
+        _("Hash do Documento do Concurso"), max_length=64, blank=True, editable=False,
+        help_text=_("SHA-256 do template e dos dados da vaga usados no documento do concurso.")
+    )
 
     
     class NivelAprovacao(models.TextChoices):
@@ -78,9 +87,34 @@ class Vaga(models.Model):
     
     history = HistoricalRecords()
 
+    TEMPLATE_CONCURSO = 'candidaturas/pdf/concurso_oficial.html'
+
     def __str__(self):
         return self.titulo
 
+    def calcular_hash_concurso(self):
+        """SHA-256 do template do aviso de concurso e dos campos da vaga que ele mostra."""
+        import hashlib
+        import json
+        from django.template.loader import get_template
+
+        campos = [
+            self.pk, self.titulo, self.descricao, self.numero_vagas, self.data_inicio, self.data_fim,
+            sorted(self.documentos_necessarios or []), self.requer_formacao,
+        ]
+        origem = get_template(self.TEMPLATE_CONCURSO).template.source
+        return hashlib.sha256(json.dumps([origem, campos], default=str).encode()).hexdigest()
+
+    @property
+    def documento_concurso_actual(self):
+        """O documento gravado corresponde aos dados actuais (não é preciso gerar de novo)."""
+        return bool(self.documento_concurso) and self.hash_concurso == self.calcular_hash_concurso()
+
+    @property
+    def versao_concurso(self):
+        """Versão do documento no URL público: muda quando o conteúdo muda."""
+        return self.hash_concurso[:12] or '0'
+
     class Meta:
         verbose_name = _("Vaga")
         verbose_name_plural = _("Vagas")
@@ -124,6 +158,228 @@ class EntrevistadorVaga(models.Model):
         return f"{self.nome} - {self.vaga.titulo}"
 
 
+class SequenciaCodigoCandidato(models.Model):
+    """
+    Contador por (Distrito, Bloco) usado para atribuir o número sequencial
+    do código do candidato.
+
+    Cada reserva é um único UPDATE atómico sobre esta linha, em vez de
+    procurar o último código emitido na tabela de candidatos.
+    """
+    distrito = models.ForeignKey(
+        Distrito,
+        on_delete=models.CASCADE,
+        related_name='sequencias_codigo',
+        verbose_name=_("Distrito")
+    )
+    bloco = models.CharField(_("Bloco"), max_length=10)
+    ultimo_numero = models.PositiveBigIntegerField(_("Último Número Atribuído"), default=0)
+
+    class Meta:
+        verbose_name = _("Sequência de Código de Candidato")
+        verbose_name_plural = _("Sequências de Códigos de Candidatos")
+        unique_together = ('distrito', 'bloco')
+
+    def __str__(self):
+        return f"{self.distrito_id}/{self.bloco}: {self.ultimo_numero}"
+
+    @classmethod
+    def _valor_inicial(cls, distrito_id, bloco):
+        """
+        Maior número já emitido para o distrito/bloco antes de existir contador.
+        Só é calculado uma vez, quando a linha da sequência é criada.
+        """
+        maior = 0
+        codigos = Candidato.objects.filter(
+            distrito_id=distrito_id,
+            codigo_candidato__contains=f"-{bloco}-"
+        ).values_list('codigo_candidato', flat=True)
+        for codigo in codigos.iterator():
+            partes = codigo.split('-')
+            if len(partes) >= 3 and partes[1] == bloco:
+                try:
+                    maior = max(maior, int(partes[2]))
+                except ValueError:
+                    continue
+        return maior
+
+    @classmethod
+    def reservar(cls, distrito_id, bloco, quantidade=1):
+        """
+        Reserva `quantidade` números consecutivos para o distrito/bloco.
+
+        Retorna um `range` com os números reservados. Em PostgreSQL usa
+        UPDATE ... RETURNING; nos restantes motores (SQLite) faz o UPDATE com
+        F() e lê o valor dentro da mesma transacção, que mantém o bloqueio
+        de escrita até ao fim.
+        """
+        from django.db import connection, transaction
+        from django.db.models import F
+
+        if quantidade < 1:
+            return range(0)
+
+        cls.objects.get_or_create(
+            distrito_id=distrito_id,
+            bloco=bloco,
+            defaults={'ultimo_numero': lambda: cls._valor_inicial(distrito_id, bloco)}
+        )
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                tabela = connection.ops.quote_name(cls._meta.db_table)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"UPDATE {tabela} SET ultimo_numero = ultimo_numero + %s "
+                        f"WHERE distrito_id = %s AND bloco = %s RETURNING ultimo_numero",
+                        [quantidade, distrito_id, bloco]
+                    )
+                    ultimo = cursor.fetchone()[0]
+            else:
+                filtro = cls.objects.filter(distrito_id=distrito_id, bloco=bloco)
+                filtro.update(ultimo_numero=F('ultimo_numero') + quantidade)
+                ultimo = filtro.values_list('ultimo_numero', flat=True).get()
+
+        return range(ultimo - quantidade + 1, ultimo + 1)
+
+
+# Campos de Candidato que formam a chave de EstatisticaCandidatos
+CAMPOS_CHAVE_ESTATISTICA = ('provincia_id', 'distrito_id', 'vaga_id', 'estado', 'genero')
+
+
+class CandidatoQuerySet(models.QuerySet):
+    """
+    QuerySet de Candidato que mantém a tabela EstatisticaCandidatos actualizada
+    nos caminhos que não disparam signals (update() e bulk_create()).
+    """
+
+    def update(self, **kwargs):
+        # update() não passa pelo auto_now; o feed de alterações depende deste campo
+        kwargs.setdefault('data_atualizacao', timezone.now())
+        campos_chave = {
+            nome for nome in kwargs
+            if nome in EstatisticaCandidatos.CAMPOS_CANDIDATO
+            or nome.removesuffix('_id') in EstatisticaCandidatos.CAMPOS_CANDIDATO
+        }
+        campos_pesquisa = set(kwargs) & set(TermoPesquisaCandidato.CAMPOS_CANDIDATO)
+        if not campos_chave and not campos_pesquisa:
+            return super().update(**kwargs)
+
+        from django.db import transaction
+        # Com F(), Case... (ex.: bulk_update) o novo valor só se conhece depois: compara linha a linha
+        por_linha = any(hasattr(kwargs[nome], 'resolve_expression') for nome in campos_chave)
+        with transaction.atomic(using=self.db):
+            if campos_pesquisa:
+                ids = list(self.values_list('pk', flat=True))
+            if por_linha:
+                antes = EstatisticaCandidatos.chaves_por_linha(self.select_for_update())
+            elif campos_chave:
+                antes = EstatisticaCandidatos.contar_por_chave(self)
+            linhas = super().update(**kwargs)
+            if por_linha:
+                depois = EstatisticaCandidatos.chaves_por_linha(self.model._base_manager.using(self.db).filter(pk__in=antes))
+                EstatisticaCandidatos.aplicar_deltas(EstatisticaCandidatos.diferenca(antes, depois))
+            elif campos_chave:
+                EstatisticaCandidatos.aplicar_update(antes, kwargs)
+            if campos_pesquisa:
+                TermoPesquisaCandidato.indexar(Candidato.objects.filter(pk__in=ids))
+        return linhas
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from django.db import transaction
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            afectadas = None
+            if kwargs.get('update_conflicts') or kwargs.get('ignore_conflicts'):
+                afectadas = self._linhas_em_conflito(objs, kwargs.get('unique_fields'))
+            if afectadas is None:
+                objs = super().bulk_create(objs, *args, **kwargs)
+                EstatisticaCandidatos.aplicar_deltas(EstatisticaCandidatos.contar_instancias(objs))
+            else:
+                # O ON CONFLICT decide o que é inserido ou alterado: recontam-se só as linhas
+                # que podem ter sido afectadas (bloqueadas antes do INSERT)
+                antes = EstatisticaCandidatos.chaves_por_linha(afectadas.select_for_update())
+                objs = super().bulk_create(objs, *args, **kwargs)
+                depois = EstatisticaCandidatos.chaves_por_linha(afectadas)
+                EstatisticaCandidatos.aplicar_deltas(EstatisticaCandidatos.diferenca(antes, depois))
+        TermoPesquisaCandidato.indexar(objs)
+        return objs
+
+    def _linhas_em_conflito(self, objs, campos_unicos=None):
+        """
+        Linhas com algum dos valores de `campos_unicos` (por omissão, todos os
+        campos unique) de `objs`: as que um bulk_create com ignore_conflicts ou
+        update_conflicts pode inserir ou alterar. None se não houver valores.
+        """
+        from django.db.models import Q
+
+        opcoes = self.model._meta
+        if campos_unicos:
+            atributos = [opcoes.get_field(nome).attname for nome in campos_unicos]
+        else:
+            atributos = [campo.attname for campo in opcoes.concrete_fields if campo.unique]
+        filtro = Q()
+        for atributo in atributos:
+            valores = {getattr(obj, atributo) for obj in objs} - {None}
+            if valores:
+                filtro |= Q(**{f'{atributo}__in': valores})
+        if not filtro:
+            return None
+        return self.model._base_manager.using(self.db).filter(filtro)
+
+    def pesquisar(self, texto):
+        """
+        Pesquisa por prefixo: todas as palavras de `texto` no nome, ou o BI/código
+        começado por `texto`. Anota `relevancia` (soma dos pesos dos termos
+        encontrados) para ordenar. Ver candidaturas/pesquisa.py.
+        Um `texto` sem letras nem dígitos não filtra (relevancia 0 para todos).
+        """
+        from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+
+        palavras = pesquisa.normalizar(texto)
+        if not palavras:
+            return self.annotate(relevancia=Value(0, output_field=IntegerField()))
+
+        documento = Q(tipo__in=pesquisa.DOCUMENTOS, **pesquisa.intervalo_prefixo(pesquisa.compactar(texto)))
+        nomes = [Q(tipo=pesquisa.NOME, **pesquisa.intervalo_prefixo(palavra)) for palavra in palavras]
+        correspondencias = documento
+        for nome in nomes:
+            correspondencias |= nome
+
+        def indicador(condicao):
+            return Max(Case(When(condicao, then=Value(1)), default=Value(0), output_field=IntegerField()))
+
+        # Um GROUP BY sobre os termos encontrados (intervalos no índice), sem ler a tabela de candidatos
+        palavras_encontradas = Value(0)
+        for nome in nomes:
+            palavras_encontradas = palavras_encontradas + indicador(nome)
+        encontrados = (
+            TermoPesquisaCandidato.objects.filter(correspondencias)
+            .order_by().values('candidato_id')
+            .annotate(documento=indicador(documento), palavras=palavras_encontradas)
+            .filter(Q(documento=1) | Q(palavras=len(nomes)))
+            .values('candidato_id')
+        )
+        relevancia = (
+            TermoPesquisaCandidato.objects.filter(correspondencias, candidato=OuterRef('pk'))
+            .order_by().values('candidato_id').annotate(total=Sum('peso')).values('total')
+        )
+        return self.filter(pk__in=encontrados).annotate(relevancia=Subquery(relevancia))
+
+    def com_documento(self, numero_bi=None, numero_telefone=None):
+        """Candidatos com este BI ou telefone exactos (ignora maiúsculas, espaços e separadores)."""
+        from django.db.models import Q
+        filtro = Q()
+        if numero_bi and pesquisa.compactar(numero_bi):
+            filtro |= Q(tipo=pesquisa.BI, termo=pesquisa.compactar(numero_bi))
+        if numero_telefone and pesquisa.apenas_digitos(numero_telefone):
+            filtro |= Q(tipo=pesquisa.TELEFONE, termo=pesquisa.apenas_digitos(numero_telefone))
+        if not filtro:
+            return self.none()
+        return self.filter(pk__in=TermoPesquisaCandidato.objects.filter(filtro).values('candidato_id'))
+
+
 class Candidato(models.Model):
     class Estado(models.TextChoices):
         PENDENTE = 'PENDENTE', _('Pendente')
@@ -203,10 +459,18 @@ class Candidato(models.Model):
     )
     
     # Documents
-    arquivo_cv = models.FileField(_("Curriculum Vitae (CV)"), upload_to='candidatos/cv/', null=True, blank=True)
-    arquivo_bi = models.FileField(_("Cópia do BI"), upload_to='candidatos/bi/', null=True, blank=True)
-    arquivo_certificado = models.FileField(_("Certificado de Habilitações"), upload_to='candidatos/certificados/', null=True, blank=True)
-    foto = models.ImageField(_("Foto"), upload_to='candidatos/fotos/', blank=True, null=True)
+    # Guardados por conteúdo (sicfaae_comum/armazenamento.py): ficheiros iguais ocupam o disco uma vez
+    arquivo_cv = models.FileField(_("Curriculum Vitae (CV)"), upload_to='candidatos/cv/', storage=armazenamento_conteudo, null=True, blank=True)
+    arquivo_bi = models.FileField(_("Cópia do BI"), upload_to='candidatos/bi/', storage=armazenamento_conteudo, null=True, blank=True)
+    arquivo_certificado = models.FileField(_("Certificado de Habilitações"), upload_to='candidatos/certificados/', storage=armazenamento_conteudo, null=True, blank=True)
+    foto = models.ImageField(_("Foto"), upload_to='candidatos/fotos/', storage=armazenamento_conteudo, blank=True, null=True)
+    CAMPOS_FICHEIROS = ('arquivo_cv', 'arquivo_bi', 'arquivo_certificado', 'foto')
+    # Foto cujas miniaturas já existem (sicfaae_comum/miniaturas.py); diferente de `foto` = ainda não geradas
+    foto_miniaturas = models.CharField(max_length=100, blank=True, editable=False)
+    tamanhos_documentos = models.JSONField(
+        _("Tamanhos dos Documentos"), default=dict, blank=True, editable=False,
+        help_text=_("Bytes enviados e guardados (após compactação) por documento")
+    )
 
     estado = models.CharField(
         _("Estado da Candidatura"),
@@ -233,6 +497,8 @@ class Candidato(models.Model):
     data_atualizacao = models.DateTimeField(auto_now=True)
     
     history = HistoricalRecords()
+
+    objects = CandidatoQuerySet.as_manager()
     
     def _obter_bloco_distrito(self):
         """Obtém bloco automático baseado no ID do distrito.
@@ -290,6 +556,11 @@ class Candidato(models.Model):
             # Usar 1 letra
             return primeira_letra
     
+    @staticmethod
+    def _formatar_codigo(inicial_provincia, bloco, numero, inicial_distrito):
+        """Monta o código no formato A-B-12345678-C (8 dígitos com zeros à esquerda)."""
+        return f"{inicial_provincia}-{bloco}-{str(numero).zfill(8)}-{inicial_distrito}"
+
     def gerar_codigo_candidato(self):
         """Gera código único no formato: Província-Bloco-Sequencial-Distrito
         
@@ -304,7 +575,7 @@ class Candidato(models.Model):
         Sistema híbrido que funciona offline e online:
         - Cada distrito tem bloco único automático
         - Suporta sincronização de múltiplas instalações
-        - Usa transações atômicas para evitar duplicação
+        - O sequencial vem de SequenciaCodigoCandidato (um UPDATE atómico por código)
         """
         if self.codigo_candidato:
             return self.codigo_candidato
@@ -312,62 +583,108 @@ class Candidato(models.Model):
         if not self.provincia or not self.distrito:
             return ''
         
-        from django.db import transaction
-        
         inicial_provincia = self.provincia.nome[0].upper()
         bloco = self._obter_bloco_distrito()
         inicial_distrito = self._obter_inicial_distrito()
         
-        # Usar transação atômica para evitar race conditions
-        with transaction.atomic():
-            # Buscar último candidato DESTE BLOCO e distrito
-            ultimo_candidato = Candidato.objects.filter(
-                distrito=self.distrito,
-                codigo_candidato__contains=f"-{bloco}-"
-            ).exclude(
-                codigo_candidato=''
-            ).select_for_update().order_by('-id').first()
-            
-            if ultimo_candidato and ultimo_candidato.codigo_candidato:
-                try:
-                    # Extrair número: M-5-00000042-Ma -> "00000042"
-                    partes = ultimo_candidato.codigo_candidato.split('-')
-                    if len(partes) >= 3:
-                        numero_str = partes[2]
-                        proximo_numero = int(numero_str) + 1
-                    else:
-                        proximo_numero = 1
-                except (ValueError, IndexError):
-                    proximo_numero = 1
+        numero = SequenciaCodigoCandidato.reservar(self.distrito.id, bloco)[0]
+        return self._formatar_codigo(inicial_provincia, bloco, numero, inicial_distrito)
+
+    @classmethod
+    def reservar_codigos(cls, candidatos, simular=False):
+        """
+        Atribui códigos a vários candidatos (sem os gravar).
+
+        Os candidatos são agrupados por distrito e cada grupo reserva o seu
+        intervalo de números numa única operação, em vez de um UPDATE por
+        candidato. Candidatos que já têm código ou sem província/distrito são
+        ignorados.
+
+        Com `simular=True` os números são calculados a partir do valor actual
+        da sequência, sem a alterar (usado no --dry-run dos comandos).
+
+        Retorna a lista de candidatos a que foi atribuído código.
+        """
+        from collections import defaultdict
+
+        grupos = defaultdict(list)
+        for candidato in candidatos:
+            if not candidato.codigo_candidato and candidato.provincia_id and candidato.distrito_id:
+                grupos[(candidato.provincia_id, candidato.distrito_id)].append(candidato)
+
+        atribuidos = []
+        for (provincia_id, distrito_id), grupo in grupos.items():
+            referencia = grupo[0]
+            inicial_provincia = referencia.provincia.nome[0].upper()
+            bloco = referencia._obter_bloco_distrito()
+            inicial_distrito = referencia._obter_inicial_distrito()
+
+            if simular:
+                sequencia = SequenciaCodigoCandidato.objects.filter(
+                    distrito_id=distrito_id, bloco=bloco
+                ).values_list('ultimo_numero', flat=True).first()
+                if sequencia is None:
+                    sequencia = SequenciaCodigoCandidato._valor_inicial(distrito_id, bloco)
+                numeros = range(sequencia + 1, sequencia + 1 + len(grupo))
             else:
-                proximo_numero = 1
-            
-            # Formatar: 8 dígitos com zeros à esquerda
-            numero_formatado = str(proximo_numero).zfill(8)
-            
-            # Montar código
-            codigo = f"{inicial_provincia}-{bloco}-{numero_formatado}-{inicial_distrito}"
-            
-            # Verificação adicional: garantir unicidade
-            tentativas = 0
-            while Candidato.objects.filter(codigo_candidato=codigo).exists() and tentativas < 100:
-                proximo_numero += 1
-                numero_formatado = str(proximo_numero).zfill(8)
-                codigo = f"{inicial_provincia}-{bloco}-{numero_formatado}-{inicial_distrito}"
-                tentativas += 1
-            
-            return codigo
+                numeros = SequenciaCodigoCandidato.reservar(distrito_id, bloco, len(grupo))
+
+            for candidato, numero in zip(grupo, numeros):
+                candidato.codigo_candidato = cls._formatar_codigo(
+                    inicial_provincia, bloco, numero, inicial_distrito
+                )
+                atribuidos.append(candidato)
+
+        return atribuidos
     
     def save(self, *args, **kwargs):
         """Sobrescreve save para gerar código automaticamente."""
-        # Gerar código antes de salvar, se necessário
-        if not self.codigo_candidato and self.provincia and self.distrito:
+        from django.db import transaction
+
+        # A reserva do número e o INSERT ficam na mesma transacção: se a
+        # gravação falhar, o número volta à sequência em vez de ficar perdido
+        with transaction.atomic(using=kwargs.get('using')):
+            codigo_gerado = False
+            if not self.codigo_candidato and self.provincia and self.distrito:
+                try:
+                    with transaction.atomic(using=kwargs.get('using')):
+                        self.codigo_candidato = self.gerar_codigo_candidato()
+                    codigo_gerado = True
+                except Exception:
+                    # Se falhar, deixar vazio por enquanto
+                    pass
             try:
-                self.codigo_candidato = self.gerar_codigo_candidato()
-            except Exception as e:
-                # Se falhar, deixar vazio por enquanto
-                pass
-        super().save(*args, **kwargs)
+                super().save(*args, **kwargs)
+            except Exception:
+                if codigo_gerado:
+                    self.codigo_candidato = ''
+                raise
+        self.guardar_valores_gravados(kwargs.get('update_fields'))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        candidato = super().from_db(db, field_names, values)
+        candidato.guardar_valores_gravados()
+        return candidato
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.guardar_valores_gravados(fields)
+
+    def guardar_valores_gravados(self, campos=None):
+        """
+        Memoriza os valores que a linha tem na base de dados (CAMPOS_GRAVADOS),
+        para o pre_save não a voltar a ler. `campos` limita aos campos lidos ou
+        gravados; os que não estão carregados (defer) ficam de fora.
+        """
+        if campos is not None:
+            campos = {self._meta.get_field(nome).attname for nome in campos}
+        gravados = dict(getattr(self, '_valores_gravados', {}))
+        for campo in CAMPOS_GRAVADOS:
+            if campo in self.__dict__ and (campos is None or campo in campos):
+                valor = self.__dict__[campo]
+                gravados[campo] = getattr(valor, 'name', valor)  # FieldFile -> nome
+        self._valores_gravados = gravados
 
     def __str__(self):
         return f"{self.nome_completo} ({self.estado})"
@@ -376,6 +693,25 @@ class Candidato(models.Model):
     class Meta:
         verbose_name = _("Candidato")
         verbose_name_plural = _("Candidatos")
+        indexes = [
+            # Feed de alterações para o DEFC (candidaturas/alteracoes.py)
+            models.Index(fields=['data_atualizacao', 'id'], name='candidato_alteracoes_idx'),
+            # Paginação por cursor das listagens e da API (candidaturas/paginacao.py)
+            models.Index(fields=['data_criacao', 'id'], name='candidato_criacao_idx'),
+            models.Index(fields=['estado', 'data_criacao', 'id'], name='candidato_estado_criacao_idx'),
+            # Listagens e contagens por âmbito e estado (ver benchmark_indices)
+            models.Index(fields=['distrito', 'estado', 'data_criacao', 'id'], name='candidato_distrito_estado_idx'),
+            models.Index(fields=['provincia', 'estado', 'data_criacao', 'id'], name='candidato_provincia_estado_idx'),
+            models.Index(fields=['vaga', 'estado'], name='candidato_vaga_estado_idx'),
+            # Candidatos ainda por enviar ao DEFC (EnvioDEFC.solicitar): índice parcial sem os já enviados.
+            # A condição não tem valores, para o SQLite a reconhecer também com parâmetros (estado = ?)
+            models.Index(
+                fields=['estado', 'provincia', 'distrito'], name='candidato_por_enviar_idx',
+                condition=models.Q(enviado_defc=False),
+            ),
+            # Cobre o GROUP BY de EstatisticaCandidatos.contar_por_chave sem ler a tabela
+            models.Index(fields=['provincia', 'distrito', 'vaga', 'estado', 'genero'], name='candidato_estatistica_idx'),
+        ]
 
 
 class Entrevista(models.Model):
@@ -460,6 +796,791 @@ class Entrevista(models.Model):
         )
     
 
+class EstatisticaCandidatos(models.Model):
+    """
+    Contagem pré-agregada de candidatos por (Província, Distrito, Vaga, Estado, Género).
+
+    É mantida pelos signals de Candidato e pelo CandidatoQuerySet, para que o
+    painel de controlo leia algumas centenas de linhas em vez de agregar a
+    tabela de candidatos. `python manage.py rebuild_stats` recalcula tudo.
+    """
+    CAMPOS_CANDIDATO = ('provincia', 'distrito', 'vaga', 'estado', 'genero')
+
+    chave = models.CharField(_("Chave"), max_length=100, unique=True)
+    provincia = models.ForeignKey(
+        Provincia, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='+', verbose_name=_("Província")
+    )
+    distrito = models.ForeignKey(
+        Distrito, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='+', verbose_name=_("Distrito")
+    )
+    vaga = models.ForeignKey(
+        Vaga, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='+', verbose_name=_("Vaga")
+    )
+    estado = models.CharField(_("Estado da Candidatura"), max_length=30)
+    genero = models.CharField(_("Género"), max_length=1)
+    total = models.IntegerField(_("Total"), default=0)
+
+    class Meta:
+        verbose_name = _("Estatística de Candidatos")
+        verbose_name_plural = _("Estatísticas de Candidatos")
+
+    def __str__(self):
+        return f"{self.chave}: {self.total}"
+
+    # --- Chaves ---
+
+    @staticmethod
+    def formatar_chave(chave):
+        """(1, 4, None, 'PENDENTE', 'M') -> '1:4:-:PENDENTE:M'"""
+        return ':'.join('-' if valor is None else str(valor) for valor in chave)
+
+    @classmethod
+    def chave_de(cls, candidato):
+        return (candidato.provincia_id, candidato.distrito_id, candidato.vaga_id, candidato.estado, candidato.genero)
+
+    @classmethod
+    def contar_instancias(cls, candidatos):
+        from collections import Counter
+        return Counter(cls.chave_de(c) for c in candidatos)
+
+    @classmethod
+    def contar_por_chave(cls, queryset):
+        """Contagem por chave das linhas de um queryset de Candidato (um GROUP BY)."""
+        from django.db.models import Count
+        grupos = queryset.order_by().values_list(*CAMPOS_CHAVE_ESTATISTICA).annotate(n=Count('id'))
+        return {tuple(g[:5]): g[5] for g in grupos}
+
+    @classmethod
+    def chaves_por_linha(cls, queryset):
+        """{pk: chave} das linhas de um queryset de Candidato."""
+        return {
+            linha[0]: tuple(linha[1:])
+            for linha in queryset.order_by().values_list('pk', *CAMPOS_CHAVE_ESTATISTICA)
+        }
+
+    @staticmethod
+    def diferenca(antes, depois):
+        """Deltas entre as chaves das linhas antes e depois de uma alteração ({pk: chave})."""
+        from collections import Counter
+        deltas = Counter(depois.values())
+        deltas.subtract(Counter(antes.values()))
+        return deltas
+
+    # --- Actualização incremental ---
+
+    @classmethod
+    def aplicar_deltas(cls, deltas):
+        """Soma cada delta à linha da sua chave, criando-a se necessário."""
+        from django.db.models import F
+        for chave, delta in deltas.items():
+            if not delta:
+                continue
+            provincia_id, distrito_id, vaga_id, estado, genero = chave
+            linha, _ = cls.objects.get_or_create(
+                chave=cls.formatar_chave(chave),
+                defaults={
+                    'provincia_id': provincia_id, 'distrito_id': distrito_id, 'vaga_id': vaga_id,
+                    'estado': estado, 'genero': genero,
+                }
+            )
+            cls.objects.filter(pk=linha.pk).update(total=F('total') + delta)
+
+    @classmethod
+    def aplicar_update(cls, antes, valores):
+        """
+        Move as contagens de `antes` para as novas chaves depois de um
+        queryset.update(**valores) com valores constantes (as expressões são
+        tratadas linha a linha por CandidatoQuerySet.update).
+        """
+        novos = {}
+        for nome, valor in valores.items():
+            campo = nome.removesuffix('_id')
+            if campo in cls.CAMPOS_CANDIDATO:
+                novos[cls.CAMPOS_CANDIDATO.index(campo)] = getattr(valor, 'pk', valor)
+
+        deltas = {}
+        for chave, n in antes.items():
+            nova = list(chave)
+            for posicao, valor in novos.items():
+                nova[posicao] = valor
+            nova = tuple(nova)
+            if nova != chave:
+                deltas[chave] = deltas.get(chave, 0) - n
+                deltas[nova] = deltas.get(nova, 0) + n
+        cls.aplicar_deltas(deltas)
+
+    @classmethod
+    def reconstruir(cls):
+        """Recalcula toda a tabela a partir de Candidato."""
+        from django.db import transaction
+        with transaction.atomic():
+            cls.objects.all().delete()
+            contagens = cls.contar_por_chave(Candidato.objects.all())
+            cls.objects.bulk_create([
+                cls(
+                    chave=cls.formatar_chave(chave),
+                    provincia_id=chave[0], distrito_id=chave[1], vaga_id=chave[2],
+                    estado=chave[3], genero=chave[4], total=n,
+                )
+                for chave, n in contagens.items()
+            ], batch_size=500)
+        return len(contagens)
+
+
+class TermoPesquisaCandidato(models.Model):
+    """
+    Índice de pesquisa de candidatos: uma linha por palavra do nome, BI,
+    código e telefone, normalizados (minúsculas, sem acentos nem separadores).
+
+    É mantido pelos signals de Candidato e pelo CandidatoQuerySet (update(),
+    bulk_update() e bulk_create()); `python manage.py reindexar_pesquisa`
+    reconstrói tudo. A pesquisa está em CandidatoQuerySet.pesquisar().
+    """
+    CAMPOS_CANDIDATO = ('nome_completo', 'numero_bi', 'codigo_candidato', 'numero_telefone')
+
+    class Tipo(models.TextChoices):
+        NOME = pesquisa.NOME, _('Nome')
+        BI = pesquisa.BI, _('BI')
+        CODIGO = pesquisa.CODIGO, _('Código')
+        TELEFONE = pesquisa.TELEFONE, _('Telefone')
+
+    candidato = models.ForeignKey(Candidato, on_delete=models.CASCADE, related_name='termos_pesquisa')
+    tipo = models.CharField(_("Tipo"), max_length=1, choices=Tipo.choices)
+    termo = models.CharField(_("Termo"), max_length=pesquisa.TAMANHO_TERMO)
+    peso = models.PositiveSmallIntegerField(_("Peso"), default=0)
+
+    class Meta:
+        verbose_name = _("Termo de Pesquisa")
+        verbose_name_plural = _("Termos de Pesquisa")
+        indexes = [models.Index(fields=['tipo', 'termo'], name='termo_pesquisa_idx')]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.termo}"
+
+    @classmethod
+    def termos_de(cls, candidato):
+        return pesquisa.termos_candidato(*(getattr(candidato, campo) for campo in cls.CAMPOS_CANDIDATO))
+
+    @classmethod
+    def indexar(cls, candidatos):
+        """Substitui os termos dos candidatos indicados (instâncias ou queryset)."""
+        candidatos = [c for c in candidatos if c.pk]
+        if not candidatos:
+            return 0
+        from django.db import transaction
+        with transaction.atomic():
+            cls.objects.filter(candidato_id__in=[c.pk for c in candidatos]).delete()
+            termos = cls.objects.bulk_create([
+                cls(candidato_id=c.pk, tipo=tipo, termo=termo, peso=peso)
+                for c in candidatos for tipo, termo, peso in cls.termos_de(c)
+            ], batch_size=1000)
+        return len(termos)
+
+    @classmethod
+    def reconstruir(cls, tamanho_bloco=2000):
+        """Reindexa todos os candidatos, em blocos."""
+        total = 0
+        candidatos = Candidato.objects.only('pk', *cls.CAMPOS_CANDIDATO).order_by('pk')
+        ultimo = 0
+        while True:
+            bloco = list(candidatos.filter(pk__gt=ultimo)[:tamanho_bloco])
+            if not bloco:
+                return total
+            total += cls.indexar(bloco)
+            ultimo = bloco[-1].pk
+
+
+# Valores da linha que os signals de Candidato comparam com os novos
+CAMPOS_GRAVADOS = (
+    *CAMPOS_CHAVE_ESTATISTICA, *Candidato.CAMPOS_FICHEIROS, *TermoPesquisaCandidato.CAMPOS_CANDIDATO
+)
+
+
+@receiver(pre_save, sender=Candidato)
+def guardar_chave_estatistica(sender, instance, **kwargs):
+    """
+    Guarda a chave de estatística, os campos pesquisáveis e os ficheiros que o
+    candidato tinha na base de dados. Usa os valores lidos com a instância
+    (Candidato.guardar_valores_gravados); só faz uma query se algum não foi lido
+    (only()/defer(), instância criada com o pk).
+    """
+    instance._chave_estatistica_anterior = None
+    instance._pesquisa_anterior = None
+    instance._ficheiros_anteriores = {}
+    if not instance._state.adding and instance.pk:
+        gravados = getattr(instance, '_valores_gravados', {})
+        if all(campo in gravados for campo in CAMPOS_GRAVADOS):
+            anterior = tuple(gravados[campo] for campo in CAMPOS_GRAVADOS)
+        else:
+            anterior = Candidato.objects.filter(pk=instance.pk).values_list(*CAMPOS_GRAVADOS).first()
+        if anterior:
+            fim_ficheiros = 5 + len(Candidato.CAMPOS_FICHEIROS)
+            instance._chave_estatistica_anterior = anterior[:5]
+            instance._ficheiros_anteriores = {
+                campo: nome or '' for campo, nome in zip(Candidato.CAMPOS_FICHEIROS, anterior[5:fim_ficheiros])
+            }
+            instance._pesquisa_anterior = anterior[fim_ficheiros:]
+    # Nomes já guardados atribuídos directamente ao campo (os ficheiros novos são contados pelo storage)
+    instance._ficheiros_atribuidos = {
+        campo for campo, nome in armazenamento.ficheiros(instance, Candidato.CAMPOS_FICHEIROS).items()
+        if nome != instance._ficheiros_anteriores.get(campo, '') and getattr(instance, campo)._committed
+    }
+
+
+@receiver(post_save, sender=Candidato)
+def actualizar_estatistica_apos_gravar(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    nova = EstatisticaCandidatos.chave_de(instance)
+    anterior = getattr(instance, '_chave_estatistica_anterior', None)
+    if anterior == nova:
+        return
+    deltas = {nova: 1}
+    if anterior is not None:
+        deltas[anterior] = -1
+    EstatisticaCandidatos.aplicar_deltas(deltas)
+
+
+@receiver(post_save, sender=Candidato)
+def actualizar_termos_pesquisa(sender, instance, created, **kwargs):
+    actuais = tuple(getattr(instance, campo) for campo in TermoPesquisaCandidato.CAMPOS_CANDIDATO)
+    if created or getattr(instance, '_pesquisa_anterior', None) != actuais:
+        TermoPesquisaCandidato.indexar([instance])
+
+
+@receiver(post_delete, sender=Candidato)
+def actualizar_estatistica_apos_apagar(sender, instance, **kwargs):
+    EstatisticaCandidatos.aplicar_deltas({EstatisticaCandidatos.chave_de(instance): -1})
+
+
+@receiver(post_save, sender=Candidato)
+def actualizar_referencias_ficheiros(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    armazenamento.actualizar_referencias(
+        instance, Candidato.CAMPOS_FICHEIROS,
+        getattr(instance, '_ficheiros_anteriores', {}), getattr(instance, '_ficheiros_atribuidos', set()),
+    )
+
+
+@receiver(post_delete, sender=Candidato)
+def libertar_ficheiros(sender, instance, **kwargs):
+    for nome in armazenamento.ficheiros(instance, Candidato.CAMPOS_FICHEIROS).values():
+        if armazenamento.e_conteudo(nome):
+            armazenamento_conteudo.delete(nome)
+
+
+@receiver(post_save, sender=Vaga)
+@receiver(post_delete, sender=Vaga)
+@receiver(post_save, sender=Provincia)
+@receiver(post_delete, sender=Provincia)
+@receiver(post_save, sender=Distrito)
+@receiver(post_delete, sender=Distrito)
+def invalidar_referencias(sender, **kwargs):
+    """Esvazia a cache de nomes do registo (referencias.py) neste processo."""
+    referencias.invalidar()
+
+
+@receiver(post_save, sender=Candidato)
+def actualizar_miniaturas(sender, instance, raw=False, **kwargs):
+    """
+    Apaga as miniaturas da foto substituída, depois do commit. As da foto nova
+    são geradas pelo worker (miniaturas.gerar_pendentes em processar_tarefas).
+    """
+    from django.db import transaction
+
+    if raw:
+        return
+    anterior = getattr(instance, '_ficheiros_anteriores', {}).get('foto', '')
+    if anterior and anterior != (instance.foto.name or ''):
+        transaction.on_commit(lambda: miniaturas.libertar(anterior))
+
+
+@receiver(post_delete, sender=Candidato)
+def libertar_miniaturas(sender, instance, **kwargs):
+    from django.db import transaction
+
+    if instance.foto:
+        nome = instance.foto.name
+        transaction.on_commit(lambda: miniaturas.libertar(nome))
+
+class TarefaRelatorio(models.Model):
+    """
+    Geração de relatório, exportação ou importação executada fora do pedido
+    HTTP pelo comando `python manage.py processar_tarefas`. O ficheiro final
+    (numa importação, o relatório de erros) fica em MEDIA_ROOT e é descarregado
+    pela página de estado da tarefa.
+    """
+    class Tipo(models.TextChoices):
+        RELATORIO_PDF = 'RELATORIO_PDF', _('Relatório PDF')
+        EXPORTAR_EXCEL = 'EXPORTAR_EXCEL', _('Exportação Excel')
+        IMPORTAR_EXCEL = 'IMPORTAR_EXCEL', _('Importação Excel')
+        DOCUMENTO_CONCURSO = 'DOCUMENTO_CONCURSO', _('Documento de Concurso')
+
+    class Estado(models.TextChoices):
+        PENDENTE = 'PENDENTE', _('Pendente')
+        EM_CURSO = 'EM_CURSO', _('Em Curso')
+        CONCLUIDA = 'CONCLUIDA', _('Concluída')
+        FALHADA = 'FALHADA', _('Falhada')
+
+    ESTADOS_ACTIVOS = (Estado.PENDENTE, Estado.EM_CURSO)
+
+    tipo = models.CharField(_("Tipo"), max_length=20, choices=Tipo.choices)
+    parametros = models.JSONField(_("Parâmetros"), default=dict, blank=True)
+    utilizador = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='tarefas_relatorio', verbose_name=_("Solicitado por")
+    )
+    escopo = models.CharField(
+        _("Âmbito"), max_length=50,
+        help_text=_("Âmbito de dados do utilizador (nível, província, distrito)")
+    )
+    chave = models.CharField(
+        _("Chave"), max_length=64, db_index=True,
+        help_text=_("Hash de tipo + parâmetros + âmbito, usado para reaproveitar pedidos iguais")
+    )
+    estado = models.CharField(_("Estado"), max_length=20, choices=Estado.choices, default=Estado.PENDENTE)
+    progresso = models.PositiveSmallIntegerField(_("Progresso (%)"), default=0)
+    ficheiro = models.FileField(_("Ficheiro"), upload_to='relatorios/%Y/%m/', blank=True)
+    entrada = models.FileField(
+        _("Ficheiro de entrada"), upload_to='importacoes/%Y/%m/', blank=True,
+        help_text=_("Ficheiro enviado pelo utilizador (importações)")
+    )
+    resumo = models.JSONField(_("Resumo"), default=dict, blank=True)
+    erro = models.TextField(_("Erro"), blank=True)
+
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(null=True, blank=True)
+    # Actualizada pelo worker enquanto executa a tarefa (ver recuperar_abandonadas)
+    data_actividade = models.DateTimeField(null=True, blank=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Tarefa de Relatório")
+        verbose_name_plural = _("Tarefas de Relatório")
+        ordering = ['-data_criacao']
+        indexes = [models.Index(fields=['estado', 'data_criacao'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chave'],
+                condition=models.Q(estado__in=['PENDENTE', 'EM_CURSO']),
+                name='tarefa_relatorio_activa_unica',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_estado_display()})"
+
+    @staticmethod
+    def obter_escopo(utilizador):
+        """Âmbito de dados do utilizador, igual para quem vê os mesmos candidatos."""
+        from .escopo import obter_escopo
+        return obter_escopo(utilizador).chave
+
+    @classmethod
+    def solicitar(cls, utilizador, tipo, parametros, entrada=None):
+        """
+        Cria a tarefa, ou devolve a que já está pendente/em curso para o mesmo
+        tipo, parâmetros e âmbito. `entrada` é o ficheiro a processar (gravado
+        antes de a tarefa ficar visível ao worker). Retorna (tarefa, criada).
+        """
+        import hashlib
+        import json
+        from django.db import IntegrityError, transaction
+
+        escopo = cls.obter_escopo(utilizador)
+        chave = hashlib.sha256(
+            json.dumps([tipo, parametros, escopo], sort_keys=True).encode()
+        ).hexdigest()
+
+        while True:
+            existente = cls.objects.filter(chave=chave, estado__in=cls.ESTADOS_ACTIVOS).first()
+            if existente:
+                return existente, False
+            tarefa = cls(tipo=tipo, parametros=parametros, utilizador=utilizador, escopo=escopo, chave=chave)
+            if entrada is not None:
+                tarefa.entrada.save(entrada.name, entrada, save=False)
+            try:
+                with transaction.atomic():
+                    tarefa.save()
+                return tarefa, True
+            except IntegrityError:
+                # Outro pedido igual criou a tarefa entretanto
+                if tarefa.entrada:
+                    tarefa.entrada.delete(save=False)
+
+    @classmethod
+    def reservar_proxima(cls):
+        """
+        Marca a tarefa pendente mais antiga como EM_CURSO e devolve-a.
+        O UPDATE condicional garante que dois workers não ficam com a mesma tarefa.
+        """
+        from django.utils import timezone
+        pendentes = cls.objects.filter(estado=cls.Estado.PENDENTE).order_by('data_criacao').values_list('pk', flat=True)[:10]
+        for pk in pendentes:
+            agora = timezone.now()
+            if cls.objects.filter(pk=pk, estado=cls.Estado.PENDENTE).update(
+                estado=cls.Estado.EM_CURSO, data_inicio=agora, data_actividade=agora
+            ):
+                return cls.objects.get(pk=pk)
+        return None
+
+    @classmethod
+    def recuperar_abandonadas(cls, limite):
+        """
+        Volta a pôr em fila as tarefas EM_CURSO sem actividade desde `limite`
+        (worker morto). Um worker vivo actualiza data_actividade periodicamente
+        (registar_actividade), pelo que não perde a tarefa por esta demorar.
+        """
+        return cls.objects.filter(estado=cls.Estado.EM_CURSO).filter(
+            models.Q(data_actividade__lt=limite) |
+            models.Q(data_actividade__isnull=True, data_inicio__lt=limite)
+        ).update(estado=cls.Estado.PENDENTE, progresso=0, data_inicio=None, data_actividade=None)
+
+    @classmethod
+    def limpar_expiradas(cls, limite):
+        """Apaga as tarefas terminadas antes de `limite` e os seus ficheiros. Retorna quantas apagou."""
+        expiradas = cls.objects.exclude(estado__in=cls.ESTADOS_ACTIVOS).filter(data_conclusao__lt=limite)
+        apagadas = 0
+        for tarefa in expiradas.iterator():
+            for ficheiro in (tarefa.ficheiro, tarefa.entrada):
+                if ficheiro:
+                    ficheiro.delete(save=False)
+            tarefa.delete()
+            apagadas += 1
+        return apagadas
+
+    def registar_actividade(self):
+        """Batimento do worker: a tarefa continua a ser executada."""
+        from django.utils import timezone
+        TarefaRelatorio.objects.filter(pk=self.pk, estado=self.Estado.EM_CURSO).update(data_actividade=timezone.now())
+
+    def definir_progresso(self, progresso):
+        from django.utils import timezone
+        self.progresso = max(0, min(100, int(progresso)))
+        TarefaRelatorio.objects.filter(pk=self.pk).update(progresso=self.progresso, data_actividade=timezone.now())
+
+    def concluir(self, nome_ficheiro=None, conteudo=None, resumo=None):
+        """Sem `conteudo` a tarefa fica sem ficheiro (o resultado está noutro modelo, ex.: a vaga)."""
+        from django.utils import timezone
+        if conteudo is not None:
+            self.ficheiro.save(nome_ficheiro, conteudo, save=False)
+        self.estado = self.Estado.CONCLUIDA
+        self.progresso = 100
+        self.data_conclusao = timezone.now()
+        if resumo is not None:
+            self.resumo = resumo
+        self.save(update_fields=['ficheiro', 'estado', 'progresso', 'data_conclusao', 'resumo'])
+
+    def falhar(self, erro):
+        from django.utils import timezone
+        self.estado = self.Estado.FALHADA
+        self.erro = str(erro)
+        self.data_conclusao = timezone.now()
+        self.save(update_fields=['estado', 'erro', 'data_conclusao'])
+
+
+
+class ConteudoFicheiro(models.Model):
+    """
+    Ficheiro guardado pelo ArmazenamentoConteudo (sicfaae_comum/armazenamento.py),
+    com o número de campos que o usam. Com zero referências o registo e o
+    ficheiro são apagados.
+    """
+    nome = models.CharField(_("Nome no Storage"), max_length=100, unique=True)
+    sha256 = models.CharField(_("SHA-256"), max_length=64, db_index=True)
+    tamanho = models.PositiveBigIntegerField(_("Tamanho (bytes)"), default=0)
+    referencias = models.PositiveIntegerField(_("Referências"), default=0)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Conteúdo de Ficheiro")
+        verbose_name_plural = _("Conteúdos de Ficheiros")
+
+    def __str__(self):
+        return f"{self.nome} ({self.referencias})"
+
+
+class CarregamentoDocumento(models.Model):
+    """
+    Carregamento em blocos (retomável) de um documento da Etapa 2 da candidatura
+    (ver views_carregamentos.py). O ficheiro parcial fica em
+    MEDIA_ROOT/carregamentos/ até ser usado na submissão ou expirar
+    (comando limpar_carregamentos). Quem conhece o identificador pode continuar o envio.
+    """
+    class Campo(models.TextChoices):
+        CV = 'arquivo_cv', _('Curriculum Vitae')
+        BI = 'arquivo_bi', _('Cópia do BI')
+        CERTIFICADO = 'arquivo_certificado', _('Certificado')
+        FOTO = 'foto', _('Foto')
+
+    class DeslocamentoInvalido(Exception):
+        """O bloco não começa no fim do que já foi recebido; `recebido` indica onde retomar."""
+        def __init__(self, recebido):
+            super().__init__(f"O envio deve continuar no byte {recebido}.")
+            self.recebido = recebido
+
+    identificador = models.UUIDField(_("Identificador"), unique=True, editable=False)
+    campo = models.CharField(_("Documento"), max_length=30, choices=Campo.choices)
+    nome_original = models.CharField(_("Nome do Ficheiro"), max_length=255)
+    tamanho = models.PositiveBigIntegerField(_("Tamanho (bytes)"))
+    recebido = models.PositiveBigIntegerField(_("Recebido (bytes)"), default=0)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Carregamento de Documento")
+        verbose_name_plural = _("Carregamentos de Documentos")
+        indexes = [models.Index(fields=['data_atualizacao'])]
+
+    def __str__(self):
+        return f"{self.get_campo_display()}: {self.nome_original} ({self.recebido}/{self.tamanho})"
+
+    def save(self, *args, **kwargs):
+        if not self.identificador:
+            import uuid
+            self.identificador = uuid.uuid4()
+        super().save(*args, **kwargs)
+
+    @property
+    def concluido(self):
+        return self.recebido >= self.tamanho
+
+    @property
+    def caminho(self):
+        import os
+        from django.conf import settings
+        return os.path.join(settings.MEDIA_ROOT, 'carregamentos', f'{self.identificador}.part')
+
+    def acrescentar(self, deslocamento, dados):
+        """
+        Acrescenta `dados` a partir de `deslocamento` bytes. Lança
+        DeslocamentoInvalido se o deslocamento não for o já recebido (bloco
+        repetido ou perdido) ou se o total ultrapassar o tamanho declarado.
+        Retorna o total recebido.
+        """
+        import os
+        from django.db import transaction
+
+        with transaction.atomic():
+            actual = CarregamentoDocumento.objects.select_for_update().get(pk=self.pk)
+            if deslocamento != actual.recebido or actual.recebido + len(dados) > actual.tamanho:
+                raise self.DeslocamentoInvalido(actual.recebido)
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            with open(self.caminho, 'r+b' if actual.recebido else 'wb') as parcial:
+                # Um bloco anterior interrompido pode ter deixado bytes a mais no fim
+                parcial.seek(actual.recebido)
+                parcial.write(dados)
+                parcial.truncate()
+            self.recebido = actual.recebido + len(dados)
+            CarregamentoDocumento.objects.filter(pk=self.pk).update(
+                recebido=self.recebido, data_atualizacao=timezone.now()
+            )
+        return self.recebido
+
+    def abrir(self):
+        """File com o documento completo (com o nome original)."""
+        from django.core.files import File
+        return File(open(self.caminho, 'rb'), name=self.nome_original)
+
+    def apagar(self):
+        import os
+        try:
+            os.remove(self.caminho)
+        except FileNotFoundError:
+            pass
+        self.delete()
+
+    @classmethod
+    def limpar_expirados(cls, limite):
+        """Apaga os carregamentos sem actividade desde `limite` (e os ficheiros parciais)."""
+        expirados = list(cls.objects.filter(data_atualizacao__lt=limite))
+        for carregamento in expirados:
+            carregamento.apagar()
+        return len(expirados)
+
+
+class EnvioDEFC(models.Model):
+    """
+    Transferência de candidatos aprovados para o DEFC, executada pelo comando
+    `python manage.py enviar_defc` (ver candidaturas/transferencia.py).
+    Cada candidato tem o seu ItemEnvioDEFC com o resultado do envio.
+    """
+    class Estado(models.TextChoices):
+        PENDENTE = 'PENDENTE', _('Pendente')
+        EM_CURSO = 'EM_CURSO', _('Em Curso')
+        CONCLUIDO = 'CONCLUIDO', _('Concluído')
+        CONCLUIDO_COM_ERROS = 'CONCLUIDO_COM_ERROS', _('Concluído com Erros')
+
+    ESTADOS_ACTIVOS = (Estado.PENDENTE, Estado.EM_CURSO)
+
+    utilizador = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='envios_defc', verbose_name=_("Solicitado por")
+    )
+    estado = models.CharField(_("Estado"), max_length=20, choices=Estado.choices, default=Estado.PENDENTE)
+    total = models.PositiveIntegerField(_("Total de Candidatos"), default=0)
+    enviados = models.PositiveIntegerField(_("Enviados"), default=0)
+    falhados = models.PositiveIntegerField(_("Falhados"), default=0)
+
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(null=True, blank=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Envio para DEFC")
+        verbose_name_plural = _("Envios para DEFC")
+        ordering = ['-data_criacao']
+        indexes = [models.Index(fields=['estado', 'data_criacao'])]
+
+    def __str__(self):
+        return f"Envio DEFC #{self.pk} ({self.get_estado_display()})"
+
+    @property
+    def pendentes(self):
+        return max(self.total - self.enviados - self.falhados, 0)
+
+    @classmethod
+    def solicitar(cls, candidatos, utilizador=None):
+        """
+        Põe em fila os `candidatos` (queryset) que ainda não foram enviados nem
+        estão num envio activo. Retorna o EnvioDEFC, ou None se não houver nenhum.
+        """
+        from django.db import transaction
+
+        ids = list(
+            candidatos.filter(enviado_defc=False)
+            .exclude(itens_envio_defc__envio__estado__in=cls.ESTADOS_ACTIVOS)
+            .order_by().values_list('pk', flat=True).distinct()
+        )
+        if not ids:
+            return None
+        with transaction.atomic():
+            envio = cls.objects.create(utilizador=utilizador, total=len(ids))
+            ItemEnvioDEFC.objects.bulk_create(
+                [ItemEnvioDEFC(envio=envio, candidato_id=pk) for pk in ids], batch_size=1000
+            )
+        return envio
+
+    @classmethod
+    def reservar_proximo(cls):
+        """Marca o envio pendente mais antigo como EM_CURSO e devolve-o."""
+        from django.utils import timezone
+        pendentes = cls.objects.filter(estado=cls.Estado.PENDENTE).order_by('data_criacao').values_list('pk', flat=True)[:10]
+        for pk in pendentes:
+            if cls.objects.filter(pk=pk, estado=cls.Estado.PENDENTE).update(
+                estado=cls.Estado.EM_CURSO, data_inicio=timezone.now()
+            ):
+                return cls.objects.get(pk=pk)
+        return None
+
+    @classmethod
+    def recuperar_abandonados(cls, limite):
+        """Volta a pôr em fila os envios EM_CURSO iniciados antes de `limite` (worker morto)."""
+        return cls.objects.filter(estado=cls.Estado.EM_CURSO, data_inicio__lt=limite).update(
+            estado=cls.Estado.PENDENTE, data_inicio=None
+        )
+
+
+class ItemEnvioDEFC(models.Model):
+    """Resultado do envio de um candidato para o DEFC."""
+    class Estado(models.TextChoices):
+        PENDENTE = 'PENDENTE', _('Pendente')
+        ENVIADO = 'ENVIADO', _('Enviado')
+        FALHADO = 'FALHADO', _('Falhado')
+
+    envio = models.ForeignKey(EnvioDEFC, on_delete=models.CASCADE, related_name='itens')
+    candidato = models.ForeignKey(Candidato, on_delete=models.CASCADE, related_name='itens_envio_defc')
+    estado = models.CharField(_("Estado"), max_length=10, choices=Estado.choices, default=Estado.PENDENTE)
+    id_defc = models.CharField(_("ID no Sistema DEFC"), max_length=50, blank=True)
+    tentativas = models.PositiveSmallIntegerField(_("Tentativas"), default=0)
+    erro = models.TextField(_("Erro"), blank=True)
+    data_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Candidato do Envio DEFC")
+        verbose_name_plural = _("Candidatos do Envio DEFC")
+        constraints = [
+            models.UniqueConstraint(fields=['envio', 'candidato'], name='item_envio_defc_unico')
+        ]
+        indexes = [models.Index(fields=['envio', 'estado'])]
+
+    def __str__(self):
+        return f"{self.candidato_id} → DEFC ({self.get_estado_display()})"
+
+class MedicaoVista(models.Model):
+    """
+    Medições agregadas por nome de URL (número de queries, tempos de base de
+    dados, renderização e total), acumuladas pelo InstrumentacaoMiddleware.
+    Ver sicfaae_comum/instrumentacao.py.
+    """
+    nome_url = models.CharField(_("Nome da URL"), max_length=200, unique=True)
+    pedidos = models.PositiveIntegerField(_("Pedidos"), default=0)
+    queries = models.PositiveBigIntegerField(_("Total de Queries"), default=0)
+    max_queries = models.PositiveIntegerField(_("Máximo de Queries"), default=0)
+    pedidos_com_duplicadas = models.PositiveIntegerField(_("Pedidos com Queries Repetidas"), default=0)
+    exemplo_duplicada = models.TextField(_("Última Query Repetida"), blank=True)
+    tempo_db = models.FloatField(_("Tempo de BD (ms, total)"), default=0)
+    tempo_render = models.FloatField(_("Tempo de Renderização (ms, total)"), default=0)
+    tempo_total = models.FloatField(_("Tempo Total (ms, total)"), default=0)
+    max_tempo_total = models.FloatField(_("Tempo Máximo (ms)"), default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Medição de Vista")
+        verbose_name_plural = _("Medições de Vistas")
+        ordering = ['-tempo_total']
+
+    def __str__(self):
+        return self.nome_url
+
+    def _media(self, total):
+        return round(total / self.pedidos, 1) if self.pedidos else 0
+
+    @property
+    def media_queries(self):
+        return self._media(self.queries)
+
+    @property
+    def media_tempo_db(self):
+        return self._media(self.tempo_db)
+
+    @property
+    def media_tempo_render(self):
+        return self._media(self.tempo_render)
+
+    @property
+    def media_tempo_total(self):
+        return self._media(self.tempo_total)
+
+    @classmethod
+    def registar(cls, agregados):
+        """Soma os agregados {nome_url: {...}} de um processo às linhas existentes."""
+        from django.db import transaction
+        from django.db.models import F
+        from django.db.models.functions import Greatest
+
+        with transaction.atomic():
+            for nome, a in agregados.items():
+                valores = {
+                    'pedidos': F('pedidos') + a['pedidos'],
+                    'queries': F('queries') + a['queries'],
+                    'max_queries': Greatest('max_queries', a['max_queries']),
+                    'pedidos_com_duplicadas': F('pedidos_com_duplicadas') + a['pedidos_com_duplicadas'],
+                    'tempo_db': F('tempo_db') + a['tempo_db'],
+                    'tempo_render': F('tempo_render') + a['tempo_render'],
+                    'tempo_total': F('tempo_total') + a['tempo_total'],
+                    'max_tempo_total': Greatest('max_tempo_total', a['max_tempo_total']),
+                    'data_atualizacao': timezone.now(),
+                }
+                if a['exemplo_duplicada']:
+                    valores['exemplo_duplicada'] = a['exemplo_duplicada']
+                if not cls.objects.filter(nome_url=nome).update(**valores):
+                    cls.objects.get_or_create(nome_url=nome)
+                    cls.objects.filter(nome_url=nome).update(**valores)
 
 
 class PerfilUtilizador(models.Model):
@@ -537,3 +1658,12 @@ def salvar_perfil_usuario(sender, instance, **kwargs):
     """Guarda o perfil quando o utilizador é guardado."""
     if not instance.is_superuser and hasattr(instance, 'perfil'):
         instance.perfil.save()
+
+
+@receiver(post_save, sender=PerfilUtilizador)
+@receiver(post_delete, sender=PerfilUtilizador)
+def invalidar_escopo_utilizador(sender, instance, **kwargs):
+    """Remove da cache o perfil usado por candidaturas.escopo."""
+    from django.core.cache import cache
+    from .escopo import chave_cache
+    cache.delete(chave_cache(instance.usuario_id))
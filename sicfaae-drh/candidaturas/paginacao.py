@@ -0,0 +1,14 @@
+"""
+Ordenação e paginação por cursor das listagens de candidatos.
+
+A ordenação (data_criacao, id) é servida pelo índice com os mesmos campos de
+Candidato; o cursor (sicfaae_comum.paginacao) guarda os dois valores, pelo
+que a página 1000 custa o mesmo que a primeira, mesmo com datas repetidas.
+"""
+from sicfaae_comum.paginacao import PaginacaoCursor
+
+ORDENACAO_CANDIDATOS = ('-data_criacao', '-id')
+
+
+class CandidatoCursorPagination(PaginacaoCursor):
+    ordering = ORDENACAO_CANDIDATOS
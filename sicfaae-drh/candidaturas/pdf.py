@@ -0,0 +1,163 @@
+"""
+Serviço de geração de PDF (xhtml2pdf) usado por render_to_pdf e pelos PDFs de candidato.
+
+Para não repetir o mesmo trabalho em cada pedido:
+- link_callback resolve os URIs de estáticos uma única vez por processo
+  (finders.find percorre todas as pastas de estáticos) e troca as fotos dos
+  candidatos pela miniatura de PDF (sicfaae_comum/miniaturas.py), quando já existe;
+- pdf_candidato() guarda o PDF de cada candidato no storage, com chave no
+  template, em data_atualizacao e na `versao` indicada por quem chama (os
+  dados de outras tabelas que o template mostra, como a entrevista ou a vaga,
+  e a data de emissão): os downloads repetidos são servidos do ficheiro
+  gravado e uma alteração de qualquer destes dados gera uma versão nova. As
+  versões substituídas são apagadas mais tarde pelo worker
+  (limpar_versoes_antigas), e não no pedido que gera a nova, que pode correr
+  ao mesmo tempo que um download da anterior.
+
+Listas longas (relatórios com milhares de candidatos) não são paginadas pelo
+xhtml2pdf num só documento: render_pdf_em_blocos() renderiza blocos de
+tamanho fixo, cada um um documento separado, e junta-os com o PdfWriter do
+pypdf. O xhtml2pdf só tem um bloco em memória de cada vez; os recursos
+repetidos em todos os blocos (tipos de letra, imagens) ficam uma só vez no
+ficheiro final (compress_identical_objects).
+"""
+import functools
+import hashlib
+import itertools
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import get_template
+from pypdf import PdfReader, PdfWriter
+from xhtml2pdf import pisa
+
+from sicfaae_comum import miniaturas
+
+PASTA_CACHE = 'pdf_cache'
+# Minutos durante os quais uma versão substituída ainda pode estar a ser descarregada
+VALIDADE_VERSAO_ANTIGA = getattr(settings, 'PDF_CACHE_VALIDADE_VERSAO_ANTIGA', 10)
+
+
+@functools.lru_cache(maxsize=512)
+def _resolver_estatico(uri, static_url, static_root):
+    if static_url and uri.startswith(static_url):
+        return os.path.join(static_root, uri.replace(static_url, ""))
+    result = finders.find(uri)
+    if result:
+        if not isinstance(result, (list, tuple)):
+            result = [result]
+        return os.path.normpath(result[0])
+    return uri
+
+
+def link_callback(uri, rel):
+    """
+    Converte URIs HTML para caminhos absolutos do sistema para o xhtml2pdf.
+    """
+    if settings.MEDIA_URL and uri.startswith(settings.MEDIA_URL):
+        # Não fica em cache: a miniatura de uma foto pode ainda não existir
+        nome = uri.replace(settings.MEDIA_URL, "")
+        return miniaturas.caminho(nome, 'pdf') or os.path.join(str(settings.MEDIA_ROOT), nome)
+    return _resolver_estatico(uri, settings.STATIC_URL, str(settings.STATIC_ROOT))
+
+
+def render_pdf_bytes(template_src, context_dict=None):
+    """Renderiza o template para PDF. Retorna (bytes, erro)."""
+    html = get_template(template_src).render(context_dict or {})
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result, link_callback=link_callback)
+    if pdf.err:
+        return None, pdf.err
+    return result.getvalue(), None
+
+
+def _versao_template(template_src):
+    origem = get_template(template_src).origin.name
+    try:
+        return os.path.getmtime(origem)
+    except (OSError, TypeError):
+        return 0
+
+
+def pdf_candidato(candidato, template_src, obter_contexto, versao=()):
+    """
+    Nome no storage do PDF de `candidato` gerado com `template_src`. O PDF só é
+    gerado (com o contexto devolvido por `obter_contexto()`) se ainda não existir
+    para esta versão do candidato, do template e de `versao` (valores de tudo o
+    que o template mostra além do próprio candidato). Retorna (nome, erro).
+    """
+    pasta = f"{PASTA_CACHE}/{os.path.splitext(os.path.basename(template_src))[0]}/{candidato.pk}"
+    partes = [template_src, _versao_template(template_src), candidato.data_atualizacao.isoformat(), *versao]
+    chave = hashlib.sha256('|'.join(map(str, partes)).encode()).hexdigest()[:20]
+    nome = f"{pasta}/{chave}.pdf"
+    if default_storage.exists(nome):
+        return nome, None
+
+    conteudo, erro = render_pdf_bytes(template_src, obter_contexto())
+    if erro:
+        return None, erro
+    return default_storage.save(nome, ContentFile(conteudo)), None
+
+
+def _listar(pasta):
+    try:
+        return default_storage.listdir(pasta)
+    except (FileNotFoundError, NotImplementedError):
+        return [], []
+
+
+def limpar_versoes_antigas(limite):
+    """
+    Apaga os PDFs de candidato que já têm uma versão mais recente e foram
+    gravados antes de `limite`. Retorna o número de ficheiros apagados.
+    """
+    apagados = 0
+    for template in _listar(PASTA_CACHE)[0]:
+        for candidato in _listar(f"{PASTA_CACHE}/{template}")[0]:
+            pasta = f"{PASTA_CACHE}/{template}/{candidato}"
+            versoes = sorted(
+                (default_storage.get_modified_time(f"{pasta}/{ficheiro}"), ficheiro)
+                for ficheiro in _listar(pasta)[1]
+            )
+            for data, ficheiro in versoes[:-1]:
+                if data < limite:
+                    default_storage.delete(f"{pasta}/{ficheiro}")
+                    apagados += 1
+    return apagados
+
+
+def render_pdf_em_blocos(destino, template_src, contexto, nome_lista, tamanho_bloco, progresso=None):
+    """
+    Escreve em `destino` o PDF de `template_src` com a lista `contexto[nome_lista]`
+    (um queryset) renderizada em blocos de `tamanho_bloco` linhas. Cada bloco é
+    um documento xhtml2pdf com `inicio` (linhas anteriores), `total` e
+    `continuacao` (False só no primeiro) no contexto. `progresso(fraccao)` é
+    chamado após cada bloco. Lança RuntimeError se um bloco falhar.
+    """
+    itens = contexto[nome_lista]
+    total = itens.count()
+    linhas = itens.iterator(chunk_size=tamanho_bloco)
+    juncao = PdfWriter()
+    inicio = 0
+    while True:
+        bloco = list(itertools.islice(linhas, tamanho_bloco))
+        if not bloco and inicio:
+            break
+        conteudo, erro = render_pdf_bytes(template_src, {
+            **contexto, nome_lista: bloco, 'inicio': inicio, 'total': total, 'continuacao': inicio > 0,
+        })
+        if erro:
+            raise RuntimeError(f"Erro ao gerar PDF (linhas {inicio + 1}-{inicio + len(bloco)}): {erro}")
+        juncao.append(PdfReader(BytesIO(conteudo)))
+        inicio += len(bloco)
+        if progresso and total:
+            progresso(inicio / total)
+        if len(bloco) < tamanho_bloco:
+            break
+    juncao.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    juncao.write(destino)
+    return total
@@ -1,21 +1,15 @@
 from django.contrib.auth.models import User
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
-from .models import Candidato, PerfilUtilizador
+from .models import Candidato, EstatisticaCandidatos, PerfilUtilizador
+from .escopo import obter_escopo
 
 def obter_perfil_usuario(usuario):
     """
     Obtém o perfil do utilizador. Retorna None para superusers.
+    O perfil é resolvido uma vez por pedido (ver candidaturas/escopo.py).
     """
-    if not usuario.is_authenticated:
-        return None
-
-    if usuario.is_superuser:
-        return None
-    
-    # Cria perfil se não existir
-    perfil, criado = PerfilUtilizador.objects.get_or_create(usuario=usuario)
-    return perfil
+    return obter_escopo(usuario).perfil
 
 
 def obter_candidatos_acessiveis(usuario):
@@ -27,57 +21,22 @@ def obter_candidatos_acessiveis(usuario):
     - Provincial: Candidatos da sua província
     - Distrital: Candidatos do seu distrito
     """
-    if usuario.is_superuser:
-        return Candidato.objects.all()
-    
-    perfil = obter_perfil_usuario(usuario)
-    
-    if not perfil:
-        return Candidato.objects.none()
-    
-    if perfil.nivel == PerfilUtilizador.Nivel.CENTRAL:
-        return Candidato.objects.all()
-    
-    elif perfil.nivel == PerfilUtilizador.Nivel.PROVINCIAL:
-        if not perfil.provincia:
-            return Candidato.objects.none()
-        return Candidato.objects.filter(provincia=perfil.provincia)
-    
-    elif perfil.nivel == PerfilUtilizador.Nivel.DISTRITAL:
-        # Strict checking: must have district AND province assigned
-        if not perfil.distrito:
-            return Candidato.objects.none()
-        return Candidato.objects.filter(
-            distrito=perfil.distrito
-        )
-    
-    return Candidato.objects.none()
+    return obter_escopo(usuario).filtrar(Candidato.objects.all())
+
 
 
+def obter_estatisticas_acessiveis(usuario):
+    """
+    Retorna as linhas de EstatisticaCandidatos visíveis ao utilizador,
+    com o mesmo âmbito de obter_candidatos_acessiveis.
+    """
+    return obter_escopo(usuario).filtrar(EstatisticaCandidatos.objects.all())
+
 def pode_ver_candidato(usuario, candidato):
     """
     Verifica se o utilizador pode VER um candidato.
     """
-    if usuario.is_superuser:
-        return True
-    
-    perfil = obter_perfil_usuario(usuario)
-    
-    if not perfil:
-        return False
-    
-    if perfil.nivel == PerfilUtilizador.Nivel.CENTRAL:
-        return True
-    
-    elif perfil.nivel == PerfilUtilizador.Nivel.PROVINCIAL:
-        # Pode ver se for da sua província
-        return candidato.provincia == perfil.provincia
-    
-    elif perfil.nivel == PerfilUtilizador.Nivel.DISTRITAL:
-        # Pode ver se for do seu distrito
-        return candidato.distrito == perfil.distrito
-    
-    return False
+    return obter_escopo(usuario).abrange(candidato.provincia_id, candidato.distrito_id)
 
 
 def pode_gerir_candidato(usuario, candidato):
@@ -85,27 +44,15 @@ def pode_gerir_candidato(usuario, candidato):
     Verifica se o utilizador pode GERIR (aprovar/rejeitar/editar) um candidato.
     AGORA: Apenas DISTRITAL pode gerir.
     """
-    if usuario.is_superuser:
-        return False # Superuser vê tudo mas não gere (política definida)
-    
-    perfil = obter_perfil_usuario(usuario)
-    
-    if not perfil:
-        return False
+    escopo = obter_escopo(usuario)
     
-    # Central e Provincial: Apenas visualizam (retorna False para gestão)
-    if perfil.nivel in [PerfilUtilizador.Nivel.CENTRAL, PerfilUtilizador.Nivel.PROVINCIAL]:
+    # Superuser vê tudo mas não gere (política definida);
+    # Central e Provincial: Apenas visualizam
+    if not escopo.is_distrital:
         return False
     
     # Distrital: Pode gerir se for do seu distrito
-    elif perfil.nivel == PerfilUtilizador.Nivel.DISTRITAL:
-        return candidato.distrito == perfil.distrito
-        
-    # Provincial: Pode gerir se for da sua província
-    elif perfil.nivel == PerfilUtilizador.Nivel.PROVINCIAL:
-        return candidato.provincia == perfil.provincia
-    
-    return False
+    return candidato.distrito_id == escopo.distrito_id
 
 
 def filtrar_candidatos_por_provincia(queryset, provincia):
@@ -180,3 +127,15 @@ def obter_exibicao_nivel_usuario(usuario):
     else:
         nome_dist = perfil.distrito.nome if perfil.distrito else 'Não Atribuído'
         return f"STAE Distrital - {nome_dist}"
+
+
+def pode_ver_tarefa(usuario, tarefa):
+    """
+    Verifica se o utilizador pode acompanhar/descarregar uma TarefaRelatorio:
+    quem a pediu, ou quem tem o mesmo âmbito de dados (pedidos reaproveitados).
+    """
+    if usuario.is_superuser:
+        return True
+    if tarefa.utilizador_id == usuario.id:
+        return True
+    return obter_escopo(usuario).chave == tarefa.escopo
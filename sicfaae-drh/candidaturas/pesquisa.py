@@ -0,0 +1,79 @@
+"""
+Normalização de texto para a pesquisa de candidatos.
+
+Os candidatos são indexados na tabela TermoPesquisaCandidato (ver models.py):
+cada palavra do nome, o BI, o código e o telefone ficam guardados em
+minúsculas, sem acentos nem separadores, com um índice (tipo, termo).
+
+A pesquisa por prefixo é feita com um intervalo `prefixo <= termo < limite`
+em vez de LIKE '%...%', pelo que usa o índice B-tree tanto em SQLite como em
+PostgreSQL, independentemente da collation (os termos só têm [0-9a-z]).
+
+Este módulo não importa modelos, para poder ser usado nas migrações.
+"""
+import re
+import unicodedata
+
+NOME = 'N'
+BI = 'B'
+CODIGO = 'C'
+TELEFONE = 'T'
+DOCUMENTOS = (BI, CODIGO)
+
+# Relevância de cada termo encontrado: documento > primeiro nome > restantes nomes
+PESO_DOCUMENTO = 10
+PESO_PRIMEIRO_NOME = 3
+PESO_NOME = 1
+
+TAMANHO_TERMO = 40
+
+
+def normalizar(texto):
+    """'João  Mário-Silva' -> ['joao', 'mario', 'silva']"""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return [palavra[:TAMANHO_TERMO] for palavra in re.findall(r'[0-9a-z]+', texto)]
+
+
+def compactar(texto):
+    """'A-B-0001234-C' -> 'ab0001234c'; usado para BI e código."""
+    return ''.join(normalizar(texto))[:TAMANHO_TERMO]
+
+
+def apenas_digitos(telefone):
+    """'+258 84 123 4567' -> '841234567' (sem o indicativo de Moçambique)."""
+    digitos = ''.join(c for c in str(telefone or '') if c.isdigit())
+    if len(digitos) == 12 and digitos.startswith('258'):
+        digitos = digitos[3:]
+    return digitos[:TAMANHO_TERMO]
+
+
+def termos_candidato(nome_completo, numero_bi, codigo_candidato, numero_telefone):
+    """Lista de (tipo, termo, peso) a indexar para um candidato."""
+    termos = {}
+    for posicao, palavra in enumerate(normalizar(nome_completo)):
+        peso = PESO_PRIMEIRO_NOME if posicao == 0 else PESO_NOME
+        termos[(NOME, palavra)] = max(peso, termos.get((NOME, palavra), 0))
+    for tipo, termo in ((BI, compactar(numero_bi)), (CODIGO, compactar(codigo_candidato))):
+        if termo:
+            termos[(tipo, termo)] = PESO_DOCUMENTO
+    telefone = apenas_digitos(numero_telefone)
+    if telefone:
+        termos[(TELEFONE, telefone)] = 0
+    return [(tipo, termo, peso) for (tipo, termo), peso in termos.items()]
+
+
+def _seguinte(caracter):
+    return 'a' if caracter == '9' else chr(ord(caracter) + 1)
+
+
+def intervalo_prefixo(prefixo):
+    """
+    Filtros de campo para `termo` começar por `prefixo`: {'termo__gte': 'jo', 'termo__lt': 'jp'}.
+    Os termos só têm [0-9a-z], e os dígitos ordenam antes das letras em qualquer collation.
+    """
+    filtros = {'termo__gte': prefixo}
+    base = prefixo.rstrip('z')
+    if base:
+        filtros['termo__lt'] = base[:-1] + _seguinte(base[-1])
+    return filtros
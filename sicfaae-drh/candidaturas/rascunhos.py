@@ -0,0 +1,56 @@
+"""
+Rascunho do registo de candidatura em duas etapas.
+
+Os dados da Etapa 1 não vão para a sessão (uma escrita em django_session por
+candidato, e uma leitura em cada pedido seguinte): ficam num cookie comprimido
+e cifrado com Fernet (AES + HMAC), com uma chave derivada da SECRET_KEY. O
+servidor não guarda nada; os dados pessoais não podem ser lidos no browser, o
+cookie só é aceite durante VALIDADE segundos e qualquer alteração invalida-o.
+É apagado quando a candidatura é submetida.
+
+Os carregamentos em blocos (views_carregamentos.py) exigem o mesmo rascunho.
+"""
+import base64
+import json
+import zlib
+
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+COOKIE = 'rascunho_candidatura_drh'
+SAL = 'candidaturas.rascunhos'
+VALIDADE = getattr(settings, 'RASCUNHO_CANDIDATURA_VALIDADE', 60 * 60)
+
+
+def _fernet():
+    chave = salted_hmac(SAL, 'cookie', algorithm='sha256').digest()
+    return Fernet(base64.urlsafe_b64encode(chave))
+
+
+def criar_token(dados):
+    return _fernet().encrypt(zlib.compress(json.dumps(dados).encode())).decode()
+
+
+def ler(request):
+    """Dados da Etapa 1 do rascunho do pedido, ou None se não houver (ou tiver expirado)."""
+    token = request.COOKIES.get(COOKIE)
+    if not token:
+        return None
+    try:
+        return json.loads(zlib.decompress(_fernet().decrypt(token.encode(), ttl=VALIDADE)))
+    except (InvalidToken, zlib.error, ValueError):
+        return None
+
+
+def guardar(resposta, dados):
+    resposta.set_cookie(
+        COOKIE, criar_token(dados), max_age=VALIDADE, httponly=True, samesite='Lax',
+        secure=getattr(settings, 'SESSION_COOKIE_SECURE', False),
+    )
+    return resposta
+
+
+def apagar(resposta):
+    resposta.delete_cookie(COOKIE, samesite='Lax')
+    return resposta
@@ -0,0 +1,62 @@
+"""
+Nomes de vagas, províncias e distritos em memória do processo, para as páginas
+públicas do registo (Etapa 2) não consultarem estas tabelas em cada pedido.
+
+A cache é carregada de uma vez (três consultas) e recarregada ao fim de
+VALIDADE segundos. Os signals de Vaga, Provincia e Distrito (models.py)
+esvaziam-na no processo que fez a alteração; nos restantes processos a
+alteração aparece quando a validade termina, ou logo que seja pedido um id
+que ainda não está na cache.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+VALIDADE = getattr(settings, 'REFERENCIAS_CACHE_VALIDADE', 5 * 60)
+
+
+class _Referencias:
+    def __init__(self):
+        self._nomes = None
+        self._carregado_em = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _carregar():
+        from core.models import Provincia, Distrito
+        from .models import Vaga
+
+        provincias = dict(Provincia.objects.values_list('id', 'nome'))
+        return {
+            'vaga': dict(Vaga.objects.values_list('id', 'titulo')),
+            'provincia': provincias,
+            # Como Distrito.__str__
+            'distrito': {
+                pk: f"{nome} ({provincias.get(provincia_id, '')})"
+                for pk, nome, provincia_id in Distrito.objects.values_list('id', 'nome', 'provincia_id')
+            },
+        }
+
+    def _obter(self, recarregar=False):
+        with self._lock:
+            if recarregar or self._nomes is None or time.monotonic() - self._carregado_em > VALIDADE:
+                self._nomes = self._carregar()
+                self._carregado_em = time.monotonic()
+            return self._nomes
+
+    def nome(self, tipo, pk):
+        """Nome da vaga/província/distrito (`tipo`) com id `pk`, ou None se não existir."""
+        if pk is None:
+            return None
+        nomes = self._obter()
+        if pk not in nomes[tipo]:
+            nomes = self._obter(recarregar=True)
+        return nomes[tipo].get(pk)
+
+    def invalidar(self):
+        with self._lock:
+            self._nomes = None
+
+
+referencias = _Referencias()
@@ -8,6 +8,8 @@ class CandidatoParaDEFCSerializer(serializers.ModelSerializer):
     provincia_nome = serializers.CharField(source='provincia.nome', read_only=True)
     distrito_nome = serializers.CharField(source='distrito.nome', read_only=True)
     vaga_titulo = serializers.CharField(source='vaga.titulo', read_only=True)
+    # Nome da foto no armazenamento por conteúdo, para o DEFC partilhar o ficheiro
+    foto_conteudo = serializers.SerializerMethodField()
     
     class Meta:
         model = Candidato
@@ -28,9 +30,26 @@ class CandidatoParaDEFCSerializer(serializers.ModelSerializer):
             'vaga_titulo',
             'estado',
             'foto',
+            'foto_conteudo',
         ]
         read_only_fields = ['id', 'codigo_candidato', 'estado']
+    
+    def get_foto_conteudo(self, candidato):
+        from sicfaae_comum.armazenamento import e_conteudo
+        return candidato.foto.name if e_conteudo(candidato.foto.name) else ''
+
+
 
+class CandidatoAlteracaoSerializer(CandidatoParaDEFCSerializer):
+    """Candidato no feed de alterações para o DEFC (candidaturas/alteracoes.py)"""
+    activo = serializers.SerializerMethodField()
+    
+    class Meta(CandidatoParaDEFCSerializer.Meta):
+        fields = CandidatoParaDEFCSerializer.Meta.fields + ['data_atualizacao', 'activo']
+    
+    def get_activo(self, candidato):
+        from .alteracoes import ESTADOS_DEFC
+        return candidato.estado in ESTADOS_DEFC
 
 class CandidatoListSerializer(serializers.ModelSerializer):
     """Serializer para listagem de candidatos"""
@@ -0,0 +1,220 @@
+"""
+Relatórios PDF, exportações e importações Excel (e o documento oficial de
+abertura de concurso) executados fora do pedido HTTP.
+
+As views geram o ficheiro na hora quando o volume é pequeno; acima dos
+limites abaixo criam uma TarefaRelatorio, que o comando
+`python manage.py processar_tarefas` executa e guarda em MEDIA_ROOT.
+As importações (candidaturas/importacao.py) correm sempre em segundo plano.
+"""
+import datetime
+import tempfile
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.files import File
+from django.core.files.base import ContentFile
+from .models import Candidato, TarefaRelatorio, Vaga
+
+# Número de candidatos a partir do qual o relatório passa para segundo plano
+LIMITE_SINCRONO_PDF = getattr(settings, 'RELATORIOS_LIMITE_SINCRONO_PDF', 300)
+LIMITE_SINCRONO_EXCEL = getattr(settings, 'RELATORIOS_LIMITE_SINCRONO_EXCEL', 5000)
+
+# Linhas por documento xhtml2pdf nos relatórios em lista (ver candidaturas/pdf.py)
+TAMANHO_BLOCO_PDF = getattr(settings, 'RELATORIOS_PDF_TAMANHO_BLOCO', 200)
+
+# Intervalo (em linhas) entre actualizações de progresso
+PASSO_PROGRESSO = 1000
+
+TIPOS_RELATORIO = ('geral', 'pendentes', 'rejeitados', 'estatisticas', 'auditoria')
+
+
+def candidatos_relatorio(user, tipo_relatorio):
+    """Candidatos acessíveis ao utilizador, filtrados pelo tipo de relatório."""
+    from .permissions import obter_candidatos_acessiveis
+    queryset_base = obter_candidatos_acessiveis(user)
+
+    if tipo_relatorio in ('geral', 'estatisticas'):
+        return queryset_base
+    elif tipo_relatorio == 'pendentes':
+        return queryset_base.filter(estado=Candidato.Estado.PENDENTE)
+    elif tipo_relatorio == 'rejeitados':
+        return queryset_base.filter(estado=Candidato.Estado.ENTREVISTA_REPROVADA)
+    return Candidato.objects.none()
+
+
+def preparar_relatorio_pdf(user, tipo_relatorio):
+    """Retorna (template, context) do relatório PDF `tipo_relatorio`."""
+    from .managers import GestorEstatisticas
+    from .permissions import obter_exibicao_nivel_usuario
+
+    titulo = "Relatório"
+    template = 'candidaturas/pdf/lista_generica.html'
+    context = {}
+
+    queryset = candidatos_relatorio(user, tipo_relatorio).select_related('provincia', 'distrito').order_by('nome_completo')
+
+    if tipo_relatorio == 'geral':
+        titulo = "Lista Geral de Inscritos"
+
+    elif tipo_relatorio == 'pendentes':
+        titulo = "Relatório de Candidaturas Pendentes"
+
+    elif tipo_relatorio == 'rejeitados':
+        titulo = "Relatório de Candidaturas Rejeitadas"
+
+    elif tipo_relatorio == 'estatisticas':
+        titulo = "Resumo Estatístico de Candidaturas"
+        gestor = GestorEstatisticas(user)
+        stats_gerais = gestor.obter_estatisticas_gerais()
+
+        template = 'candidaturas/pdf/resumo_estatistico.html'
+        context['stats_total'] = stats_gerais['total_candidatos']
+        context['stats_role'] = stats_gerais['stats_funcao']
+        context['stats_status'] = stats_gerais['stats_estado']
+
+    elif tipo_relatorio == 'auditoria':
+        if not user.is_superuser:
+             raise PermissionDenied("Apenas superusuários podem gerar relatórios de auditoria.")
+
+        titulo = "Relatório de Auditoria do Sistema (Audit Log)"
+        template = 'candidaturas/pdf/auditoria_log.html'
+
+        # Obter histórico (últimos 100 eventos)
+        # Note: Candidato.history.all() vem do django-simple-history
+        context['historico'] = Candidato.history.select_related('history_user').order_by('-history_date')[:100]
+
+    else:
+        titulo = "Relatório Desconhecido"
+
+    if tipo_relatorio != 'estatisticas':
+        context['candidatos'] = queryset
+        context['inicio'] = 0
+
+    context['titulo'] = titulo
+    context['area_nome'] = obter_exibicao_nivel_usuario(user)
+    context['data'] = datetime.datetime.now()
+    return template, context
+
+
+def nome_relatorio_pdf(tipo_relatorio):
+    return f"Relatorio_{tipo_relatorio}_{datetime.datetime.now().strftime('%Y%m%d')}.pdf"
+
+
+def nome_exportacao_excel(tipo_relatorio, extensao='xlsx'):
+    prefixos = {'pendentes': 'candidatos_pendentes', 'rejeitados': 'candidatos_rejeitados'}
+    prefixo = prefixos.get(tipo_relatorio, 'candidatos_geral')
+    return f'{prefixo}_{datetime.datetime.now().strftime("%Y%m%d_%H%M")}.{extensao}'
+
+
+# --- Execução das tarefas (worker) ---
+
+def executar_relatorio_pdf(tarefa):
+    from .pdf import render_pdf_bytes, render_pdf_em_blocos
+
+    tipo_relatorio = tarefa.parametros.get('tipo_relatorio', 'geral')
+    template, context = preparar_relatorio_pdf(tarefa.utilizador, tipo_relatorio)
+    tarefa.definir_progresso(10)
+
+    if tipo_relatorio in ('geral', 'pendentes', 'rejeitados'):
+        # Listas: blocos de TAMANHO_BLOCO_PDF linhas juntos num ficheiro temporário
+        with tempfile.TemporaryFile(suffix='.pdf') as ficheiro:
+            render_pdf_em_blocos(
+                ficheiro, template, context, 'candidatos', TAMANHO_BLOCO_PDF,
+                progresso=lambda fraccao: tarefa.definir_progresso(10 + fraccao * 85),
+            )
+            ficheiro.seek(0)
+            tarefa.concluir(nome_relatorio_pdf(tipo_relatorio), File(ficheiro))
+        return
+
+    conteudo, erro = render_pdf_bytes(template, context)
+    if erro:
+        raise RuntimeError(f"Erro ao gerar PDF: {erro}")
+    tarefa.concluir(nome_relatorio_pdf(tipo_relatorio), ContentFile(conteudo))
+
+
+def executar_exportacao_excel(tarefa):
+    from .exportacao import COLUNAS_CANDIDATOS, linhas_candidatos, escrever_xlsx
+
+    tipo_relatorio = tarefa.parametros.get('tipo_relatorio', 'geral')
+    candidatos = candidatos_relatorio(tarefa.utilizador, tipo_relatorio)
+    total = candidatos.count() or 1
+
+    def linhas_com_progresso():
+        for numero, linha in enumerate(linhas_candidatos(candidatos), 1):
+            if numero % PASSO_PROGRESSO == 0:
+                tarefa.definir_progresso(numero * 95 / total)
+            yield linha
+
+    with tempfile.TemporaryFile(suffix='.xlsx') as ficheiro:
+        escrever_xlsx(ficheiro, "Candidatos", [titulo for titulo, _ in COLUNAS_CANDIDATOS], linhas_com_progresso())
+        ficheiro.seek(0)
+        tarefa.concluir(nome_exportacao_excel(tipo_relatorio), File(ficheiro))
+
+
+def executar_importacao_excel(tarefa):
+    """Importa o ficheiro de entrada; o ficheiro final é o relatório das linhas com erro."""
+    from .exportacao import escrever_xlsx
+    from .importacao import CABECALHO_RELATORIO, ImportadorCandidatos
+
+    simular = tarefa.parametros.get('simular', False)
+    importador = ImportadorCandidatos(tarefa.utilizador, simular=simular)
+    with tarefa.entrada.open('rb') as entrada:
+        resumo = importador.importar(entrada, tarefa.parametros.get('formato', 'xlsx'), progresso=lambda fraccao: tarefa.definir_progresso(fraccao * 95))
+
+    prefixo = 'simulacao_importacao' if simular else 'importacao'
+    with tempfile.TemporaryFile(suffix='.xlsx') as ficheiro:
+        escrever_xlsx(ficheiro, "Erros", CABECALHO_RELATORIO, importador.erros)
+        ficheiro.seek(0)
+        tarefa.concluir(
+            f'{prefixo}_erros_{datetime.datetime.now().strftime("%Y%m%d_%H%M")}.xlsx',
+            File(ficheiro), resumo={**resumo, 'simulacao': simular},
+        )
+
+
+def executar_documento_concurso(tarefa):
+    """
+    Gera o aviso oficial do concurso (AbrirConcursoView, EditarVagaView). Se o
+    hash do conteúdo for igual ao do documento gravado, o PDF não é gerado de
+    novo. O documento pertence à vaga: a tarefa fica sem ficheiro próprio.
+    """
+    from django.utils import timezone
+    from .pdf import render_pdf_bytes
+
+    # Uma edição feita durante a geração reutiliza esta tarefa (mesma chave): volta a verificar
+    while True:
+        vaga = Vaga.objects.get(pk=tarefa.parametros['vaga'])
+        hash_concurso = vaga.calcular_hash_concurso()
+        if vaga.documento_concurso and vaga.hash_concurso == hash_concurso:
+            break
+        conteudo, erro = render_pdf_bytes(Vaga.TEMPLATE_CONCURSO, {'vaga': vaga, 'data_geracao': timezone.now()})
+        if erro:
+            raise RuntimeError(f"Erro ao gerar PDF oficial: {erro}")
+        anterior = vaga.documento_concurso.name
+        # O nome inclui a versão: o URL antigo pode continuar em cache (imutável) sem servir conteúdo novo
+        vaga.documento_concurso.save(
+            f"Concurso_Vaga_{vaga.pk}_{hash_concurso[:12]}.pdf", ContentFile(conteudo), save=False
+        )
+        # update(): não mexe em data_atualizacao nem sobrepõe edições feitas entretanto
+        Vaga.objects.filter(pk=vaga.pk).update(documento_concurso=vaga.documento_concurso.name, hash_concurso=hash_concurso)
+        if anterior and anterior != vaga.documento_concurso.name:
+            vaga.documento_concurso.storage.delete(anterior)
+    tarefa.concluir(resumo={'documento': vaga.documento_concurso.name})
+
+
+EXECUTORES = {
+    TarefaRelatorio.Tipo.RELATORIO_PDF: executar_relatorio_pdf,
+    TarefaRelatorio.Tipo.EXPORTAR_EXCEL: executar_exportacao_excel,
+    TarefaRelatorio.Tipo.IMPORTAR_EXCEL: executar_importacao_excel,
+    TarefaRelatorio.Tipo.DOCUMENTO_CONCURSO: executar_documento_concurso,
+}
+
+
+def executar_tarefa(tarefa):
+    """Executa uma tarefa já reservada. Erros ficam registados na própria tarefa."""
+    try:
+        if tarefa.utilizador is None:
+            raise RuntimeError("O utilizador que pediu o relatório já não existe.")
+        EXECUTORES[tarefa.tipo](tarefa)
+    except Exception as e:
+        tarefa.falhar(e)
+    return tarefa
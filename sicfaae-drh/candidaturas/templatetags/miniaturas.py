@@ -0,0 +1,11 @@
+from django import template
+
+from sicfaae_comum import miniaturas
+
+register = template.Library()
+
+
+@register.filter
+def miniatura(foto, tamanho):
+    """URL da miniatura da foto: {{ candidato.foto|miniatura:'cartao' }} (tamanhos em miniaturas.TAMANHOS)."""
+    return miniaturas.url(foto, tamanho)
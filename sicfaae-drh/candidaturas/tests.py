@@ -1,8 +1,13 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth.models import User
 from unittest.mock import patch
-from .models import Candidato, Provincia, Distrito, PerfilUtilizador
+import io
+import openpyxl
+from django.utils import timezone
+from .models import Candidato, EstatisticaCandidatos, Provincia, Distrito, PerfilUtilizador, Vaga
 from .managers import GestorEstatisticas
 
 class TesteFluxoCandidatura(TestCase):
@@ -32,34 +37,38 @@ class TesteFluxoCandidatura(TestCase):
             estado=Candidato.Estado.PENDENTE,
             provincia=self.provincia,
             distrito=self.distrito,
-            funcao=Candidato.Funcao.AGENTE_CIVICO
         )
 
-    @patch('candidaturas.views.render_to_pdf')
+        # Os PDFs gerados são guardados no storage
+        import shutil
+        import tempfile
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    @patch('candidaturas.pdf.render_pdf_bytes')
     def test_fluxo_completo(self, mock_render):
         # Mock PDF generation
-        mock_render.return_value = b'%PDF-1.4 mock'
-
-        # 1. Aprovar Documentos
-        url = reverse('candidaturas:verificar_candidato', args=[self.candidato.pk, 'aprovar'])
-        response = self.client.get(url, follow=True)
-        self.candidato.refresh_from_db()
-        self.assertEqual(self.candidato.estado, Candidato.Estado.DOCS_APROVADOS)
+        mock_render.return_value = (b'%PDF-1.4 mock', None)
 
-        # 2. Gerar PDF
+        # 1. Gerar PDF
         url_pdf = reverse('candidaturas:gerar_pdf', args=[self.candidato.pk])
         response_pdf = self.client.get(url_pdf)
         self.assertEqual(response_pdf.status_code, 200)
+        self.assertEqual(b''.join(response_pdf.streaming_content), b'%PDF-1.4 mock')
 
-        # 3. Enviar SMS (Muda para Entrevista Agendada)
+        # 2. Enviar SMS (Muda para Entrevista Agendada e redirecciona para o WhatsApp)
         url_sms = reverse('candidaturas:enviar_sms', args=[self.candidato.pk])
-        self.client.get(url_sms, follow=True)
+        response_sms = self.client.get(url_sms)
+        self.assertTrue(response_sms['Location'].startswith('https://wa.me/'))
         self.candidato.refresh_from_db()
         self.assertEqual(self.candidato.estado, Candidato.Estado.ENTREVISTA_AGENDADA)
 
-        # 4. Aprovar na Entrevista
+        # 3. Aprovar na Entrevista
         url_entrevista = reverse('candidaturas:registar_entrevista', args=[self.candidato.pk, 'passou'])
-        self.client.get(url_entrevista, follow=True)
+        self.client.get(url_entrevista)
         self.candidato.refresh_from_db()
         self.assertEqual(self.candidato.estado, Candidato.Estado.ENTREVISTA_APROVADA)
 
@@ -67,25 +76,28 @@ class TesteGestorEstatisticas(TestCase):
     def setUp(self):
         self.provincia = Provincia.objects.create(nome="Maputo")
         self.distrito = Distrito.objects.create(provincia=self.provincia, nome="KaMpfumo")
+        hoje = timezone.now().date()
+        self.brigadista = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        self.formador = Vaga.objects.create(titulo="Formador", data_inicio=hoje, data_fim=hoje)
         
         # Criar 3 candidatos
         Candidato.objects.create(
             nome_completo="C1", numero_bi="1", numero_telefone="1",
             provincia=self.provincia, distrito=self.distrito,
-            funcao=Candidato.Funcao.BRIGADISTA, estado=Candidato.Estado.PENDENTE
+            vaga=self.brigadista, estado=Candidato.Estado.PENDENTE
         )
         Candidato.objects.create(
             nome_completo="C2", numero_bi="2", numero_telefone="2",
             provincia=self.provincia, distrito=self.distrito,
-            funcao=Candidato.Funcao.BRIGADISTA, estado=Candidato.Estado.DOCS_APROVADOS
+            vaga=self.brigadista, estado=Candidato.Estado.ENTREVISTA_AGENDADA
         )
         Candidato.objects.create(
             nome_completo="C3", numero_bi="3", numero_telefone="3",
             provincia=self.provincia, distrito=self.distrito,
-            funcao=Candidato.Funcao.FORMADOR, estado=Candidato.Estado.PENDENTE
+            vaga=self.formador, estado=Candidato.Estado.PENDENTE
         )
 
-        self.user = User.objects.create_user('admin', 'password') # Sem perfil = Superuser logic fallback or base
+        self.user = User.objects.create_superuser('admin', password='password')
 
     def test_estatisticas_gerais(self):
         gestor = GestorEstatisticas(self.user)
@@ -107,3 +119,1237 @@ class TesteGestorEstatisticas(TestCase):
         
         pendentes = next(item for item in stats['stats_estado'] if item['label'] == 'Pendente')
         self.assertEqual(pendentes['count'], 2)
+
+    def test_estatisticas_acompanham_alteracoes(self):
+        c1 = Candidato.objects.get(numero_bi="1")
+        c1.estado = Candidato.Estado.ENTREVISTA_APROVADA
+        c1.genero = Candidato.Genero.FEMININO
+        c1.save()
+        Candidato.objects.filter(numero_bi="2").update(estado=Candidato.Estado.ENVIADO_DEFC)
+        Candidato.objects.get(numero_bi="3").delete()
+
+        gestor = GestorEstatisticas(self.user)
+        self.assertEqual(gestor.obter_estatisticas_gerais()['total_candidatos'], 2)
+        self.assertEqual(gestor.obter_detalhes_admissao(), {
+            'total_admitidos': 2, 'admitidos_homens': 1, 'admitidos_mulheres': 1
+        })
+
+        geografia = gestor.obter_distribuicao_geografica(is_central=True)
+        provincia = geografia['detalhes_provincia'][0]
+        self.assertEqual(provincia['total'], 2)
+        self.assertEqual(provincia['districts_stats'], [{'name': 'KaMpfumo', 'admitted': 2, 'total': 2}])
+
+        # A reconstrução completa deve coincidir com o estado incremental
+        antes = set(EstatisticaCandidatos.objects.filter(total__gt=0).values_list('chave', 'total'))
+        EstatisticaCandidatos.reconstruir()
+        self.assertEqual(set(EstatisticaCandidatos.objects.values_list('chave', 'total')), antes)
+
+    def test_bulk_create_com_conflitos_sem_reconstruir(self):
+        def novo(bi, estado=Candidato.Estado.PENDENTE):
+            return Candidato(
+                nome_completo=f"C{bi}", numero_bi=bi, codigo_candidato=f"B-{bi}", numero_telefone=bi,
+                provincia=self.provincia, distrito=self.distrito, vaga=self.brigadista, estado=estado
+            )
+
+        with patch.object(EstatisticaCandidatos, 'reconstruir', side_effect=AssertionError):
+            # "1" já existe e o segundo "4" repete o primeiro: só o primeiro "4" é inserido
+            Candidato.objects.bulk_create([novo("1"), novo("4"), novo("4")], ignore_conflicts=True)
+            # "2" já existe e muda de estado; "5" é inserido
+            Candidato.objects.bulk_create(
+                [novo("2", Candidato.Estado.ENTREVISTA_APROVADA), novo("5")],
+                update_conflicts=True, unique_fields=['numero_bi'], update_fields=['estado'],
+            )
+
+        self.assertEqual(Candidato.objects.count(), 5)
+        antes = set(EstatisticaCandidatos.objects.filter(total__gt=0).values_list('chave', 'total'))
+        EstatisticaCandidatos.reconstruir()
+        self.assertEqual(set(EstatisticaCandidatos.objects.values_list('chave', 'total')), antes)
+
+
+    def test_bulk_update_sem_reconstruir(self):
+        candidatos = list(Candidato.objects.order_by('numero_bi'))
+        candidatos[0].estado = Candidato.Estado.ENTREVISTA_APROVADA
+        candidatos[1].vaga = self.formador
+        candidatos[2].nome_completo = "C3 Alterado"  # não muda a chave
+
+        # bulk_update passa um Case por campo a update(): as chaves mudam linha a linha
+        with patch.object(EstatisticaCandidatos, 'reconstruir', side_effect=AssertionError):
+            Candidato.objects.bulk_update(candidatos, ['estado', 'vaga', 'nome_completo'])
+
+        antes = set(EstatisticaCandidatos.objects.filter(total__gt=0).values_list('chave', 'total'))
+        EstatisticaCandidatos.reconstruir()
+        self.assertEqual(set(EstatisticaCandidatos.objects.values_list('chave', 'total')), antes)
+
+    def test_gravar_usa_os_valores_lidos(self):
+        c1 = Candidato.objects.get(numero_bi="1")
+        c1.estado = Candidato.Estado.ENTREVISTA_APROVADA
+        with CaptureQueriesContext(connection) as ctx:
+            c1.save()
+        leituras = [q for q in ctx.captured_queries if 'FROM "candidaturas_candidato"' in q['sql']]
+        self.assertEqual(leituras, [])  # o pre_save não volta a ler a linha
+
+        # Os valores gravados passam a ser os anteriores do save seguinte
+        c1.genero = Candidato.Genero.FEMININO
+        c1.save(update_fields=['genero'])
+        # Sem os campos carregados, o pre_save lê-os da base de dados
+        c2 = Candidato.objects.only('pk', 'estado').get(numero_bi="2")
+        c2.estado = Candidato.Estado.ENVIADO_DEFC
+        c2.save(update_fields=['estado'])
+
+        antes = set(EstatisticaCandidatos.objects.filter(total__gt=0).values_list('chave', 'total'))
+        EstatisticaCandidatos.reconstruir()
+        self.assertEqual(set(EstatisticaCandidatos.objects.values_list('chave', 'total')), antes)
+
+
+class TesteSequenciaCodigoCandidato(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(nome="Gaza")
+        self.distrito = Distrito.objects.create(provincia=self.provincia, nome="Chókwè")
+
+    def criar_candidato(self, bi, **kwargs):
+        return Candidato.objects.create(
+            nome_completo=f"Candidato {bi}", numero_bi=bi, numero_telefone="841234567",
+            provincia=self.provincia, distrito=self.distrito, **kwargs
+        )
+
+    def test_codigos_sequenciais_por_distrito(self):
+        c1 = self.criar_candidato("100")
+        c2 = self.criar_candidato("101")
+        self.assertTrue(c1.codigo_candidato.endswith("-00000001-C"))
+        self.assertTrue(c2.codigo_candidato.endswith("-00000002-C"))
+
+    def test_insert_falhado_devolve_o_numero(self):
+        from django.db import IntegrityError
+
+        self.criar_candidato("100")
+        repetido = Candidato(
+            nome_completo="Repetido", numero_bi="100", numero_telefone="841234567",
+            provincia=self.provincia, distrito=self.distrito
+        )
+        with self.assertRaises(IntegrityError):
+            repetido.save()
+        self.assertEqual(repetido.codigo_candidato, '')
+
+        # O número reservado pela gravação falhada volta à sequência
+        c2 = self.criar_candidato("101")
+        self.assertTrue(c2.codigo_candidato.endswith("-00000002-C"))
+
+    def test_sequencia_continua_a_partir_de_codigos_existentes(self):
+        bloco = self.criar_candidato("100")._obter_bloco_distrito()
+        self.criar_candidato("101", codigo_candidato=f"G-{bloco}-00000041-C")
+        from .models import SequenciaCodigoCandidato
+        SequenciaCodigoCandidato.objects.all().delete()
+
+        c3 = self.criar_candidato("102")
+        self.assertEqual(c3.codigo_candidato, f"G-{bloco}-00000042-C")
+
+    def test_reservar_codigos_em_lote(self):
+        self.criar_candidato("100")  # cria a linha da sequência
+
+        def novos(prefixo, n):
+            return [
+                Candidato(nome_completo=f"{prefixo}{i}", numero_bi=f"{prefixo}{i}", numero_telefone="1",
+                          provincia=self.provincia, distrito=self.distrito)
+                for i in range(n)
+            ]
+
+        with CaptureQueriesContext(connection) as poucos:
+            lote_pequeno = Candidato.reservar_codigos(novos("P", 2))
+        with CaptureQueriesContext(connection) as muitos:
+            lote_grande = Candidato.reservar_codigos(novos("G", 50))
+
+        # O número de queries não depende do tamanho do lote
+        self.assertEqual(len(poucos), len(muitos))
+        numeros = [int(c.codigo_candidato.split('-')[2]) for c in lote_pequeno + lote_grande]
+        self.assertEqual(numeros, list(range(2, 54)))
+
+
+@override_settings(INSTRUMENTACAO_INTERVALO=None)  # gravar as medições alteraria as contagens de queries
+class TesteDetalheVagaQueries(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(nome="Niassa")
+        self.distrito = Distrito.objects.create(provincia=self.provincia, nome="Lichinga")
+        hoje = timezone.now().date()
+        self.vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        self.user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(self.user)
+
+    def criar_candidatos(self, quantidade, inicio=0):
+        estados = Candidato.Estado.values
+        for i in range(inicio, inicio + quantidade):
+            Candidato.objects.create(
+                nome_completo=f"Candidato {i}", numero_bi=f"BI{i}", numero_telefone="841234567",
+                provincia=self.provincia, distrito=self.distrito, vaga=self.vaga,
+                estado=estados[i % len(estados)], genero='F' if i % 3 == 0 else 'M'
+            )
+
+    def contar_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('candidaturas:detalhe_vaga', args=[self.vaga.pk]))
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, len(ctx.captured_queries)
+
+    def test_numero_de_queries_fixo(self):
+        self.criar_candidatos(2)
+        _, poucos = self.contar_queries()
+        self.criar_candidatos(20, inicio=2)
+        resposta, muitos = self.contar_queries()
+
+        self.assertEqual(poucos, muitos)
+        self.assertEqual(resposta.context['total_candidatos'], 22)
+        self.assertEqual(resposta.context['candidatos_pendentes'], 5)
+        self.assertEqual(resposta.context['candidatos_enviados_defc'], 4)
+        self.assertEqual(resposta.context['candidatos_homens'], 14)
+        self.assertEqual(resposta.context['candidatos_mulheres'], 8)
+
+
+class TesteDocumentoConcurso(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        hoje = timezone.now().date()
+        self.vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def abrir(self, numero_vagas):
+        from django.core.management import call_command
+
+        url = reverse('candidaturas:abrir_concurso', args=[self.vaga.pk])
+        with patch('candidaturas.pdf.render_pdf_bytes') as render:
+            self.client.post(url, {'numero_vagas': numero_vagas})
+            render.assert_not_called()  # nada é gerado no pedido
+            render.return_value = (b'%PDF-1.4 aviso', None)
+            call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+        self.vaga.refresh_from_db()
+        return render.call_count
+
+    def test_documento_gerado_em_segundo_plano_e_servido_imutavel(self):
+        from .models import TarefaRelatorio
+
+        self.assertEqual(self.abrir(10), 1)
+        versao = self.vaga.versao_concurso
+        url = reverse('candidaturas:documento_concurso', args=[self.vaga.pk, versao])
+        self.client.logout()
+        resposta = self.client.get(url)
+        self.assertEqual(b''.join(resposta.streaming_content), b'%PDF-1.4 aviso')
+        self.assertIn('immutable', resposta['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 304)
+
+        with self.settings(FICHEIROS_ENVIO='x-accel-redirect'):
+            resposta = self.client.get(url)
+        self.assertEqual(resposta['X-Accel-Redirect'], f'/media-interno/{self.vaga.documento_concurso.name}')
+        self.assertEqual(resposta.content, b'')
+
+        # Reabrir sem alterações não volta a gerar; com outro número de vagas gera uma versão nova
+        self.client.force_login(User.objects.get(username='admin'))
+        self.assertEqual(self.abrir(10), 0)
+        self.assertEqual(TarefaRelatorio.objects.count(), 1)
+        self.assertEqual(self.abrir(12), 1)
+        self.assertNotEqual(self.vaga.versao_concurso, versao)
+        # O documento é da vaga: as tarefas não ficam com o ficheiro
+        self.assertFalse(TarefaRelatorio.objects.exclude(ficheiro='').exists())
+        self.assertRedirects(
+            self.client.get(url),
+            reverse('candidaturas:documento_concurso', args=[self.vaga.pk, self.vaga.versao_concurso]),
+            fetch_redirect_response=False,
+        )
+
+
+    def test_edicao_da_vaga_gera_nova_versao(self):
+        from django.core.management import call_command
+        from .models import TarefaRelatorio
+
+        self.abrir(10)
+        versao = self.vaga.versao_concurso
+        dados = {
+            'titulo': "Brigadista Eleitoral", 'descricao': '', 'data_inicio': self.vaga.data_inicio,
+            'data_fim': self.vaga.data_fim, 'ativa': 'on', 'nivel_aprovacao': Vaga.NivelAprovacao.DISTRITAL,
+        }
+        with patch('candidaturas.pdf.render_pdf_bytes', return_value=(b'%PDF-1.4 aviso 2', None)) as render:
+            self.client.post(reverse('candidaturas:editar_vaga', args=[self.vaga.pk]), dados)
+            render.assert_not_called()
+            self.assertEqual(TarefaRelatorio.objects.filter(estado=TarefaRelatorio.Estado.PENDENTE).count(), 1)
+            call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+        self.vaga.refresh_from_db()
+        self.assertEqual(render.call_count, 1)
+        self.assertNotEqual(self.vaga.versao_concurso, versao)
+        self.assertTrue(self.vaga.documento_concurso_actual)
+
+
+class TesteExportarExcel(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(nome="Tete")
+        self.distrito = Distrito.objects.create(provincia=self.provincia, nome="Moatize")
+        hoje = timezone.now().date()
+        self.vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        for i in range(30):
+            Candidato.objects.create(
+                nome_completo=f"Candidato {i}", numero_bi=f"BI{i}", numero_telefone="841234567",
+                provincia=self.provincia, distrito=self.distrito, vaga=self.vaga
+            )
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+
+    def test_exportacao_streaming(self):
+        url = reverse('candidaturas:exportar_excel', args=['geral'])
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(url)
+            conteudo = b''.join(resposta.streaming_content)
+
+        self.assertTrue(resposta.streaming)
+        consultas_candidato = [q for q in ctx.captured_queries if 'candidaturas_candidato' in q['sql']]
+        self.assertEqual(len(consultas_candidato), 2)  # COUNT (limite síncrono) + linhas com JOINs
+
+        ws = openpyxl.load_workbook(io.BytesIO(conteudo)).active
+        linhas = list(ws.iter_rows(values_only=True))
+        self.assertEqual(len(linhas), 31)
+        self.assertEqual(linhas[0][0], 'Código')
+        self.assertEqual(linhas[1][4:7], ('Brigadista', 'Tete', 'Moatize'))
+
+    def test_exportacao_grande_vai_para_fila(self):
+        import shutil
+        import tempfile
+        from django.core.management import call_command
+        from .models import TarefaRelatorio
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        url = reverse('candidaturas:exportar_excel', args=['geral'])
+
+        with override_settings(MEDIA_ROOT=media), patch('candidaturas.tarefas.LIMITE_SINCRONO_EXCEL', 10):
+            primeira = self.client.get(url)
+            segunda = self.client.get(url)
+            tarefa = TarefaRelatorio.objects.get()
+            self.assertRedirects(primeira, reverse('candidaturas:estado_tarefa', args=[tarefa.pk]))
+            self.assertEqual(primeira.url, segunda.url)  # pedido repetido reaproveita a tarefa
+
+            call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+
+            estado = self.client.get(primeira.url, {'formato': 'json'}).json()
+            self.assertEqual(estado['estado'], TarefaRelatorio.Estado.CONCLUIDA)
+            self.assertEqual(estado['progresso'], 100)
+
+            resposta = self.client.get(estado['url_download'])
+            self.assertEqual(resposta.status_code, 200)
+            conteudo = b''.join(resposta.streaming_content)
+        self.assertEqual(openpyxl.load_workbook(io.BytesIO(conteudo)).active.max_row, 31)
+
+    def test_relatorio_pdf_em_blocos(self):
+        from pypdf import PdfReader
+        from . import pdf
+        from .tarefas import preparar_relatorio_pdf
+
+        template, context = preparar_relatorio_pdf(User.objects.get(username='admin'), 'geral')
+        destino = io.BytesIO()
+        with patch('candidaturas.pdf.render_pdf_bytes', wraps=pdf.render_pdf_bytes) as render:
+            self.assertEqual(pdf.render_pdf_em_blocos(destino, template, context, 'candidatos', 12), 30)
+        self.assertEqual(render.call_count, 3)
+
+        texto = ''.join(pagina.extract_text() for pagina in PdfReader(io.BytesIO(destino.getvalue())).pages)
+        self.assertEqual(texto.count('Lista Geral de Inscritos'), 1)  # cabeçalho só no primeiro bloco
+        self.assertIn('Total de Registos: 30', texto)
+        self.assertEqual(texto.count('Moatize'), 30)
+        self.assertIn('\n30\n', texto)  # numeração continua entre blocos
+
+
+class TesteFilaTarefas(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        self.user = User.objects.create_superuser('admin', password='password')
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=self.media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def ficheiros_em_media(self):
+        import os
+        return [nome for _, _, nomes in os.walk(self.media) for nome in nomes]
+
+    def test_pedido_concorrente_reaproveita_a_tarefa(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db.models.query import QuerySet
+        from .models import TarefaRelatorio
+
+        parametros = {'formato': 'csv', 'sha256': 'abc'}
+        outra, _ = TarefaRelatorio.solicitar(self.user, TarefaRelatorio.Tipo.IMPORTAR_EXCEL, parametros)
+
+        # O outro pedido ainda não estava gravado quando este procurou uma tarefa activa
+        first = QuerySet.first
+        procuras = []
+
+        def primeira_procura_vazia(qs):
+            procuras.append(qs)
+            return None if len(procuras) == 1 else first(qs)
+
+        with patch.object(QuerySet, 'first', primeira_procura_vazia):
+            tarefa, criada = TarefaRelatorio.solicitar(
+                self.user, TarefaRelatorio.Tipo.IMPORTAR_EXCEL, parametros,
+                entrada=SimpleUploadedFile('candidatos.csv', b'nome\n')
+            )
+        self.assertEqual((tarefa, criada), (outra, False))
+        self.assertEqual(TarefaRelatorio.objects.count(), 1)
+        self.assertEqual(self.ficheiros_em_media(), [])  # a entrada gravada para a tarefa recusada é apagada
+
+    def test_tarefa_com_actividade_nao_e_recuperada(self):
+        from datetime import timedelta
+        from .models import TarefaRelatorio
+
+        TarefaRelatorio.solicitar(self.user, TarefaRelatorio.Tipo.EXPORTAR_EXCEL, {'tipo_relatorio': 'geral'})
+        tarefa = TarefaRelatorio.reservar_proxima()
+        # Começou há duas horas, mas o worker continua a dar sinal de vida
+        TarefaRelatorio.objects.filter(pk=tarefa.pk).update(data_inicio=timezone.now() - timedelta(hours=2))
+        tarefa.registar_actividade()
+        limite = timezone.now() - timedelta(minutes=5)
+        self.assertEqual(TarefaRelatorio.recuperar_abandonadas(limite), 0)
+
+        TarefaRelatorio.objects.filter(pk=tarefa.pk).update(data_actividade=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(TarefaRelatorio.recuperar_abandonadas(limite), 1)
+        self.assertEqual(TarefaRelatorio.reservar_proxima().pk, tarefa.pk)
+
+    def test_tarefas_expiradas_apagadas_com_os_ficheiros(self):
+        from datetime import timedelta
+        from django.core.files.base import ContentFile
+        from django.core.management import call_command
+        from .models import TarefaRelatorio
+
+        tarefas = []
+        for tipo_relatorio in ('geral', 'admitidos'):
+            tarefa, _ = TarefaRelatorio.solicitar(
+                self.user, TarefaRelatorio.Tipo.EXPORTAR_EXCEL, {'tipo_relatorio': tipo_relatorio}
+            )
+            tarefa.concluir(f'{tipo_relatorio}.xlsx', ContentFile(b'xlsx'))
+            tarefas.append(tarefa)
+        expirada, recente = tarefas
+        TarefaRelatorio.objects.filter(pk=expirada.pk).update(data_conclusao=timezone.now() - timedelta(days=8))
+
+        call_command('processar_tarefas', '--uma-vez', '--validade', '7', stdout=io.StringIO())
+
+        self.assertEqual(list(TarefaRelatorio.objects.values_list('pk', flat=True)), [recente.pk])
+        self.assertFalse(expirada.ficheiro.storage.exists(expirada.ficheiro.name))
+        self.assertTrue(recente.ficheiro.storage.exists(recente.ficheiro.name))
+
+
+class ClienteDEFCFalso:
+    """Substitui o DEFC: aceita os candidatos e falha os primeiros `falhas_rede` pedidos."""
+    def __init__(self, falhas_rede=0):
+        self.falhas_rede = falhas_rede
+        self.lotes = []
+
+    def enviar_lote(self, candidatos):
+        from .transferencia import ErroTransferencia
+        self.lotes.append([c['id'] for c in candidatos])
+        if self.falhas_rede:
+            self.falhas_rede -= 1
+            raise ErroTransferencia("timeout")
+        return {c['id']: {'id_drh': c['id'], 'estado': 'criado', 'id': 1000 + c['id']} for c in candidatos}
+
+
+class TesteEnvioDEFC(TestCase):
+    def setUp(self):
+        provincia = Provincia.objects.create(nome="Sofala")
+        distrito = Distrito.objects.create(provincia=provincia, nome="Beira")
+        hoje = timezone.now().date()
+        self.vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        for i in range(5):
+            Candidato.objects.create(
+                nome_completo=f"Candidato {i}", numero_bi=f"BI{i}", numero_telefone="841234567",
+                provincia=provincia, distrito=distrito, vaga=self.vaga,
+                estado=Candidato.Estado.ENTREVISTA_APROVADA
+            )
+        self.aprovados = Candidato.objects.filter(estado=Candidato.Estado.ENTREVISTA_APROVADA)
+
+    def test_envio_em_lotes(self):
+        from .models import EnvioDEFC, ItemEnvioDEFC
+        from .transferencia import processar
+
+        envio = EnvioDEFC.solicitar(self.aprovados)
+        self.assertEqual(envio.total, 5)
+        self.assertIsNone(EnvioDEFC.solicitar(self.aprovados))  # já estão em fila
+
+        cliente = ClienteDEFCFalso(falhas_rede=1)
+        envio = processar(EnvioDEFC.reservar_proximo(), cliente, tamanho_lote=2, max_tentativas=2, espera=0)
+
+        self.assertEqual(envio.estado, EnvioDEFC.Estado.CONCLUIDO)
+        self.assertEqual((envio.enviados, envio.falhados), (5, 0))
+        self.assertEqual([len(lote) for lote in cliente.lotes], [2, 2, 2, 1])  # o 1.º lote é repetido
+        self.assertFalse(Candidato.objects.exclude(estado=Candidato.Estado.ENVIADO_DEFC).exists())
+        candidato = Candidato.objects.first()
+        self.assertEqual(candidato.id_defc, str(1000 + candidato.pk))
+        self.assertEqual(ItemEnvioDEFC.objects.filter(estado=ItemEnvioDEFC.Estado.ENVIADO).count(), 5)
+
+    def test_lote_falha_apos_tentativas(self):
+        from .models import EnvioDEFC, ItemEnvioDEFC
+        from .transferencia import processar
+
+        EnvioDEFC.solicitar(self.aprovados)
+        with patch('candidaturas.transferencia.time.sleep') as esperar:
+            envio = processar(EnvioDEFC.reservar_proximo(), ClienteDEFCFalso(falhas_rede=10), max_tentativas=3, espera=1)
+
+        # Espera crescente antes de cada repetição do lote
+        self.assertEqual([chamada.args[0] for chamada in esperar.call_args_list], [1, 2])
+        self.assertEqual(envio.estado, EnvioDEFC.Estado.CONCLUIDO_COM_ERROS)
+        self.assertEqual(envio.falhados, 5)
+        self.assertEqual(set(ItemEnvioDEFC.objects.values_list('tentativas', 'erro')), {(3, 'timeout')})
+        self.assertEqual(self.aprovados.count(), 5)
+
+
+class TesteFeedAlteracoes(TestCase):
+    def setUp(self):
+        provincia = Provincia.objects.create(nome="Manica")
+        distrito = Distrito.objects.create(provincia=provincia, nome="Chimoio")
+        hoje = timezone.now().date()
+        vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        for i in range(5):
+            Candidato.objects.create(
+                nome_completo=f"Candidato {i}", numero_bi=f"BI{i}", numero_telefone="841234567",
+                provincia=provincia, distrito=distrito, vaga=vaga,
+                estado=Candidato.Estado.ENVIADO_DEFC if i < 3 else Candidato.Estado.PENDENTE
+            )
+        from rest_framework.authtoken.models import Token
+        token = Token.objects.create(user=User.objects.create_user('defc', password='password'))
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def pedir(self, cursor='', limite=2):
+        url = reverse('candidaturas_api:candidato-alteracoes')
+        return self.client.get(url, {'cursor': cursor, 'limite': limite}, **self.auth).json()
+
+    @patch('candidaturas.alteracoes.MARGEM_SEGUNDOS', 0)
+    def test_feed_incremental(self):
+        paginas = [self.pedir()]
+        while paginas[-1]['mais']:
+            paginas.append(self.pedir(paginas[-1]['cursor']))
+        candidatos = [c for pagina in paginas for c in pagina['candidatos']]
+        self.assertEqual(len(paginas), 3)
+        self.assertEqual(sum(c['activo'] for c in candidatos), 3)
+        segunda = paginas[-1]
+
+        # Sem alterações, o cursor não devolve nada
+        self.assertEqual(self.pedir(segunda['cursor'])['candidatos'], [])
+
+        # update() em massa também avança data_atualizacao
+        Candidato.objects.filter(nome_completo="Candidato 0").update(estado=Candidato.Estado.ENTREVISTA_APROVADA)
+        Candidato.objects.filter(nome_completo="Candidato 1").delete()
+        terceira = self.pedir(segunda['cursor'])
+        self.assertEqual([(c['nome_completo'], c['activo']) for c in terceira['candidatos']], [("Candidato 0", False)])
+        self.assertEqual(len(terceira['removidos']), 1)
+
+    def test_alteracoes_recentes_esperam_pela_margem(self):
+        import datetime
+        # Com a margem, o que ainda pode ter transacções por fazer commit fica para depois
+        self.assertEqual(self.pedir(limite=100)['candidatos'], [])
+
+        antiga = timezone.now() - datetime.timedelta(hours=1)
+        Candidato.objects.exclude(nome_completo="Candidato 2").update(data_atualizacao=antiga)
+        resposta = self.pedir(limite=100)
+        self.assertEqual(len(resposta['candidatos']), 4)
+        self.assertFalse(resposta['mais'])
+
+        with patch('candidaturas.alteracoes.MARGEM_SEGUNDOS', 0):
+            seguinte = self.pedir(resposta['cursor'], limite=100)
+        self.assertEqual([c['nome_completo'] for c in seguinte['candidatos']], ["Candidato 2"])
+
+
+class TesteEscopoUtilizador(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(nome="Inhambane")
+        self.distrito = Distrito.objects.create(provincia=self.provincia, nome="Maxixe")
+        self.outro_distrito = Distrito.objects.create(provincia=self.provincia, nome="Vilankulo")
+        self.user = User.objects.create_user('distrital', password='password')
+        perfil = self.user.perfil
+        perfil.nivel = PerfilUtilizador.Nivel.DISTRITAL
+        perfil.provincia = self.provincia
+        perfil.distrito = self.distrito
+        perfil.save()
+        for i, distrito in enumerate([self.distrito, self.outro_distrito]):
+            Candidato.objects.create(
+                nome_completo=f"Candidato {i}", numero_bi=f"BI{i}", numero_telefone="841234567",
+                provincia=self.provincia, distrito=distrito
+            )
+        self.client.force_login(self.user)
+
+    def consultas_perfil(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('candidaturas:lista_verificacao'), {'estado': 'TODOS'})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, [q for q in ctx.captured_queries if 'candidaturas_perfilutilizador' in q['sql']]
+
+    def usar_cache_partilhada(self):
+        import shutil
+        import tempfile
+
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        definicao = self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': pasta,
+        }})
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def test_perfil_resolvido_uma_vez_e_invalidado(self):
+        from .escopo import obter_escopo
+
+        self.usar_cache_partilhada()
+
+        resposta, consultas = self.consultas_perfil()
+        self.assertLessEqual(len(consultas), 1)
+        self.assertEqual([c.nome_completo for c in resposta.context['candidatos']], ["Candidato 0"])
+
+        _, consultas = self.consultas_perfil()
+        self.assertEqual(consultas, [])  # servido pela cache
+
+        perfil = PerfilUtilizador.objects.get(usuario=self.user)
+        perfil.nivel = PerfilUtilizador.Nivel.PROVINCIAL
+        perfil.save()
+        resposta, _ = self.consultas_perfil()
+        self.assertEqual(len(resposta.context['candidatos']), 2)
+        self.assertTrue(obter_escopo(User.objects.get(pk=self.user.pk)).is_provincial)
+
+    def test_cache_local_nao_guarda_o_perfil_entre_pedidos(self):
+        from .escopo import cache_partilhada
+
+        # Sem CACHES, cada worker teria a sua cópia e não veria a invalidação dos outros
+        self.assertFalse(cache_partilhada())
+        self.consultas_perfil()
+        _, consultas = self.consultas_perfil()
+        self.assertEqual(len(consultas), 1)
+
+    def test_perfil_criado_se_nao_existir(self):
+        from .escopo import obter_escopo
+
+        PerfilUtilizador.objects.filter(usuario=self.user).delete()
+        escopo = obter_escopo(User.objects.get(pk=self.user.pk))
+        self.assertIsNone(escopo.distrito_id)
+        self.assertEqual(PerfilUtilizador.objects.filter(usuario=self.user).count(), 1)
+
+
+class TestePesquisaCandidatos(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(nome="Zambézia")
+        self.distrito = Distrito.objects.create(provincia=self.provincia, nome="Quelimane")
+        nomes = ["João Mário Cossa", "Joana Sitoe", "Mário João Langa", "Ana Cossa"]
+        self.candidatos = [
+            Candidato.objects.create(
+                nome_completo=nome, numero_bi=f"11010012345{i}A", numero_telefone=f"+25884123456{i}",
+                provincia=self.provincia, distrito=self.distrito
+            )
+            for i, nome in enumerate(nomes)
+        ]
+        self.user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(self.user)
+
+    def nomes(self, texto):
+        return [c.nome_completo for c in Candidato.objects.pesquisar(texto).order_by('-relevancia', 'pk')]
+
+    def test_prefixo_sem_acentos_e_ordenado_por_relevancia(self):
+        self.assertEqual(self.nomes("joao"), ["João Mário Cossa", "Mário João Langa"])
+        self.assertEqual(self.nomes("Jo"), ["João Mário Cossa", "Joana Sitoe", "Mário João Langa"])
+        self.assertEqual(self.nomes("mar cos"), ["João Mário Cossa"])
+        self.assertEqual(self.nomes("110100123453"), ["Ana Cossa"])
+        codigo = Candidato.objects.get(pk=self.candidatos[1].pk).codigo_candidato
+        self.assertEqual(self.nomes(codigo.lower()), ["Joana Sitoe"])
+
+    def test_indice_actualizado_ao_alterar_candidato(self):
+        candidato = self.candidatos[3]
+        candidato.nome_completo = "Ânia Cossa"
+        candidato.save()
+        Candidato.objects.filter(pk=self.candidatos[1].pk).update(nome_completo="Joana Zunguze")
+
+        self.assertEqual(self.nomes("ania"), ["Ânia Cossa"])
+        self.assertEqual(self.nomes("sitoe"), [])
+        self.assertEqual(self.nomes("zung"), ["Joana Zunguze"])
+
+    def test_lista_e_consulta_usam_o_indice(self):
+        resposta = self.client.get(reverse('candidaturas:lista_verificacao'), {'q': 'cossa', 'estado': 'TODOS'})
+        self.assertEqual(len(resposta.context['candidatos']), 2)
+
+        self.assertEqual(Candidato.objects.com_documento(numero_bi=' 110100123452a').get(), self.candidatos[2])
+
+        resposta = self.client.post(reverse('candidaturas:consulta_publica'), {'termo': '84 123 4561'})
+        self.assertEqual(resposta.context['candidato'], self.candidatos[1])
+
+    def test_pesquisa_so_com_pontuacao(self):
+        self.assertEqual(len(self.nomes("?!-")), 4)
+        resposta = self.client.get(reverse('candidaturas:lista_verificacao'), {'q': '...', 'estado': 'TODOS'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.context['candidatos']), 4)
+
+
+class TestePaginacaoCursor(TestCase):
+    def setUp(self):
+        provincia = Provincia.objects.create(nome="Niassa")
+        distrito = Distrito.objects.create(provincia=provincia, nome="Lichinga")
+        Candidato.objects.bulk_create([
+            Candidato(
+                nome_completo=f"Candidato {i}", numero_bi=f"N{i}", codigo_candidato=f"N-{i}", numero_telefone="841234567",
+                provincia=provincia, distrito=distrito
+            )
+            for i in range(65)
+        ])
+        # Datas iguais: a ordem é desempatada pelo id
+        Candidato.objects.update(data_criacao=timezone.now())
+        self.esperados = list(Candidato.objects.order_by('-id').values_list('pk', flat=True))
+        self.user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(self.user)
+
+    def test_lista_percorrida_por_cursor(self):
+        url = reverse('candidaturas:lista_verificacao')
+        resposta = self.client.get(url, {'estado': 'TODOS'})
+        vistos, paginas = [], []
+        while True:
+            paginas.append(resposta)
+            vistos += [c.pk for c in resposta.context['candidatos']]
+            if not resposta.context['page_obj'].has_next():
+                break
+            resposta = self.client.get(url + resposta.context['url_seguinte'])
+        self.assertEqual(vistos, self.esperados)
+        self.assertEqual(len(paginas), 3)
+
+        anterior = self.client.get(url + resposta.context['url_anterior'])
+        self.assertEqual([c.pk for c in anterior.context['candidatos']], self.esperados[30:60])
+        self.assertIn('estado=TODOS', resposta.context['url_anterior'])
+
+    def test_cursor_com_valores_invalidos_mostra_a_primeira_pagina(self):
+        from sicfaae_comum.paginacao import codificar_cursor
+
+        url = reverse('candidaturas:lista_verificacao')
+        for valores in (['ontem', 5], [timezone.now(), 'x'], [None, 5], [[1], {'a': 1}]):
+            resposta = self.client.get(url, {'estado': 'TODOS', 'cursor': codificar_cursor(valores)})
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual([c.pk for c in resposta.context['candidatos']], self.esperados[:30])
+
+    def test_api_paginada(self):
+        from rest_framework.authtoken.models import Token
+        token = Token.objects.create(user=self.user)
+        url = reverse('candidaturas_api:candidato-list') + '?page_size=20'
+        vistos = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                dados = self.client.get(url, HTTP_AUTHORIZATION=f'Token {token.key}').json()
+            # Datas repetidas não levam a OFFSET: o cursor tem a data e o id
+            self.assertFalse([q for q in ctx.captured_queries if 'OFFSET' in q['sql'].upper()])
+            vistos += [c['id'] for c in dados['results']]
+            url = dados['next']
+        self.assertEqual(vistos, self.esperados)
+
+        anterior = self.client.get(dados['previous'], HTTP_AUTHORIZATION=f'Token {token.key}').json()
+        self.assertEqual([c['id'] for c in anterior['results']], self.esperados[40:60])
+
+
+class TesteGerarDadosCarga(TestCase):
+    def setUp(self):
+        provincia = Provincia.objects.create(nome="Tete")
+        for nome in ("Moatize", "Angónia"):
+            Distrito.objects.create(provincia=provincia, nome=nome)
+
+    def gerar(self, quantidade):
+        from django.core.management import call_command
+        call_command('gerar_dados_carga', '--candidatos', quantidade, '--lote', 40, stdout=io.StringIO())
+
+    def test_gera_candidatos_entrevistas_e_historico(self):
+        from .models import Entrevista, TermoPesquisaCandidato
+        self.gerar(100)
+        self.gerar(20)
+
+        self.assertEqual(Candidato.objects.count(), 120)
+        self.assertEqual(Candidato.history.count(), 120)
+        self.assertFalse(Candidato.objects.filter(codigo_candidato='').exists())
+        entrevistados = Candidato.objects.exclude(estado=Candidato.Estado.PENDENTE)
+        self.assertEqual(Entrevista.objects.count(), entrevistados.count())
+        self.assertEqual(Entrevista.history.count(), entrevistados.count())
+        self.assertEqual(sum(EstatisticaCandidatos.objects.values_list('total', flat=True)), 120)
+        self.assertTrue(TermoPesquisaCandidato.objects.exists())
+
+    def test_mesma_semente_gera_os_mesmos_dados(self):
+        self.gerar(50)
+        primeiro = list(Candidato.objects.order_by('numero_bi').values_list('numero_bi', 'nome_completo', 'estado'))
+        Candidato.objects.all().delete()
+        self.gerar(50)
+        segundo = list(Candidato.objects.order_by('numero_bi').values_list('numero_bi', 'nome_completo', 'estado'))
+        self.assertEqual(primeiro, segundo)
+
+
+@override_settings(INSTRUMENTACAO_INTERVALO=None)  # gravar as medições alteraria as contagens de queries
+class TesteInstrumentacao(TestCase):
+    def setUp(self):
+        provincia = Provincia.objects.create(nome="Manica")
+        distrito = Distrito.objects.create(provincia=provincia, nome="Chimoio")
+        vaga = Vaga.objects.create(titulo="MMV", data_inicio=timezone.now().date(), data_fim=timezone.now().date())
+        Candidato.objects.bulk_create([
+            Candidato(
+                nome_completo=f"Candidato {i}", numero_bi=f"M{i}", codigo_candidato=f"M-{i}", numero_telefone="841234567",
+                provincia=provincia, distrito=distrito, vaga=vaga
+            )
+            for i in range(40)
+        ])
+        self.user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(self.user)
+
+    def test_cabecalhos_e_linha_de_log(self):
+        import json
+        with self.settings(INSTRUMENTACAO_CABECALHOS=True), \
+                self.assertLogs('sicfaae_comum.instrumentacao', 'INFO') as logs:
+            resposta = self.client.get(reverse('candidaturas:lista_verificacao'))
+
+        registo = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(registo['url'], 'candidaturas:lista_verificacao')
+        self.assertEqual(registo['queries'], int(resposta['X-SQL-Queries']))
+        self.assertIn('db;dur=', resposta['Server-Timing'])
+        self.assertIn('render;dur=', resposta['Server-Timing'])
+
+    def test_orcamentos(self):
+        from sicfaae_comum.instrumentacao import orcamento_sql, OrcamentoSQLExcedido
+
+        # Listas com vaga/distrito de cada candidato sem N+1
+        with self.settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=True):
+            with orcamento_sql(maximo_duplicadas=0):
+                self.client.get(reverse('candidaturas:lista_verificacao'), {'estado': 'TODOS'})
+            with orcamento_sql(maximo_duplicadas=0):
+                self.client.get(reverse('candidaturas_api:candidato-list'))
+
+        with self.settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=True,
+                           ORCAMENTOS_SQL={'candidaturas:lista_verificacao': 1}):
+            with self.assertRaises(OrcamentoSQLExcedido):
+                self.client.get(reverse('candidaturas:lista_verificacao'))
+
+        with self.assertRaisesMessage(OrcamentoSQLExcedido, '40x SELECT'):
+            with orcamento_sql(maximo_duplicadas=0):
+                for candidato in Candidato.objects.all():
+                    candidato.distrito.nome
+
+    def test_medicoes_agregadas_no_admin(self):
+        from sicfaae_comum.instrumentacao import agregador
+        from .models import MedicaoVista
+
+        agregador.gravar()
+        MedicaoVista.objects.all().delete()
+        with self.settings(INSTRUMENTACAO_INTERVALO=0):
+            for _ in range(2):
+                self.client.get(reverse('candidaturas:lista_verificacao'))
+
+        medicao = MedicaoVista.objects.get(nome_url='candidaturas:lista_verificacao')
+        self.assertEqual(medicao.pedidos, 2)
+        self.assertGreater(medicao.media_queries, 0)
+
+        resposta = self.client.get(reverse('admin:candidaturas_medicaovista_changelist'))
+        self.assertContains(resposta, 'candidaturas:lista_verificacao')
+        self.client.force_login(User.objects.create_user('gestor', password='password', is_staff=True))
+        resposta = self.client.get(reverse('admin:candidaturas_medicaovista_changelist'))
+        self.assertEqual(resposta.status_code, 403)
+
+
+class TesteImportacaoExcel(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        hoje = timezone.now().date()
+        self.vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        self.distrito = Distrito.objects.create(provincia=Provincia.objects.create(nome="Gaza"), nome="Chókwè")
+        Candidato.objects.create(
+            nome_completo="Existente", numero_bi="100000001A", numero_telefone="841234567", observacoes="Antiga"
+        )
+        self.user = User.objects.create_superuser('admin', 'admin@stae.gov.mz', 'password')
+        self.client.force_login(self.user)
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def ficheiro(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .exportacao import escrever_xlsx
+
+        destino = io.BytesIO()
+        cabecalho = ['BI', 'Nome', 'Telefone', 'Observacoes', 'Vaga', 'Província', 'Distrito']
+        escrever_xlsx(destino, "Candidatos", cabecalho, [
+            ['100000001A', None, None, 'Nova nota', None, None, None],
+            [200000002, 'Ana Cossa', 841111111, None, 'brigadista', 'Gaza', 'Chókwè'],
+            ['300000003C', 'Rui Sitoe', None, None, 'Astronauta', 'Gaza', 'Chókwè'],
+            ['200000002', 'Duplicado', None, None, None, 'Gaza', 'Chókwè'],
+            [None, None, None, None, None, None, None],
+            ['400000004D', 'Sem Distrito', None, None, None, None, None],
+            ['500000005E', 'Lina Tembe', None, None, None, 'gaza', 'CHÓKWÈ'],
+        ])
+        return SimpleUploadedFile('candidatos.xlsx', destino.getvalue())
+
+    def importar(self, **dados):
+        from django.core.management import call_command
+        from .models import TarefaRelatorio
+
+        resposta = self.client.post(reverse('candidaturas:importar_excel'), {'excel_file': self.ficheiro(), **dados})
+        tarefa = TarefaRelatorio.objects.get(tipo=TarefaRelatorio.Tipo.IMPORTAR_EXCEL, parametros__simular=bool(dados))
+        self.assertRedirects(resposta, reverse('candidaturas:estado_tarefa', args=[tarefa.pk]))
+        call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.estado, TarefaRelatorio.Estado.CONCLUIDA, tarefa.erro)
+        return tarefa
+
+    def test_simulacao_nao_grava(self):
+        tarefa = self.importar(simular='1')
+        self.assertEqual(tarefa.resumo, {
+            'criados': 2, 'actualizados': 1, 'sem_alteracoes': 0, 'erros': 3, 'simulacao': True,
+        })
+        self.assertEqual(Candidato.objects.count(), 1)
+        self.assertEqual(Candidato.objects.get().observacoes, "Antiga")
+
+    def test_importacao_em_bulk_com_relatorio_de_erros(self):
+        from .models import TermoPesquisaCandidato
+
+        with CaptureQueriesContext(connection) as ctx:
+            tarefa = self.importar()
+        por_bi = [q for q in ctx.captured_queries if '"candidaturas_candidato"."numero_bi" IN' in q['sql']]
+        self.assertEqual(len(por_bi), 1)  # existentes do bloco numa única query
+
+        self.assertEqual(tarefa.resumo['criados'], 2)
+        self.assertEqual(tarefa.resumo['erros'], 3)
+        existente = Candidato.objects.get(numero_bi='100000001A')
+        self.assertEqual(existente.observacoes, "Antiga\n[Import]: Nova nota")
+        self.assertEqual(existente.history.first().history_change_reason, 'Importação Excel')
+        nova = Candidato.objects.get(numero_bi='200000002')
+        self.assertEqual((nova.numero_telefone, nova.vaga, nova.distrito), ('841111111', self.vaga, self.distrito))
+        self.assertEqual(Candidato.objects.filter(distrito=self.distrito).exclude(codigo_candidato='').count(), 2)
+        self.assertEqual(nova.history.get().history_user, self.user)
+        self.assertEqual(sum(EstatisticaCandidatos.objects.values_list('total', flat=True)), 3)
+        self.assertTrue(TermoPesquisaCandidato.objects.filter(candidato=nova).exists())
+
+        with tarefa.ficheiro.open('rb') as relatorio:
+            linhas = list(openpyxl.load_workbook(relatorio).active.iter_rows(values_only=True))
+        self.assertEqual(linhas, [
+            ('Linha', 'BI', 'Erro'),
+            (4, '300000003C', 'Vaga desconhecida: Astronauta'),
+            (5, '200000002', 'BI repetido no ficheiro (linha 3).'),
+            (7, '400000004D', 'Província e Distrito são obrigatórios para novos candidatos.'),
+        ])
+
+    def test_csv_e_ndjson_exportados_voltam_a_ser_importados(self):
+        import os
+        from django.core.management import call_command
+        from django.conf import settings
+
+        Candidato.objects.create(
+            nome_completo="Ana Cossa", numero_bi="600000006F", numero_telefone="841111111",
+            vaga=self.vaga, provincia=self.distrito.provincia, distrito=self.distrito,
+        )
+        resposta = self.client.get(reverse('candidaturas:exportar_excel', args=['geral']), {'formato': 'csv'})
+        self.assertTrue(resposta.streaming)
+        linhas = b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[0], 'Código,Nome Completo,BI,Gênero,Vaga,Província,Distrito,Telefone,Estado,Data Inscrição')
+        self.assertEqual(len(linhas), 3)
+
+        destino = os.path.join(settings.MEDIA_ROOT, 'candidatos.ndjson')
+        call_command('exportar_candidatos', destino, stdout=io.StringIO())
+        call_command('exportar_candidatos', destino, '--acrescentar', '--estado', 'ENVIADO_DEFC', stdout=io.StringIO())
+        with open(destino, 'a', encoding='utf-8') as ficheiro:
+            ficheiro.write('{"numero_bi": \n')
+        Candidato.objects.filter(numero_bi="600000006F").delete()
+
+        saida = io.StringIO()
+        call_command('importar_candidatos', destino, stdout=saida)
+        self.assertIn('1 criados, 0 actualizados, 1 sem alterações, 1 erros', saida.getvalue())
+        self.assertIn('Linha 3', saida.getvalue())
+        recriada = Candidato.objects.get(numero_bi="600000006F")
+        self.assertEqual((recriada.vaga, recriada.distrito), (self.vaga, self.distrito))
+
+
+class TestePDFCandidato(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        distrito = Distrito.objects.create(provincia=Provincia.objects.create(nome="Niassa"), nome="Lichinga")
+        self.candidato = Candidato.objects.create(
+            nome_completo="Ana Cossa", numero_bi="700000007G", numero_telefone="841111111",
+            provincia=distrito.provincia, distrito=distrito,
+        )
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def test_pdf_so_e_gerado_de_novo_quando_o_candidato_muda(self):
+        import datetime
+        import os
+        from django.conf import settings
+        from django.core.management import call_command
+        from . import pdf
+
+        url = reverse('candidaturas:gerar_pdf', args=[self.candidato.pk])
+        with patch('candidaturas.pdf.render_pdf_bytes', wraps=pdf.render_pdf_bytes) as render:
+            primeira = b''.join(self.client.get(url).streaming_content)
+            segunda = b''.join(self.client.get(url).streaming_content)
+            self.assertEqual(render.call_count, 1)
+            self.assertTrue(primeira.startswith(b'%PDF'))
+            self.assertEqual(primeira, segunda)
+
+            self.candidato.nome_completo = "Ana Cossa Tembe"
+            self.candidato.save()
+            resposta = self.client.get(url)
+            self.assertEqual(render.call_count, 2)
+            self.assertIn('Ficha_STAE_700000007G.pdf', resposta['Content-Disposition'])
+
+        # A versão anterior só é apagada pelo worker, depois de VALIDADE_VERSAO_ANTIGA
+        pasta = os.path.join(settings.MEDIA_ROOT, pdf.PASTA_CACHE, 'formulario_stae', str(self.candidato.pk))
+        self.assertEqual(len(os.listdir(pasta)), 2)
+        self.assertEqual(pdf.limpar_versoes_antigas(timezone.now() - datetime.timedelta(minutes=10)), 0)
+        call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+        self.assertEqual(len(os.listdir(pasta)), 2)
+        self.assertEqual(pdf.limpar_versoes_antigas(timezone.now() + datetime.timedelta(seconds=1)), 1)
+        self.assertEqual(len(os.listdir(pasta)), 1)
+        self.assertEqual(b''.join(self.client.get(url).streaming_content)[:4], b'%PDF')
+
+    def test_pdf_gerado_de_novo_quando_a_entrevista_ou_o_dia_mudam(self):
+        import datetime
+        from . import pdf
+        from .models import Entrevista
+
+        entrevista = Entrevista.objects.create(candidato=self.candidato, data_hora=timezone.now(), local="Sala 1")
+        url = reverse('candidaturas:gerar_ficha_entrevista', args=[self.candidato.pk])
+        with patch('candidaturas.pdf.render_pdf_bytes', wraps=pdf.render_pdf_bytes) as render:
+            self.client.get(url)
+            self.client.get(url)
+            self.assertEqual(render.call_count, 1)
+
+            # Reagendada sem gravar o candidato
+            entrevista.local = "Sala 2"
+            entrevista.save()
+            self.client.get(url)
+            self.assertEqual(render.call_count, 2)
+            self.assertIn("Sala 2", render.call_args.args[1]['candidato'].entrevista_detalhe.local)
+
+            url = reverse('candidaturas:gerar_pdf', args=[self.candidato.pk])
+            self.client.get(url)
+            amanha = timezone.localdate() + datetime.timedelta(days=1)
+            with patch('candidaturas.views.timezone.localdate', return_value=amanha):
+                self.client.get(url)
+            self.assertEqual(render.call_count, 4)
+            self.assertEqual(render.call_args.args[1]['data'], amanha)
+
+
+class TesteCarregamentoDocumentos(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        hoje = timezone.now().date()
+        vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        distrito = Distrito.objects.create(provincia=Provincia.objects.create(nome="Tete"), nome="Moatize")
+        from . import rascunhos
+
+        self.client.cookies[rascunhos.COOKIE] = rascunhos.criar_token({
+            'vaga': vaga.pk, 'nome_completo': "Ana Cossa", 'genero': Candidato.Genero.FEMININO,
+            'data_nascimento': None, 'numero_bi': "110100000001A", 'numero_telefone': "841111111",
+            'provincia': distrito.provincia.pk, 'distrito': distrito.pk, 'endereco': "Bairro 1",
+        })
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def foto_png(self):
+        from PIL import Image
+
+        saida = io.BytesIO()
+        Image.effect_noise((1600, 1200), 60).convert('RGB').save(saida, 'PNG')
+        return saida.getvalue()
+
+    def test_envio_em_blocos_retomado_e_compactado(self):
+        import os
+        from django.conf import settings
+        from .models import CarregamentoDocumento
+
+        conteudo = self.foto_png()
+        resposta = self.client.post(
+            reverse('candidaturas:iniciar_carregamento'),
+            {'campo': 'foto', 'nome': 'foto.png', 'tamanho': len(conteudo)}, content_type='application/json',
+        )
+        self.assertEqual(resposta.status_code, 201)
+        url = reverse('candidaturas:bloco_carregamento', args=[resposta.json()['identificador']])
+
+        def enviar(inicio, fim):
+            return self.client.put(url, conteudo[inicio:fim], content_type='application/octet-stream',
+                                   HTTP_X_DESLOCAMENTO=str(inicio))
+
+        bloco = resposta.json()['tamanho_bloco']
+        self.assertEqual(enviar(0, bloco).json()['recebido'], bloco)
+        # Bloco repetido depois de uma falha: o servidor indica onde continuar
+        repetido = enviar(0, bloco)
+        self.assertEqual((repetido.status_code, repetido.json()['recebido']), (409, bloco))
+        self.assertFalse(self.client.get(url).json()['concluido'])
+        for inicio in range(bloco, len(conteudo), bloco):
+            ultima = enviar(inicio, inicio + bloco)
+        self.assertTrue(ultima.json()['concluido'])
+
+        resposta = self.client.post(reverse('candidaturas:registar_etapa2'), {
+            'carregamento_foto': resposta.json()['identificador'],
+        })
+        self.assertRedirects(resposta, reverse('candidaturas:sucesso_candidatura'), fetch_redirect_response=False)
+
+        candidato = Candidato.objects.get(numero_bi="110100000001A")
+        self.assertTrue(candidato.foto.name.endswith('.jpg'))
+        self.assertEqual(candidato.foto.width, 800)
+        tamanhos = candidato.tamanhos_documentos['foto']
+        self.assertEqual(tamanhos['original'], len(conteudo))
+        self.assertEqual(tamanhos['guardado'], candidato.foto.size)
+        self.assertLess(tamanhos['guardado'], tamanhos['original'])
+        # O carregamento e o ficheiro parcial já não são precisos
+        self.assertFalse(CarregamentoDocumento.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'carregamentos')), [])
+
+
+class TesteArmazenamentoConteudo(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        self.distrito = Distrito.objects.create(provincia=Provincia.objects.create(nome="Gaza"), nome="Chibuto")
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def candidato(self, bi, **ficheiros):
+        return Candidato.objects.create(
+            nome_completo="Ana Cossa", numero_bi=bi, numero_telefone="841111111",
+            provincia=self.distrito.provincia, distrito=self.distrito, **ficheiros
+        )
+
+    def test_ficheiros_iguais_sao_guardados_uma_vez(self):
+        from django.core.files.base import ContentFile
+        from .models import ConteudoFicheiro
+        from .serializers import CandidatoParaDEFCSerializer
+
+        requerimento = b'%PDF-1.4 requerimento'
+        primeiro = self.candidato("800000008H", arquivo_cv=ContentFile(requerimento, name='req.pdf'))
+        segundo = self.candidato("800000009H", arquivo_bi=ContentFile(requerimento, name='outro.PDF'),
+                                 foto=primeiro.arquivo_cv.name)
+        nome = primeiro.arquivo_cv.name
+        self.assertTrue(nome.startswith('conteudo/') and nome.endswith('.pdf'))
+        self.assertEqual(segundo.arquivo_bi.name, nome)
+        self.assertEqual(ConteudoFicheiro.objects.get(nome=nome).referencias, 3)
+        self.assertEqual(CandidatoParaDEFCSerializer(segundo).data['foto_conteudo'], nome)
+
+        # Substituir e apagar retiram referências; o ficheiro só sai com a última
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo.arquivo_bi = ContentFile(b'%PDF-1.4 BI', name='bi.pdf')
+            segundo.save()
+            primeiro.delete()
+        self.assertEqual(ConteudoFicheiro.objects.get(nome=nome).referencias, 1)
+        self.assertTrue(segundo.foto.storage.exists(nome))
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo.delete()
+        self.assertFalse(ConteudoFicheiro.objects.exists())
+        self.assertFalse(segundo.foto.storage.exists(nome))
+
+
+class TesteMiniaturas(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        distrito = Distrito.objects.create(provincia=Provincia.objects.create(nome="Manica"), nome="Gondola")
+        self.candidato = Candidato.objects.create(
+            nome_completo="Ana Cossa", numero_bi="900000009J", numero_telefone="841111111",
+            provincia=distrito.provincia, distrito=distrito,
+        )
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        definicao = self.settings(MEDIA_ROOT=media)
+        definicao.enable()
+        self.addCleanup(definicao.disable)
+
+    def foto(self, cor):
+        from django.core.files.base import ContentFile
+        from PIL import Image
+
+        saida = io.BytesIO()
+        Image.new('RGB', (1200, 900), cor).save(saida, 'PNG')
+        return ContentFile(saida.getvalue(), name='foto.png')
+
+    def test_miniaturas_geradas_pelo_worker_e_substituidas_com_a_foto(self):
+        from django.core.files.storage import default_storage
+        from django.core.management import call_command
+        from PIL import Image
+        from sicfaae_comum import miniaturas
+        from . import pdf
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.candidato.foto = self.foto('red')
+            self.candidato.save()
+        primeira = self.candidato.foto.name
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        lista = reverse('candidaturas:lista_verificacao') + '?estado=TODOS'
+
+        # Antes do worker: a lista usa a foto original e nada é gerado no pedido
+        resposta = self.client.get(lista)
+        self.assertContains(resposta, self.candidato.foto.url)
+        self.assertFalse(default_storage.exists(miniaturas.nome_miniatura(primeira, 'lista')))
+
+        call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+        for tamanho, lado in miniaturas.TAMANHOS.items():
+            with default_storage.open(miniaturas.nome_miniatura(primeira, tamanho)) as ficheiro:
+                self.assertEqual(Image.open(ficheiro).size, (lado, lado))
+        self.assertEqual(
+            pdf.link_callback(self.candidato.foto.url, None),
+            default_storage.path(miniaturas.nome_miniatura(primeira, 'pdf')),
+        )
+        resposta = self.client.get(lista)
+        self.assertContains(resposta, default_storage.url(miniaturas.nome_miniatura(primeira, 'lista')))
+
+        self.candidato.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.candidato.foto = self.foto('blue')
+            self.candidato.save()
+        self.assertFalse(default_storage.exists(miniaturas.nome_miniatura(primeira, 'cartao')))
+        call_command('processar_tarefas', '--uma-vez', stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(miniaturas.nome_miniatura(self.candidato.foto.name, 'cartao')))
+
+
+class TesteRascunhoCandidatura(TestCase):
+    def test_etapa1_em_cookie_cifrado_sem_sessao(self):
+        import base64
+        from django.contrib.sessions.models import Session
+        from . import rascunhos
+
+        hoje = timezone.now().date()
+        vaga = Vaga.objects.create(titulo="Brigadista", data_inicio=hoje, data_fim=hoje)
+        distrito = Distrito.objects.create(provincia=Provincia.objects.create(nome="Tete"), nome="Moatize")
+        resposta = self.client.post(reverse('candidaturas:registar_etapa1'), {
+            'vaga': vaga.pk, 'nome_completo': "Ana Cossa", 'genero': Candidato.Genero.FEMININO,
+            'numero_bi': "120100000001A", 'numero_telefone': "841111111",
+            'provincia': distrito.provincia.pk, 'distrito': distrito.pk, 'endereco': "Bairro 1",
+        })
+        self.assertRedirects(resposta, reverse('candidaturas:registar_etapa2'), fetch_redirect_response=False)
+        self.assertIn(rascunhos.COOKIE, resposta.cookies)
+        self.assertFalse(Session.objects.exists())
+        # Os dados pessoais não ficam legíveis no cookie
+        token = resposta.cookies[rascunhos.COOKIE].value.encode()
+        for conteudo in (token, base64.urlsafe_b64decode(token)):
+            self.assertNotIn(b"120100000001A", conteudo)
+            self.assertNotIn(b"Cossa", conteudo)
+
+        self.client.get(reverse('candidaturas:registar_etapa2'))
+        # Os nomes vêm da cache em memória: sem consultas às tabelas de referência
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('candidaturas:registar_etapa2'))
+        self.assertContains(resposta, "Moatize (Tete), Tete")
+        self.assertContains(resposta, "Brigadista")
+        self.assertFalse([q for q in ctx.captured_queries if 'vaga' in q['sql'] or 'core_' in q['sql']])
+        self.assertFalse(Session.objects.exists())
+
+        # Rascunho alterado no browser: deixa de ser aceite
+        self.client.cookies[rascunhos.COOKIE] = resposta.wsgi_request.COOKIES[rascunhos.COOKIE] + 'x'
+        self.assertRedirects(self.client.get(reverse('candidaturas:registar_etapa2')),
+                             reverse('candidaturas:registar_etapa1'), fetch_redirect_response=False)
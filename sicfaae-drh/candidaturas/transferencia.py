@@ -0,0 +1,197 @@
+"""
+Transferência de candidatos aprovados para o DEFC.
+
+Os candidatos são enviados em lotes (DEFC_TAMANHO_LOTE) para o endpoint
+`candidatos/receber_lote/` do DEFC, numa única requests.Session com
+keep-alive. O DEFC usa o id do candidato no DRH (id_drh) como chave de
+idempotência, pelo que reenviar um lote após uma falha de rede não cria
+duplicados. O resultado de cada candidato fica no respectivo ItemEnvioDEFC.
+
+Os envios pedidos pelas views ficam em fila (EnvioDEFC) e são executados pelo
+comando `python manage.py enviar_defc`. Depois de um erro de transporte o lote
+só é repetido após uma espera que duplica a cada falha seguida
+(DEFC_ESPERA_TENTATIVA, até DEFC_ESPERA_MAXIMA segundos), para não insistir
+num DEFC em baixo ou sobrecarregado.
+"""
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+import requests
+from requests.adapters import HTTPAdapter
+
+from sicfaae_comum.contagens import contar_por_estado
+
+from .models import Candidato, EnvioDEFC, ItemEnvioDEFC
+from .serializers import CandidatoParaDEFCSerializer
+
+TAMANHO_LOTE = getattr(settings, 'DEFC_TAMANHO_LOTE', 500)
+MAX_TENTATIVAS = getattr(settings, 'DEFC_MAX_TENTATIVAS', 3)
+TIMEOUT = getattr(settings, 'DEFC_TIMEOUT', 60)
+# Segundos de espera antes de repetir um lote após um erro de transporte
+ESPERA_TENTATIVA = getattr(settings, 'DEFC_ESPERA_TENTATIVA', 2)
+ESPERA_MAXIMA = getattr(settings, 'DEFC_ESPERA_MAXIMA', 60)
+
+
+class ErroTransferencia(Exception):
+    """O DEFC não aceitou o lote (erro de rede, autenticação ou resposta inválida)."""
+
+
+class ClienteDEFC:
+    """Cliente HTTP do DEFC com uma sessão persistente (keep-alive)."""
+
+    def __init__(self, url=None, token=None, timeout=TIMEOUT):
+        self.url = url or settings.DEFC_API_URL
+        token = token if token is not None else settings.DEFC_API_TOKEN
+        if not self.url or not token:
+            raise ErroTransferencia('Configuração de API DEFC não encontrada')
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        self.sessao.headers.update({
+            'Authorization': f'Token {token}',
+            'Content-Type': 'application/json',
+        })
+        self.sessao.mount('http://', HTTPAdapter(pool_maxsize=1, max_retries=1))
+        self.sessao.mount('https://', HTTPAdapter(pool_maxsize=1, max_retries=1))
+
+    def close(self):
+        self.sessao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def enviar_lote(self, candidatos):
+        """
+        Envia uma lista de candidatos serializados e devolve {id_drh: resultado},
+        onde resultado é o dicionário devolvido pelo DEFC para esse candidato.
+        """
+        try:
+            resposta = self.sessao.post(
+                f'{self.url}candidatos/receber_lote/',
+                json={'candidatos': candidatos},
+                timeout=self.timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            raise ErroTransferencia(f'Erro de comunicação com DEFC: {e}') from e
+
+        if resposta.status_code != 200:
+            raise ErroTransferencia(f'DEFC respondeu {resposta.status_code}: {resposta.text[:500]}')
+        try:
+            resultados = resposta.json()['resultados']
+        except (ValueError, KeyError) as e:
+            raise ErroTransferencia('Resposta inválida do DEFC') from e
+        return {resultado.get('id_drh'): resultado for resultado in resultados}
+
+
+def serializar_candidatos(candidatos):
+    """Payload de envio para uma lista/queryset de Candidato."""
+    return CandidatoParaDEFCSerializer(candidatos, many=True).data
+
+
+def _marcar_enviados(candidatos_ids, id_defc_por_candidato):
+    """Actualiza os candidatos aceites pelo DEFC (estado e id no DEFC)."""
+    Candidato.objects.filter(pk__in=candidatos_ids).update(
+        estado=Candidato.Estado.ENVIADO_DEFC,
+        enviado_defc=True,
+        data_envio_defc=timezone.now(),
+    )
+    Candidato.objects.bulk_update(
+        [Candidato(pk=pk, id_defc=id_defc) for pk, id_defc in id_defc_por_candidato.items()],
+        ['id_defc'], batch_size=500,
+    )
+
+
+def enviar_itens(cliente, itens):
+    """
+    Envia um lote de ItemEnvioDEFC (com candidato carregado) e grava o
+    resultado de cada um. Erros de transporte propagam-se como
+    ErroTransferencia, com os itens ainda PENDENTE.
+    """
+    por_candidato = {item.candidato_id: item for item in itens}
+    resultados = cliente.enviar_lote(serializar_candidatos([item.candidato for item in itens]))
+
+    agora = timezone.now()
+    enviados = {}
+    for candidato_id, item in por_candidato.items():
+        resultado = resultados.get(candidato_id)
+        item.tentativas += 1
+        if resultado and resultado.get('estado') in ('criado', 'actualizado'):
+            item.estado = ItemEnvioDEFC.Estado.ENVIADO
+            item.id_defc = str(resultado.get('id', ''))
+            item.erro = ''
+            item.data_envio = agora
+            enviados[candidato_id] = item.id_defc
+        else:
+            item.estado = ItemEnvioDEFC.Estado.FALHADO
+            item.erro = str(resultado.get('erros', '')) if resultado else 'Candidato ausente da resposta do DEFC'
+
+    ItemEnvioDEFC.objects.bulk_update(itens, ['estado', 'id_defc', 'tentativas', 'erro', 'data_envio'])
+    if enviados:
+        _marcar_enviados(list(enviados), enviados)
+    return len(enviados), len(itens) - len(enviados)
+
+
+def processar(envio, cliente=None, tamanho_lote=TAMANHO_LOTE, max_tentativas=MAX_TENTATIVAS,
+              espera=ESPERA_TENTATIVA):
+    """
+    Envia os itens pendentes do `envio` em lotes. Um lote cuja transmissão
+    falha é repetido até `max_tentativas`, após `espera` segundos (o dobro a
+    cada falha seguida); depois disso os seus itens ficam FALHADO.
+    """
+    proprio = cliente is None
+    try:
+        if proprio:
+            cliente = ClienteDEFC()
+    except ErroTransferencia as e:
+        envio.itens.filter(estado=ItemEnvioDEFC.Estado.PENDENTE).update(
+            estado=ItemEnvioDEFC.Estado.FALHADO, erro=str(e)
+        )
+        return concluir_envio(envio)
+
+    pendentes = envio.itens.filter(estado=ItemEnvioDEFC.Estado.PENDENTE).select_related(
+        'candidato__provincia', 'candidato__distrito', 'candidato__vaga'
+    ).order_by('pk')
+    falhas_seguidas = 0
+    try:
+        while True:
+            itens = list(pendentes[:tamanho_lote])
+            if not itens:
+                break
+            if falhas_seguidas:
+                time.sleep(min(espera * 2 ** (falhas_seguidas - 1), ESPERA_MAXIMA))
+            try:
+                enviados, falhados = enviar_itens(cliente, itens)
+                falhas_seguidas = 0
+            except ErroTransferencia as e:
+                ids = [item.pk for item in itens]
+                ItemEnvioDEFC.objects.filter(pk__in=ids).update(tentativas=F('tentativas') + 1, erro=str(e))
+                esgotados = ItemEnvioDEFC.objects.filter(pk__in=ids, tentativas__gte=max_tentativas)
+                falhados = esgotados.update(estado=ItemEnvioDEFC.Estado.FALHADO)
+                enviados = 0
+                falhas_seguidas += 1
+            EnvioDEFC.objects.filter(pk=envio.pk).update(
+                enviados=F('enviados') + enviados, falhados=F('falhados') + falhados
+            )
+    finally:
+        if proprio:
+            cliente.close()
+
+    return concluir_envio(envio)
+
+
+def concluir_envio(envio):
+    """Recalcula os contadores do envio a partir dos itens e fecha-o."""
+    Estado = ItemEnvioDEFC.Estado
+    contagens = contar_por_estado(envio.itens.all(), estados=[Estado.ENVIADO, Estado.FALHADO])
+    enviados, falhados = contagens['por_estado'][Estado.ENVIADO], contagens['por_estado'][Estado.FALHADO]
+    estado = EnvioDEFC.Estado.CONCLUIDO_COM_ERROS if falhados else EnvioDEFC.Estado.CONCLUIDO
+    EnvioDEFC.objects.filter(pk=envio.pk).update(
+        estado=estado, enviados=enviados, falhados=falhados,
+        data_conclusao=timezone.now()
+    )
+    envio.refresh_from_db()
+    return envio
@@ -2,6 +2,7 @@ from django.urls import path
 from . import views
 from . import views_vagas
 from . import views_entrevistador
+from . import views_carregamentos
 
 app_name = 'candidaturas'
 
@@ -12,6 +13,8 @@ urlpatterns = [
     path('gestao/relatorios/', views.RelatoriosView.as_view(), name='relatorios'),
     path('gestao/exportar-excel/<str:tipo_relatorio>/', views.ExportarExcelView.as_view(), name='exportar_excel'),
     path('gestao/relatorios/pdf/<str:tipo_relatorio>/', views.relatorio_pdf, name='relatorio_pdf'),
+    path('gestao/tarefas/<int:pk>/', views.EstadoTarefaView.as_view(), name='estado_tarefa'),
+    path('gestao/tarefas/<int:pk>/descarregar/', views.descarregar_tarefa, name='descarregar_tarefa'),
     path('gestao/utilizadores/', views.GerirUtilizadoresView.as_view(), name='gestao_utilizadores'),
     
     # Gestão de Vagas
@@ -23,6 +26,7 @@ urlpatterns = [
     path('gestao/vagas/<int:pk>/apagar/', views_vagas.ApagarVagaView.as_view(), name='apagar_vaga'),
     path('gestao/vagas/<int:pk>/alternar-status/', views_vagas.alternar_status_vaga, name='alternar_status_vaga'),
     path('gestao/vagas/<int:pk>/abrir-concurso/', views_vagas.AbrirConcursoView.as_view(), name='abrir_concurso'),
+    path('concursos/<int:pk>/aviso-<str:versao>.pdf', views_vagas.documento_concurso, name='documento_concurso'),
     path('gestao/vagas/<int:pk>/novo-entrevistador/', views_vagas.AdicionarEntrevistadorVagaView.as_view(), name='adicionar_entrevistador_vaga'),
     path('gestao/vagas/<int:pk>/enviar-aprovados-formacao/', views_vagas.enviar_aprovados_vaga_formacao, name='enviar_aprovados_vaga_formacao'),
     
@@ -30,6 +34,8 @@ urlpatterns = [
     path('registar/', views.RegistarCandidaturaEtapa1View.as_view(), name='registar_candidatura'),
     path('registar/etapa1/', views.RegistarCandidaturaEtapa1View.as_view(), name='registar_etapa1'),
     path('registar/etapa2/', views.RegistarCandidaturaEtapa2View.as_view(), name='registar_etapa2'),
+    path('registar/carregamentos/', views_carregamentos.iniciar_carregamento, name='iniciar_carregamento'),
+    path('registar/carregamentos/<uuid:identificador>/', views_carregamentos.bloco_carregamento, name='bloco_carregamento'),
     path('registar/voltar/', views.voltar_etapa1, name='voltar_etapa1'),
     
     path('sucesso/', views.sucesso_candidatura, name='sucesso_candidatura'),
@@ -1,42 +1,18 @@
-import os
-from io import BytesIO
-from django.conf import settings
+import logging
+
 from django.http import HttpResponse
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-from django.contrib.staticfiles import finders
-import re
 
-def link_callback(uri, rel):
-    """
-    Converte URIs HTML para caminhos absolutos do sistema para o xhtml2pdf.
-    """
-    if settings.MEDIA_URL and uri.startswith(settings.MEDIA_URL):
-        path = os.path.join(settings.MEDIA_ROOT, uri.replace(settings.MEDIA_URL, ""))
-    elif settings.STATIC_URL and uri.startswith(settings.STATIC_URL):
-        path = os.path.join(settings.STATIC_ROOT, uri.replace(settings.STATIC_URL, ""))
-    else:
-        result = finders.find(uri)
-        if result:
-            if not isinstance(result, (list, tuple)):
-                result = [result]
-            result = list(os.path.normpath(x) for x in result)
-            origin = result[0]
-            return origin
-        return uri
+from .pdf import render_pdf_bytes
 
-    return path
+logger = logging.getLogger(__name__)
 
 def render_to_pdf(template_src, context_dict={}):
-    template = get_template(template_src)
-    html  = template.render(context_dict)
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result, link_callback=link_callback)
-    if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
+    conteudo, erro = render_pdf_bytes(template_src, context_dict)
+    if not erro:
+        return HttpResponse(conteudo, content_type='application/pdf')
     else:
-        print(f"Erro Geracao PDF: {pdf.err}")
-        return HttpResponse(f"Erro ao gerar PDF: {pdf.err}", status=500)
+        logger.error("Erro na geração do PDF (%s): %s", template_src, erro)
+        return HttpResponse(f"Erro ao gerar PDF: {erro}", status=500)
     return None
 
 def formatar_numero_telefone(telefone):
@@ -4,13 +4,15 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.core.files.storage import default_storage
 from django.db.models import Q
 from django.urls import reverse, reverse_lazy
 import datetime
 from django.utils import timezone
+from sicfaae_comum.paginacao import paginar_por_cursor, url_com_cursor
 
-from .models import Candidato, PerfilUtilizador, Provincia, Distrito, Vaga, Entrevista
+from .models import Candidato, PerfilUtilizador, Distrito, Vaga, Entrevista, TarefaRelatorio, EnvioDEFC
 from .forms import (
     FormularioCandidatura, FormularioAutenticacao, FormularioCriacaoUsuario, 
     FormularioValidacaoDocumentos, FormularioCandidaturaManual,
@@ -18,13 +20,18 @@ from .forms import (
     EntrevistaForm, AvaliacaoEntrevistaForm
 )
 from .utils import render_to_pdf, formatar_numero_telefone, despachante_login
+from .pdf import pdf_candidato
+from . import rascunhos
+from .referencias import referencias
 from .managers import GestorEstatisticas
+from .paginacao import ORDENACAO_CANDIDATOS
 from .permissions import (
     obter_candidatos_acessiveis, 
     pode_gerir_candidato,
     pode_ver_candidato,
     obter_exibicao_nivel_usuario,
-    obter_perfil_usuario
+    obter_perfil_usuario,
+    pode_ver_tarefa
 )
 
 class PaginaInicialView(generic.TemplateView):
@@ -37,95 +44,107 @@ class PaginaInicialView(generic.TemplateView):
 
 class ExportarExcelView(LoginRequiredMixin, generic.View):
     def get(self, request, tipo_relatorio='geral', *args, **kwargs):
-        import openpyxl
-        from openpyxl.utils import get_column_letter
+        from sicfaae_comum import formatos
+        from .exportacao import COLUNAS_CANDIDATOS, COLUNAS_TROCA, linhas_candidatos, resposta_xlsx
+        from .tarefas import candidatos_relatorio, nome_exportacao_excel, LIMITE_SINCRONO_EXCEL
 
-        # 1. Obter dados filtrados (respeita hierarquia)
-        queryset_base = obter_candidatos_acessiveis(request.user)
-        
-        candidatos = queryset_base
-        filename_prefix = "candidatos_geral"
-        
-        if tipo_relatorio == 'pendentes':
-            candidatos = queryset_base.filter(estado=Candidato.Estado.PENDENTE)
-            filename_prefix = "candidatos_pendentes"
-        elif tipo_relatorio == 'rejeitados':
-            candidatos = queryset_base.filter(estado=Candidato.Estado.DOCS_REJEITADOS)
-            filename_prefix = "candidatos_rejeitados"
-        elif tipo_relatorio == 'auditoria':
+        if tipo_relatorio == 'auditoria':
             # Para auditoria, exportamos o log se for superusuário, ou nada/erro se não for
             if not request.user.is_superuser:
                  return HttpResponse("Apenas superusuários podem exportar auditoria.", status=403)
-            # Logica especial para auditoria seria diferente (outro modelo), 
-            # mas vamos manter simples por enquanto ou exportar vazio se não implementado a fundo. 
-            # O report PDF usa Candidato.history.all(). Vamos tentar fazer igual.
-            # Se for complexo misturar, melhor tratar separado. Mas vamos tentar.
             return self.exportar_auditoria(request)
 
-        # 2. Criar Workbook
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename={filename_prefix}_{datetime.datetime.now().strftime("%Y%m%d_%H%M")}.xlsx'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Candidatos"
+        if tipo_relatorio not in ('pendentes', 'rejeitados'):
+            tipo_relatorio = 'geral'
 
-        # 3. Cabeçalho
-        headers = ['Código', 'Nome Completo', 'BI', 'Gênero', 'Vaga', 'Província', 'Distrito', 'Telefone', 'Estado', 'Data Inscrição']
-        ws.append(headers)
-        
-        # Estilo para Cabeçalho
-        for col_num, column_title in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.font = openpyxl.styles.Font(bold=True)
-            
-        # 4. Linhas
-        for c in candidatos:
-            row = [
-                c.codigo_candidato,
-                c.nome_completo,
-                c.numero_bi,
-                c.get_genero_display(),
-                str(c.vaga), # __str__ retorna o titulo
-                str(c.provincia),
-                str(c.distrito),
-                c.numero_telefone,
-                c.get_estado_display(),
-                c.data_criacao.strftime("%d/%m/%Y") if c.data_criacao else ""
-            ]
-            ws.append(row)
-
-        wb.save(response)
-        return response
+        # 1. Obter dados filtrados (respeita hierarquia)
+        candidatos = candidatos_relatorio(request.user, tipo_relatorio)
+
+        # CSV/NDJSON (?formato=) são gerados enquanto são enviados, em memória constante
+        formato = request.GET.get('formato')
+        if formato in formatos.TIPOS:
+            return formatos.resposta_streaming(
+                nome_exportacao_excel(tipo_relatorio, formato), formato, COLUNAS_TROCA, linhas_candidatos(candidatos)
+            )
+
+        # 2. Volumes grandes vão para a fila de tarefas
+        if candidatos.count() > LIMITE_SINCRONO_EXCEL:
+            return solicitar_tarefa(
+                request, TarefaRelatorio.Tipo.EXPORTAR_EXCEL, {'tipo_relatorio': tipo_relatorio}
+            )
+
+        # 3. Workbook write-only, linhas lidas por values_list com JOINs
+        cabecalho = [titulo for titulo, _ in COLUNAS_CANDIDATOS]
+        return resposta_xlsx(
+            nome_exportacao_excel(tipo_relatorio), "Candidatos", cabecalho, linhas_candidatos(candidatos)
+        )
 
     def exportar_auditoria(self, request):
-        import openpyxl
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename=auditoria_log_{datetime.datetime.now().strftime("%Y%m%d_%H%M")}.xlsx'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Auditoria Log"
-        
-        headers = ['Data', 'Usuario', 'Tipo', 'Alteração']
-        ws.append(headers)
-        
-        # history_user vem do django-simple-history
-        historico = Candidato.history.all().order_by('-history_date')[:500] 
-        
-        for h in historico:
-            tipo = "Criação" if h.history_type == '+' else "Edição" if h.history_type == '~' else "Remoção"
-            user_str = str(h.history_user) if h.history_user else "Sistema"
-            row = [
-                h.history_date.strftime("%d/%m/%Y %H:%M"),
-                user_str,
-                tipo,
-                f"Estado alterado para {h.estado}" # Simplificação
-            ]
-            ws.append(row)
-            
-        wb.save(response)
-        return response
+        from .exportacao import CABECALHO_AUDITORIA, linhas_auditoria, resposta_xlsx
+        return resposta_xlsx(
+            f'auditoria_log_{datetime.datetime.now().strftime("%Y%m%d_%H%M")}.xlsx',
+            "Auditoria Log", CABECALHO_AUDITORIA, linhas_auditoria()
+        )
+
+
+def solicitar_tarefa(request, tipo, parametros, entrada=None):
+    """Cria (ou reaproveita) a tarefa em segundo plano e redirecciona para o seu estado."""
+    tarefa, criada = TarefaRelatorio.solicitar(request.user, tipo, parametros, entrada=entrada)
+    if criada and entrada is not None:
+        messages.info(request, "O ficheiro foi recebido e está a ser importado em segundo plano.")
+    elif criada:
+        messages.info(request, "O ficheiro é grande e está a ser gerado em segundo plano.")
+    else:
+        messages.info(request, "Já existe um pedido igual em curso. A acompanhar o seu progresso.")
+    return redirect('candidaturas:estado_tarefa', pk=tarefa.pk)
+
+
+class EstadoTarefaView(LoginRequiredMixin, generic.DetailView):
+    """Página (ou JSON, com ?formato=json) de acompanhamento de uma TarefaRelatorio."""
+    model = TarefaRelatorio
+    template_name = 'candidaturas/tarefas/estado_tarefa.html'
+    context_object_name = 'tarefa'
+
+    def get_object(self, queryset=None):
+        tarefa = super().get_object(queryset)
+        if not pode_ver_tarefa(self.request.user, tarefa):
+            raise PermissionDenied("Não tem permissão para ver esta tarefa.")
+        return tarefa
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if request.GET.get('formato') == 'json':
+            tarefa = self.object
+            return JsonResponse({
+                'id': tarefa.pk,
+                'estado': tarefa.estado,
+                'estado_display': tarefa.get_estado_display(),
+                'progresso': tarefa.progresso,
+                'erro': tarefa.erro,
+                'resumo': tarefa.resumo,
+                'url_download': (
+                    reverse('candidaturas:descarregar_tarefa', args=[tarefa.pk])
+                    if tarefa.estado == TarefaRelatorio.Estado.CONCLUIDA else None
+                ),
+            })
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+@login_required
+def descarregar_tarefa(request, pk):
+    """Descarrega o ficheiro de uma tarefa concluída."""
+    from django.http import FileResponse, Http404
+    import os
+
+    tarefa = get_object_or_404(TarefaRelatorio, pk=pk)
+    if not pode_ver_tarefa(request.user, tarefa):
+        raise PermissionDenied("Não tem permissão para ver esta tarefa.")
+    if tarefa.estado != TarefaRelatorio.Estado.CONCLUIDA or not tarefa.ficheiro:
+        raise Http404("O ficheiro ainda não está disponível.")
+
+    return FileResponse(
+        tarefa.ficheiro.open('rb'), as_attachment=True, filename=os.path.basename(tarefa.ficheiro.name)
+    )
 
 
 class PainelControloView(LoginRequiredMixin, generic.TemplateView):
@@ -196,8 +215,8 @@ class ListaVerificacaoView(LoginRequiredMixin, generic.ListView):
         # Filtragem por Perfil de Utilizador (Hierarquia)
         # A função obter_candidatos_acessiveis já faz a maior parte da filtragem hierárquica.
         # Este bloco pode ser para refinar ou adicionar lógica específica de UI.
-        if hasattr(self.request.user, 'perfil') and self.request.user.perfil:
-            perfil = self.request.user.perfil
+        perfil = obter_perfil_usuario(self.request.user)
+        if perfil:
             
             # STAE Central: Pode ver tudo, mas foca em vagas CENTRAIS para aprovação
             if perfil.nivel == PerfilUtilizador.Nivel.CENTRAL:
@@ -227,11 +246,8 @@ class ListaVerificacaoView(LoginRequiredMixin, generic.ListView):
                     
         # Aplicação dos Filtros de Pesquisa UI
         if q:
-            qs = qs.filter(
-                Q(nome_completo__icontains=q) | 
-                Q(numero_bi__icontains=q) |
-                Q(codigo_candidato__icontains=q)
-            )
+            # Pesquisa por prefixo no índice TermoPesquisaCandidato (nome, BI, código)
+            qs = qs.pesquisar(q)
             
         if estado:
             if estado == 'TODOS': # Handle 'TODOS' option
@@ -246,13 +262,24 @@ class ListaVerificacaoView(LoginRequiredMixin, generic.ListView):
 
         # Filtro de Província (Apenas Central/Superuser)
         filtro_provincia = self.request.GET.get('provincia')
-        if (self.request.user.is_superuser or obter_perfil_usuario(self.request.user).nivel == PerfilUtilizador.Nivel.CENTRAL) and filtro_provincia:
+        if (self.request.user.is_superuser or self.request.escopo.is_central) and filtro_provincia:
              qs = qs.filter(provincia__id=filtro_provincia)
 
-        return qs.order_by('-data_criacao')
+        self.ordenacao = ('-relevancia',) + ORDENACAO_CANDIDATOS if q else ORDENACAO_CANDIDATOS
+        # A tabela mostra a vaga e o distrito de cada candidato
+        return qs.select_related('vaga', 'distrito').order_by(*self.ordenacao)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Paginação por cursor (candidaturas/paginacao.py) em vez de OFFSET
+        pagina = paginar_por_cursor(queryset, self.request.GET.get('cursor'), page_size, self.ordenacao)
+        return None, pagina, pagina.object_list, pagina.has_other_pages()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        pagina = context['page_obj']
+        context['url_primeira'] = url_com_cursor(self.request, None)
+        context['url_anterior'] = url_com_cursor(self.request, pagina.cursor_anterior)
+        context['url_seguinte'] = url_com_cursor(self.request, pagina.cursor_seguinte)
         context['estado_atual'] = self.request.GET.get('estado', Candidato.Estado.PENDENTE)
         context['vaga_atual'] = self.request.GET.get('vaga', '')
         context['genero_atual'] = self.request.GET.get('genero', '')
@@ -291,35 +318,48 @@ class DetalheCandidatoView(LoginRequiredMixin, generic.DetailView):
 
 
 
+def _resposta_pdf_candidato(candidato, template_src, obter_contexto, nome_ficheiro, versao=()):
+    """PDF do candidato servido do storage; só é gerado de novo quando o candidato, `versao` ou o template muda."""
+    nome, erro = pdf_candidato(candidato, template_src, obter_contexto, versao)
+    if erro:
+        return HttpResponse(f"Erro ao gerar PDF: {erro}", status=500)
+    return FileResponse(
+        default_storage.open(nome, 'rb'), as_attachment=True, filename=nome_ficheiro,
+        content_type='application/pdf'
+    )
+
+
 def gerar_pdf(request, pk):
-    candidato = get_object_or_404(Candidato, pk=pk)
-    data = { 
+    candidato = get_object_or_404(Candidato.objects.select_related('provincia', 'distrito__provincia'), pk=pk)
+    # A data de emissão faz parte da versão: o PDF guardado só é reutilizado no mesmo dia
+    emissao = timezone.localdate()
+    data = lambda: {
         'candidato': candidato,
-        'data': datetime.datetime.now(),
+        'data': emissao,
         'cabecalho_stae': 'SECRETARIADO TÉCNICO DE ADMINISTRAÇÃO ELEITORAL',
     }
-    pdf = render_to_pdf('candidaturas/formulario_stae.html', data)
-    if pdf:
-        response = pdf
-        filename = f"Ficha_STAE_{candidato.numero_bi}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    return HttpResponse("Erro ao gerar PDF")
+    return _resposta_pdf_candidato(
+        candidato, 'candidaturas/formulario_stae.html', data, f"Ficha_STAE_{candidato.numero_bi}.pdf",
+        versao=(emissao, candidato.provincia, candidato.distrito),
+    )
 
 
 def gerar_ficha_entrevista(request, pk):
-    candidato = get_object_or_404(Candidato, pk=pk)
-    data = { 
+    candidato = get_object_or_404(Candidato.objects.select_related('vaga', 'entrevista_detalhe'), pk=pk)
+    # A entrevista é gravada sem alterar o candidato (AgendarEntrevistaView)
+    entrevista = getattr(candidato, 'entrevista_detalhe', None)
+    data = lambda: {
         'candidato': candidato,
         'data': datetime.datetime.now(),
     }
-    pdf = render_to_pdf('candidaturas/pdf/ficha_entrevista.html', data)
-    if pdf:
-        response = pdf
-        filename = f"Ficha_Entrevista_{candidato.nome_completo.replace(' ', '_')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    return HttpResponse("Erro ao gerar PDF de Entrevista")
+    return _resposta_pdf_candidato(
+        candidato, 'candidaturas/pdf/ficha_entrevista.html', data,
+        f"Ficha_Entrevista_{candidato.nome_completo.replace(' ', '_')}.pdf",
+        versao=(
+            candidato.vaga.titulo if candidato.vaga else '',
+            entrevista.data_atualizacao.isoformat() if entrevista else '',
+        ),
+    )
 
 # AJAX Views
 def carregar_distritos(request):
@@ -349,15 +389,15 @@ class RegistarCandidaturaEtapa1View(generic.FormView):
     template_name = 'candidaturas/candidatura_etapa1.html'
     
     def get_initial(self):
-        """Preencher com dados da sessão se existirem (voltar da etapa 2)"""
+        """Preencher com os dados do rascunho se existirem (voltar da etapa 2)"""
         initial = super().get_initial()
-        dados_sessao = self.request.session.get('candidatura_etapa1', {})
-        if dados_sessao:
-            initial.update(dados_sessao)
+        rascunho = rascunhos.ler(self.request)
+        if rascunho:
+            initial.update(rascunho)
         return initial
     
     def form_valid(self, form):
-        """Guardar dados na sessão e redirecionar para Etapa 2"""
+        """Guardar dados no rascunho (cookie cifrado, sem sessão) e redirecionar para Etapa 2"""
         dados = {
             'vaga': form.cleaned_data['vaga'].id,
             'nome_completo': form.cleaned_data['nome_completo'],
@@ -369,8 +409,7 @@ class RegistarCandidaturaEtapa1View(generic.FormView):
             'distrito': form.cleaned_data['distrito'].id,
             'endereco': form.cleaned_data['endereco'],
         }
-        self.request.session['candidatura_etapa1'] = dados
-        return redirect('candidaturas:registar_etapa2')
+        return rascunhos.guardar(redirect('candidaturas:registar_etapa2'), dados)
 
 class RegistarCandidaturaEtapa2View(generic.FormView):
     """Etapa 2: Upload de Documentos"""
@@ -380,7 +419,8 @@ class RegistarCandidaturaEtapa2View(generic.FormView):
     
     def dispatch(self, request, *args, **kwargs):
         """Verificar se a Etapa 1 foi completada"""
-        if 'candidatura_etapa1' not in request.session:
+        self.dados_etapa1 = rascunhos.ler(request)
+        if not self.dados_etapa1:
             messages.warning(request, "Por favor, preencha primeiro os seus dados pessoais.")
             return redirect('candidaturas:registar_etapa1')
         return super().dispatch(request, *args, **kwargs)
@@ -388,27 +428,26 @@ class RegistarCandidaturaEtapa2View(generic.FormView):
     def get_context_data(self, **kwargs):
         """Adicionar dados da Etapa 1 ao contexto para exibição"""
         context = super().get_context_data(**kwargs)
-        dados_etapa1 = self.request.session.get('candidatura_etapa1', {})
+        dados_etapa1 = self.dados_etapa1
         
-        # Carregar objetos relacionados para exibição
-        from .models import Vaga
+        # Nomes da vaga e da geografia a partir da cache em memória (referencias.py)
         if dados_etapa1:
             context['dados_etapa1'] = {
-                'vaga': Vaga.objects.filter(id=dados_etapa1.get('vaga')).first(),
+                'vaga': referencias.nome('vaga', dados_etapa1.get('vaga')),
                 'nome_completo': dados_etapa1.get('nome_completo'),
                 'genero': dict(Candidato.Genero.choices).get(dados_etapa1.get('genero')),
                 'data_nascimento': dados_etapa1.get('data_nascimento'),
                 'numero_bi': dados_etapa1.get('numero_bi'),
                 'numero_telefone': dados_etapa1.get('numero_telefone'),
-                'provincia': Provincia.objects.filter(id=dados_etapa1.get('provincia')).first(),
-                'distrito': Distrito.objects.filter(id=dados_etapa1.get('distrito')).first(),
+                'provincia': referencias.nome('provincia', dados_etapa1.get('provincia')),
+                'distrito': referencias.nome('distrito', dados_etapa1.get('distrito')),
                 'endereco': dados_etapa1.get('endereco'),
             }
         return context
     
     def form_valid(self, form):
-        """Combinar dados da sessão com arquivos e criar candidato"""
-        dados_etapa1 = self.request.session.get('candidatura_etapa1')
+        """Combinar dados do rascunho com arquivos e criar candidato"""
+        dados_etapa1 = self.dados_etapa1
         
         # Criar instância do candidato
         from datetime import datetime
@@ -427,23 +466,29 @@ class RegistarCandidaturaEtapa2View(generic.FormView):
         candidato.distrito_id = dados_etapa1['distrito']
         candidato.endereco = dados_etapa1['endereco']
         
-        # Dados da Etapa 2 (arquivos)
-        candidato.arquivo_cv = form.cleaned_data.get('arquivo_cv')
-        candidato.arquivo_bi = form.cleaned_data.get('arquivo_bi')
-        candidato.arquivo_certificado = form.cleaned_data.get('arquivo_certificado')
-        candidato.foto = form.cleaned_data.get('foto')
+        # Dados da Etapa 2 (arquivos), compactados antes de guardar
+        from .compactacao import compactar
+        for campo in form.CAMPOS_DOCUMENTOS:
+            ficheiro = form.cleaned_data.get(campo)
+            if ficheiro:
+                ficheiro, original, guardado = compactar(campo, ficheiro)
+                candidato.tamanhos_documentos[campo] = {'original': original, 'guardado': guardado}
+            setattr(candidato, campo, ficheiro)
         
         # Estado inicial
         candidato.estado = Candidato.Estado.PENDENTE
         
         # Salvar
         candidato.save()
-        
-        # Limpar sessão
-        del self.request.session['candidatura_etapa1']
+
+        # Os ficheiros enviados em blocos já foram copiados para o candidato
+        for carregamento in form.carregamentos:
+            form.cleaned_data[carregamento.campo].close()
+            carregamento.apagar()
         
         messages.success(self.request, f"Candidatura submetida com sucesso! Código: {candidato.codigo_candidato} | BI: {candidato.numero_bi}")
-        return super().form_valid(form)
+        # Limpar rascunho
+        return rascunhos.apagar(super().form_valid(form))
 
 def voltar_etapa1(request):
     """Permite voltar à Etapa 1 mantendo os dados"""
@@ -546,92 +591,28 @@ def despachante_auth(request):
     return redirect(despachante_login(request.user))
 
 class ImportarExcelView(LoginRequiredMixin, generic.TemplateView):
+    """Recebe o ficheiro e cria a tarefa de importação (ver candidaturas/importacao.py)."""
     template_name = 'candidaturas/importar_excel.html'
 
     def post(self, request, *args, **kwargs):
-        if 'excel_file' not in request.FILES:
+        from .importacao import formato_do_nome, resumo_sha256
+
+        excel_file = request.FILES.get('excel_file')
+        if excel_file is None:
             messages.error(request, "Nenhum arquivo enviado.")
             return redirect('.')
-        
-        excel_file = request.FILES['excel_file']
-        import openpyxl
-        
-        try:
-            wb = openpyxl.load_workbook(excel_file)
-            ws = wb.active
-            
-            atualizados = 0
-            criados = 0
-            
-            rows = list(ws.rows)
-            header = [c.value for c in rows[0]] if rows else []
-            
-            def find_col(names):
-                for i, h in enumerate(header):
-                    if str(h).strip().lower() in [n.lower() for n in names]:
-                        return i
-                return -1
-
-            bi_idx = find_col(['BI', 'Número de BI', 'Numero de BI'])
-            obs_idx = find_col(['Observacoes', 'Observações', 'Notas', 'Obs'])
-            nome_idx = find_col(['Nome', 'Nome Completo'])
-            tel_idx = find_col(['Telefone', 'Telemovel', 'Celular'])
-            vaga_idx = find_col(['Vaga', 'Cargo', 'Função'])
-            
-            if bi_idx == -1:
-                messages.error(request, "Coluna 'BI' não encontrada no Excel.")
-                return redirect('.')
+        formato = formato_do_nome(excel_file.name)
+        if formato is None:
+            messages.error(request, "O arquivo deve estar no formato Excel (.xlsx), CSV ou NDJSON (.ndjson/.jsonl).")
+            return redirect('.')
 
-            for row in rows[1:]:
-                bi_val = row[bi_idx].value
-                if not bi_val: continue
-                
-                bi_val = str(bi_val).strip()
-                obs_val = row[obs_idx].value if obs_idx != -1 else ""
-                nome_val = row[nome_idx].value if nome_idx != -1 else ""
-                tel_val = row[tel_idx].value if tel_idx != -1 else ""
-                vaga_val = row[vaga_idx].value if vaga_idx != -1 else ""
-                
-                if obs_val is None: obs_val = ""
-                
-                funcao_valida = Candidato.Funcao.BRIGADISTA
-                if vaga_val:
-                    r_str = str(vaga_val).strip().upper()
-                    if 'FORMADOR' in r_str: funcao_valida = Candidato.Funcao.FORMADOR
-                    elif 'BRIGADISTA' in r_str: funcao_valida = Candidato.Funcao.BRIGADISTA
-                    elif 'AGENTE' in r_str or 'CIVICO' in r_str: funcao_valida = Candidato.Funcao.AGENTE_CIVICO
-
-                candidato, criado = Candidato.objects.get_or_create(
-                    numero_bi=bi_val,
-                    defaults={
-                        'nome_completo': nome_val or f"Candidato {bi_val}",
-                        'numero_telefone': tel_val or "000000000",
-                        'observacoes': obs_val,
-                        'funcao': funcao_valida,
-                        'estado': Candidato.Estado.PENDENTE
-                    }
-                )
-
-                if not criado:
-                    updates = []
-                    if obs_val:
-                        if candidato.observacoes:
-                            candidato.observacoes += f"\n[Import]: {obs_val}"
-                        else:
-                            candidato.observacoes = obs_val
-                        updates.append("obs")
-                    if updates:
-                        candidato.save()
-                        atualizados += 1
-                else:
-                    criados += 1
-
-            messages.success(request, f"Importação concluída. Atualizados: {atualizados}, Criados: {criados}")
-            
-        except Exception as e:
-            messages.error(request, f"Erro ao processar arquivo: {str(e)}")
-            
-        return redirect('.')         
+        parametros = {
+            'ficheiro': excel_file.name,
+            'formato': formato,
+            'sha256': resumo_sha256(excel_file),
+            'simular': bool(request.POST.get('simular')),
+        }
+        return solicitar_tarefa(request, TarefaRelatorio.Tipo.IMPORTAR_EXCEL, parametros, entrada=excel_file)
 
 class GerirUtilizadoresView(LoginRequiredMixin, generic.CreateView):
     template_name = 'candidaturas/gestao_utilizadores.html'
@@ -690,69 +671,28 @@ class RelatoriosView(LoginRequiredMixin, generic.TemplateView):
     template_name = 'candidaturas/relatorios.html'
 
 def relatorio_pdf(request, tipo_relatorio):
+    from .tarefas import candidatos_relatorio, preparar_relatorio_pdf, nome_relatorio_pdf, LIMITE_SINCRONO_PDF
+
     user = request.user
     if not user.is_authenticated:
         return redirect('login')
-        
-    queryset_base = obter_candidatos_acessiveis(user).select_related('provincia', 'distrito').order_by('nome_completo')
-    
-    titulo = "Relatório"
-    template = 'candidaturas/pdf/lista_generica.html'
-    context = {}
-    
-    if tipo_relatorio == 'geral':
-        titulo = "Lista Geral de Inscritos"
-        queryset = queryset_base
-        
-    elif tipo_relatorio == 'pendentes':
-        titulo = "Relatório de Candidaturas Pendentes"
-        queryset = queryset_base.filter(estado=Candidato.Estado.PENDENTE)
-        
-    elif tipo_relatorio == 'rejeitados':
-        titulo = "Relatório de Candidaturas Rejeitadas"
-        queryset = queryset_base.filter(estado=Candidato.Estado.DOCS_REJEITADOS)
-        
-    elif tipo_relatorio == 'estatisticas':
-        titulo = "Resumo Estatístico de Candidaturas"
-        gestor = GestorEstatisticas(user)
-        stats_gerais = gestor.obter_estatisticas_gerais()
-        
-        template = 'candidaturas/pdf/resumo_estatistico.html'
-        context['stats_total'] = stats_gerais['total_candidatos']
-        context['stats_role'] = stats_gerais['stats_funcao']
-        context['stats_status'] = stats_gerais['stats_estado']
-        
-        queryset = queryset_base
 
-    elif tipo_relatorio == 'auditoria':
-        if not user.is_superuser:
-             raise PermissionDenied("Apenas superusuários podem gerar relatórios de auditoria.")
-             
-        titulo = "Relatório de Auditoria do Sistema (Audit Log)"
-        template = 'candidaturas/pdf/auditoria_log.html'
-        
-        # Obter histórico (últimos 100 eventos)
-        # Note: Candidato.history.all() vem do django-simple-history
-        historico = Candidato.history.all().order_by('-history_date')[:100]
-        context['historico'] = historico
-        queryset = Candidato.objects.none() # Não usado neste template
+    if tipo_relatorio == 'auditoria' and not user.is_superuser:
+        raise PermissionDenied("Apenas superusuários podem gerar relatórios de auditoria.")
 
-    else:
-        titulo = "Relatório Desconhecido"
-        queryset = Candidato.objects.none()
-
-    if tipo_relatorio != 'estatisticas':
-        context['candidatos'] = queryset
+    # Listas grandes vão para a fila de tarefas (o resumo estatístico e a auditoria são sempre curtos)
+    if tipo_relatorio in ('geral', 'pendentes', 'rejeitados'):
+        if candidatos_relatorio(user, tipo_relatorio).count() > LIMITE_SINCRONO_PDF:
+            return solicitar_tarefa(
+                request, TarefaRelatorio.Tipo.RELATORIO_PDF, {'tipo_relatorio': tipo_relatorio}
+            )
 
-    context['titulo'] = titulo
-    context['area_nome'] = obter_exibicao_nivel_usuario(user)
-    context['data'] = datetime.datetime.now()
+    template, context = preparar_relatorio_pdf(user, tipo_relatorio)
 
     pdf = render_to_pdf(template, context)
     if pdf:
         response = pdf
-        filename = f"Relatorio_{tipo_relatorio}_{datetime.datetime.now().strftime('%Y%m%d')}.pdf"
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
+        response['Content-Disposition'] = f'inline; filename="{nome_relatorio_pdf(tipo_relatorio)}"'
         return response
     
     return HttpResponse("Erro ao gerar PDF")
@@ -769,20 +709,19 @@ class PesquisaCandidatoView(LoginRequiredMixin, generic.View):
             messages.error(request, "Por favor, introduza um número de BI.")
             return render(request, self.template_name)
         
-        try:
-            candidato = Candidato.objects.get(numero_bi__iexact=bi)
-            
-            if not pode_ver_candidato(request.user, candidato):
-                 messages.error(request, "Não tem permissão para aceder a este candidato.")
-                 return render(request, self.template_name)
-
-            url = reverse_lazy('candidaturas:detalhe_candidato', kwargs={'pk': candidato.pk})
-            return redirect(f"{url}?tab=docs")
-            
-        except Candidato.DoesNotExist:
+        # Procura no índice de pesquisa (BI normalizado), não numa comparação iexact
+        candidato = Candidato.objects.com_documento(numero_bi=bi).order_by('pk').first()
+        if candidato is None:
             messages.error(request, f"Candidato com BI '{bi}' não encontrado.")
             return render(request, self.template_name)
 
+        if not pode_ver_candidato(request.user, candidato):
+             messages.error(request, "Não tem permissão para aceder a este candidato.")
+             return render(request, self.template_name)
+
+        url = reverse_lazy('candidaturas:detalhe_candidato', kwargs={'pk': candidato.pk})
+        return redirect(f"{url}?tab=docs")
+
 class RegistarCandidaturaManualView(LoginRequiredMixin, generic.CreateView):
     model = Candidato
     form_class = FormularioCandidaturaManual
@@ -815,9 +754,9 @@ def consulta_publica(request):
         if termo:
             try:
                 # Busca por BI ou Telefone
-                candidato = Candidato.objects.filter(
-                    Q(numero_bi__iexact=termo) | Q(numero_telefone=termo)
-                ).first()
+                candidato = Candidato.objects.com_documento(
+                    numero_bi=termo, numero_telefone=termo
+                ).order_by('-data_criacao').first()
                 
                 if not candidato:
                     erro = "Nenhuma candidatura encontrada com os dados fornecidos."
@@ -902,30 +841,6 @@ class EditarVagaView(LoginRequiredMixin, generic.UpdateView):
         return context
 
 
-class DetalheVagaView(LoginRequiredMixin, generic.DetailView):
-    """Exibe detalhes de uma vaga com estatísticas."""
-    model = Vaga
-    template_name = 'candidaturas/vagas/detalhe_vaga.html'
-    context_object_name = 'vaga'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        vaga = self.object
-        
-        # Estatísticas da vaga
-        context['total_candidatos'] = vaga.candidatos.count()
-        context['candidatos_pendentes'] = vaga.candidatos.filter(estado=Candidato.Estado.PENDENTE).count()
-        context['candidatos_docs_aprovados'] = vaga.candidatos.filter(estado=Candidato.Estado.DOCS_APROVADOS).count()
-        context['candidatos_entrevista_agendada'] = vaga.candidatos.filter(estado=Candidato.Estado.ENTREVISTA_AGENDADA).count()
-        context['candidatos_aprovados'] = vaga.candidatos.filter(estado=Candidato.Estado.ENTREVISTA_APROVADA).count()
-        context['candidatos_enviados_defc'] = vaga.candidatos.filter(estado=Candidato.Estado.ENVIADO_DEFC).count()
-        
-        # Lista de candidatos recentes
-        context['candidatos_recentes'] = vaga.candidatos.all().order_by('-data_criacao')[:10]
-        
-        return context
-
-
 def alternar_status_vaga(request, pk):
     """Ativa ou desativa uma vaga."""
     vaga = get_object_or_404(Vaga, pk=pk)
@@ -999,23 +914,6 @@ class EditarVagaView(LoginRequiredMixin, generic.UpdateView):
         return context
 
 
-class DetalheVagaView(LoginRequiredMixin, generic.DetailView):
-    model = Vaga
-    template_name = 'candidaturas/vagas/detalhe_vaga.html'
-    context_object_name = 'vaga'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        vaga = self.object
-        context['total_candidatos'] = vaga.candidatos.count()
-        context['candidatos_pendentes'] = vaga.candidatos.filter(estado=Candidato.Estado.PENDENTE).count()
-        context['candidatos_entrevista_agendada'] = vaga.candidatos.filter(estado=Candidato.Estado.ENTREVISTA_AGENDADA).count()
-        context['candidatos_aprovados'] = vaga.candidatos.filter(estado=Candidato.Estado.ENTREVISTA_APROVADA).count()
-        context['candidatos_enviados_defc'] = vaga.candidatos.filter(estado=Candidato.Estado.ENVIADO_DEFC).count()
-        context['candidatos_recentes'] = vaga.candidatos.all().order_by('-data_criacao')[:10]
-        return context
-
-
 def alternar_status_vaga(request, pk):
     vaga = get_object_or_404(Vaga, pk=pk)
     vaga.ativa = not vaga.ativa
@@ -1152,40 +1050,16 @@ def enviar_aprovados_lista_formacao(request):
         if request.user.is_superuser or perfil.nivel == PerfilUtilizador.Nivel.CENTRAL:
             qs = qs.filter(provincia__id=provincia_id)
             
-    candidatos = list(qs)
-    total = len(candidatos)
-    
-    if total == 0:
+    if not qs.exists():
         messages.warning(request, "Nenhum candidato apto encontrado com os filtros atuais.")
         return redirect(f"{reverse('candidaturas:lista_verificacao')}?estado=ENTREVISTA_APROVADA")
 
-    import random
-    import string
-    
-    for c in candidatos:
-         chars = string.ascii_letters + string.digits
-         senha = ''.join(random.choices(chars, k=8))
-         c.password_defc = senha
-         c.estado = Candidato.Estado.ENVIADO_DEFC
-         c.save()
-         c.save()
-         
-    # Trigger DEFC migration script automatically
-    import subprocess
-    import platform
-    import os
-    python_cmd = 'python' if platform.system() == 'Windows' else 'python3'
-    defc_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../sicfaae-defc'))
-    script_path = os.path.join(defc_dir, 'migrate_defc.py')
-    
-    if os.path.exists(script_path):
-        try:
-            subprocess.Popen([python_cmd, script_path], cwd=defc_dir)
-            messages.success(request, f"{total} candidatos aprovados foram enviados com sucesso e a sincronização com DEFC foi iniciada.")
-        except Exception as e:
-            messages.warning(request, f"{total} candidatos enviados, mas falha ao sincronizar com DEFC: {str(e)}")
+    # A transferência é feita em lotes pelo comando enviar_defc
+    envio = EnvioDEFC.solicitar(qs, request.user)
+    if envio:
+        messages.success(request, f"{envio.total} candidatos aprovados foram postos em fila para envio ao DEFC.")
     else:
-        messages.success(request, f"{total} candidatos aprovados foram enviados para Formação com sucesso! (Sync script não encontrado)")
+        messages.info(request, "Todos os candidatos aprovados já foram enviados ou estão em fila para envio ao DEFC.")
     
     # Base redirect with state
     url = f"{reverse('candidaturas:lista_verificacao')}?estado=ENVIADO_DEFC"
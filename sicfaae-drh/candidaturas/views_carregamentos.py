@@ -0,0 +1,95 @@
+"""
+Carregamento em blocos (retomável) dos documentos da candidatura. Protocolo
+usado pela Etapa 2 (candidatura_etapa2.html):
+
+1. POST carregamentos/ com campo, nome e tamanho -> 201 {identificador, recebido, tamanho_bloco}
+2. PUT carregamentos/<identificador>/ com o bloco no corpo e o cabeçalho
+   X-Deslocamento (bytes já enviados) -> {recebido, concluido}. Se o
+   deslocamento não coincidir (bloco repetido ou perdido), 409 com o recebido.
+3. GET carregamentos/<identificador>/ -> {recebido, tamanho, concluido}, para
+   retomar depois de uma falha de rede.
+
+Concluído o envio, o identificador vai no campo escondido carregamento_<campo>
+do formulário da Etapa 2 em vez do ficheiro. Só quem tem o rascunho da Etapa 1
+(cookie de rascunhos.py) pode iniciar carregamentos.
+"""
+import json
+import os
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods
+
+from candidaturas import rascunhos
+from candidaturas.models import CarregamentoDocumento
+
+TAMANHO_BLOCO = getattr(settings, 'CARREGAMENTOS_TAMANHO_BLOCO', 512 * 1024)
+TAMANHO_MAXIMO = getattr(settings, 'CARREGAMENTOS_TAMANHO_MAXIMO', 10 * 1024 * 1024)
+
+# Extensões aceites por campo (as mesmas do formulário)
+EXTENSOES = {
+    CarregamentoDocumento.Campo.CV: ('.pdf', '.doc', '.docx'),
+    CarregamentoDocumento.Campo.BI: ('.pdf', '.jpg', '.jpeg', '.png'),
+    CarregamentoDocumento.Campo.CERTIFICADO: ('.pdf', '.jpg', '.jpeg', '.png'),
+    CarregamentoDocumento.Campo.FOTO: ('.jpg', '.jpeg', '.png'),
+}
+
+
+def _estado(carregamento, status=200):
+    return JsonResponse({
+        'identificador': str(carregamento.identificador),
+        'recebido': carregamento.recebido,
+        'tamanho': carregamento.tamanho,
+        'concluido': carregamento.concluido,
+        'tamanho_bloco': TAMANHO_BLOCO,
+    }, status=status)
+
+
+def _erro(mensagem, status=400, **extra):
+    return JsonResponse({'erro': mensagem, **extra}, status=status)
+
+
+@require_http_methods(['POST'])
+def iniciar_carregamento(request):
+    if not rascunhos.ler(request):
+        return _erro("Preencha primeiro os dados pessoais.", status=403)
+
+    try:
+        dados = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+        campo = dados.get('campo')
+        nome = os.path.basename(str(dados.get('nome', '')))[:255]
+        tamanho = int(dados.get('tamanho'))
+    except (TypeError, ValueError):
+        return _erro("Pedido inválido: indique campo, nome e tamanho.")
+
+    if campo not in EXTENSOES:
+        return _erro("Documento desconhecido.")
+    if not nome.lower().endswith(EXTENSOES[campo]):
+        return _erro(f"Formato não aceite. Use: {', '.join(EXTENSOES[campo])}")
+    if not 0 < tamanho <= TAMANHO_MAXIMO:
+        return _erro(f"O ficheiro deve ter no máximo {TAMANHO_MAXIMO // (1024 * 1024)} MB.")
+
+    carregamento = CarregamentoDocumento.objects.create(campo=campo, nome_original=nome, tamanho=tamanho)
+    return _estado(carregamento, status=201)
+
+
+@require_http_methods(['GET', 'PUT'])
+def bloco_carregamento(request, identificador):
+    carregamento = get_object_or_404(CarregamentoDocumento, identificador=identificador)
+    if request.method == 'GET':
+        return _estado(carregamento)
+
+    try:
+        deslocamento = int(request.headers.get('X-Deslocamento', ''))
+    except ValueError:
+        return _erro("Cabeçalho X-Deslocamento em falta.")
+    dados = request.body
+    if not dados or len(dados) > TAMANHO_BLOCO:
+        return _erro(f"Cada bloco deve ter entre 1 e {TAMANHO_BLOCO} bytes.")
+
+    try:
+        carregamento.acrescentar(deslocamento, dados)
+    except CarregamentoDocumento.DeslocamentoInvalido as e:
+        return _erro(str(e), status=409, recebido=e.recebido)
+    return _estado(carregamento)
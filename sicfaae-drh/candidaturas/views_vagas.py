@@ -5,15 +5,16 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.db.models import Q
-from django.utils import timezone
-from django.core.files.base import ContentFile
+from django.http import Http404
 from django.contrib.auth.models import User
 import string
 import random
 from django.contrib.auth.decorators import login_required
-from candidaturas.models import Vaga, Candidato, EntrevistadorVaga
+from candidaturas.models import Vaga, Candidato, EntrevistadorVaga, EnvioDEFC, TarefaRelatorio
 from candidaturas.forms import VagaForm, VagaFormEtapa1, VagaFormEtapa2, AbrirConcursoForm, CriarEntrevistadorVagaForm
 from candidaturas.utils import render_to_pdf
+from candidaturas.ficheiros import resposta_ficheiro
+from sicfaae_comum.contagens import contar_por_estado
 
 
 class ListaVagasView(LoginRequiredMixin, generic.ListView):
@@ -169,8 +170,12 @@ class EditarVagaView(LoginRequiredMixin, generic.UpdateView):
         return kwargs
     
     def form_valid(self, form):
-        messages.success(self.request, f'Vaga "{form.instance.titulo}" atualizada com sucesso!')
-        return super().form_valid(form)
+        resposta = super().form_valid(form)
+        messages.success(self.request, f'Vaga "{self.object.titulo}" atualizada com sucesso!')
+        # O aviso publicado mostra campos da vaga: uma edição que os mude gera uma versão nova
+        if self.object.concurso_aberto and pedir_documento_concurso(self.request, self.object):
+            messages.info(self.request, "O documento oficial está a ser actualizado e ficará disponível dentro de momentos.")
+        return resposta
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -189,13 +194,19 @@ class DetalheVagaView(LoginRequiredMixin, generic.DetailView):
         context = super().get_context_data(**kwargs)
         vaga = self.object
         
-        # Estatísticas da vaga
-        context['total_candidatos'] = vaga.candidatos.count()
-        context['candidatos_pendentes'] = vaga.candidatos.filter(estado=Candidato.Estado.PENDENTE).count()
-        context['candidatos_docs_aprovados'] = vaga.candidatos.filter(estado=Candidato.Estado.DOCS_APROVADOS).count()
-        context['candidatos_entrevista_agendada'] = vaga.candidatos.filter(estado=Candidato.Estado.ENTREVISTA_AGENDADA).count()
-        context['candidatos_aprovados'] = vaga.candidatos.filter(estado=Candidato.Estado.ENTREVISTA_APROVADA).count()
-        context['candidatos_enviados_defc'] = vaga.candidatos.filter(estado=Candidato.Estado.ENVIADO_DEFC).count()
+        # Estatísticas da vaga por estado e por género (uma única query)
+        Estado, Genero = Candidato.Estado, Candidato.Genero
+        contagens = contar_por_estado(
+            vaga.candidatos.all(), estados=Estado.values, generos=Genero.values
+        )
+        por_estado = contagens['por_estado']
+        context['total_candidatos'] = contagens['total']
+        context['candidatos_pendentes'] = por_estado[Estado.PENDENTE]
+        context['candidatos_entrevista_agendada'] = por_estado[Estado.ENTREVISTA_AGENDADA]
+        context['candidatos_aprovados'] = por_estado[Estado.ENTREVISTA_APROVADA]
+        context['candidatos_enviados_defc'] = por_estado[Estado.ENVIADO_DEFC]
+        context['candidatos_homens'] = contagens['por_genero'][Genero.MASCULINO]
+        context['candidatos_mulheres'] = contagens['por_genero'][Genero.FEMININO]
         
         # Lista de candidatos recentes
         context['candidatos_recentes'] = vaga.candidatos.all().order_by('-data_criacao')[:10]
@@ -210,39 +221,19 @@ def enviar_aprovados_vaga_formacao(request, pk):
     vaga = get_object_or_404(Vaga, pk=pk)
     
     from django.contrib import messages
-    from django.utils import timezone
     
     candidatos_aprovados = Candidato.objects.filter(
         vaga=vaga,
         estado=Candidato.Estado.ENTREVISTA_APROVADA
     )
     
-    total = candidatos_aprovados.count()
-    
-    if total > 0:
-        candidatos_ids = list(candidatos_aprovados.values_list('id', flat=True))
-        Candidato.objects.filter(id__in=candidatos_ids).update(
-            estado=Candidato.Estado.ENVIADO_DEFC,
-            enviado_defc=True,
-            data_envio_defc=timezone.now()
-        )
-        
-        # Trigger DEFC migration script automatically
-        import subprocess
-        import platform
-        import os
-        python_cmd = 'python' if platform.system() == 'Windows' else 'python3'
-        defc_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../sicfaae-defc'))
-        script_path = os.path.join(defc_dir, 'migrate_defc.py')
-        
-        if os.path.exists(script_path):
-            try:
-                subprocess.Popen([python_cmd, script_path], cwd=defc_dir)
-                messages.success(request, f"Sucesso: {total} candidatos aprovados transferidos e sincronização DEFC iniciada.")
-            except Exception as e:
-                messages.warning(request, f"{total} candidatos marcados como enviados, mas falha ao sincronizar com DEFC: {str(e)}")
+    if candidatos_aprovados.exists():
+        # A transferência é feita em lotes pelo comando enviar_defc
+        envio = EnvioDEFC.solicitar(candidatos_aprovados, request.user)
+        if envio:
+            messages.success(request, f"Sucesso: {envio.total} candidatos aprovados postos em fila para transferência ao DEFC.")
         else:
-            messages.success(request, f"Sucesso: {total} candidatos aprovados transferidos para a Formação (DEFC)!")
+            messages.info(request, "Os candidatos aprovados já foram enviados ou estão em fila para transferência ao DEFC.")
     else:
         messages.warning(request, "Nenhum candidato aprovado na entrevista foi encontrado para transferência.")
         
@@ -260,6 +251,17 @@ def alternar_status_vaga(request, pk):
     
     return redirect('candidaturas:lista_vagas')
 
+def pedir_documento_concurso(request, vaga):
+    """
+    Põe em fila a geração do aviso oficial pelo worker (processar_tarefas) se o
+    documento gravado não corresponde aos dados actuais. Retorna True se pediu.
+    """
+    if vaga.documento_concurso_actual:
+        return False
+    TarefaRelatorio.solicitar(request.user, TarefaRelatorio.Tipo.DOCUMENTO_CONCURSO, {'vaga': vaga.pk})
+    return True
+
+
 class AbrirConcursoView(LoginRequiredMixin, generic.UpdateView):
     """View para abrir o concurso e definir número de vagas, gerando o PDF."""
     model = Vaga
@@ -272,33 +274,32 @@ class AbrirConcursoView(LoginRequiredMixin, generic.UpdateView):
     def form_valid(self, form):
         vaga = form.save(commit=False)
         vaga.concurso_aberto = True
-        
-        # Gerar o PDF do concurso
-        from django.template.loader import get_template
-        from xhtml2pdf import pisa
-        from io import BytesIO
-        from candidaturas.utils import link_callback
-        
-        context_dict = {
-            'vaga': vaga,
-            'data_geracao': timezone.now(),
-        }
-        
-        template = get_template('candidaturas/pdf/concurso_oficial.html')
-        html = template.render(context_dict)
-        result = BytesIO()
-        pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result, link_callback=link_callback)
-        
-        if not pdf.err:
-            pdf_name = f"Concurso_Vaga_{vaga.pk}.pdf"
-            vaga.documento_concurso.save(pdf_name, ContentFile(result.getvalue()), save=False)
-        else:
-            messages.error(self.request, "Erro ao gerar PDF oficial.")
-            
         vaga.save()
+
+        # Reabrir sem alterações mantém o documento actual
+        if pedir_documento_concurso(self.request, vaga):
+            messages.info(self.request, "O documento oficial está a ser gerado e ficará disponível dentro de momentos.")
+        else:
+            messages.info(self.request, "O documento oficial não mudou e foi mantido.")
+
         messages.success(self.request, f"Concurso aberto com sucesso para {vaga.numero_vagas} vagas!")
         return redirect(self.get_success_url())
 
+
+def documento_concurso(request, pk, versao):
+    """Aviso oficial do concurso (público). O URL inclui a versão, por isso a resposta é imutável."""
+    vaga = get_object_or_404(
+        Vaga.objects.only('pk', 'concurso_aberto', 'documento_concurso', 'hash_concurso'), pk=pk, concurso_aberto=True
+    )
+    if not vaga.documento_concurso:
+        raise Http404("O documento do concurso ainda não está disponível.")
+    if versao != vaga.versao_concurso:
+        return redirect('candidaturas:documento_concurso', pk=vaga.pk, versao=vaga.versao_concurso)
+    return resposta_ficheiro(
+        request, vaga.documento_concurso, f"Concurso_Vaga_{vaga.pk}.pdf",
+        etag=vaga.hash_concurso or None, imutavel=bool(vaga.hash_concurso),
+    )
+
 class ApagarVagaView(LoginRequiredMixin, generic.DeleteView):
     """View para remover uma vaga permanentemente."""
     model = Vaga
@@ -1,12 +1,11 @@
 import os
 import django
-from django.utils import timezone
 
 # Setup Django environment
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DRH.settings')
 django.setup()
 
-from candidaturas.models import Candidato, Vaga
+from candidaturas.models import Candidato, Vaga, EnvioDEFC
 
 def enviar_candidatos(titulo_vaga, quantidade):
     vaga = Vaga.objects.filter(titulo__icontains=titulo_vaga).first()
@@ -24,13 +23,12 @@ def enviar_candidatos(titulo_vaga, quantidade):
         
     print(f"Preparando para enviar {len(candidatos_ids)} candidatos da vaga '{titulo_vaga}'...")
     
-    # Atualizar em massa
-    Candidato.objects.filter(id__in=candidatos_ids).update(
-        estado=Candidato.Estado.ENVIADO_DEFC,
-        enviado_defc=True,
-        data_envio_defc=timezone.now()
-    )
-    print(f"Sucesso: {len(candidatos_ids)} candidatos de '{titulo_vaga}' marcados como ENVIADO_DEFC.")
+    # Pôr em fila; o envio é feito em lotes por `python manage.py enviar_defc`
+    envio = EnvioDEFC.solicitar(Candidato.objects.filter(id__in=candidatos_ids))
+    if envio:
+        print(f"Sucesso: {envio.total} candidatos de '{titulo_vaga}' em fila para envio ao DEFC (envio #{envio.pk}).")
+    else:
+        print(f"Os candidatos de '{titulo_vaga}' já foram enviados ou estão em fila.")
 
 if __name__ == '__main__':
     enviar_candidatos('Formador Nacional', 75)